@@ -0,0 +1,350 @@
+import sys
+import os
+import json
+import time
+import datetime
+import typing
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function, MUTED_TYPES
+from functions.utilities import stream_name_Function
+from classes.Telegrambot import CTelegramBot
+from classes import SQLite_Database
+from classes.SQLite_Database import SQLite_Database_Class
+from classes.Simulated_Broker import Simulated_Broker_Class
+from classes.Broker_Gateway import CBroker_Gateway, CBroker_Metadata
+from classes.Candle_Cache import CANDLE_WINDOW, load_candles_Function
+from classes.Scheduler import BAR_SECONDS
+from classes.Metatrader_Module import COMMISSION_PER_LOT
+from classes.DP_Parameteres import DP_Parameteres_Class
+from classes.Flag import Flag_Class
+from classes.timeframe import Timeframe_Class
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+BACKTEST_CONFIG: dict = config.get("backtest", {})
+BACKTEST_PATH: str = BACKTEST_CONFIG.get("path", "./backtests")
+BACKTEST_BALANCE: float = BACKTEST_CONFIG.get("balance", 10_000.0)
+RETRAIN_EVERY_DAYS: float = BACKTEST_CONFIG.get("retrain_every_days", 7)  # simulated days between two retrainings of the ML models
+STAGES = ("broker", "flags", "validation", "ml", "orders")  # the latency columns of a simulated bar
+
+def release_bars_Function(The_flags: list[Flag_Class], The_first_bar: int, window: int = CANDLE_WINDOW) -> dict[int, list[Flag_Class]]:
+    """
+    The bar at which the live bot would first detect each flag found on the whole history: the bot looks at the
+    last `window` bars, whose first bar is never the start of a flag, so a flag ending at bar e and starting at bar
+    s shows up at the close of bar e if s is still inside that window, and never otherwise. Flags ended before
+    `The_first_bar` (the history the bot starts with) all show up on it.
+    Returns:
+        dict[int, list[Flag_Class]]: The flags released at each bar, in the order of detection.
+    """
+    releases: dict[int, list[Flag_Class]] = {}
+    for flag in The_flags:
+        The_bar = max(int(flag.End_index), The_first_bar)
+        if flag.Start_index >= The_bar - window + 2:
+            releases.setdefault(The_bar, []).append(flag)
+    return releases
+
+class DP_Tracker_Class:
+    """
+    The active DPs of a backtest as columns, so that the DPs whose `Each_DP_validation_Function` outcome changes at
+    a bar are found for all of them at once instead of validating every DP on every bar. Prices are signed (those
+    of Bearish DPs negated), so both directions look for a low at or below a level and a high above the best one:
+    - a DP without entry changes on the first bar after its `first_valid_trade_time` whose low reaches its entry;
+    - an entered DP changes on a bar whose low reaches its stop (it closes) or whose high beats the best price
+      since the entry (its Result grows).
+    """
+
+    COLUMNS = ("keys", "sign", "entry", "stop", "first", "entry_bar", "best")
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.sign = np.empty(0)
+        self.entry = np.empty(0)
+        self.stop = np.empty(0)
+        self.first = np.empty(0, dtype=np.int64)  # the first bar the entry can happen on
+        self.entry_bar = np.empty(0, dtype=np.int64)  # -1 until the entry
+        self.best = np.empty(0)  # the best signed price since the entry
+
+    def add_Function(self, The_DPs: list[DP_Parameteres_Class], The_first_bars: np.ndarray):
+        sign = np.array([1.0 if aDP.trade_direction == "Bullish" else -1.0 for aDP in The_DPs])
+        highs = np.array([aDP.High.price for aDP in The_DPs], dtype=float)
+        lows = np.array([aDP.Low.price for aDP in The_DPs], dtype=float)
+        self.keys = np.concatenate((self.keys, np.array([aDP.key for aDP in The_DPs], dtype=np.int64)))
+        self.sign = np.concatenate((self.sign, sign))
+        self.entry = np.concatenate((self.entry, np.where(sign > 0, highs, -lows)))
+        self.stop = np.concatenate((self.stop, np.where(sign > 0, lows, -highs)))
+        self.first = np.concatenate((self.first, np.asarray(The_first_bars, dtype=np.int64)))
+        self.entry_bar = np.concatenate((self.entry_bar, np.full(len(The_DPs), -1, dtype=np.int64)))
+        self.best = np.concatenate((self.best, np.full(len(The_DPs), -np.inf)))
+
+    def remove_Function(self, The_keys: typing.Iterable[int]):
+        keep = ~np.isin(self.keys, np.fromiter(The_keys, dtype=np.int64))
+        for column in self.COLUMNS:
+            setattr(self, column, getattr(self, column)[keep])
+
+    def catch_up_Function(self, The_positions: np.ndarray, The_bar: int, The_highs: np.ndarray, The_lows: np.ndarray):
+        """ Plays the bars between the first bar and `The_bar` (excluded) on DPs registered late (on the first bar of the backtest). """
+        for position in The_positions:
+            first = self.first[position]
+            if first >= The_bar:
+                continue
+            lows, highs = (The_lows[first:The_bar], The_highs[first:The_bar]) if self.sign[position] > 0 else (-The_highs[first:The_bar], -The_lows[first:The_bar])
+            entry_hits = np.flatnonzero(lows <= self.entry[position])
+            if entry_hits.size:
+                self.entry_bar[position] = first + entry_hits[0]
+                self.best[position] = highs[entry_hits[0]:].max()
+
+    def events_Function(self, The_bar: int, The_high: float, The_low: float) -> tuple[np.ndarray, int]:
+        """ The positions of the DPs whose validation changes at `The_bar` (updating their state), and how many of them entered. """
+        low = np.where(self.sign > 0, The_low, -The_high)
+        high = np.where(self.sign > 0, The_high, -The_low)
+        entered = self.entry_bar >= 0
+        entering = ~entered & (self.first <= The_bar) & (low <= self.entry)
+        changed = np.flatnonzero(entering | (entered & ((low <= self.stop) | (high > self.best))))
+        self.entry_bar[entering] = The_bar
+        self.best[changed] = np.maximum(self.best[changed], high[changed])
+        return changed, int(np.count_nonzero(entering))
+
+    def tradeable_Function(self) -> list[int]:
+        """ The keys of the DPs without entry: the tradeable DPs of the validation, in registration order. """
+        return self.keys[self.entry_bar < 0].tolist()
+
+class Backtest_Class:
+    """
+    Replays the cached candles of one stream (`load_candles_Function`) bar by bar through the production pipeline of
+    `Timeframe_Class`: flag detection (`FlagDetector_Class`), DP validation (`Each_DP_validation_Function`), the ML
+    engine (`ML_Main_Function`) and the order-management pass (`Update_Positions_Function`), against an in-memory
+    SQLite storage and a `Simulated_Broker_Class` behind the broker gateway. Only closed bars are played.
+    The work per bar is incremental, where the live bot redoes everything on its last `CANDLE_WINDOW` bars:
+    - the flags are detected once on the whole history and released at the bar the bot would find them
+      (`release_bars_Function`);
+    - only the DPs whose validation changes at the bar are validated (`DP_Tracker_Class`), on the bars since their
+      first valid bar (or entry); the others keep their stored Result and weight;
+    - the ML engine runs when the tradeable DPs or the Results of their related DPs change, and retrains every
+      `backtest.retrain_every_days` simulated days;
+    - the order pass runs when the trade list changes.
+    Writes the equity curve, the fills and the latency of every bar per stage to `backtest.path`.
+    """
+
+    def __init__(self, The_symbol: str = config["trading_configs"]["asset"], The_timeframe: str = config["trading_configs"]["timeframes"][0],
+                 start: typing.Union[str, datetime.datetime, None] = None, end: typing.Union[str, datetime.datetime, None] = None,
+                 balance: float = BACKTEST_BALANCE, retrain_every_days: float = RETRAIN_EVERY_DAYS, The_directory: typing.Optional[str] = None):
+        self.symbol = The_symbol
+        self.timeframe = The_timeframe
+        self.stream = stream_name_Function(The_symbol, The_timeframe)
+        self.start = start
+        self.end = end
+        self.balance = balance
+        self.retrain_seconds = retrain_every_days * 86400
+        self.directory = The_directory or os.path.join(BACKTEST_PATH, f"{self.stream}_{datetime.datetime.now():%Y%m%d_%H%M%S}")
+        self.stats = {"flags": 0, "DPs": 0, "validations": 0, "ml_passes": 0, "retrains": 0, "order_passes": 0}
+
+    def _setup_Function(self):
+        SQLite_Database.SQLITE_PATH = ":memory:"  # a connection of its own, whatever `storage.sqlite_path` the live streams opened
+        SQLite_Database.sqlite_connection = None
+        self.storage = SQLite_Database_Class(self.stream)
+        self.frame = Timeframe_Class(self.timeframe, self.symbol, The_storage=self.storage)
+        self.frame.model_directory = self.directory
+        self.frame.retrain_every = float("inf")  # retrained on simulated time instead (`request_retrain_Function`)
+        self.frame.Order_Manager.notify = False
+        self.frame.Order_Manager.clock = lambda: self.clock
+        self.broker = Simulated_Broker_Class(self.symbol, balance=self.balance, commission_per_lot=COMMISSION_PER_LOT)
+        CBroker_Gateway.target = self.broker
+        CBroker_Metadata.invalidate_Function(self.symbol)
+        self.tracker = DP_Tracker_Class()
+        self.clock = datetime.datetime.now()
+
+    async def _validate_Function(self, The_changed: np.ndarray, The_bar: int) -> set[int]:
+        """ Validates the DPs at `The_changed` positions of the tracker on the bars since their entry (or first bar), and stores the outcome. Returns the keys whose Result changed. """
+        self.frame.dps_to_update, self.frame.Tradeable_DPs, self.frame.inserting_BackTest_DB = [], [], []
+        starts = np.where(self.tracker.entry_bar >= 0, self.tracker.entry_bar, self.tracker.first)
+        for position in The_changed:
+            dp_key = int(self.tracker.keys[position])
+            aDP = self.storage.Registry.Active_DPs.get(dp_key)
+            if aDP is None:
+                continue
+            self.frame.DataSet = self.candles.iloc[starts[position]:The_bar + 1]
+            try:
+                await self.frame.Each_DP_validation_Function(aDP, dp_key)
+            except Exception as e:
+                print_and_logging_Function("error", f"{self.stream} -> Error in validating DPs: {e}", "title")
+        self.stats["validations"] += len(The_changed)
+        if self.frame.inserting_BackTest_DB:
+            await self.storage._update_dp_Results_Function(self.frame.inserting_BackTest_DB)
+        if self.frame.dps_to_update:
+            await self.storage._update_dp_weights_Function(self.frame.dps_to_update)
+            self.tracker.remove_Function(dp_key for dp_key, weight in self.frame.dps_to_update if weight == 0)
+        return {dp_key for dp_key, _ in self.frame.inserting_BackTest_DB}
+
+    def _watched_Function(self, The_tradeable: list[int]) -> set[int]:
+        """ The related DPs of the tradeable ones: their Results are model inputs. """
+        related_keys = self.storage.Registry.Related_keys
+        return {related for dp_key in The_tradeable for related in related_keys.get(dp_key, ()) if related is not None}
+
+    async def run_Function(self) -> dict:
+        """
+        Plays the candles and writes `equity.csv`, `fills.csv`, `latency.csv` and `summary.json` to the directory
+        of the backtest.
+        Returns:
+            dict: The summary: activity counters, final balance, return and drawdown, and the p50/p95/max latency
+            of each stage of a simulated bar (ms).
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._setup_Function()
+        await self.storage.sync_registry_Function()
+        wall_start = time.perf_counter()
+
+        self.candles = load_candles_Function(self.symbol, self.timeframe, end=self.end)
+        if len(self.candles) < 2:
+            raise ValueError(f"{self.stream}: no cached candles to replay (see functions/candle_history.py)")
+        times = self.candles["time"].to_numpy(dtype="datetime64[ns]")
+        first_bar = min(CANDLE_WINDOW, len(self.candles)) - 1  # the bot starts with one window of history
+        if self.start is not None:
+            first_bar = max(first_bar, int(np.searchsorted(times, np.datetime64(pd.Timestamp(self.start)))))
+        if first_bar >= len(self.candles):
+            raise ValueError(f"{self.stream}: no cached candles after {self.start}")
+        opens, highs, lows, closes = (self.candles[column].to_numpy(dtype=float) for column in ("open", "high", "low", "close"))
+        seconds = times.astype("datetime64[s]").astype(np.int64)
+        bar_seconds = BAR_SECONDS.get(self.timeframe, 60)
+
+        releases = release_bars_Function(await self.frame.detector.find_flags_Function(self.candles), first_bar)
+        detection_seconds = time.perf_counter() - wall_start
+
+        bars = len(self.candles) - first_bar
+        latency = np.zeros((bars, len(STAGES)))
+        balance = np.zeros(bars)
+        equity = np.zeros(bars)
+        open_positions = np.zeros(bars, dtype=np.int64)
+        pending_orders = np.zeros(bars, dtype=np.int64)
+        trade_list: list = []
+        trade_signature: typing.Optional[tuple] = None
+        tradeable: list[int] = []
+        watched: set[int] = set()
+        next_retrain = seconds[first_bar] + self.retrain_seconds
+
+        for row, The_bar in enumerate(range(first_bar, len(self.candles))):
+            stage_start = time.perf_counter()
+            if self.broker.advance_Function(int(seconds[The_bar]), opens[The_bar], highs[The_bar], lows[The_bar], closes[The_bar]):
+                CBroker_Metadata.invalidate_Function()
+            self.broker.time = int(seconds[The_bar]) + bar_seconds
+            self.clock = datetime.datetime.fromtimestamp(self.broker.time, datetime.timezone.utc).replace(tzinfo=None)
+            stage_end = time.perf_counter()
+            latency[row, 0] = stage_end - stage_start
+
+            # Flags the bot finds at the close of this bar
+            stage_start = stage_end
+            new_positions = np.empty(0, dtype=np.int64)
+            The_flags = releases.get(The_bar)
+            if The_flags:
+                known_DPs = len(self.storage.Registry.Active_DPs)
+                await self.storage.save_flags_Function(The_flags)
+                self.stats["flags"] += self.storage.detected_flags
+                new_DPs = list(self.storage.Registry.Active_DPs.values())[known_DPs:]
+                if new_DPs:
+                    first_bars = np.searchsorted(times, np.array([np.datetime64(aDP.first_valid_trade_time) for aDP in new_DPs], dtype="datetime64[ns]"), side="right")
+                    self.tracker.add_Function(new_DPs, first_bars)
+                    new_positions = np.arange(len(self.tracker.keys) - len(new_DPs), len(self.tracker.keys))
+                    self.tracker.catch_up_Function(new_positions, The_bar, highs, lows)
+                    self.stats["DPs"] += len(new_DPs)
+            stage_end = time.perf_counter()
+            latency[row, 1] = stage_end - stage_start
+
+            # DP validation, only where it changes
+            stage_start = stage_end
+            changed, entered = self.tracker.events_Function(The_bar, highs[The_bar], lows[The_bar])
+            changed = np.union1d(changed, new_positions[self.tracker.first[new_positions] < The_bar]) if len(new_positions) else changed
+            new_results = await self._validate_Function(changed, The_bar) if len(changed) else set()
+            stage_end = time.perf_counter()
+            latency[row, 2] = stage_end - stage_start
+
+            # ML engine
+            stage_start = stage_end
+            tradeable_changed = bool(len(new_positions) or entered)
+            if tradeable_changed:
+                tradeable = self.tracker.tradeable_Function()
+                watched = self._watched_Function(tradeable)
+            retrain = seconds[The_bar] >= next_retrain
+            if retrain:
+                self.frame.request_retrain_Function("FTC")
+                next_retrain = seconds[The_bar] + self.retrain_seconds
+                self.stats["retrains"] += 1
+            if retrain or ((tradeable_changed or not watched.isdisjoint(new_results)) and os.path.exists(self.frame.model_path_Function("FTC"))):
+                trade_list = await self.frame.ML_Main_Function(tradeable)
+                self.stats["ml_passes"] += 1
+            stage_end = time.perf_counter()
+            latency[row, 3] = stage_end - stage_start
+
+            # Order pass, when the trade list changed
+            stage_start = stage_end
+            signature = tuple((dp_key, RR) for _, dp_key, _, RR, _ in trade_list)
+            if signature != trade_signature:
+                await self.frame.Update_Positions_Function(trade_list)
+                trade_signature = signature
+                self.stats["order_passes"] += 1
+            latency[row, 4] = time.perf_counter() - stage_start
+
+            balance[row] = self.broker.balance
+            equity[row] = self.broker.equity_Function()
+            open_positions[row] = len(self.broker.positions)
+            pending_orders[row] = len(self.broker.orders)
+
+        wall_seconds = time.perf_counter() - wall_start
+        bar_times = self.candles["time"].iloc[first_bar:].to_numpy()
+        pd.DataFrame({"time": bar_times, "balance": balance, "equity": equity, "positions": open_positions,
+                      "orders": pending_orders}).to_csv(os.path.join(self.directory, "equity.csv"), index=False)
+        fills = pd.DataFrame(self.broker.deals, columns=["time", "ticket", "symbol", "type", "entry", "reason", "price", "volume", "sl", "tp", "profit", "balance"])
+        fills["time"] = pd.to_datetime(fills["time"], unit="s")
+        fills.to_csv(os.path.join(self.directory, "fills.csv"), index=False)
+        latency_ms = latency * 1000
+        latency_frame = pd.DataFrame(latency_ms, columns=[f"{stage}_ms" for stage in STAGES])
+        latency_frame.insert(0, "time", bar_times)
+        latency_frame["total_ms"] = latency_ms.sum(axis=1)
+        latency_frame.to_csv(os.path.join(self.directory, "latency.csv"), index=False)
+
+        closes_out = fills[fills["entry"] == "out"]
+        peak = np.maximum.accumulate(equity)
+        summary = {
+            "stream": self.stream, "first_bar": str(bar_times[0]), "last_bar": str(bar_times[-1]), "bars": bars,
+            "wall_seconds": round(wall_seconds, 2), "detection_seconds": round(detection_seconds, 2),
+            "bars_per_second": round(bars / wall_seconds, 1) if wall_seconds else None,
+            **self.stats, "orders": dict(self.frame.Order_Manager.stats), "fills": int((fills["entry"] == "in").sum()),
+            "closed_trades": len(closes_out), "winning_trades": int((closes_out["profit"] > 0).sum()),
+            "start_balance": self.balance, "final_balance": round(self.broker.balance, 2), "final_equity": round(float(equity[-1]), 2),
+            "return_percent": round((float(equity[-1]) / self.balance - 1) * 100, 3),
+            "max_drawdown_percent": round(float(np.max(1 - equity / peak)) * 100, 3) if bars else 0.0,
+            "latency_ms": {column: {"p50": round(float(np.percentile(latency_frame[column], 50)), 3),
+                                    "p95": round(float(np.percentile(latency_frame[column], 95)), 3),
+                                    "max": round(float(latency_frame[column].max()), 3)}
+                           for column in latency_frame.columns if column != "time"},
+        }
+        with open(os.path.join(self.directory, "summary.json"), "w") as file:
+            json.dump(summary, file, indent=4, default=str)
+        return summary
+
+async def run_backtest_Function(The_backtest: Backtest_Class, verbose: bool = False) -> dict:
+    """
+    Runs `The_backtest` with the pipeline quiet (no info / warning logs unless `verbose`, no Telegram messages), then
+    puts back the live broker target and SQLite connection.
+    """
+    The_target = CBroker_Gateway.target
+    The_sqlite = SQLite_Database.SQLITE_PATH, SQLite_Database.sqlite_connection
+    muted = set(MUTED_TYPES)
+    if not verbose:
+        MUTED_TYPES.update({"info", "warning"})
+    CTelegramBot.muted = True
+    try:
+        return await The_backtest.run_Function()
+    finally:
+        MUTED_TYPES.clear()
+        MUTED_TYPES.update(muted)
+        CTelegramBot.muted = False
+        CBroker_Gateway.target = The_target
+        if SQLite_Database.sqlite_connection is not None and SQLite_Database.sqlite_connection is not The_sqlite[1]:
+            SQLite_Database.sqlite_connection.close()
+        SQLite_Database.SQLITE_PATH, SQLite_Database.sqlite_connection = The_sqlite
+        CBroker_Metadata.invalidate_Function(The_backtest.symbol)
@@ -0,0 +1,197 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import collections
+import concurrent.futures
+import itertools
+import queue
+import threading
+import typing
+import numpy as np
+import MetaTrader5
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+BROKER_CONFIG: dict = config.get("broker", {})
+BROKER_TIMEOUT: float = BROKER_CONFIG.get("timeout", 10)
+SLOW_CALL_MS: float = BROKER_CONFIG.get("slow_call_ms", 500)
+METADATA_TTL: float = BROKER_CONFIG.get("metadata_ttl", 5)  # seconds a symbol_info / account_info stays cached
+LATENCY_WINDOW = 500  # latencies kept per call for the percentiles
+
+PRIORITY_ORDER = 0  # session and order calls go first
+PRIORITY_INFO = 1
+PRIORITY_DATA = 2
+CALL_PRIORITIES: dict[str, int] = {
+    "initialize": PRIORITY_ORDER, "login": PRIORITY_ORDER, "order_send": PRIORITY_ORDER, "order_check": PRIORITY_ORDER,
+    "orders_get": PRIORITY_ORDER, "positions_get": PRIORITY_ORDER,
+    "account_info": PRIORITY_INFO, "symbol_info": PRIORITY_INFO, "symbol_info_tick": PRIORITY_INFO,
+}  # anything else (copy_rates_*, copy_ticks_*, history_*) is data
+
+class Call_Stats_Class:
+    """ Counters and rolling latency window of one MetaTrader5 function. """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.wait_ms = 0.0  # time spent in the queue before the gateway thread picked the call
+        self.recent_ms: collections.deque = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def add_Function(self, ms: float, wait_ms: float, failed: bool):
+        self.calls += 1
+        self.errors += failed
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.wait_ms += wait_ms
+        self.recent_ms.append(ms)
+
+class Broker_Gateway_Class:
+    """
+    Runs every MetaTrader5 call on one dedicated thread, so a slow terminal call never blocks the event loop (the
+    MetaTrader5 package is not thread-safe either: one thread owns the session). Calls are queued by priority
+    (session and orders, then account/symbol info, then data) and FIFO within a priority; a caller stops waiting
+    after its timeout, and a call still queued by then is dropped. Latency and queue wait are kept per function.
+    `target` is the MetaTrader5 module, or the proxy of the coordinator in a worker of the process mode.
+    """
+
+    def __init__(self):
+        self.target: typing.Any = MetaTrader5
+        self.requests: queue.PriorityQueue = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.thread: typing.Optional[threading.Thread] = None
+        self.thread_lock = threading.Lock()
+        self.stats: dict[str, Call_Stats_Class] = {}
+
+    def _run_Function(self):
+        while True:
+            _, _, (The_name, args, kwargs, future, queued_at) = self.requests.get()
+            if not future.set_running_or_notify_cancel():
+                continue  # its caller timed out while it was queued
+            start = time.perf_counter()
+            failed = False
+            try:
+                future.set_result(getattr(self.target, The_name)(*args, **kwargs))
+            except BaseException as e:
+                failed = True
+                future.set_exception(e)
+            ms = (time.perf_counter() - start) * 1000
+            self.stats.setdefault(The_name, Call_Stats_Class()).add_Function(ms, (start - queued_at) * 1000, failed)
+            if ms >= SLOW_CALL_MS:
+                print_and_logging_Function("warning", f"Slow broker call {The_name}: {ms:.0f} ms", "description")
+
+    def submit_Function(self, The_name: str, *args, priority: typing.Optional[int] = None, **kwargs) -> concurrent.futures.Future:
+        """ Queues `target.<The_name>(*args, **kwargs)` for the gateway thread (started on the first call). """
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run_Function, name="Broker-Gateway", daemon=True)
+                self.thread.start()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        The_priority = CALL_PRIORITIES.get(The_name, PRIORITY_DATA) if priority is None else priority
+        self.requests.put((The_priority, next(self.sequence), (The_name, args, kwargs, future, time.perf_counter())))
+        return future
+
+    def _timed_out_Function(self, The_name: str, future: concurrent.futures.Future, timeout: float) -> TimeoutError:
+        future.cancel()  # dropped if still queued; a call already running cannot be interrupted
+        self.stats.setdefault(The_name, Call_Stats_Class()).timeouts += 1
+        return TimeoutError(f"Broker call {The_name} timed out after {timeout}s")
+
+    async def call_Function(self, The_name: str, *args, priority: typing.Optional[int] = None, timeout: typing.Optional[float] = None, **kwargs):
+        """ Awaits `MetaTrader5.<The_name>(*args, **kwargs)` run on the gateway thread. Raises TimeoutError after `timeout` (default `broker.timeout`). """
+        timeout = BROKER_TIMEOUT if timeout is None else timeout
+        future = self.submit_Function(The_name, *args, priority=priority, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out_Function(The_name, future, timeout)
+
+    def call_sync_Function(self, The_name: str, *args, priority: typing.Optional[int] = None, timeout: typing.Optional[float] = None, **kwargs):
+        """ Blocking `call_Function`, for threads other than the event loop's. """
+        timeout = BROKER_TIMEOUT if timeout is None else timeout
+        future = self.submit_Function(The_name, *args, priority=priority, **kwargs)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise self._timed_out_Function(The_name, future, timeout)
+
+    def report_Function(self) -> list[dict]:
+        """
+        Returns:
+            list[dict]: One entry per MetaTrader5 function, slowest total first: name, calls, errors, timeouts,
+            total/avg/max ms, average queue wait and rolling p50/p95/p99 ms.
+        """
+        report = []
+        for The_name, stats in list(self.stats.items()):
+            recent = np.fromiter(list(stats.recent_ms), dtype=float)
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if len(recent) else (0.0, 0.0, 0.0)
+            report.append({"name": The_name, "calls": stats.calls, "errors": stats.errors, "timeouts": stats.timeouts,
+                           "total_ms": stats.total_ms, "avg_ms": stats.total_ms / stats.calls if stats.calls else 0.0,
+                           "max_ms": stats.max_ms, "avg_wait_ms": stats.wait_ms / stats.calls if stats.calls else 0.0,
+                           "p50": float(p50), "p95": float(p95), "p99": float(p99)})
+        report.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return report
+
+CBroker_Gateway = Broker_Gateway_Class()
+
+class Broker_Metadata_Class:
+    """
+    TTL cache of `symbol_info` and `account_info` in front of the gateway: sizing and placing an order read both,
+    and they change rarely (account_info when margin or balance moves). Entries expire after `broker.metadata_ttl`
+    seconds, are dropped explicitly after orders, cancels and closed positions (`invalidate_Function`), and are
+    refreshed together at the start of each order-management pass (`prefetch_Function`). Concurrent misses of the
+    same entry share one terminal call.
+    """
+
+    def __init__(self, The_gateway: Broker_Gateway_Class):
+        self.gateway = The_gateway
+        self.entries: dict[tuple, tuple[float, typing.Any]] = {}  # ("symbol_info", symbol) / ("account_info",) -> (expiry, value)
+        self.in_flight: dict[tuple, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    async def _get_Function(self, The_key: tuple, refresh: bool = False):
+        entry = self.entries.get(The_key)
+        if entry is not None and entry[0] > time.monotonic() and not refresh:
+            self.stats["hits"] += 1
+            return entry[1]
+        if The_key in self.in_flight:
+            return await asyncio.shield(self.in_flight[The_key])
+        self.stats["misses"] += 1
+        The_call = asyncio.ensure_future(self.gateway.call_Function(*The_key))
+        self.in_flight[The_key] = The_call
+        try:
+            value = await asyncio.shield(The_call)
+        finally:
+            self.in_flight.pop(The_key, None)
+        if value is not None:  # a failed lookup is retried on the next read
+            self.entries[The_key] = (time.monotonic() + METADATA_TTL, value)
+        return value
+
+    async def symbol_info_Function(self, The_symbol: str):
+        return await self._get_Function(("symbol_info", The_symbol))
+
+    async def account_info_Function(self):
+        return await self._get_Function(("account_info",))
+
+    async def prefetch_Function(self, The_symbols: typing.Iterable[str]):
+        """ Refreshes account_info and the symbol_info of `The_symbols` in one batch of queued gateway calls. """
+        await asyncio.gather(self._get_Function(("account_info",), refresh=True),
+                             *[self._get_Function(("symbol_info", The_symbol), refresh=True) for The_symbol in set(The_symbols)])
+
+    def invalidate_Function(self, The_symbol: typing.Optional[str] = None, account: bool = True):
+        """ Drops account_info (fills, cancels, balance changes) and, if given, the symbol_info of `The_symbol`. """
+        if account:
+            self.entries.pop(("account_info",), None)
+        if The_symbol is not None:
+            self.entries.pop(("symbol_info", The_symbol), None)
+        self.stats["invalidations"] += 1
+
+CBroker_Metadata = Broker_Metadata_Class(CBroker_Gateway)
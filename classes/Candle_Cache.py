@@ -0,0 +1,125 @@
+import sys
+import os
+import json
+import datetime
+import typing
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+CANDLES_CONFIG: dict = config.get("candles", {})
+CACHE_ENABLED: bool = CANDLES_CONFIG.get("cache", False)  # keep the closed bars on disk and only fetch the missing ones
+CACHE_PATH: str = CANDLES_CONFIG.get("cache_path", "./candles")
+CANDLE_WINDOW = 10000  # bars per window, as fetched by `fetch_data_Function`
+RATES_DTYPE = np.dtype([("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+                        ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8")])
+
+def as_rates_Function(The_rates: typing.Any) -> np.ndarray:
+    """ MetaTrader5 rates (or any record array with their fields) as a `RATES_DTYPE` array, copied field by field. """
+    rates = np.empty(0 if The_rates is None else len(The_rates), dtype=RATES_DTYPE)
+    for field in RATES_DTYPE.names:
+        if len(rates):
+            rates[field] = The_rates[field]
+    return rates
+
+def merge_rates_Function(The_rates: np.ndarray, The_new_rates: np.ndarray) -> np.ndarray:
+    """ `The_rates` and `The_new_rates` merged in time order; a new bar replaces the bar of the same time. """
+    kept = The_rates[~np.isin(The_rates["time"], The_new_rates["time"])]
+    merged = np.concatenate((kept, The_new_rates))
+    return merged[np.argsort(merged["time"], kind="stable")]
+
+def rates_frame_Function(The_rates: np.ndarray) -> pd.DataFrame:
+    """ Rates in the layout of `fetch_data_Function` ('time' as datetime). """
+    DataSet = pd.DataFrame(The_rates)
+    DataSet["time"] = pd.to_datetime(DataSet["time"], unit="s")
+    return DataSet
+
+def cache_file_Function(The_symbol: str, The_timeframe: str) -> str:
+    return os.path.join(CACHE_PATH, f"{The_symbol}_{The_timeframe}.rates")
+
+class Candle_Cache_Class:
+    """
+    The closed bars of one symbol and timeframe on disk: a flat file of `RATES_DTYPE` records, oldest first, read
+    through `np.memmap` (only the pages of the bars asked for are read) and grown by appending the bars newer than
+    its last one. Nothing else is in the file, so any tool can read it with `np.memmap(path, dtype=RATES_DTYPE)`.
+    The forming bar is never written.
+    """
+
+    def __init__(self, The_symbol: str, The_timeframe: str):
+        self.symbol = The_symbol
+        self.timeframe = The_timeframe
+        self.path = cache_file_Function(The_symbol, The_timeframe)
+
+    def _records_Function(self) -> np.ndarray:
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        count = size // RATES_DTYPE.itemsize  # a record cut short by a crash is ignored (and overwritten by the next append)
+        if count == 0:
+            return np.empty(0, dtype=RATES_DTYPE)
+        return np.memmap(self.path, dtype=RATES_DTYPE, mode="r", shape=(count,))
+
+    def __len__(self) -> int:
+        return len(self._records_Function())
+
+    def last_time_Function(self) -> typing.Optional[int]:
+        records = self._records_Function()
+        return int(records["time"][-1]) if len(records) else None
+
+    def read_Function(self, count: typing.Optional[int] = None, start: typing.Optional[int] = None, end: typing.Optional[int] = None) -> np.ndarray:
+        """ A copy of the cached bars with `start` <= time < `end` (seconds), the last `count` of them if given. """
+        records = self._records_Function()
+        first, last = 0, len(records)
+        if start is not None:
+            first = int(np.searchsorted(records["time"], start))
+        if end is not None:
+            last = int(np.searchsorted(records["time"], end))
+        if count is not None:
+            first = max(first, last - count)
+        return np.array(records[first:last])
+
+    def append_Function(self, The_rates: np.ndarray) -> int:
+        """ Appends the bars of `The_rates` (closed bars, oldest first) newer than the cached ones; returns how many. """
+        last_time = self.last_time_Function()
+        new_rates = The_rates if last_time is None else The_rates[The_rates["time"] > last_time]
+        if len(new_rates) == 0:
+            return 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as file:
+            file.seek(os.path.getsize(self.path) // RATES_DTYPE.itemsize * RATES_DTYPE.itemsize)
+            file.write(np.ascontiguousarray(new_rates, dtype=RATES_DTYPE).tobytes())
+            file.truncate()
+        return len(new_rates)
+
+    def merge_Function(self, The_rates: np.ndarray) -> int:
+        """ Adds the bars of `The_rates` (closed bars) missing from the file, also between cached ones (backfilled gaps); returns how many. """
+        if len(The_rates) == 0:
+            return 0
+        last_time = self.last_time_Function()
+        if last_time is None or The_rates["time"][0] > last_time:
+            return self.append_Function(The_rates)
+        records = self.read_Function()
+        new_rates = The_rates[~np.isin(The_rates["time"], records["time"])]
+        if len(new_rates):
+            self.rewrite_Function(merge_rates_Function(records, new_rates))
+        return len(new_rates)
+
+    def rewrite_Function(self, The_rates: np.ndarray):
+        """ Replaces the whole file (older history merged in front of the cached bars), through a temporary file. """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temporary = self.path + ".tmp"
+        np.ascontiguousarray(The_rates, dtype=RATES_DTYPE).tofile(temporary)
+        os.replace(temporary, self.path)
+
+def load_candles_Function(The_symbol: str, The_timeframe: str, start: typing.Union[str, datetime.datetime, None] = None,
+                          end: typing.Union[str, datetime.datetime, None] = None) -> pd.DataFrame:
+    """
+    The cached bars of `The_symbol` / `The_timeframe` between `start` and `end` (broker clock, as the bars) as a
+    DataFrame in the layout of `fetch_data_Function`: for backtests and the research notebook, without a terminal.
+    """
+    The_start = None if start is None else pd.Timestamp(start).value // 10**9
+    The_end = None if end is None else pd.Timestamp(end).value // 10**9
+    return rates_frame_Function(Candle_Cache_Class(The_symbol, The_timeframe).read_Function(start=The_start, end=The_end))
@@ -0,0 +1,338 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import collections
+import datetime
+import typing
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.utilities import is_trading_hours_now, SYMBOLS
+from classes.Metatrader_Module import CMetatrader_Module
+from classes.Broker_Gateway import CBroker_Gateway
+from classes.Scheduler import BAR_SECONDS, RETRY_INTERVAL, RETRY_TIMEOUT
+from classes.Candle_Cache import Candle_Cache_Class, CACHE_ENABLED, CANDLE_WINDOW, RATES_DTYPE, as_rates_Function, merge_rates_Function, rates_frame_Function
+import parameters
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+CANDLES_CONFIG: dict = config.get("candles", {})
+RESAMPLE: bool = CANDLES_CONFIG.get("resample", False)  # build the higher timeframes from the base stream instead of fetching each
+BASE_TIMEFRAME: str = CANDLES_CONFIG.get("base_timeframe", "M1")
+ALIGNMENT_OFFSET: int = CANDLES_CONFIG.get("alignment_offset_seconds", 0)  # shift of the bar boundaries of the broker's sessions
+CLOSED_WEEKDAYS: list[int] = CANDLES_CONFIG.get("closed_weekdays", [5, 6])  # days without bars (broker clock, Monday = 0); [] for 24/7 symbols
+CLOSURE_MARGIN: int = CANDLES_CONFIG.get("closure_margin_minutes", 60) * 60  # bars missing around a closed day that belong to the closure
+GAP_EVENTS = 100  # gap events kept for the stats
+
+def bar_starts_Function(The_times: np.ndarray, The_timeframe: str) -> np.ndarray:
+    """ The open time (seconds) of the `The_timeframe` bar holding each of `The_times` (seconds, broker clock). """
+    bar_seconds = BAR_SECONDS[The_timeframe]
+    return (The_times - ALIGNMENT_OFFSET) // bar_seconds * bar_seconds + ALIGNMENT_OFFSET
+
+def resample_Function(The_base: np.ndarray, The_timeframe: str) -> np.ndarray:
+    """
+    Aggregates base bars into `The_timeframe` bars as the terminal does: first open, highest high, lowest low, last
+    close, summed volumes and the lowest spread; a bar exists only where base bars do (no bar over closures).
+    """
+    if len(The_base) == 0:
+        return np.empty(0, dtype=RATES_DTYPE)
+    starts = bar_starts_Function(The_base["time"], The_timeframe)
+    firsts = np.concatenate(([0], np.flatnonzero(np.diff(starts)) + 1))
+    lasts = np.concatenate((firsts[1:] - 1, [len(The_base) - 1]))
+    rates = np.empty(len(firsts), dtype=RATES_DTYPE)
+    rates["time"] = starts[firsts]
+    rates["open"] = The_base["open"][firsts]
+    rates["high"] = np.maximum.reduceat(The_base["high"], firsts)
+    rates["low"] = np.minimum.reduceat(The_base["low"], firsts)
+    rates["close"] = The_base["close"][lasts]
+    rates["tick_volume"] = np.add.reduceat(The_base["tick_volume"], firsts)
+    rates["spread"] = np.minimum.reduceat(The_base["spread"], firsts)
+    rates["real_volume"] = np.add.reduceat(The_base["real_volume"], firsts)
+    return rates
+
+def is_closure_Function(start: int, end: int) -> bool:
+    """ Whether no bar is expected in [start, end) (seconds, broker clock): within `CLOSURE_MARGIN` of its ends it only holds closed weekdays. """
+    start, end = start + CLOSURE_MARGIN, end - CLOSURE_MARGIN
+    if end <= start:
+        return False
+    days = np.arange(start // 86400, (end - 1) // 86400 + 1)
+    return bool(np.isin((days + 3) % 7, CLOSED_WEEKDAYS).all())  # 1970-01-01 was a Thursday
+
+def gap_spans_Function(The_times: np.ndarray, The_timeframe: str, The_known: typing.Sequence[tuple[int, int]] = ()) -> list[tuple[int, int]]:
+    """
+    The spans [start, end) (seconds) where bars of `The_timeframe` are missing between consecutive `The_times`:
+    wider than the bar spacing, and neither a market closure (`is_closure_Function`) nor within one of `The_known`.
+    """
+    if The_timeframe not in BAR_SECONDS or len(The_times) < 2:
+        return []
+    bar_seconds = BAR_SECONDS[The_timeframe]
+    spans = []
+    for position in np.flatnonzero(np.diff(The_times) > bar_seconds):
+        start, end = int(The_times[position]) + bar_seconds, int(The_times[position + 1])
+        if is_closure_Function(start, end) or any(known_start <= start and end <= known_end for known_start, known_end in The_known):
+            continue
+        spans.append((start, end))
+    return spans
+
+def is_resampled_Function(The_timeframe: str) -> bool:
+    """ Whether `The_timeframe` is built from the base stream: intraday and daily multiples of the base timeframe. """
+    return (RESAMPLE and The_timeframe in BAR_SECONDS and The_timeframe != "W1"
+            and BAR_SECONDS[The_timeframe] % BAR_SECONDS[BASE_TIMEFRAME] == 0)
+
+class Resampler_Class:
+    """
+    The base window (the last `CANDLE_WINDOW` base bars) and the windows of the timeframes built from it. Each
+    window is seeded once from the broker; afterwards every ingested chunk of base bars (the new ones plus the
+    forming one, or the bars backfilled into a gap) only rebuilds the target bars from the open of the target bar
+    holding its first bar.
+    """
+
+    def __init__(self):
+        self.base = np.empty(0, dtype=RATES_DTYPE)
+        self.windows: dict[str, np.ndarray] = {}
+
+    def seed_Function(self, The_timeframe: str, The_rates: np.ndarray):
+        self.windows[The_timeframe] = The_rates[-CANDLE_WINDOW:]
+
+    def ingest_Function(self, The_new_base: np.ndarray):
+        """ Merges base bars (a newer one replaces the stored bar of the same time) and updates the seeded windows. """
+        if len(The_new_base) == 0:
+            return
+        first_time = The_new_base["time"][0]
+        self.base = merge_rates_Function(self.base, The_new_base)[-CANDLE_WINDOW:]
+        for The_timeframe, window in list(self.windows.items()):
+            start = bar_starts_Function(np.array([first_time]), The_timeframe)[0]
+            if start < self.base["time"][0]:
+                # Only the bars the base window fully holds are rebuilt, which must include those of the new bars
+                start = bar_starts_Function(self.base["time"][:1], The_timeframe)[0] + BAR_SECONDS[The_timeframe]
+                if start > The_new_base["time"][-1]:
+                    del self.windows[The_timeframe]  # seeded again from the broker
+                    continue
+            self.windows[The_timeframe] = np.concatenate((window[window["time"] < start],
+                                                          resample_Function(self.base[self.base["time"] >= start], The_timeframe)))[-CANDLE_WINDOW:]
+
+class Candle_Feed_Class:
+    """
+    Where the pipeline gets its candle windows (`window_Function`). Without `candles.resample` and
+    `candles.cache`, each window is fetched whole from the terminal as before.
+    - `candles.resample`: only the base stream (`candles.base_timeframe`, M1 by default) is fetched after the first
+      windows: one short tail of base bars per bar close, shared by all timeframes, from which `Resampler_Class`
+      builds the others (those that are multiples of the base one).
+    - `candles.cache`: the first window of a timeframe is the tail of its `Candle_Cache_Class` topped up with the
+      bars since the last cached one, and the timeframes fetched directly only fetch the bars since their last one;
+      every closed bar is appended to the cache.
+    Every window is checked for gaps (`gap_spans_Function`) before it is handed out: the missing bars are fetched
+    with `copy_rates_range`, spans the terminal has no bars for either (holidays, bars without ticks) are
+    remembered, and a window with a gap that could not be fetched is not handed out at all (`window_Function`).
+    """
+
+    def __init__(self, The_symbol: str):
+        self.symbol = The_symbol
+        self.resampler = Resampler_Class()
+        self.windows: dict[str, np.ndarray] = {}  # windows of the timeframes fetched directly, with the cache
+        self.caches: dict[str, Candle_Cache_Class] = {}
+        self.lock = asyncio.Lock()
+        self.base_fetched_at: typing.Optional[float] = None
+        self.empty_spans: dict[str, list[tuple[int, int]]] = {}  # gaps the terminal has no bars for either
+        self.gap_events: collections.deque = collections.deque(maxlen=GAP_EVENTS)
+        self.stats = {"base_fetches": 0, "base_bars": 0, "window_fetches": 0, "cached_bars_loaded": 0, "topped_up_bars": 0, "cached_bars_written": 0,
+                      "gaps": 0, "gap_bars": 0, "backfilled_bars": 0, "unfilled_gaps": 0, "incomplete_windows": 0}
+
+    def _cache_Function(self, The_timeframe: str) -> Candle_Cache_Class:
+        if The_timeframe not in self.caches:
+            self.caches[The_timeframe] = Candle_Cache_Class(self.symbol, The_timeframe)
+        return self.caches[The_timeframe]
+
+    async def _fetch_rates_Function(self, The_timeframe: str, count: int) -> np.ndarray:
+        The_rates = await CBroker_Gateway.call_Function("copy_rates_from_pos", self.symbol, CMetatrader_Module.timeframe_mapping[The_timeframe], 0, count)
+        if The_rates is None:
+            raise RuntimeError(f"No {The_timeframe} rates from the terminal")
+        return as_rates_Function(The_rates)
+
+    async def _fetch_range_Function(self, The_timeframe: str, start: int, end: typing.Optional[int] = None) -> np.ndarray:
+        """ The bars of `The_timeframe` opened from `start` to `end` (seconds, broker clock, both included), or to the forming one. """
+        The_end = (datetime.datetime.fromtimestamp(end, datetime.timezone.utc) if end is not None
+                   else datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1))  # the broker clock may run ahead of UTC
+        The_rates = await CBroker_Gateway.call_Function("copy_rates_range", self.symbol, CMetatrader_Module.timeframe_mapping[The_timeframe],
+                                                        datetime.datetime.fromtimestamp(start, datetime.timezone.utc), The_end)
+        if The_rates is None:
+            raise RuntimeError(f"No {The_timeframe} rates from the terminal")
+        return as_rates_Function(The_rates)
+
+    async def _load_window_Function(self, The_timeframe: str) -> np.ndarray:
+        """ The first window of `The_timeframe`: the cached tail topped up with the bars since its last bar, or a whole fetched window. """
+        cached = self._cache_Function(The_timeframe).read_Function(count=CANDLE_WINDOW) if CACHE_ENABLED else np.empty(0, dtype=RATES_DTYPE)
+        if len(cached) == 0:
+            self.stats["window_fetches"] += 1
+            return await self._fetch_rates_Function(The_timeframe, CANDLE_WINDOW)
+        fresh = await self._fetch_range_Function(The_timeframe, int(cached["time"][-1]))
+        self.stats["cached_bars_loaded"] += len(cached)
+        self.stats["topped_up_bars"] += len(fresh)
+        if len(fresh) == 0:
+            return cached
+        return np.concatenate((cached[cached["time"] < fresh["time"][0]], fresh))[-CANDLE_WINDOW:]
+
+    async def _update_direct_Function(self, The_timeframe: str) -> np.ndarray:
+        """ The window of a timeframe fetched directly (with the cache): only the bars since its forming bar are fetched. """
+        async with self.lock:
+            window = self.windows.get(The_timeframe)
+            if window is None or len(window) == 0:
+                window = await self._load_window_Function(The_timeframe)
+            else:
+                fresh = await self._fetch_range_Function(The_timeframe, int(window["time"][-1]))
+                if len(fresh):
+                    window = np.concatenate((window[window["time"] < fresh["time"][0]], fresh))[-CANDLE_WINDOW:]
+            self.windows[The_timeframe] = window
+            return window
+
+    async def _update_base_Function(self):
+        """ Fetches the base bars since the last fetch (with the forming one); callers within half a retry interval share one fetch. """
+        async with self.lock:
+            now = time.monotonic()
+            if self.base_fetched_at is not None and now - self.base_fetched_at < RETRY_INTERVAL / 2:
+                return
+            if len(self.resampler.base) == 0:
+                The_rates = await self._load_window_Function(BASE_TIMEFRAME)
+            else:
+                The_rates = await self._fetch_range_Function(BASE_TIMEFRAME, int(self.resampler.base["time"][-1]))  # from the forming bar: no gap after a disconnect
+            self.base_fetched_at = now
+            self.resampler.ingest_Function(The_rates)
+            self.stats["base_fetches"] += 1
+            self.stats["base_bars"] += len(The_rates)
+
+    async def _seed_Function(self, The_timeframe: str):
+        async with self.lock:
+            if The_timeframe not in self.resampler.windows:
+                self.resampler.seed_Function(The_timeframe, await self._load_window_Function(The_timeframe))
+
+    async def _backfill_Function(self, The_timeframe: str, The_rates: np.ndarray) -> tuple[np.ndarray, bool]:
+        """
+        Fetches the bars missing between those of `The_rates`; returns them and whether every gap is resolved
+        (filled, or confirmed empty by the terminal). Each gap is recorded in `stats` and `gap_events`.
+        """
+        known = self.empty_spans.setdefault(The_timeframe, [])
+        if len(The_rates):
+            known[:] = [span for span in known if span[1] > The_rates["time"][0]]  # spans older than the window are forgotten
+        fetched, complete = [], True
+        for start, end in gap_spans_Function(The_rates["time"], The_timeframe, known):
+            missing = (end - start) // BAR_SECONDS[The_timeframe]
+            try:
+                The_bars = await self._fetch_range_Function(The_timeframe, start, end - 1)
+                The_bars = The_bars[(The_bars["time"] >= start) & (The_bars["time"] < end)]
+            except Exception as e:
+                The_bars = None
+                print_and_logging_Function("warning", f"Backfilling the {The_timeframe} gap at {pd.to_datetime(start, unit='s')} failed: {e}", "description")
+            self.stats["gaps"] += 1
+            self.stats["gap_bars"] += missing
+            self.gap_events.append({"timeframe": The_timeframe, "start": pd.to_datetime(start, unit="s"), "end": pd.to_datetime(end, unit="s"),
+                                    "missing": missing, "backfilled": None if The_bars is None else len(The_bars)})
+            if The_bars is None:
+                self.stats["unfilled_gaps"] += 1
+                complete = False
+                continue
+            if len(The_bars) < missing:
+                known.append((start, end))  # the rest has no bars at the terminal either
+            self.stats["backfilled_bars"] += len(The_bars)
+            fetched.append(The_bars)
+            print_and_logging_Function("warning", f"{The_timeframe} gap of {missing} bars from {pd.to_datetime(start, unit='s')} to {pd.to_datetime(end, unit='s')}: {len(The_bars)} backfilled", "description")
+        return (np.concatenate(fetched) if fetched else np.empty(0, dtype=RATES_DTYPE)), complete
+
+    async def _fill_gaps_Function(self, The_timeframe: str) -> bool:
+        """ Backfills the gaps of the held window of `The_timeframe` (and of its cache); False while one could not be fetched. """
+        if is_resampled_Function(The_timeframe):
+            window = self.resampler.base if The_timeframe == BASE_TIMEFRAME else self.resampler.windows.get(The_timeframe)
+        else:
+            window = self.windows.get(The_timeframe)
+        if window is None:
+            return True
+        The_bars, complete = await self._backfill_Function(The_timeframe, window)
+        if len(The_bars) == 0:
+            return complete
+        if The_timeframe == BASE_TIMEFRAME and is_resampled_Function(The_timeframe):
+            self.resampler.ingest_Function(The_bars)  # also rebuilds the target bars holding them
+        elif is_resampled_Function(The_timeframe):
+            self.resampler.windows[The_timeframe] = merge_rates_Function(window, The_bars)[-CANDLE_WINDOW:]
+        else:
+            self.windows[The_timeframe] = merge_rates_Function(window, The_bars)[-CANDLE_WINDOW:]
+        last_cached = self._cache_Function(The_timeframe).last_time_Function() if CACHE_ENABLED else None
+        if last_cached is not None:  # the newer bars are appended with the window
+            self.stats["cached_bars_written"] += self._cache_Function(The_timeframe).merge_Function(The_bars[The_bars["time"] <= last_cached])
+        return complete
+
+    async def _current_window_Function(self, The_timeframe: str) -> tuple[typing.Optional[np.ndarray], bool]:
+        """
+        The up-to-date window of `The_timeframe` (None while it cannot be built) and whether it is complete (no
+        unresolved gap, in the base window either for a resampled timeframe); its closed bars are appended to the cache.
+        """
+        if is_resampled_Function(The_timeframe):
+            if The_timeframe != BASE_TIMEFRAME and The_timeframe not in self.resampler.windows:
+                await self._seed_Function(The_timeframe)
+            await self._update_base_Function()
+            async with self.lock:
+                complete = await self._fill_gaps_Function(BASE_TIMEFRAME)
+                if The_timeframe != BASE_TIMEFRAME:
+                    complete = await self._fill_gaps_Function(The_timeframe) and complete
+            window = self.resampler.base if The_timeframe == BASE_TIMEFRAME else self.resampler.windows.get(The_timeframe)
+        else:
+            await self._update_direct_Function(The_timeframe)
+            async with self.lock:
+                complete = await self._fill_gaps_Function(The_timeframe)
+            window = self.windows.get(The_timeframe)
+        if CACHE_ENABLED and window is not None and len(window) > 1:
+            self.stats["cached_bars_written"] += self._cache_Function(The_timeframe).append_Function(window[:-1])
+        return window, complete
+
+    async def _checked_fetch_Function(self, The_timeframe: str, The_last_DataSet: pd.DataFrame) -> pd.DataFrame:
+        """ `main_fetching_data_Function` with the gaps of the fetched window backfilled; an empty DataFrame while one cannot be. """
+        DataSet = await CMetatrader_Module.main_fetching_data_Function(The_timeframe, The_last_DataSet, ticker=self.symbol)
+        if len(DataSet) == 0:
+            return DataSet
+        The_rates = as_rates_Function(DataSet.assign(time=DataSet["time"].values.astype("datetime64[s]").astype(np.int64)))
+        async with self.lock:
+            The_bars, complete = await self._backfill_Function(The_timeframe, The_rates)
+        if not complete:
+            self.stats["incomplete_windows"] += 1
+            print_and_logging_Function("warning", f"The {The_timeframe} window misses bars that could not be fetched: skipped", "description")
+            return pd.DataFrame()
+        return DataSet if len(The_bars) == 0 else rates_frame_Function(merge_rates_Function(The_rates, The_bars)[-CANDLE_WINDOW:])
+
+    async def window_Function(self, The_timeframe: str, The_last_DataSet: pd.DataFrame) -> pd.DataFrame:
+        """
+        The window of `The_timeframe` following `The_last_DataSet`: polled every `scheduler.retry_interval` seconds
+        until its newest bar is newer than the last one of `The_last_DataSet`, or an empty DataFrame after
+        `scheduler.retry_timeout` seconds (as `fetch_data_Function`). A window with gaps that could not be
+        backfilled is not returned (flag detection and DP validation never see it): the empty DataFrame stands for it.
+        """
+        if not (is_resampled_Function(The_timeframe) or CACHE_ENABLED):
+            return await self._checked_fetch_Function(The_timeframe, The_last_DataSet)
+
+        last_time = pd.Timestamp(The_last_DataSet["time"].iloc[-1]).value // 10**9 if len(The_last_DataSet) else None
+        The_deadline = time.monotonic() + RETRY_TIMEOUT
+        try:
+            while is_trading_hours_now() and (not parameters.shutdown_flag):
+                window, complete = await self._current_window_Function(The_timeframe)
+                is_new = window is not None and len(window) and (last_time is None or window["time"][-1] > last_time)
+                if is_new and complete:
+                    print_and_logging_Function("info", f"Data {The_timeframe} successfully {f'resampled from {BASE_TIMEFRAME}' if is_resampled_Function(The_timeframe) and The_timeframe != BASE_TIMEFRAME else 'fetched'}", "title")
+                    return rates_frame_Function(window)
+                if time.monotonic() >= The_deadline:
+                    if is_new:
+                        self.stats["incomplete_windows"] += 1
+                        print_and_logging_Function("warning", f"The {The_timeframe} window still misses bars {RETRY_TIMEOUT}s after the bar close: skipped", "description")
+                    else:
+                        print_and_logging_Function("warning", f"No new {The_timeframe} candle {RETRY_TIMEOUT}s after the bar close", "description")
+                    return pd.DataFrame()
+                await asyncio.sleep(RETRY_INTERVAL)
+        except Exception as e:
+            print_and_logging_Function("error", f"Failed to build the {The_timeframe} window: {e}", "title")
+        return pd.DataFrame()
+
+CCandle_Feeds: dict[str, Candle_Feed_Class] = {The_symbol: Candle_Feed_Class(The_symbol) for The_symbol in SYMBOLS}
+CCandle_Feed = CCandle_Feeds[SYMBOLS[0]]
@@ -0,0 +1,187 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import contextlib
+import typing
+import aiomysql
+import mysql.connector
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from classes.Query_Metrics import Instrumented_Connection_Class
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+DB_CONFIG: dict = config.get("database", {})
+DB_CREDENTIALS = {
+    "host": DB_CONFIG.get("host", "localhost"),
+    "port": DB_CONFIG.get("port", 3306),
+    "user": DB_CONFIG.get("user", "TradingBot"),
+    "password": DB_CONFIG.get("password", ""),
+    "db": DB_CONFIG.get("db", "tradingbotdb"),
+}
+
+class DB_Pool_Class:
+    """
+    The one async MySQL connection pool of the process, shared by every `Database_Class` (all timeframes and
+    symbols) and the write-behind flusher.
+    - Fair share: each user (a timeframe, "write_behind", ...) holds at most `per_timeframe_limit` connections at
+      once, so a busy timeframe cannot starve the others.
+    - Warmup: `initialize_Function` opens and checks `pool_minsize` connections before the first loop.
+    - Health checks: a connection idle for more than `health_check_after` seconds is pinged (and reconnected) before
+      it is handed out; a connection that cannot be revived is closed and replaced.
+    - Metrics: acquire wait time, connections in use and acquire timeouts (`metrics_Function`).
+    - Fan-out: `gather_Function` runs independent reads concurrently, each on its own connection.
+    - Query metrics: the connections handed out are instrumented, every statement is recorded in `CQuery_Metrics`.
+    """
+
+    def __init__(self):
+        self.pool: typing.Optional[aiomysql.Pool] = None
+        self.init_lock = asyncio.Lock()
+        self.minsize: int = DB_CONFIG.get("pool_minsize", 2)
+        self.maxsize: int = DB_CONFIG.get("pool_maxsize", 20)
+        self.per_user_limit: int = DB_CONFIG.get("per_timeframe_limit", 4)
+        self.acquire_timeout: float = DB_CONFIG.get("acquire_timeout", 10)
+        self.health_check_after: float = DB_CONFIG.get("health_check_after", 60)
+        self.fan_out_limit: int = DB_CONFIG.get("fan_out_limit", 3)
+        self.limits: dict[str, asyncio.Semaphore] = {}
+        self.last_used: dict[int, float] = {}
+        self.metrics = {"acquires": 0, "wait_ms": 0.0, "max_wait_ms": 0.0, "in_use": 0, "max_in_use": 0,
+                        "timeouts": 0, "dropped": 0}
+
+    @staticmethod
+    def connect_sync_Function():
+        """ Short-lived synchronous connection for the startup DDL and the migration scripts. """
+        credentials = dict(DB_CREDENTIALS)
+        credentials["database"] = credentials.pop("db")
+        return mysql.connector.connect(**credentials)
+
+    async def initialize_Function(self):
+        async with self.init_lock:
+            if self.pool is not None:
+                return
+            try:
+                self.pool = await aiomysql.create_pool(
+                    **DB_CREDENTIALS,
+                    autocommit=True,
+                    minsize=self.minsize,
+                    maxsize=self.maxsize,
+                    pool_recycle=3600)
+            except Exception as e:
+                print_and_logging_Function("error", f"Error in initializing DB pool: {e}", "title")
+                return
+
+            # Warmup: check the minsize connections now rather than on the first loop
+            async def warm():
+                async with self.acquire("warmup") as conn:
+                    async with conn.cursor() as cursor:
+                        await cursor.execute("SELECT 1")
+            await asyncio.gather(*[warm() for _ in range(self.minsize)], return_exceptions=True)
+            print_and_logging_Function("info", f"DB pool ready: {self.pool.size} connections, up to {self.maxsize}, {self.per_user_limit} per timeframe", "title")
+
+    async def _healthy_connection_Function(self, conn):
+        """ Pings a connection idle for too long; returns None when it cannot be revived (it is then closed). """
+        if time.monotonic() - self.last_used.get(id(conn), time.monotonic()) < self.health_check_after:
+            return conn
+        try:
+            await conn.ping(reconnect=True)
+            return conn
+        except Exception as e:
+            print_and_logging_Function("warning", f"Dropping a dead DB connection: {e}", "description")
+            conn.close()
+            self.pool.release(conn) # type: ignore
+            self.last_used.pop(id(conn), None)
+            self.metrics["dropped"] += 1
+            return None
+
+    async def _acquire_within_share_Function(self, limit: asyncio.Semaphore):
+        await limit.acquire()
+        try:
+            conn = None
+            while conn is None:
+                conn = await self._healthy_connection_Function(await self.pool.acquire()) # type: ignore
+            return conn
+        except BaseException:
+            limit.release()
+            raise
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, The_user: str = "default"):
+        """
+        Acquires a connection for `The_user` (usually the timeframe), within its fair share.
+        Raises:
+            TimeoutError: If no connection is available within `acquire_timeout` seconds.
+        """
+        if self.pool is None:
+            await self.initialize_Function()
+        if self.pool is None:
+            raise ConnectionError("DB pool is not available")
+
+        limit = self.limits.setdefault(The_user, asyncio.Semaphore(self.per_user_limit))
+        start = time.perf_counter()
+        try:
+            conn = await asyncio.wait_for(self._acquire_within_share_Function(limit), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            raise TimeoutError(f"No DB connection for {The_user} within {self.acquire_timeout} seconds")
+
+        wait_ms = (time.perf_counter() - start) * 1000
+        self.metrics["acquires"] += 1
+        self.metrics["wait_ms"] += wait_ms
+        self.metrics["max_wait_ms"] = max(self.metrics["max_wait_ms"], wait_ms)
+        self.metrics["in_use"] += 1
+        self.metrics["max_in_use"] = max(self.metrics["max_in_use"], self.metrics["in_use"])
+        try:
+            yield Instrumented_Connection_Class(conn, The_user)
+        finally:
+            self.metrics["in_use"] -= 1
+            self.last_used[id(conn)] = time.monotonic()
+            self.pool.release(conn) # type: ignore
+            limit.release()
+
+    async def gather_Function(self, *The_calls: typing.Awaitable, limit: typing.Optional[int] = None) -> list:
+        """
+        Awaits independent DB calls concurrently (`asyncio.gather`), at most `limit` (default `fan_out_limit`) at a
+        time, so one method does not take more than its share of the pool. Each call acquires its own connection.
+        Returns:
+            list: The results, in the order of the calls. The first exception is raised, as with `asyncio.gather`.
+        """
+        semaphore = asyncio.Semaphore(limit or self.fan_out_limit)
+
+        async def limited(call: typing.Awaitable):
+            async with semaphore:
+                return await call
+        return await asyncio.gather(*[limited(call) for call in The_calls])
+
+    def metrics_Function(self) -> dict:
+        snapshot = dict(self.metrics)
+        snapshot["avg_wait_ms"] = snapshot["wait_ms"] / snapshot["acquires"] if snapshot["acquires"] else 0.0
+        snapshot["size"] = self.pool.size if self.pool is not None else 0
+        snapshot["free"] = self.pool.freesize if self.pool is not None else 0
+        return snapshot
+
+    def view_Function(self, The_user: str) -> "DB_Pool_View_Class":
+        return DB_Pool_View_Class(self, The_user)
+
+    async def close_Function(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+class DB_Pool_View_Class:
+    """ The shared pool as seen by one user: `acquire()` without arguments, like an aiomysql pool. """
+
+    def __init__(self, The_pool: DB_Pool_Class, The_user: str):
+        self.shared = The_pool
+        self.user = The_user
+
+    def acquire(self):
+        return self.shared.acquire(self.user)
+
+CDB_Pool = DB_Pool_Class()
@@ -1,7 +1,7 @@
 import typing
 import datetime
 import pandas as pd
-from .FlagPoint import FlagPoint_Class
+from .FlagPoint import FlagPoint_Class, ID_to_key_Function
 
 class DP_Parameteres_Class:
     
@@ -39,7 +39,8 @@ class DP_Parameteres_Class:
         ID_generator_Function(self):
             Generates a unique identifier (ID) for the decision point based on the 
             timestamps of the High and Low flag points. If either High or Low is None 
-            or their timestamps are unavailable, the ID is set to None.
+            or their timestamps are unavailable, the ID is set to None. The compact 64-bit 
+            database key (`key`) is derived from the ID and kept in sync with it.
         __repr__(self):
             Returns a string representation of the DP_Parameteres_Class object, 
             including its type, High, Low, weight, first_valid_trade_time, and trade_direction.
@@ -99,13 +100,18 @@ class DP_Parameteres_Class:
             self.id = f"H {self.High.time} & L {self.Low.time}"
         else:
             self.id = None
+        self.key = ID_to_key_Function(self.id)
         return self.id
     
     def length_cal_Function(self):
         self.length = int(abs(self.High.time - self.Low.time)/ pd.Timedelta("1min"))
         
     def to_model_input_Function(self) -> pd.DataFrame:
-        return pd.DataFrame([{
+        return pd.DataFrame([self.model_input_row_Function()])
+
+    def model_input_row_Function(self) -> dict:
+        """ The model inputs of the DP as one row (column -> value), for scoring many DPs in one batch. """
+        return {
             "length":             self.length,
             "Flag_Ratio":         self.ratio_to_flag,
             "NO_Used_Candles":    self.number_used_candle,
@@ -116,7 +122,7 @@ class DP_Parameteres_Class:
             "Is_golfed":          self.Is_golfed,
             "Is_used_half":       self.Is_used_half,
             "parent_length":      self.parent_length
-        }])
+        }
 
     def __repr__(self):
         return (f"DP_Parameteres_Class(type={self.type}, High={self.High}, Low={self.Low}, "
@@ -0,0 +1,141 @@
+import sys
+import os
+import typing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.DP_Parameteres import DP_Parameteres_Class
+from classes.FlagPoint import ID_to_key_Function
+
+class TradeInfo(typing.TypedDict):
+    TP: float
+    Vol: float
+    Order_ID: int
+
+class DP_Registry_Class:
+    """
+    Long-lived, in-memory view of one timeframe's DP universe, kept in sync with MySQL by the code paths that write.
+    It is loaded once at startup (`load_Function`) and afterwards updated incrementally by `Database_Class` right after
+    each successful write, so the per-loop reads (`_get_update_DPlist_Function`, `_get_tradeable_DPs_Function`,
+    `Read_Pending_Positions_Function`) no longer touch the database. `Database_Class` re-reads the tables every
+    `registry_resync_every` loops as a consistency check.
+    Attributes:
+        TimeFrame (str): The timeframe of the registry.
+        Active_DPs (dict[int, DP_Parameteres_Class]): DPs with weight > 0, keyed by their 64-bit key.
+        Related_keys (dict[int, tuple]): The keys of the two related DPs of each active DP.
+        Results (dict[int, float]): Non-zero Results of every DP (active or not), used for the related-DP features.
+        Known_keys (set[int]): Keys of every DP stored in the database, so re-detected flags are not re-activated.
+        Traded_DP_Dict (dict[int, TradeInfo]): Positions placed on the active DPs, keyed by DP key.
+        Pending_Positions (dict[int, int]): DP key -> Order_ID of the positions whose Result is still 0.
+        is_loaded (bool): Whether `load_Function` ran at least once.
+        loops_since_sync (int): Number of loops served since the last full load.
+    """
+
+    def __init__(self, The_timeframe: str):
+        self.TimeFrame = The_timeframe
+        self.Active_DPs: dict[int, DP_Parameteres_Class] = {}
+        self.Related_keys: dict[int, tuple[typing.Optional[int], typing.Optional[int]]] = {}
+        self.Results: dict[int, float] = {}
+        self.Known_keys: set[int] = set()
+        self.Traded_DP_Dict: dict[int, TradeInfo] = {}
+        self.Pending_Positions: dict[int, int] = {}
+        self.is_loaded = False
+        self.loops_since_sync = 0
+
+    def load_Function(self,
+                      active_DPs: list[DP_Parameteres_Class],
+                      related_keys: list[tuple[typing.Optional[int], typing.Optional[int]]],
+                      traded_DPs: dict[int, TradeInfo],
+                      dp_results: list[tuple[int, float]],
+                      pending_positions: dict[int, int]):
+        """
+        Replaces the whole content of the registry with a fresh read of the database.
+        Args:
+            active_DPs: Every DP with weight > 0, with its `key` set.
+            related_keys: (Related_DP_1, Related_DP_2) keys of each DP of `active_DPs`, in the same order.
+            traded_DPs: The positions placed on the active DPs.
+            dp_results: (key, Result) of every DP in the table.
+            pending_positions: DP key -> Order_ID of the positions whose Result is 0.
+        """
+        self.Active_DPs = {dp.key: dp for dp in active_DPs}
+        self.Related_keys = {dp.key: (int(k1) if k1 is not None else None, int(k2) if k2 is not None else None)
+                             for dp, (k1, k2) in zip(active_DPs, related_keys)}
+        self.Known_keys = {int(dp_key) for dp_key, _ in dp_results}
+        self.Results = {int(dp_key): Result for dp_key, Result in dp_results if Result != 0}
+
+        # Updated in place: timeframe.py holds on to Traded_DP_Dict through Database_Class
+        self.Traded_DP_Dict.clear()
+        self.Traded_DP_Dict.update(traded_DPs)
+        self.Pending_Positions = {int(dp_key): order_id for dp_key, order_id in pending_positions.items()}
+
+        self.is_loaded = True
+        self.loops_since_sync = 0
+
+    def needs_sync_Function(self, resync_every: int) -> bool:
+        return not self.is_loaded or self.loops_since_sync >= resync_every
+
+    def _with_related_results_Function(self, dp_key: int) -> DP_Parameteres_Class:
+        """ Refreshes the Related_DP_1/2 features of an active DP with the latest known Results. """
+        dp = self.Active_DPs[dp_key]
+        related_1, related_2 = self.Related_keys.get(dp_key, (None, None))
+        dp.related_DP_indexes = [self.Results.get(related_1) if related_1 is not None else None, # type: ignore
+                                 self.Results.get(related_2) if related_2 is not None else None] # type: ignore
+        return dp
+
+    def get_active_DPs_Function(self) -> list[tuple[DP_Parameteres_Class, int]]:
+        self.loops_since_sync += 1
+        return [(self._with_related_results_Function(dp_key), dp_key) for dp_key in list(self.Active_DPs)]
+
+    def get_DPs_Function(self, dp_keys: list[int]) -> list[DP_Parameteres_Class]:
+        return [self._with_related_results_Function(dp_key) for dp_key in dp_keys if dp_key in self.Active_DPs]
+
+    def add_DP_Function(self, aDP: DP_Parameteres_Class):
+        """ Registers a DP that has just been inserted. DPs already stored in the database are left untouched. """
+        if aDP.key is None or aDP.key in self.Known_keys:
+            return
+        self.Known_keys.add(aDP.key)
+        if aDP.weight > 0:
+            related = [ID_to_key_Function(related_id) for related_id in aDP.related_DP_indexes[:2]]
+            related += [None] * (2 - len(related))
+            self.Active_DPs[aDP.key] = aDP
+            self.Related_keys[aDP.key] = (related[0], related[1])
+
+    def update_weights_Function(self, dps_to_update: list[tuple[int, float]]):
+        for dp_key, weight in dps_to_update:
+            if weight > 0:
+                if dp_key in self.Active_DPs:
+                    self.Active_DPs[dp_key].weight = weight # type: ignore
+                continue
+            # A closed DP is no longer loaded, and neither is its position (its Result is reconciled set-based
+            # with the weight write, see `reconcile_results_query_Function`)
+            self.Active_DPs.pop(dp_key, None)
+            self.Related_keys.pop(dp_key, None)
+            self.Traded_DP_Dict.pop(dp_key, None)
+            self.Pending_Positions.pop(dp_key, None)
+
+    def update_results_Function(self, dps_to_update: list[tuple[int, float]]):
+        for dp_key, Result in dps_to_update:
+            if Result != 0:
+                self.Results[dp_key] = Result
+                self.Pending_Positions.pop(dp_key, None)
+            else:
+                self.Results.pop(dp_key, None)
+
+    def add_positions_Function(self, positions: list[tuple]):
+        """ Registers inserted positions, given as the rows of `Database_Class._insert_positions_batch`. """
+        for position in positions:
+            dp_key, tp, vol, order_id, Result = position[0], position[4], position[6], position[7], position[9]
+            self.Traded_DP_Dict[dp_key] = {"TP": tp, "Vol": vol, "Order_ID": order_id}
+            if Result == 0:
+                self.Pending_Positions[dp_key] = order_id
+
+    def remove_positions_Function(self, cancelled_list_dict: dict[int, int]):
+        for dp_key in cancelled_list_dict.keys():
+            self.Traded_DP_Dict.pop(dp_key, None)
+            self.Pending_Positions.pop(dp_key, None)
+
+    def update_TPs_Function(self, modifying_TP_DB: list[tuple[int, float]]):
+        new_TPs = dict(modifying_TP_DB)
+        for trade_info in self.Traded_DP_Dict.values():
+            if trade_info["Order_ID"] in new_TPs:
+                trade_info["TP"] = new_TPs[trade_info["Order_ID"]]
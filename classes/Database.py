@@ -1,27 +1,44 @@
 import mysql.connector  # noqa: F401
-from mysql.connector import pooling
 import sys
 import os
 import datetime
-import aiomysql
 import pandas as pd
+import numpy as np
+import time
 import typing
+import json
+import re
+import aiomysql
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from classes.Flag import Flag_Class
 from functions.logger import print_and_logging_Function
-from classes.FlagPoint import FlagPoint_Class
-from classes.DP_Parameteres import DP_Parameteres_Class
 from classes.Metatrader_Module import CMetatrader_Module
-
-class Database_Class:
+from functions.DB_migration import ensure_schema_Function, performance_summary_SQL_Function, PERFORMANCE_SUMMARY_TABLE, String_Keys_Error
+from classes.Storage import Storage_Class, POSITION_RESULT_SQL, ML_COLUMNS, ML_COLUMN_DTYPES
+from classes.Write_Behind import CWrite_Behind, Pending_Writes_Class, FLUSH_INTERVAL
+from classes.DB_Pool import CDB_Pool, DB_Pool_View_Class
+from classes.Query_Metrics import CQuery_Metrics
+from functions.DB_archive import read_archived_DPs_Function
+from functions.utilities import stream_symbol_Function
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+STREAM_CHUNK_SIZE: int = config.get("database", {}).get("stream_chunk_size", 5000)
+STREAM_TABLE_PREFIXES = ("Flags", "Flag_Points", "Important_DPs", "Positions")  # + "_<stream>", archived as "Archive_<table>"
+STREAM_TABLES = re.compile(rf"(?<![0-9A-Za-z])(?:{'|'.join(STREAM_TABLE_PREFIXES)})_[0-9A-Za-z_]+")
+EXPLAINABLE_STATEMENTS = ("SELECT", "INSERT", "REPLACE", "UPDATE", "DELETE", "WITH")
+
+class Database_Class(Storage_Class):
     """
-    A utility class for managing database operations related to a trading bot.
+    A utility class for managing database operations related to a trading bot: the MySQL implementation of
+    `Storage_Class`, used by the live bot.
 
     Attributes:
-        connection_pool (pooling.MySQLConnectionPool): A connection pool for managing MySQL database connections.
-        db_pool (aiomysql.Pool): Asynchronous database connection pool, initialized to None.
+        db_pool (DB_Pool_View_Class): This timeframe's share of the process-wide async pool (`CDB_Pool`).
 
     Methods:
         __init__(The_timeframe: str):
@@ -29,24 +46,16 @@ class Database_Class:
         _initialize_tables_Function():
             Creates the required database tables if they do not already exist.
         initialize_db_pool_Function():
-            Asynchronously initializes the database connection pool.
+            Asynchronously initializes (and warms up) the shared database connection pool.
         save_flags_Function(flag_list: list[Flag_Class]):
             Asynchronously batch inserts multiple flags into the database, ensuring all dependencies are stored correctly.
         _update_dp_weights_Function(dps_to_update: list):
             Asynchronously updates the weights of decision points in the database.
-        _get_tradeable_DPs_Function() -> list[tuple[DP_Parameteres_Class, str]]:
+        _get_tradeable_DPs_Function() -> list[tuple[DP_Parameteres_Class, int]]:
             Asynchronously fetches tradeable decision points (DPs) with a weight greater than 0 that are not already traded.
-        _insert_positions_batch(positions: list[tuple[str, str, float, float, float, datetime.datetime, int, int, float]]):
+        _insert_positions_batch(positions: list[tuple[int, str, float, float, float, datetime.datetime, int, int, float]]):
             Asynchronously inserts a batch of trading position records into the database.
     """
-    connection_pool = pooling.MySQLConnectionPool(
-        pool_name="tradingbot_pool",
-        pool_size=12,  # Adjust based on your workload
-        host="localhost",
-        user="TradingBot",
-        password="Nama-123456",
-        database="tradingbotdb",
-    )
     def __init__(self, The_timeframe: str):
         """
         Initializes the Database class with the specified timeframe and sets up the necessary database tables.
@@ -60,167 +69,57 @@ class Database_Class:
             Positions_table_name (str): Name of the table for storing positions data.
             TimeFrame (str): The timeframe associated with this database instance.
             detected_flags (int): Counter for the number of detected flags, initialized to 0.
-            Traded_DP_Set (set): A set to track traded decision points.
-            db_pool: Placeholder for the database connection pool, initialized to None.
+            Registry (DP_Registry_Class): In-memory view of the active DPs and their positions, updated by every write.
+            db_pool (DB_Pool_View_Class): This timeframe's share of the shared connection pool `CDB_Pool`.
+            DB_loop_stats (dict): Round trips, wall-clock ms and summed query ms spent loading DPs since the last reset (per loop).
+            Stream_stats (dict): Rows, seconds and rows/sec of the last streamed read (see `_stream_columns_Function`).
         Raises:
-            Exception: If the initialization of database tables fails, an error is logged.
+            String_Keys_Error: If the tables still use string IDs (the bot refuses to start on them).
+            Exception: If the initialization of database tables fails otherwise, an error is logged.
         Side Effects:
             Logs information about the initialization process and any errors encountered.
         """
-        self.flag_points_table_name = f"Flag_Points_{The_timeframe}"
-        self.important_dps_table_name = f"Important_DPs_{The_timeframe}"
-        self.flags_table_name = f"Flags_{The_timeframe}"
-        self.Positions_table_name = f"Positions_{The_timeframe}"
-        self.TimeFrame = The_timeframe
-        self.detected_flags = 0
-        self.Traded_DP_Dict: dict[str, TradeInfo] = {}
-        self.db_pool = None
+        super().__init__(The_timeframe)
+        self.db_pool: DB_Pool_View_Class = CDB_Pool.view_Function(The_timeframe)
+        self.Stream_stats = {"rows": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+        CWrite_Behind.register_database_Function(self)
         print_and_logging_Function("info", f"{self.TimeFrame} -> Database for {The_timeframe} initialized.", "description")
         
         try:
             self._initialize_tables_Function()
+        except String_Keys_Error:
+            raise
         except Exception as e:
             print_and_logging_Function("error", f"{self.TimeFrame} -> Database initialization failed: {e}", "title")
 
     def _initialize_tables_Function(self):
-        # in here I haven't used "FOREIGN KEY" due to I would insert tables using batch and table by table
-        queries = [
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.flag_points_table_name} (
-                id VARCHAR(255) PRIMARY KEY,
-                price FLOAT NULL,
-                time DATETIME NULL
-            )
-            """,
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.important_dps_table_name} (
-                id VARCHAR(255) PRIMARY KEY,
-                type ENUM('FTC', 'EL', 'MPL') NULL,
-                High_Point VARCHAR(255),
-                Low_Point VARCHAR(255),
-                weight FLOAT NULL,
-                first_valid_trade_time DATETIME NOT NULL,
-                trade_direction ENUM('Bullish', 'Bearish', 'Undefined') NULL,
-                length FLOAT NULL,
-                Flag_Ratio FLOAT NULL,
-                NO_Used_Candles INT NULL,
-                Used_Ratio FLOAT NULL,
-                Related_DP_1 VARCHAR(255) NULL,
-                Related_DP_2 VARCHAR(255) NULL,
-                Is_related_DP_used BOOL DEFAULT FALSE,
-                Is_golfed BOOL DEFAULT FALSE,
-                Is_used_half BOOL DEFAULT FALSE,
-                parent_length INT NULL,
-                Result FLOAT NOT NULL DEFAULT 0
-            )
-            """,
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.flags_table_name} (
-                Unique_Point DATETIME NOT NULL PRIMARY KEY,
-                type ENUM('Bullish', 'Bearish', 'Undefined') NOT NULL,
-                High VARCHAR(255) NOT NULL,
-                Low VARCHAR(255) NOT NULL,
-                Starting_time DATETIME NOT NULL,
-                Ending_time DATETIME NOT NULL,
-                FTC VARCHAR(255),
-                EL VARCHAR(255),
-                MPL VARCHAR(255)
-            )
-            """,
-            f"""
-            CREATE TABLE IF NOT EXISTS {self.Positions_table_name} (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                Traded_DP VARCHAR(255),
-                Order_type ENUM('Buy', 'Sell', 'Buy Limit', 'Sell Limit') NOT NULL,
-                Price FLOAT NOT NULL,
-                SL FLOAT NOT NULL,
-                TP FLOAT NOT NULL,
-                Last_modified_time DATETIME NOT NULL,
-                Vol FLOAT NOT NULL,
-                Order_ID INT NOT NULL UNIQUE,
-                Probability INT NOT NULL,
-                Result FLOAT NOT NULL DEFAULT 0
-            )
-            """
-        ]
-
-        Result_update_trigger_query = f"""
-                CREATE TRIGGER trg_update_position_result_{self.TimeFrame}
-                AFTER UPDATE ON {self.important_dps_table_name}
-                FOR EACH ROW
-                BEGIN
-                    IF NEW.Result <> OLD.Result OR NEW.weight <> OLD.weight THEN
-                        UPDATE {self.Positions_table_name}
-                        SET Result = 
-                            CASE
-                                WHEN NEW.weight = 0 THEN
-                                    CASE
-                                        WHEN ROUND(NEW.Result * ABS(Price - SL), 5) <= ROUND(ABS(TP - Price), 5)
-                                            THEN -ABS(Price - SL)
-                                        ELSE ROUND(ABS(TP - Price), 5)
-                                    END
-                                ELSE
-                                    CASE
-                                        WHEN ROUND(NEW.Result * ABS(Price - SL), 5) > ROUND(ABS(TP - Price), 5)
-                                            THEN ROUND(ABS(TP - Price), 5)
-                                        ELSE ROUND(NEW.Result * ABS(Price - SL), 5)
-                                    END
-                            END
-                        WHERE Traded_DP = NEW.id;
-                    END IF;
-                END;
-            """
-        ensuring_right_Result_query = f"""
-            UPDATE {self.Positions_table_name} AS p
-            JOIN {self.important_dps_table_name} AS d ON p.Traded_DP = d.id
-            SET p.Result = 
-                CASE
-                    WHEN d.weight = 0 THEN
-                        CASE
-                            WHEN ROUND(d.Result * ABS(p.Price - p.SL), 5) <= ROUND(ABS(p.TP - p.Price), 5) 
-                                THEN -ABS(p.Price - p.SL)
-                            ELSE ROUND(ABS(p.TP - p.Price), 5)
-                        END
-                    ELSE
-                        CASE
-                            WHEN ROUND(d.Result * ABS(p.Price - p.SL), 5) > ROUND(ABS(p.TP - p.Price), 5)
-                                THEN ROUND(ABS(p.TP - p.Price), 5)
-                            ELSE ROUND(d.Result * ABS(p.Price - p.SL), 5)
-                        END
-                END;
-
-            """    
+        # Creates the tables on first run and applies the missing schema migrations; a no-op (one query for all
+        # timeframes) when the schema is current. See functions/DB_migration.py.
         try:
-            with self.connection_pool.get_connection() as conn:
-                cursor = conn.cursor()
-                for query in queries:
-                    cursor.execute(query)
-
-                try:
-                    cursor.execute(f"DROP TRIGGER IF EXISTS {Result_update_trigger_query.split()[2]}")
-                    cursor.execute(Result_update_trigger_query)
-                    cursor.execute(ensuring_right_Result_query)
-                except Exception as e:
-                    print_and_logging_Function("warning", f"{self.TimeFrame} -> Trigger creation failed: {e}", "title")
-
-                conn.commit()
-                print_and_logging_Function("info", f"{self.TimeFrame} -> Tables and triggers created successfully!", "title")
+            version = ensure_schema_Function(self.TimeFrame)
+            print_and_logging_Function("info", f"{self.TimeFrame} -> Tables ready (schema version {version})", "title")
+        except String_Keys_Error as e:
+            print_and_logging_Function("critical", f"{e}", "title")
+            raise
         except Exception as e:
             print_and_logging_Function("error", f"{self.TimeFrame} -> Couldn't initialize DB: {e}", "title")
 
+    @staticmethod
+    def reconcile_results_query_Function(positions_table: str, important_dps_table: str, where_clause: str = "TRUE") -> str:
+        """
+        Set-based computation of the position Results from the Result and weight of their DP, for the positions
+        matching `where_clause` (aliases: p = positions, d = DPs). It replaces the former per-row
+        `trg_update_position_result_<tf>` trigger: same formula, one statement per batch.
+        """
+        return f"""
+            UPDATE {positions_table} AS p
+            JOIN {important_dps_table} AS d ON p.Traded_DP = d.id
+            SET p.Result = {POSITION_RESULT_SQL}
+            WHERE {where_clause}
+        """
+
     async def initialize_db_pool_Function(self):
-        if self.db_pool is None:
-            try:
-                self.db_pool = await aiomysql.create_pool(
-                    host="localhost",
-                    user="TradingBot",
-                    password="Nama-123456",
-                    db="tradingbotdb",
-                    autocommit=True,
-                    minsize=5,
-                    maxsize=20)
-            except Exception as e:
-                print_and_logging_Function("error", f"{self.TimeFrame} -> Error in initializing DP pool: {e}", "title")
+        await CDB_Pool.initialize_Function()
 
     async def save_flags_Function(self, flag_list: list[Flag_Class]):
         """
@@ -247,85 +146,7 @@ class Database_Class:
             async with conn.cursor() as cursor:
                 try:
                     await conn.begin()  # Start transaction
-                    flag_values = []
-                    Important_DPs_values = []
-                    flag_point_values = []
-                    for flag in flag_list:
-                        high_id = flag.high.ID_generator_Function()
-                        low_id = flag.low.ID_generator_Function()
-                        ftc_id = flag.FTC.ID_generator_Function() if flag.FTC else None
-                        el_id = flag.EL.ID_generator_Function() if flag.EL else None
-                        mpl_id = flag.MPL.ID_generator_Function() if flag.MPL else None
-
-                        # Flag
-                        flag_values.append((
-                            flag.Unique_point, flag.flag_type, high_id, low_id, 
-                            flag.Start_time, flag.End_time, ftc_id, el_id, mpl_id
-                        ))
-
-                        # High Point
-                        if flag.high.ID_generator_Function() is not None:
-                            flag_point_values.append((
-                                flag.high.ID_generator_Function(), flag.high.price, flag.high.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
-
-                        # Low Point
-                        if flag.low.ID_generator_Function() is not None:
-                            flag_point_values.append((
-                                flag.low.ID_generator_Function(), flag.low.price, flag.low.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
-
-                        # FTC
-                        if flag.FTC.ID_generator_Function() is not None:
-                            if len(flag.FTC.related_DP_indexes)== 0: 
-                                related_DP_1 = None
-                                related_DP_2 = None
-                            else:
-                                related_DP_1 = flag.FTC.related_DP_indexes[0]
-                                related_DP_2 = flag.FTC.related_DP_indexes[1]
-                                    
-                            Important_DPs_values.append((
-                                flag.FTC.ID_generator_Function(), flag.FTC.type, flag.FTC.High.ID_generator_Function(), flag.FTC.Low.ID_generator_Function(),
-                                flag.FTC.weight, flag.FTC.first_valid_trade_time, flag.FTC.trade_direction, flag.FTC.length,
-                                flag.FTC.ratio_to_flag, flag.FTC.number_used_candle, flag.FTC.used_ratio, related_DP_1, related_DP_2, int(flag.FTC.Is_related_DP_used),
-                                int(flag.FTC.Is_golfed), int(flag.FTC.Is_used_half), flag.FTC.parent_length
-                            ))
-                            flag_point_values.append((
-                                flag.FTC.High.ID_generator_Function(), flag.FTC.High.price, flag.FTC.High.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
-                            flag_point_values.append((
-                                flag.FTC.Low.ID_generator_Function(), flag.FTC.Low.price, flag.FTC.Low.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
-                        
-                        # EL
-                        if flag.EL.ID_generator_Function() is not None:
-                            Important_DPs_values.append((
-                                flag.EL.ID_generator_Function(), flag.EL.type, flag.EL.High.ID_generator_Function(), flag.EL.Low.ID_generator_Function(),
-                                flag.EL.weight, flag.EL.first_valid_trade_time, flag.EL.trade_direction, flag.EL.length,
-                                flag.EL.ratio_to_flag, flag.EL.number_used_candle, flag.EL.used_ratio, flag.EL.related_DP_indexes[0], None, int(flag.EL.Is_related_DP_used),
-                                int(flag.EL.Is_golfed), int(flag.EL.Is_used_half), flag.EL.parent_length
-                            ))
-                            flag_point_values.append((
-                                flag.EL.High.ID_generator_Function(), flag.EL.High.price, flag.EL.High.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
-                            flag_point_values.append((
-                                flag.EL.Low.ID_generator_Function(), flag.EL.Low.price, flag.EL.Low.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
-
-                        # MPL
-                        if flag.MPL.ID_generator_Function() is not None:
-                            Important_DPs_values.append((
-                                flag.MPL.ID_generator_Function(), flag.MPL.type, flag.MPL.High.ID_generator_Function(), flag.MPL.Low.ID_generator_Function(),
-                                flag.MPL.weight, flag.MPL.first_valid_trade_time, flag.MPL.trade_direction, flag.MPL.length,
-                                flag.MPL.ratio_to_flag, flag.MPL.number_used_candle, flag.MPL.used_ratio, None, None, int(flag.MPL.Is_related_DP_used),
-                                int(flag.MPL.Is_golfed), int(flag.MPL.Is_used_half), flag.MPL.parent_length
-                            ))
-                            flag_point_values.append((
-                                flag.MPL.High.ID_generator_Function(), flag.MPL.High.price, flag.MPL.High.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
-                            flag_point_values.append((
-                                flag.MPL.Low.ID_generator_Function(), flag.MPL.Low.price, flag.MPL.Low.time.strftime('%Y-%m-%d %H:%M:%S')
-                            ))
+                    flag_values, Important_DPs_values, flag_point_values, new_DPs = self._flag_rows_Function(flag_list)
 
                     await cursor.execute(f"SELECT COUNT(*) FROM {self.flags_table_name}")
                     before_insert_count = await cursor.fetchone()
@@ -347,10 +168,10 @@ class Database_Class:
 
                     await cursor.executemany(
                         f"""INSERT INTO {self.important_dps_table_name} 
-                            (id, type, High_Point, Low_Point, weight, first_valid_trade_time, trade_direction, length, 
+                            (id, readable_id, type, High_Point, Low_Point, weight, first_valid_trade_time, trade_direction, length, 
                             Flag_Ratio, NO_Used_Candles, Used_Ratio, Related_DP_1, Related_DP_2, Is_related_DP_used,
                             Is_golfed, Is_used_half, parent_length)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                             ON DUPLICATE KEY UPDATE id = id""",
                         Important_DPs_values
                     )
@@ -358,13 +179,15 @@ class Database_Class:
 
                     await cursor.executemany(
                         f"""INSERT INTO {self.flag_points_table_name} 
-                            (id, price, time)  -- ✅ FIXED: Explicitly include `id`
-                            VALUES (%s, %s, %s)
+                            (id, readable_id, price, time)
+                            VALUES (%s, %s, %s, %s)
                             ON DUPLICATE KEY UPDATE id = id""",
                         flag_point_values
                     )
                     await conn.commit()
 
+                    for aDP in new_DPs:
+                        self.Registry.add_DP_Function(aDP)
 
                 except Exception as e:
                     await conn.rollback()
@@ -372,309 +195,150 @@ class Database_Class:
 
     async def _update_dp_weights_Function(self, dps_to_update: list):
         """
-        Asynchronously updates the weights of data points (DPs) in the database.
-        This function performs a batch update on the specified table to modify the 
-        weights of multiple data points based on their IDs.
+        Updates the weights of data points (DPs): in the registry right away, in the database through the
+        write-behind buffer (`CWrite_Behind`), which coalesces repeated updates of the same DP.
         Args:
             dps_to_update (list): A list of tuples where each tuple contains:
-                - dp_id (str): The ID of the data point to update.
+                - dp_id (int): The 64-bit key of the data point to update.
                 - weight (float): The new weight value to set for the data point.
-        Raises:
-            Exception: If an error occurs during the database operation, it logs the 
-            error and rolls back the transaction.
         Notes:
-            - The function uses a connection pool (`self.db_pool`) to acquire a database 
-              connection and execute the batch update.
-            - The table name is specified by `self.important_dps_table_name`.
-            - The transaction is committed if successful, or rolled back in case of an error.
+            - Errors are logged, not raised.
+            - With `write_behind.flush_interval` set to 0 the buffer is flushed before returning.
         """
         
         try:
-            # Prepare the SQL query and values
-            query = f"UPDATE {self.important_dps_table_name} SET weight = %s WHERE id = %s"
-            values = [(weight, dp_id) for dp_id, weight in dps_to_update]
-
-            # Execute the batch update
-            async with self.db_pool.acquire() as conn: # type: ignore
-                await conn.commit()  # Ensure previous state is clean (optional but safe)
-                async with conn.cursor() as cursor:
-                    await cursor.executemany(query, values)  # Perform the batch update
-                    await conn.commit()  # Commit the transaction
+            self.Registry.update_weights_Function(dps_to_update)
+            CWrite_Behind.enqueue_Function(self.TimeFrame, "weights", [(dp_id, weight) for dp_id, weight in dps_to_update])
+            if FLUSH_INTERVAL <= 0:
+                await CWrite_Behind.flush_Function()
         except Exception as e:
             print_and_logging_Function("error", f"{self.TimeFrame} -> Error in batch updating DP weights: {e}", "title")
-            await conn.rollback()  # type: ignore # Rollback if there's an error
 
     async def _update_dp_Results_Function(self, dps_to_update: list):
         """
-        Asynchronously updates the Result of data points (DPs) in the database.
-        This function performs a batch update on the specified table to modify the 
-        Results of multiple data points based on their IDs.
+        Updates the Result of data points (DPs): in the registry right away, in the database through the
+        write-behind buffer (`CWrite_Behind`), which coalesces repeated updates of the same DP.
         Args:
             dps_to_update (list): A list of tuples where each tuple contains:
-                - dp_id (str): The ID of the data point to update.
+                - dp_id (int): The 64-bit key of the data point to update.
                 - Result (float): The new Result value to set for the data point.
-        Raises:
-            Exception: If an error occurs during the database operation, it logs the 
-            error and rolls back the transaction.
         Notes:
-            - The function uses a connection pool (`self.db_pool`) to acquire a database 
-              connection and execute the batch update.
-            - The table name is specified by `self.important_dps_table_name`.
-            - The transaction is committed if successful, or rolled back in case of an error.
+            - Errors are logged, not raised.
+            - With `write_behind.flush_interval` set to 0 the buffer is flushed before returning.
         """
         
         try:
-            # Prepare the SQL query and values
-            query = f"UPDATE {self.important_dps_table_name} SET Result = %s WHERE id = %s"
-            values = [(Result, dp_id) for dp_id, Result in dps_to_update]
-
-            # Execute the batch update
-            async with self.db_pool.acquire() as conn: # type: ignore
-                await conn.commit()  # Ensure previous state is clean (optional but safe)                
-                async with conn.cursor() as cursor:
-                    await cursor.executemany(query, values)  # Perform the batch update
-                    await conn.commit()  # Commit the transaction
+            self.Registry.update_results_Function(dps_to_update)
+            CWrite_Behind.enqueue_Function(self.TimeFrame, "Results", [(dp_id, Result) for dp_id, Result in dps_to_update])
+            if FLUSH_INTERVAL <= 0:
+                await CWrite_Behind.flush_Function()
         except Exception as e:
             print_and_logging_Function("error", f"{self.TimeFrame} -> Error in batch updating DP Results: {e}", "title")
-            await conn.rollback()  # type: ignore # Rollback if there's an error
             
-    async def _get_update_DPlist_Function(self) -> list[tuple[DP_Parameteres_Class, str]]:
+    async def _hydrate_DPs_Function(self, dp_keys: typing.Optional[list[int]] = None) -> dict[str, np.ndarray]:
         """
-        Asynchronously fetches tradeable Decision Points (DPs) from the database.
-        This function retrieves all important DPs with a weight greater than 0, 
-        along with their associated flag points (if any), and filters out DPs 
-        that have already been traded (exist in the Positions table). It then 
-        constructs and returns a list of DP objects paired with their IDs.
+        Loads DPs with everything needed to rebuild them in ONE round trip and returns them column by column.
+        Args:
+            dp_keys (list[int] | None): The DP keys to load. None loads every active DP (weight > 0).
         Returns:
-            list[tuple[DP_Parameteres_Class, str]]: A list of tuples where each tuple 
-            contains a DP_Parameteres_Class object representing a tradeable DP and 
-            its corresponding ID.
-        Raises:
-            Exception: Logs and handles any exceptions that occur during the database 
-            operations.
-        Notes:
-            - The function uses a connection pool (`db_pool`) to interact with the database.
-            - Flag points are fetched in bulk for efficiency and stored in a dictionary 
-              for quick lookup.
-            - The function ensures that no duplicate DPs are returned by checking against 
-              the Positions table.
-        Database Tables:
-            - `important_dps_table_name`: Stores the important DPs with their attributes.
-            - `flag_points_table_name`: Stores the flag points associated with DPs.
-            - `Positions_table_name`: Stores the traded DPs to avoid duplication.
-        Example Workflow:
-            1. Fetch all DPs with weight > 0 from the `important_dps_table_name`.
-            2. Retrieve associated flag points (High_Point and Low_Point) from 
-               `flag_points_table_name`.
-            3. Exclude DPs that already exist in the `Positions_table_name`.
-            4. Construct DP_Parameteres_Class objects for the remaining DPs and 
-               return them along with their IDs.
+            dict[str, np.ndarray]: One array per selected column (see `_hydration_query_Function`), all of the
+            same length. Empty dict if nothing matched.
         """
-        
-        try:
-            async with self.db_pool.acquire() as conn: # type: ignore
-                await conn.commit()  # Ensure previous state is clean (optional but safe)
-                async with conn.cursor() as cursor:
-                    # Step 1: Get important DPs
-                    await cursor.execute(f"""
-                        SELECT id, type, High_Point, Low_Point, weight, first_valid_trade_time, trade_direction,
-                            length, Flag_Ratio, NO_Used_Candles, Used_Ratio, Related_DP_1, Related_DP_2,
-                            Is_related_DP_used, Is_golfed, Is_used_half, parent_length
-                        FROM {self.important_dps_table_name}
-                        WHERE weight > 0
-                    """)
-                    dp_columns = [desc[0] for desc in cursor.description]
-                    dp_results = await cursor.fetchall()
-
-                    # Step 2: Fetch Flag Points
-                    flag_ids = [row[2] for row in dp_results if row[2]] + [row[3] for row in dp_results if row[3]]
-                    flag_points = {}
-                    if flag_ids:
-                        await cursor.execute(f"""
-                            SELECT id, price, time 
-                            FROM {self.flag_points_table_name} 
-                            WHERE id IN ({','.join(['%s'] * len(flag_ids))})
-                        """, flag_ids)
-                        flag_points = {str(row[0]): FlagPoint_Class(price=row[1], time=row[2]) for row in await cursor.fetchall()}
-
-                    # Step 3: Fetch existing traded DPs
-                    await cursor.execute(f"SELECT Traded_DP, TP, Vol, Order_ID FROM {self.Positions_table_name}")
-                    rows = await cursor.fetchall()
-                    self.Traded_DP_Dict = {
-                        row[0]: {"TP": row[1], "Vol": row[2], "Order_ID": row[3]} for row in rows
-                    }
-
-                    # Step 4: Fetch id -> Result mapping
-                    await cursor.execute(f"""
-                        SELECT id, Result
-                        FROM {self.important_dps_table_name}
-                        WHERE Result != 0
-                    """)
-                    result_columns = [desc[0] for desc in cursor.description]
-                    rows = await cursor.fetchall()
-                    full_df = pd.DataFrame(rows, columns=result_columns)
-                    id_to_result = dict(zip(full_df['id'], full_df['Result']))
-
-                    # Step 5: Replace Related_DP_1 and Related_DP_2
-                    updated_dp_results = []
-                    for row in dp_results:
-                        row = dict(zip(dp_columns, row))
-                        if row.get('Related_DP_1') in id_to_result:
-                            row['Related_DP_1'] = id_to_result[row['Related_DP_1']]
-                        else:
-                            row['Related_DP_1'] = None
-                        if row.get('Related_DP_2') in id_to_result:
-                            row['Related_DP_2'] = id_to_result[row['Related_DP_2']]
-                        else:
-                            row['Related_DP_2'] = None
-                        updated_dp_results.append(row)
-
-                    # Step 6: Build DP objects
-                    dps = []
-                    for row in updated_dp_results:
-                        dp_id = row['id']
-                        # if dp_id in self.Traded_DP_Set:  // in this way we let the code update everything of a traded DP and just not trading it again!
-                        #     continue  # Already exists
-
-                        high_point = flag_points.get(str(row['High_Point'])) if row['High_Point'] else None
-                        low_point = flag_points.get(str(row['Low_Point'])) if row['Low_Point'] else None
-                        dp = DP_Parameteres_Class(
-                            type=row['type'], 
-                            High=high_point,  # type: ignore
-                            Low=low_point,  # type: ignore
-                            weight=row['weight'], 
-                            first_valid_trade_time=row['first_valid_trade_time'], 
-                            trade_direction=row['trade_direction']
-                        )
-                        dp.length = row['length']
-                        dp.ratio_to_flag = row['Flag_Ratio']
-                        dp.number_used_candle = row['NO_Used_Candles']
-                        dp.used_ratio = row['Used_Ratio']                            
-                        dp.Is_related_DP_used = row['Is_related_DP_used']
-                        dp.Is_golfed = row['Is_golfed']
-                        dp.Is_used_half = row['Is_used_half']
-                        dp.parent_length = row['parent_length']
-                        dp.related_DP_indexes.append(row['Related_DP_1'])
-                        dp.related_DP_indexes.append(row['Related_DP_2'])
-
-                        dps.append((dp, dp_id))
-
-                    return dps
-        except Exception as e:
-            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in fetching tradeable DPs: {e}", "title")
-            return []
-    
-    async def _get_tradeable_DPs_Function(self, dp_ids: list[str]) -> list[DP_Parameteres_Class]:
+        if dp_keys is None:
+            query, params = self._hydration_query_Function("d.weight > 0"), None
+        else:
+            query, params = self._hydration_query_Function(f"d.id IN ({','.join(['%s'] * len(dp_keys))})"), dp_keys
+
+        start = time.perf_counter()
+        columns = await self._stream_columns_Function(query, params)
+        self.DB_loop_stats["round_trips"] += 1
+        self.DB_loop_stats["query_ms"] += (time.perf_counter() - start) * 1000
+        if not len(next(iter(columns.values()), [])):
+            return {}
+        return columns
+
+    async def _stream_columns_Function(self, query: str, params: typing.Optional[typing.Sequence] = None,
+                                       dtypes: typing.Optional[dict[str, typing.Any]] = None) -> dict[str, np.ndarray]:
+        """
+        Runs a SELECT through a server-side (unbuffered) cursor and streams the result, `STREAM_CHUNK_SIZE` rows at a
+        time, into one preallocated NumPy array per column. The arrays grow by doubling, so peak memory stays at about
+        the size of the columns plus one chunk instead of the whole result set as Python tuples.
+        Args:
+            query (str): The SELECT to run.
+            params (Sequence | None): Its parameters.
+            dtypes (dict[str, Any] | None): dtype per column name; unlisted columns are `object`. A NULL is only
+                allowed in float (NaN) and object (None) columns.
+        Returns:
+            dict[str, np.ndarray]: One array per selected column, in the select order, all of the same length.
+        """
+        dtypes = dtypes or {}
+        start = time.perf_counter()
+        async with self.db_pool.acquire() as conn: # type: ignore
+            await conn.commit()  # Ensure previous state is clean (optional but safe)
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(query, params)
+                names = [desc[0] for desc in cursor.description]
+                capacity = STREAM_CHUNK_SIZE
+                columns = {name: np.empty(capacity, dtype=dtypes.get(name, object)) for name in names}
+                count = 0
+                while True:
+                    chunk = await cursor.fetchmany(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if count + len(chunk) > capacity:
+                        capacity = max(capacity * 2, count + len(chunk))
+                        for name in names:
+                            grown = np.empty(capacity, dtype=columns[name].dtype)
+                            grown[:count] = columns[name][:count]
+                            columns[name] = grown
+                    for index, name in enumerate(names):
+                        columns[name][count:count + len(chunk)] = [row[index] for row in chunk]
+                    count += len(chunk)
+
+        seconds = time.perf_counter() - start
+        self.Stream_stats = {"rows": count, "seconds": seconds, "rows_per_sec": count / seconds if seconds > 0 else 0.0}
+        return {name: column[:count] for name, column in columns.items()}
+
+    async def sync_registry_Function(self):
         """
-        Given a list of important-DP IDs, load their full parameters (including
-        substituted Related_DP_1/2 Results) and return a list of DP_Parameteres_Class.
+        Rebuilds `self.Registry` from the database: the active DPs through the hydration query, the Results of
+        every DP and the pending positions. Runs at startup and then every `REGISTRY_RESYNC_EVERY` loops as a
+        consistency check of the incremental updates.
         """
-        if not dp_ids:
-            return []
+        await self.initialize_db_pool_Function()
+        await CWrite_Behind.flush_Function()  # the buffered writes are part of the state being reloaded
 
-        try:
-            async with self.db_pool.acquire() as conn: # type: ignore
-                await conn.commit()  # Ensure previous state is clean (optional but safe)
-                async with conn.cursor() as cursor:
-                    # 1) Fetch the requested DP rows
-                    sql = f"""
-                        SELECT id, type, High_Point, Low_Point, weight, first_valid_trade_time,
-                               trade_direction, length, Flag_Ratio, NO_Used_Candles,
-                               Used_Ratio, Related_DP_1, Related_DP_2,
-                               Is_related_DP_used, Is_golfed, Is_used_half, parent_length
-                        FROM {self.important_dps_table_name}
-                        WHERE id IN ({','.join(['%s']*len(dp_ids))})
-                    """
-                    await cursor.execute(sql, dp_ids)
-                    dp_columns = [c[0] for c in cursor.description]
-                    dp_rows = await cursor.fetchall()
-                    if not dp_rows:
-                        return []
-
-                    # 2) Build id -> Result map for ALL non-zero Results
-                    await cursor.execute(f"""
-                        SELECT id, Result
-                        FROM {self.important_dps_table_name}
-                        WHERE Result != 0
-                    """)
-                    res_rows = await cursor.fetchall()
-                    id_to_result = {r[0]: r[1] for r in res_rows}
-
-                    # 3) Collect all High_Point/Low_Point IDs for flag lookup
-                    flag_ids = []
-                    for row in dp_rows:
-                        hp, lp = row[2], row[3]
-                        if hp: 
-                            flag_ids.append(hp)
-                        if lp: 
-                            flag_ids.append(lp)
-                    flag_ids = list(set(flag_ids))
-                    flag_points = {}
-                    if flag_ids:
-                        sql_fp = f"""
-                            SELECT id, price, time
-                            FROM {self.flag_points_table_name}
-                            WHERE id IN ({','.join(['%s']*len(flag_ids))})
-                        """
-                        await cursor.execute(sql_fp, flag_ids)
-                        for fid, price, when in await cursor.fetchall():
-                            flag_points[fid] = FlagPoint_Class(price=price, time=when)
-
-                    # 4) Substitute Related_DP_1/2 → actual Result or None
-                    updated = []
-                    for row in dp_rows:
-                        rec = dict(zip(dp_columns, row))
-                        for fld in ('Related_DP_1','Related_DP_2'):
-                            rid = rec[fld]
-                            rec[fld] = id_to_result.get(rid) if rid in id_to_result else None
-                        updated.append(rec)
-
-                    # 5) Build DP_Parameteres_Class objects
-                    results = []
-                    for rec in updated:
-                        dp = DP_Parameteres_Class(
-                            type=rec['type'],
-                            High=flag_points.get(rec['High_Point']), # type: ignore
-                            Low =flag_points.get(rec['Low_Point']), # type: ignore
-                            weight=rec['weight'],
-                            first_valid_trade_time=rec['first_valid_trade_time'],
-                            trade_direction=rec['trade_direction']
-                        )
-                        # assign numeric/flag fields
-                        dp.length              = rec['length']
-                        dp.ratio_to_flag       = rec['Flag_Ratio']
-                        dp.number_used_candle  = rec['NO_Used_Candles']
-                        dp.used_ratio          = rec['Used_Ratio']
-                        dp.Is_related_DP_used  = rec['Is_related_DP_used']
-                        dp.Is_golfed           = rec['Is_golfed']
-                        dp.Is_used_half        = rec['Is_used_half']
-                        dp.parent_length       = rec['parent_length']
-                        # append the substituted Result‐values for related DPs
-                        dp.related_DP_indexes.append(rec['Related_DP_1'])
-                        dp.related_DP_indexes.append(rec['Related_DP_2'])
-
-                        results.append(dp)
-
-                    return results
+        # The three reads are independent: fanned out on separate connections
+        start = time.perf_counter()
+        columns, dp_results, pending_rows = await CDB_Pool.gather_Function(
+            self._hydrate_DPs_Function(),
+            self._fetch_all_Function(f"SELECT id, Result FROM {self.important_dps_table_name}"),
+            self._fetch_all_Function(f"SELECT Traded_DP, Order_ID FROM {self.Positions_table_name} WHERE Result = 0"))
+        self.DB_loop_stats["ms"] += (time.perf_counter() - start) * 1000
 
-        except Exception as e:
-            print_and_logging_Function(
-                "error",
-                f"{self.TimeFrame} -> Error in fetch_DPs_by_id for IDs {dp_ids}: {e}",
-                "title"
-            )
-            return []
-
-    async def _insert_positions_batch(self, positions: list[tuple[str, str, float, float, float, datetime.datetime, int, int, int, float]]):
+        self._load_registry_Function(columns, dp_results, {row[0]: row[1] for row in pending_rows})
+
+    async def _fetch_all_Function(self, query: str, params: typing.Optional[typing.Sequence] = None) -> list[tuple]:
+        """ Runs one read on its own pooled connection, so independent reads can be fanned out with `CDB_Pool.gather_Function`. """
+        start = time.perf_counter()
+        async with self.db_pool.acquire() as conn: # type: ignore
+            await conn.commit()  # Ensure previous state is clean (optional but safe)
+            async with conn.cursor() as cursor:
+                await cursor.execute(query, params)
+                rows = await cursor.fetchall()
+        self.DB_loop_stats["round_trips"] += 1
+        self.DB_loop_stats["query_ms"] += (time.perf_counter() - start) * 1000
+        return list(rows)
+
+    async def _insert_positions_batch(self, positions: list[tuple[int, str, float, float, float, datetime.datetime, int, int, int, float]]):
         """
-        Asynchronously inserts a batch of trading position records into the database.
-        This method performs a batch insert of trading positions into the specified database table.
-        If a record with the same primary key already exists, the `ON DUPLICATE KEY UPDATE` clause
-        ensures that no changes are made to the existing record.
+        Queues a batch of trading position records in the write-behind buffer (`CWrite_Behind`).
+        A position whose Traded_DP already has a buffered position is a duplicate: the buffered order is cancelled
+        and an error is raised, as for duplicates found in the database when the buffer is flushed.
         Args:
-            positions (list[tuple[str, str, float, float, float, datetime.datetime, int, int, float]]): 
+            positions (list[tuple[int, str, float, float, float, datetime.datetime, int, int, float]]): 
                 A list of tuples, where each tuple represents a trading position with the following fields:
-                - Traded_DP (str): The traded data point.
+                - Traded_DP (int): The 64-bit key of the traded data point.
                 - Order_type (str): The type of order (e.g., "buy" or "sell").
                 - Price (float): The price at which the trade was executed.
                 - SL (float): The stop-loss value.
@@ -684,250 +348,253 @@ class Database_Class:
                 - Order_ID (int): The unique identifier for the order.
                 - Result (float): The result or outcome of the trade.
         Returns:
-            None: This function does not return a value. It commits the transaction to the database.
+            None: This function does not return a value.
         Raises:
-            Exception: If an error occurs during the database operation, an exception is raised with
+            Exception: If duplicates are found or the batch cannot be queued, an exception is raised with
                        a descriptive error message.
         """
         if not positions:
             return
 
-        # Step 1: Extract Traded_DP list
-        traded_dps = [pos[0] for pos in positions]
-        placeholders = ', '.join(['%s'] * len(traded_dps))
-        check_query = f"""
-            SELECT Traded_DP, Order_ID FROM {self.Positions_table_name}
-            WHERE Traded_DP IN ({placeholders})
-        """
-
         try:
-            async with self.db_pool.acquire() as conn:  # type: ignore
-                await conn.commit()  # Ensure previous state is clean (optional but safe)
-                async with conn.cursor() as cursor:
-                    # Step 2: Check for existing Traded_DP entries
-                    await cursor.execute(check_query, traded_dps)
-                    existing : dict[str, int] = {row[0]: row[1] for row in await cursor.fetchall()}
-                    
-                    # Step 3: Filter positions to insert only new ones
-                    new_positions = [pos for pos in positions if pos[0] not in existing.keys()]
-
-                    # Step 4: Insert only non-duplicate positions
-                    if new_positions:
-                        insert_query = f"""
-                            INSERT INTO {self.Positions_table_name} 
-                            (Traded_DP, Order_type, Price, SL, TP, Last_modified_time, Vol, Order_ID, Probability, Result)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """
-                        await cursor.executemany(insert_query, new_positions)
-                        await conn.commit()
-
-                    # Step 5: Raise error if duplicates found and cancel duplicated positions !
-                    if existing:
-                        for anOrder_ID in existing.values():
-                            CMetatrader_Module.cancel_order(anOrder_ID)
-                        raise ValueError(f"Duplicate Traded_DP(s) already exist in DB: {', '.join(existing)}")
+            buffered = CWrite_Behind.buffered_inserts_Function(self.TimeFrame)
+            existing: dict[int, int] = {pos[0]: buffered[pos[0]][7] for pos in positions if pos[0] in buffered}
+            new_positions = [pos for pos in positions if pos[0] not in existing]
+
+            if new_positions:
+                CWrite_Behind.enqueue_Function(self.TimeFrame, "insert", new_positions)
+                self.Registry.add_positions_Function(new_positions)
+                if FLUSH_INTERVAL <= 0:
+                    await CWrite_Behind.flush_Function()
+
+            # Raise error if duplicates found and cancel duplicated positions !
+            if existing:
+                for anOrder_ID in existing.values():
+                    await CMetatrader_Module.cancel_order(anOrder_ID)
+                raise ValueError(f"Duplicate Traded_DP(s) already exist in DB: {', '.join(str(k) for k in existing)}")
 
         except Exception as e:
             raise Exception(f"Error inserting batch positions: {e}")
-        
+
+    async def _apply_writes_Function(self, cursor, pending: Pending_Writes_Class) -> list[int]:
+        """
+        Writes the coalesced mutations of this timeframe on the cursor of the write-behind flush. The caller owns
+        the transaction. Deleted positions go first, then new positions and TPs, then DP Results and weights;
+        finally the Results of the affected positions are reconciled in one set-based statement and the
+        `Performance_Summary` rows of their days are recomputed.
+        Returns:
+            list[int]: Order IDs to cancel after the commit: positions already stored for a DP that was traded
+            again (same handling as the former duplicate check of `_insert_positions_batch`).
+        """
+        orders_to_cancel: list[int] = []
+        # The deletes go first: a DP cancelled and traded again within one flush has its old row deleted before
+        # the duplicate check of its new position
+        affected_days: set = set()
+        if pending.deletes:
+            values = list(pending.deletes.keys())
+            await cursor.execute(f"SELECT DISTINCT DATE(Last_modified_time) FROM {self.Positions_table_name} WHERE Order_ID IN ({','.join(['%s'] * len(values))})", values)
+            affected_days.update(row[0] for row in await cursor.fetchall())
+            await cursor.execute(f"DELETE FROM {self.Positions_table_name} WHERE Order_ID IN ({','.join(['%s'] * len(values))})", values)
+
+        if pending.inserts:
+            traded_dps = list(pending.inserts.keys())
+            await cursor.execute(f"""
+                SELECT Traded_DP, Order_ID FROM {self.Positions_table_name}
+                WHERE Traded_DP IN ({', '.join(['%s'] * len(traded_dps))})
+            """, traded_dps)
+            existing: dict[int, int] = {row[0]: row[1] for row in await cursor.fetchall()}
+            # The same order already stored is a replayed journal entry, not a duplicate
+            orders_to_cancel = [order_id for dp_key, order_id in existing.items() if pending.inserts[dp_key][7] != order_id]
+            new_positions = [pos for dp_key, pos in pending.inserts.items() if dp_key not in existing]
+            if new_positions:
+                await cursor.executemany(f"""
+                    INSERT INTO {self.Positions_table_name} 
+                    (Traded_DP, Order_type, Price, SL, TP, Last_modified_time, Vol, Order_ID, Probability, Result)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, new_positions)
+
+        if pending.TPs:
+            await cursor.executemany(f"UPDATE {self.Positions_table_name} SET TP = %s WHERE Order_ID = %s",
+                                     [(tp, order_id) for order_id, tp in pending.TPs.items()])
+
+        if pending.Results:
+            await cursor.executemany(f"UPDATE {self.important_dps_table_name} SET Result = %s WHERE id = %s",
+                                     [(Result, dp_id) for dp_id, Result in pending.Results.items()])
+
+        if pending.weights:
+            await cursor.executemany(f"UPDATE {self.important_dps_table_name} SET weight = %s WHERE id = %s",
+                                     [(weight, dp_id) for dp_id, weight in pending.weights.items()])
+
+        # Position Results of the DPs (and re-priced orders) touched by this batch, in one statement
+        affected_DPs = list(set(pending.Results) | set(pending.weights) | set(pending.inserts))
+        affected_orders = list(pending.TPs.keys())
+        conditions = []
+        if affected_DPs:
+            conditions.append(f"p.Traded_DP IN ({','.join(['%s'] * len(affected_DPs))})")
+        if affected_orders:
+            conditions.append(f"p.Order_ID IN ({','.join(['%s'] * len(affected_orders))})")
+        if conditions:
+            await cursor.execute(self.reconcile_results_query_Function(self.Positions_table_name, self.important_dps_table_name, " OR ".join(conditions)),
+                                 affected_DPs + affected_orders)
+            await cursor.execute(f"SELECT DISTINCT DATE(p.Last_modified_time) FROM {self.Positions_table_name} AS p WHERE {' OR '.join(conditions)}",
+                                 affected_DPs + affected_orders)
+            affected_days.update(row[0] for row in await cursor.fetchall())
+
+        # Performance_Summary rows of the days whose positions changed
+        if affected_days:
+            days = sorted(affected_days)
+            await cursor.execute(f"DELETE FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = %s AND day IN ({','.join(['%s'] * len(days))})",
+                                 [self.TimeFrame] + days)
+            day_ranges = " OR ".join(["(Last_modified_time >= %s AND Last_modified_time < DATE_ADD(%s, INTERVAL 1 DAY))"] * len(days))
+            await cursor.execute(performance_summary_SQL_Function(self.TimeFrame, day_ranges), [d for day in days for d in (day, day)])
+        return orders_to_cancel
+
     async def Read_ML_table_Function(self) -> tuple[pd.DataFrame, pd.DataFrame]:
         try:
+            # Streamed straight into typed column arrays (server-side cursor), so the dataset is never held as tuples
+            full_df = pd.DataFrame(await self._stream_columns_Function(f"""
+                SELECT {', '.join(ML_COLUMNS)}
+                FROM {self.important_dps_table_name}
+                WHERE Result != 0
+            """, dtypes=ML_COLUMN_DTYPES))  # Results still in the write-behind buffer are picked up after the next flush
+            print_and_logging_Function("info", f"{self.TimeFrame} -> ML dataset: {self.Stream_stats['rows']} rows streamed in {self.Stream_stats['seconds']:.2f}s ({self.Stream_stats['rows_per_sec']:.0f} rows/sec)", "description")
+
+            # Add the closed DPs moved to the archive (functions/DB_archive.py)
             async with self.db_pool.acquire() as conn: # type: ignore
                 async with conn.cursor() as cursor:
-                    # Fetch all rows
-                    await cursor.execute(f"""
-                        SELECT id, type, length, Flag_Ratio, NO_Used_Candles,
-                            Used_Ratio, Related_DP_1, Related_DP_2, Is_related_DP_used,
-                            Is_golfed, Is_used_half, parent_length, Result
-                        FROM {self.important_dps_table_name}
-                        WHERE Result != 0
-                    """)
-                    rows = await cursor.fetchall()
-                    columns = [desc[0] for desc in cursor.description]
-                    
-                    # Convert to DataFrame
-                    full_df = pd.DataFrame(rows, columns=columns)
+                    archived_df = await read_archived_DPs_Function(cursor, self.TimeFrame, list(full_df.columns))
+            if not archived_df.empty:
+                full_df = pd.concat([full_df, archived_df], ignore_index=True).drop_duplicates(subset="id")
 
-                    # Build a dictionary for fast lookup of id -> Result
-                    id_to_result = dict(zip(full_df['id'], full_df['Result']))
-
-                    # Now, prepare the Related DP results
-                    full_df['Related_DP_1'] = full_df['Related_DP_1'].apply(
-                        lambda x: id_to_result.get(x, 0) if pd.notnull(x) else None
-                    )
-                    full_df['Related_DP_2'] = full_df['Related_DP_2'].apply(
-                        lambda x: id_to_result.get(x, 0) if pd.notnull(x) else None
-                    )
-
-                    # Prepare Input and Output
-                    FTC_full_df = full_df[full_df['type'] == 'FTC'].reset_index(drop=True)
-                    # EL_full_df = full_df[full_df['type'] == 'EL'].reset_index(drop=True)
-                    # MPL_full_df = full_df[full_df['type'] == 'MPL'].reset_index(drop=True)
-
-                    FTC_Input = FTC_full_df.drop(columns=['Result', 'id', 'type'])
-                    FTC_Output = FTC_full_df['Result']
-                    
-                    # EL_Input = EL_full_df.drop(columns=['Result', 'id', 'type'])
-                    # EL_Output = EL_full_df['Result']
-                    
-                    # MPL_Input = MPL_full_df.drop(columns=['Result', 'id', 'type'])
-                    # MPL_Output = MPL_full_df['Result']
-                    
-                    # return FTC_Input, FTC_Output, EL_Input, EL_Output, MPL_Input, MPL_Output
-                    return FTC_Input, FTC_Output # type: ignore
+            return self._ML_dataset_Function(full_df)
         except Exception as e:
             print_and_logging_Function("error", f"{self.TimeFrame} -> Error in fetching ML Dataset: {e}", "title")
             return pd.DataFrame(), pd.DataFrame()
     
-    async def Read_Pending_Positions_Function(self) -> dict[str, int]:
-        if self.db_pool is None:
-            await self.initialize_db_pool_Function()
-
+    async def remove_cancelled_positions_Function(self, cancelled_list_dict: dict[int, int]):
         try:
-            async with self.db_pool.acquire() as conn: # type: ignore
-                await conn.commit()  # Ensure previous state is clean (optional but safe)
-                async with conn.cursor() as cursor:
-                    try:
-                        await cursor.execute(f"""
-                            SELECT Traded_DP, Order_ID
-                            FROM {self.Positions_table_name}
-                            WHERE Result = 0
-                        """)
-                        rows = await cursor.fetchall()
-                        order_IDs = {row[0]: row[1] for row in rows}
-
-                        # print_and_logging_Function("info", f"{self.TimeFrame} -> ID Open positions: {order_IDs.values()}", "description")
-                        return order_IDs
-                    except Exception as e:
-                        raise e
-                    finally:
-                        await cursor.close()
+            self.Registry.remove_positions_Function(cancelled_list_dict)  # Safe removal
 
-        except Exception as e:
-            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in fetching open positions: {e}", "title")
-            return {}
-
-    async def remove_cancelled_positions_Function(self, cancelled_list_dict: dict[str, int]):
-        if self.db_pool is None:
-            await self.initialize_db_pool_Function()
-        try:
-            for cancelled_id in cancelled_list_dict.keys():
-                self.Traded_DP_Dict.pop(cancelled_id, None)  # Safe removal
-
-            values = list(cancelled_list_dict.values())
-            if values:
-                placeholders = ','.join(['%s'] * len(values))
-                query = f"DELETE FROM {self.Positions_table_name} WHERE Order_ID IN ({placeholders})"
-                async with self.db_pool.acquire() as conn:  # type: ignore
-                    await conn.commit()  # Ensure previous state is clean (optional but safe)
-                    async with conn.cursor() as cursor:
-                        await cursor.execute(query, values)
-                        await conn.commit()
-                        print_and_logging_Function("info", f"{self.TimeFrame} -> Removed {values} cancelled positions from DB and memory.", "description")
+            if cancelled_list_dict:
+                CWrite_Behind.enqueue_Function(self.TimeFrame, "delete", [(dp_key, order_id) for dp_key, order_id in cancelled_list_dict.items()])
+                if FLUSH_INTERVAL <= 0:
+                    await CWrite_Behind.flush_Function()
+                print_and_logging_Function("info", f"{self.TimeFrame} -> Removed {list(cancelled_list_dict.values())} cancelled positions from DB and memory.", "description")
         except Exception as e:
             raise Exception(f"Error in removing the cancelled positions from DB: {e}")
     
-    async def correct_position_results_Function(self):
-        if self.db_pool is None:
-            await self.initialize_db_pool_Function()
-            
+    async def correct_position_results_Function(self, full: bool = False):
+        """
+        Makes sure the position Results are up to date. They are reconciled with every write-behind flush, so
+        flushing is enough; `full=True` also recomputes every position of the timeframe (manual repair).
+        """
         try:
+            await CWrite_Behind.flush_Function()
+            if not full:
+                return
+
             async with self.db_pool.acquire() as conn:  # type: ignore
                 await conn.commit()
                 async with conn.cursor() as cursor:
-
-                    ensuring_right_Result_query = f"""
-                        UPDATE {self.Positions_table_name} AS p
-                        JOIN {self.important_dps_table_name} AS d ON p.Traded_DP = d.id
-                        SET p.Result = 
-                            CASE
-                                WHEN d.weight = 0 THEN
-                                    CASE
-                                        WHEN ROUND(d.Result * ABS(p.Price - p.SL), 5) <= ROUND(ABS(p.TP - p.Price), 5) 
-                                            THEN -ABS(p.Price - p.SL)
-                                        ELSE ROUND(ABS(p.TP - p.Price), 5)
-                                    END
-                                ELSE
-                                    CASE
-                                        WHEN ROUND(d.Result * ABS(p.Price - p.SL), 5) > ROUND(ABS(p.TP - p.Price), 5)
-                                            THEN ROUND(ABS(p.TP - p.Price), 5)
-                                        ELSE ROUND(d.Result * ABS(p.Price - p.SL), 5)
-                                    END
-                            END;
-
-                    """
-                    await cursor.execute(ensuring_right_Result_query)
-
+                    await cursor.execute(self.reconcile_results_query_Function(self.Positions_table_name, self.important_dps_table_name))
                     await conn.commit()
 
         except Exception as e:
             raise Exception(f"Error correcting Results in Positions table: {e}")
   
-    async def PNL_Calculator_Function(self) -> tuple[float, float]:
+    async def PNL_Calculator_Function(self, start_day: typing.Optional[datetime.date] = None, end_day: typing.Optional[datetime.date] = None) -> tuple[float, float]:
+        """ PNL (percent of balance, money) of the timeframe between two days (inclusive, None = unbounded), from `Performance_Summary`. """
         try:
+            await CWrite_Behind.flush_Function()
+            day_range, params = self._day_range_SQL_Function(start_day, end_day)
             async with self.db_pool.acquire() as conn:  # type: ignore
                 await conn.commit()
                 async with conn.cursor() as cursor:
-                    await cursor.execute(f"""SELECT SUM(Result * Vol) FROM {self.Positions_table_name}""")
+                    await cursor.execute(f"""SELECT SUM(pnl_vol) FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = %s{day_range}""", [self.TimeFrame] + params)
                     result = await cursor.fetchone()
                     total_vol_pip = result[0] if result and result[0] is not None else 0.0
 
-            return CMetatrader_Module.profit_calculator_Function(total_vol_pip)
+            return await CMetatrader_Module.profit_calculator_Function(total_vol_pip, stream_symbol_Function(self.TimeFrame))
         except Exception as e:
             raise Exception(f"Error calculating the PNL of {self.Positions_table_name}: {e}")
         
-    async def winrate_Calculator_Function(self) -> tuple[float, int]:
-        if self.db_pool is None:
-            await self.initialize_db_pool_Function()
-
+    async def winrate_Calculator_Function(self, start_day: typing.Optional[datetime.date] = None, end_day: typing.Optional[datetime.date] = None) -> tuple[float, int]:
+        """ Winrate and number of closed trades of the timeframe between two days, from `Performance_Summary`. """
         try:
+            await CWrite_Behind.flush_Function()
+            day_range, params = self._day_range_SQL_Function(start_day, end_day)
             async with self.db_pool.acquire() as conn:  # type: ignore
                 await conn.commit()
                 async with conn.cursor() as cursor:
                     await cursor.execute(f"""
-                        SELECT 
-                            CAST(SUM(CASE WHEN Result > 0 THEN 1 ELSE 0 END) AS FLOAT) / 
-                            NULLIF(COUNT(CASE WHEN Result != 0 THEN 1 END), 0) AS winrate,
-                            COUNT(CASE WHEN Result != 0 THEN 1 END) AS trade_count
-                        FROM {self.Positions_table_name}
-                    """)
+                        SELECT SUM(wins) / NULLIF(SUM(trades), 0) AS winrate, SUM(trades) AS trade_count
+                        FROM {PERFORMANCE_SUMMARY_TABLE}
+                        WHERE timeframe = %s{day_range}
+                    """, [self.TimeFrame] + params)
                     result = await cursor.fetchone()
-                    winrate = result[0] if result and result[0] is not None else 0.0
-                    trade_count = result[1] if result and result[1] is not None else 0
+                    winrate = float(result[0]) if result and result[0] is not None else 0.0
+                    trade_count = int(result[1]) if result and result[1] is not None else 0
                     return winrate, trade_count
         except Exception as e:
             raise Exception(f"Error calculating the winrate of {self.Positions_table_name}: {e}")
+
+    @staticmethod
+    async def performance_report_Function(timeframes: typing.Optional[list[str]] = None,
+                                          start_day: typing.Optional[datetime.date] = None,
+                                          end_day: typing.Optional[datetime.date] = None) -> dict[str, dict]:
+        """
+        Cross-timeframe report from `Performance_Summary`, an O(days) read that can be served on demand.
+        Returns:
+            dict[str, dict]: timeframe -> {"pnl_percent", "pnl", "winrate", "trades"}, plus an "ALL" total.
+        """
+        await CWrite_Behind.flush_Function()
+        day_range, params = Database_Class._day_range_SQL_Function(start_day, end_day)
+        if timeframes:
+            day_range += f" AND timeframe IN ({','.join(['%s'] * len(timeframes))})"
+            params += timeframes
+        async with CDB_Pool.acquire("reports") as conn:
+            await conn.commit()
+            async with conn.cursor() as cursor:
+                await cursor.execute(f"""
+                    SELECT timeframe, SUM(pnl_vol), SUM(wins), SUM(trades)
+                    FROM {PERFORMANCE_SUMMARY_TABLE}
+                    WHERE TRUE{day_range}
+                    GROUP BY timeframe WITH ROLLUP
+                """, params)
+                rows = await cursor.fetchall()
+
+        return await Storage_Class._report_from_rows_Function(rows)
         
     async def update_position_TPs_batch_Function(self, modifying_TP_DB: list[tuple[int, float]]) -> None:
         """
-        Batch update TP values in the Positions table using (Traded_DP, New TP) pairs.
+        Batch update TP values in the Positions table using (Order_ID, New TP) pairs, through the
+        write-behind buffer (`CWrite_Behind`).
 
         Args:
-            modifying_TP_DB: List of tuples where each tuple is (Traded_DP, new_TP)
+            modifying_TP_DB: List of tuples where each tuple is (Order_ID, new_TP)
         """
         if not modifying_TP_DB:
             return  # Nothing to update
 
-        if self.db_pool is None:
-            await self.initialize_db_pool_Function()
-
         try:
-            async with self.db_pool.acquire() as conn:  # type: ignore
-                await conn.commit()
-                async with conn.cursor() as cursor:
-                    await cursor.executemany(
-                        f"""
-                        UPDATE {self.Positions_table_name}
-                        SET TP = %s
-                        WHERE Order_ID = %s
-                        """,
-                        [(tp, order_id) for order_id, tp in modifying_TP_DB]
-                    )
-                    await conn.commit()
+            CWrite_Behind.enqueue_Function(self.TimeFrame, "TPs", modifying_TP_DB)
+            self.Registry.update_TPs_Function(modifying_TP_DB)
+            if FLUSH_INTERVAL <= 0:
+                await CWrite_Behind.flush_Function()
         except Exception as e:
             raise Exception(f"Error updating TP values in batch: {e}")
 
-class TradeInfo(typing.TypedDict):
-    TP: float
-    Vol: float
-    Order_ID: int
\ No newline at end of file
+    def audit_queries_Function(self) -> list[tuple[str, str, list]]:
+        """
+        Returns the statements the bot issued on this stream's tables, and on the shared ones, as (fingerprint, SQL,
+        parameters): one execution per `CQuery_Metrics` fingerprint, with the parameters it ran with, for the
+        `EXPLAIN` audit in functions/diagnostics.py. Statements `EXPLAIN` can't take (DDL, transactions) are left out.
+        """
+        own_tables = re.compile(rf"(?<![0-9A-Za-z])(?:{'|'.join(STREAM_TABLE_PREFIXES)})_{re.escape(self.TimeFrame)}(?![0-9A-Za-z])")
+        catalog = []
+        for fingerprint, sample in sorted(CQuery_Metrics.samples_Function().items()):
+            if (sample["query"].split(None, 1) or [""])[0].upper() not in EXPLAINABLE_STATEMENTS:
+                continue
+            if own_tables.search(sample["query"]) or not STREAM_TABLES.search(sample["query"]):
+                catalog.append((fingerprint, sample["query"], sample["args"] or []))
+        return catalog
@@ -1,5 +1,19 @@
+import hashlib
+import typing
 import pandas
 
+def ID_to_key_Function(The_ID: typing.Optional[str]) -> typing.Optional[int]:
+    """
+    Converts a human-readable ID (e.g. "1.0853 in 2024-05-02 10:15:00") into the compact 64-bit key used as
+    primary / foreign key in the database. The key is the first 15 hex digits of the SHA-256 of the ID, so it
+    always fits in a signed BIGINT and can be reproduced inside MySQL with
+    `CONV(LEFT(SHA2(The_ID, 256), 15), 16, 10)` (used by the migration tool in `functions/DB_migration.py`).
+    Returns None when the ID is None.
+    """
+    if The_ID is None:
+        return None
+    return int(hashlib.sha256(str(The_ID).encode("utf-8")).hexdigest()[:15], 16)
+
 class FlagPoint_Class:
     """
     FlagPoint_Class is a class that represents a flag point in a trading bot system. 
@@ -9,6 +23,7 @@ class FlagPoint_Class:
         time (pandas.Timestamp): The timestamp indicating when the flag point occurred.
         index (int): An optional index value for the flag point. Defaults to -1.
         id (str): A unique identifier for the flag point, generated based on the price and time.
+        key (int): The compact 64-bit database key derived from `id` (see `ID_to_key_Function`).
     Methods:
         __init__(price: int, time: pandas.Timestamp, index: int = -1):
             Initializes a new instance of the FlagPoint_Class with the given price, time, and optional index.
@@ -19,7 +34,7 @@ class FlagPoint_Class:
                 index (int, optional): An optional index value for the flag point. Defaults to -1.
         ID_generator_Function():
             Generates a unique identifier (id) for the flag point based on its price and time attributes.
-            If either price or time is None, the id is set to None.
+            If either price or time is None, the id is set to None. The database key is refreshed as well.
             Returns:
                 str: The generated unique identifier for the flag point, or None if price or time is missing.
     """
@@ -42,4 +57,5 @@ class FlagPoint_Class:
             self.id = f"{self.price} in {self.time}"
         else:
             self.id = None
+        self.key = ID_to_key_Function(self.id)
         return self.id
\ No newline at end of file
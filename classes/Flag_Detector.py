@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-import asyncio
 import sys
 import os
 
@@ -9,7 +8,34 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from classes.Flag import Flag_Class
 from functions.logger import print_and_logging_Function
 from classes.FlagPoint import FlagPoint_Class
-from classes.Database import Database_Class    
+from classes.Storage import Storage_Class    
+
+def next_exceeding_Function(The_values: np.ndarray) -> np.ndarray:
+    """
+    For each bar, the index of the first later bar whose value is strictly greater (-1 if there is none), found in
+    one pass with a monotonic stack instead of one forward scan per bar.
+    """
+    values = The_values.tolist()
+    The_next = [-1] * len(values)
+    stack: list[int] = []
+    for anIndex, value in enumerate(values):
+        while stack and values[stack[-1]] < value:
+            The_next[stack.pop()] = anIndex
+        stack.append(anIndex)
+    return np.array(The_next, dtype=np.int64)
+
+def previous_reaching_Function(The_values: np.ndarray) -> np.ndarray:
+    """ For each bar, the index of the last earlier bar whose value is greater or equal (-1 if there is none), in one pass. """
+    values = The_values.tolist()
+    The_previous = [-1] * len(values)
+    stack: list[int] = []
+    for anIndex, value in enumerate(values):
+        while stack and values[stack[-1]] < value:
+            stack.pop()
+        if stack:
+            The_previous[anIndex] = stack[-1]
+        stack.append(anIndex)
+    return np.array(The_previous, dtype=np.int64)
 
 class FlagDetector_Class:
     """
@@ -17,24 +43,26 @@ class FlagDetector_Class:
     It processes a given dataset to identify local extrema (highs and lows) and uses these extrema to detect 
     flag patterns. The detected flags are stored for further analysis or persistence in a database.
     Attributes:
-        CDataBase (Database_Class): An instance of the database class used for storing detected flags.
+        CDataBase (Storage_Class): An instance of the database class used for storing detected flags.
         DB_name_flag_points_table (str): The name of the database table for storing flag points.
         DB_name_flags_table (str): The name of the database table for storing flags.
         TimeFrame (str): The timeframe of the dataset being analyzed.
         Detected_Flags (list[Flag_Class]): A list to store detected flag patterns.
     Methods:
-        __init__(The_timeframe: str, The_DataBase: Database_Class):
+        __init__(The_timeframe: str, The_DataBase: Storage_Class):
             Initializes the class with the given timeframe and database instance.
         detect_local_extremes_Function(The_dataset: pd.DataFrame):
             Identifies local maxima and minima in the dataset and marks them in the dataset.
         detect_bullish_flags_Function(The_dataset: pd.DataFrame):
             Asynchronously detects bullish flag patterns in the dataset.
-        Each_bullish_detection_Function(The_highs, The_lows, The_index, The_dataset, The_local_tasks):
+        Each_bullish_detection_Function(The_highs, The_lows, The_end_index, The_bound_index, The_index, The_dataset):
             Processes a single local maximum to detect a bullish flag pattern.
         detect_bearish_flags_Function(The_dataset: pd.DataFrame):
             Asynchronously detects bearish flag patterns in the dataset.
-        Each_bearish_detection_Function(The_highs, The_lows, The_index, The_dataset, The_local_tasks):
+        Each_bearish_detection_Function(The_highs, The_lows, The_end_index, The_bound_index, The_index, The_dataset):
             Processes a single local minimum to detect a bearish flag pattern.
+        find_flags_Function(The_dataset: pd.DataFrame):
+            Detects the bullish and bearish flags of the dataset and returns them, without saving them.
         run_detection_Function(The_dataset: pd.DataFrame):
             Orchestrates the detection process for both bullish and bearish flags, 
             and saves the detected flags to the database.
@@ -44,14 +72,14 @@ class FlagDetector_Class:
         for efficient processing of large datasets.
     """
     
-    def __init__(self, The_timeframe:str, The_DataBase: Database_Class):
+    def __init__(self, The_timeframe:str, The_DataBase: Storage_Class):
         """
         Initializes the Flag_Detector class.
         Args:
             The_timeframe (str): The timeframe for which the flag detection is being performed.
-            The_DataBase (Database_Class): An instance of the Database_Class to interact with the database.
+            The_DataBase (Storage_Class): An instance of the Storage_Class to interact with the database.
         Attributes:
-            CDataBase (Database_Class): Stores the provided database instance for database operations.
+            CDataBase (Storage_Class): Stores the provided database instance for database operations.
             DB_name_flag_points_table (str): The name of the database table for storing flag points, based on the timeframe.
             DB_name_flags_table (str): The name of the database table for storing flags, based on the timeframe.
             TimeFrame (str): The timeframe for which the flag detection is being performed.
@@ -104,84 +132,77 @@ class FlagDetector_Class:
                 - 'is_local_max': A boolean column indicating whether a given row is a local maximum.
         Behavior:
             - Logs the start of the bullish flag detection process for the specified timeframe.
-            - Extracts the 'high' and 'low' price columns from the dataset.
-            - Identifies indices of local maxima using the 'is_local_max' column.
-            - For each local maximum, creates an asynchronous task to process the detection using 
-              the `Each_bullish_detection_Function`.
-            - Gathers all asynchronous tasks to ensure they complete execution.
+            - Extracts the 'high' and 'low' price columns from the dataset as NumPy arrays.
+            - Finds, for every bar at once, the next higher high (the end of a flag) and the previous high at or
+              above it (the bound of the search for the start of a flag), so no local maximum scans the rest of
+              the dataset: the detection is linear in the length of the dataset.
+            - Processes each local maximum (the 'is_local_max' column) with `Each_bullish_detection_Function`.
         Returns:
             None: 
                 This function does not return any value. It performs its operations asynchronously
                 and may log results or update internal states as part of its execution.
         """
         
-        local_tasks = []
         print_and_logging_Function("info", f"{self.TimeFrame} -> Bullish Flag Detecting of {self.TimeFrame} started...", "description")
-        highs = The_dataset['high']
-        lows = The_dataset['low']
+        highs = The_dataset['high'].to_numpy(dtype=float)
+        lows = The_dataset['low'].to_numpy(dtype=float)
+        next_higher = next_exceeding_Function(highs)
+        previous_higher = previous_reaching_Function(highs)
 
-        local_max_indices = np.where(The_dataset['is_local_max'].to_numpy())[0]
-        for anIndex in local_max_indices:
-            local_tasks.append(asyncio.create_task(self.Each_bullish_detection_Function(highs,lows,anIndex,The_dataset, local_tasks)))
+        for anIndex in np.flatnonzero(The_dataset['is_local_max'].to_numpy()):
+            await self.Each_bullish_detection_Function(highs, lows, next_higher[anIndex], previous_higher[anIndex], anIndex, The_dataset)
 
-        await asyncio.gather(*local_tasks)
-
-    async def Each_bullish_detection_Function(self, The_highs, The_lows, The_index, The_dataset, The_local_tasks):
+    async def Each_bullish_detection_Function(self, The_highs, The_lows, The_end_index, The_bound_index, The_index, The_dataset):
         """
         Asynchronously detects bullish flag patterns in a given dataset.
         This function identifies bullish flag patterns in financial data by analyzing 
         the highs and lows of a dataset. It determines the start, end, and low points 
         of the flag, and appends the detected flag to the `Detected_Flags` list.
         Args:
-            The_highs (list or np.ndarray): A list or array of high prices in the dataset.
-            The_lows (list or np.ndarray): A list or array of low prices in the dataset.
+            The_highs (np.ndarray): The high prices of the dataset.
+            The_lows (np.ndarray): The low prices of the dataset.
+            The_end_index (int): The index of the next high above the current one (-1 if there is none).
+            The_bound_index (int): The index of the previous high at or above the current one (-1 if there is none).
             The_index (int): The current index in the dataset being analyzed.
             The_dataset (pd.DataFrame): The dataset containing financial data, including 
                                         a "time" column for timestamps.
-            The_local_tasks (list): A list to store asynchronous tasks (currently unused 
-                                    but prepared for database operations).
         Returns:
             None: The function does not return any value. Instead, it appends detected 
                   bullish flag patterns to the `Detected_Flags` list.
         Key Steps:
             1. Identifies the high point of the flag using the current index.
-            2. Finds the end of the flag by locating the next high greater than the 
-               current high.
+            2. Takes the end of the flag: the next high greater than the current high
+               (`The_end_index`).
             3. Ensures the flag has a minimum length of 15 indices; otherwise, exits.
             4. Determines the low point of the flag by finding the lowest low between 
                the current index and the end of the flag.
             5. Identifies the start of the flag by finding the first low lower than 
-               the low point of the flag.
+               the low point of the flag, going back no further than `The_bound_index`.
             6. Creates a `Flag_Class` object representing the detected flag and appends 
                it to the `Detected_Flags` list.
         """
         
         high_of_flag = The_highs[The_index]
 
-        # Find end of flag
-        end_of_flag_indices = np.where((The_highs[The_index + 1:] > high_of_flag))[0] if The_index+1 < len(The_lows) else np.array([])
-        if end_of_flag_indices.size == 0:
+        # End of flag (next high above high_of_flag)
+        if The_end_index < 0:
             return
-        end_of_flag_index = The_index + 1 + end_of_flag_indices[0]
+        end_of_flag_index = The_end_index
 
         if end_of_flag_index - The_index <= 15:
             return
 
         # Find low of flag (lowest low between i and end_of_flag_index)
-        low_of_flag = The_lows[The_index:end_of_flag_index + 1].min()
-        low_of_flag_index = The_index + np.where(The_lows[The_index:end_of_flag_index + 1] == low_of_flag)[0][-1]
+        lows_in_flag = The_lows[The_index:end_of_flag_index + 1]
+        low_of_flag = lows_in_flag.min()
+        low_of_flag_index = The_index + np.flatnonzero(lows_in_flag == low_of_flag)[-1]
 
-        # Find start of flag (first low lower than low_of_flag)
-        start_of_flag_index = None
-        for j in range(1, The_index):
-            if The_highs[The_index-j] >= high_of_flag:
-                break
-            elif The_lows[The_index-j] < low_of_flag:
-                start_of_flag_index = The_index-j
-                break
-        
-        if start_of_flag_index is None:
+        # Find start of flag (first low lower than low_of_flag, back to the previous high at or above high_of_flag; bar 0 is never a start)
+        first_candidate = max(The_bound_index, 0) + 1
+        start_hits = np.flatnonzero(The_lows[first_candidate:The_index] < low_of_flag)
+        if start_hits.size == 0:
             return
+        start_of_flag_index = first_candidate + start_hits[-1]
         
         # Append valid flag
         flag = Flag_Class(
@@ -208,85 +229,77 @@ class FlagDetector_Class:
                 - 'is_local_min': A boolean column indicating whether a given row is a local minimum.
         Workflow:
             1. Logs the start of the bearish flag detection process for the specified timeframe.
-            2. Extracts the 'high' and 'low' price columns from the dataset.
-            3. Identifies the indices of rows where 'is_local_min' is True.
-            4. For each identified local minimum index:
-                - Creates an asynchronous task to perform detailed bearish flag detection using 
-                  the `Each_bearish_detection_Function`.
-            5. Waits for all detection tasks to complete using `asyncio.gather`.
+            2. Extracts the 'high' and 'low' price columns from the dataset as NumPy arrays.
+            3. Finds, for every bar at once, the next lower low (the end of a flag) and the previous low at or
+               below it (the bound of the search for the start of a flag).
+            4. Processes each local minimum (the 'is_local_min' column) with `Each_bearish_detection_Function`.
         Returns:
             None: 
                 This function does not return any value. It performs its operations asynchronously 
                 and may log information or update internal states as part of its execution.
         """
         
-        local_tasks = []
         print_and_logging_Function("info", f"{self.TimeFrame} -> Bearish Flag Detecting of {self.TimeFrame} started...", "description")
-        highs = The_dataset['high']
-        lows = The_dataset['low']
+        highs = The_dataset['high'].to_numpy(dtype=float)
+        lows = The_dataset['low'].to_numpy(dtype=float)
+        next_lower = next_exceeding_Function(-lows)
+        previous_lower = previous_reaching_Function(-lows)
 
-        local_min_indices = np.where(The_dataset['is_local_min'].to_numpy())[0]
-        for anindex in local_min_indices:
-            local_tasks.append(asyncio.create_task(self.Each_bearish_detection_Function(highs,lows,anindex, The_dataset, local_tasks)))
+        for anindex in np.flatnonzero(The_dataset['is_local_min'].to_numpy()):
+            await self.Each_bearish_detection_Function(highs, lows, next_lower[anindex], previous_lower[anindex], anindex, The_dataset)
 
-        await asyncio.gather(*local_tasks)
-
-    async def Each_bearish_detection_Function(self, The_highs, The_lows, The_index, The_dataset, The_local_tasks):
+    async def Each_bearish_detection_Function(self, The_highs, The_lows, The_end_index, The_bound_index, The_index, The_dataset):
         """
         Asynchronously detects bearish flag patterns in a given dataset.
         This function identifies bearish flag patterns in financial data by analyzing 
         highs and lows of price movements. It determines the start, high, low, and end 
         of a bearish flag and appends the detected flag to the `Detected_Flags` list.
         Args:
-            The_highs (list or np.ndarray): A list or array of high prices in the dataset.
-            The_lows (list or np.ndarray): A list or array of low prices in the dataset.
+            The_highs (np.ndarray): The high prices of the dataset.
+            The_lows (np.ndarray): The low prices of the dataset.
+            The_end_index (int): The index of the next low below the current one (-1 if there is none).
+            The_bound_index (int): The index of the previous low at or below the current one (-1 if there is none).
             The_index (int): The current index in the dataset being analyzed.
             The_dataset (pd.DataFrame): The dataset containing price data, including a "time" column.
-            The_local_tasks (list): A list to store asynchronous tasks (currently unused in the function).
         Returns:
             None: The function does not return a value. Instead, it appends detected flags 
             to the `Detected_Flags` list as instances of the `Flag_Class`.
         Key Steps:
             1. Identify the low of the flag at the given index (`low_of_flag`).
-            2. Find the end of the flag by locating the first low below `low_of_flag` after the current index.
+            2. Take the end of the flag: the first low below `low_of_flag` after the current index (`The_end_index`).
             3. Ensure the flag has a minimum length of 15 indices; otherwise, return early.
             4. Determine the high of the flag (`high_of_flag`) as the highest high between the current index 
                and the end of the flag.
-            5. Locate the start of the flag by finding the first high lower than `high_of_flag` before the current index.
+            5. Locate the start of the flag by finding the first high above `high_of_flag` before the current index,
+               going back no further than `The_bound_index`.
             6. If a valid start of the flag is found, create a `Flag_Class` instance with the detected flag details.
             7. Append the detected flag to the `Detected_Flags` list.
         Note:
             - The function assumes the dataset contains a "time" column for timestamp information.
             - The `Flag_Class` and `FlagPoint_Class` are custom classes used to represent the flag and its points.
-            - The `The_local_tasks` argument is included but not actively used in the current implementation.
         """
         
         low_of_flag = The_lows[The_index]
 
-        # Find end of flag
-        end_of_flag_indices = np.where((The_lows[The_index + 1:] < low_of_flag))[0] if The_index+1 < len(The_lows) else np.array([])
-        if end_of_flag_indices.size == 0:
+        # End of flag (next low below low_of_flag)
+        if The_end_index < 0:
             return
-        end_of_flag_index = The_index + 1 + end_of_flag_indices[0]
+        end_of_flag_index = The_end_index
 
         if end_of_flag_index - The_index <= 15:
             return
 
         # Find high of flag (highest high between i and end_of_flag_index)
-        high_of_flag = The_highs[The_index:end_of_flag_index + 1].max()
-        high_of_flag_index = The_index + np.where(The_highs[The_index:end_of_flag_index + 1] == high_of_flag)[0][-1]
+        highs_in_flag = The_highs[The_index:end_of_flag_index + 1]
+        high_of_flag = highs_in_flag.max()
+        high_of_flag_index = The_index + np.flatnonzero(highs_in_flag == high_of_flag)[-1]
 
-        # Find start of flag (first high lower than high_of_flag)
-        start_of_flag_index = None
-        for j in range(1, The_index):
-            if The_lows[The_index-j] <= low_of_flag:
-                break
-            elif The_highs[The_index-j] > high_of_flag:
-                start_of_flag_index = The_index-j
-                break
-        
-        if start_of_flag_index is None:
+        # Find start of flag (first high above high_of_flag, back to the previous low at or below low_of_flag; bar 0 is never a start)
+        first_candidate = max(The_bound_index, 0) + 1
+        start_hits = np.flatnonzero(The_highs[first_candidate:The_index] > high_of_flag)
+        if start_hits.size == 0:
             return
+        start_of_flag_index = first_candidate + start_hits[-1]
         
         # Append valid flag
         flag = Flag_Class(
@@ -300,12 +313,24 @@ class FlagDetector_Class:
         # The_local_tasks.append(asyncio.create_task(self.CDataBase.add_flag_Function(flag,self.DB_name_flags_table)))
         self.Detected_Flags.append(flag)
             
+    async def find_flags_Function(self, The_dataset: pd.DataFrame) -> list[Flag_Class]:
+        """
+        Detects the bullish and bearish flags of `The_dataset` (marking its local extremes) and returns them,
+        bullish first, without saving them: `run_detection_Function` saves them, the backtest releases them bar by bar.
+        The dataset must have a RangeIndex (the flags address its rows by position).
+        """
+        self.Detected_Flags : list[Flag_Class] = []
+        self.detect_local_extremes_Function(The_dataset)
+        await self.detect_bullish_flags_Function(The_dataset)
+        await self.detect_bearish_flags_Function(The_dataset)
+        return self.Detected_Flags
+
     async def run_detection_Function(self, The_dataset: pd.DataFrame):
         """
         Asynchronously runs the flag detection process on a given dataset.
         This function orchestrates the detection of bullish and bearish flags in the provided dataset,
-        saves the detected flags to the database, and logs the results. It uses asynchronous tasks
-        to perform the detection and saving operations concurrently.
+        saves the detected flags to the database, and logs the results. The flags are saved once the
+        detection is over, so the save always gets all of them.
         Args:
             The_dataset (pd.DataFrame): The dataset containing the financial data on which the flag 
                                         detection process will be performed.
@@ -313,17 +338,12 @@ class FlagDetector_Class:
             self.CDataBase.detected_flags (int): Resets the count of detected flags to zero before starting the detection.
             self.Detected_Flags (list[Flag_Class]): Initializes an empty list to store detected flags.
         Steps:
-            1. `self.detect_local_extremes_Function(The_dataset)`:
-               Identifies local extremes (highs and lows) in the dataset, which are used as a basis for flag detection.
-            2. `self.detect_bullish_flags_Function(The_dataset)`:
-               Asynchronously detects bullish flags in the dataset and appends the results to `self.Detected_Flags`.
-            3. `self.detect_bearish_flags_Function(The_dataset)`:
-               Asynchronously detects bearish flags in the dataset and appends the results to `self.Detected_Flags`.
-            4. `self.CDataBase.save_flags_Function(self.Detected_Flags)`:
+            1. `self.find_flags_Function(The_dataset)`:
+               Identifies the local extremes of the dataset, then detects its bullish and bearish flags into
+               `self.Detected_Flags`.
+            2. `self.CDataBase.save_flags_Function(self.Detected_Flags)`:
                Asynchronously saves the detected flags to the database.
-            5. `await asyncio.gather(*tasks)`:
-               Executes all asynchronous tasks concurrently.
-            6. Logs the completion of the detection process and the number of new flags detected.
+            3. Logs the completion of the detection process and the number of new flags detected.
         Logging:
             - Logs an informational message when the detection process is completed.
             - Logs the number of new flags detected.
@@ -334,15 +354,10 @@ class FlagDetector_Class:
             None
         """
         
-        tasks = []
         try:
             self.CDataBase.detected_flags = 0
-            self.Detected_Flags : list[Flag_Class] = []
-            self.detect_local_extremes_Function(The_dataset)
-            tasks.append(asyncio.create_task(self.detect_bullish_flags_Function(The_dataset)))
-            tasks.append(asyncio.create_task(self.detect_bearish_flags_Function(The_dataset)))
-            tasks.append(asyncio.create_task(self.CDataBase.save_flags_Function(self.Detected_Flags)))
-            await asyncio.gather(*tasks)
+            await self.find_flags_Function(The_dataset)
+            await self.CDataBase.save_flags_Function(self.Detected_Flags)
             print_and_logging_Function("info", f"{self.TimeFrame} -> Flag Detection of {self.TimeFrame} completed", "title")
             print_and_logging_Function("info", f"{self.TimeFrame} -> {self.CDataBase.detected_flags} New Flags detected", "description")
         except Exception as e:
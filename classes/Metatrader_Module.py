@@ -5,6 +5,7 @@ import json
 import sys
 import os
 import asyncio
+import time
 import typing
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -12,16 +13,21 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from functions.logger import print_and_logging_Function
 import parameters
 from functions.utilities import is_trading_hours_now
+from classes.Scheduler import RETRY_INTERVAL, RETRY_TIMEOUT
+from classes.Broker_Gateway import CBroker_Gateway, CBroker_Metadata
 
 # Load JSON config file
 with open("./config.json", "r") as file:
     config = json.load(file)
 
+COMMISSION_PER_LOT: float = config["account_info"]["commision"]
+
 class Metatrader_Module_Class:
     """ This class provides a set of methods to interact with the MetaTrader5 trading platform. It includes functionalities for opening positions, partially closing positions, canceling orders, fetching market data, and managing MetaTrader5 initialization and login.
     Attributes:
         Positions (pd.DataFrame): A DataFrame to store position data.
-        mt (MetaTrader5): The MetaTrader5 module for interacting with the trading platform.
+        mt (MetaTrader5): The MetaTrader5 module, for its constants. Every terminal call goes through `CBroker_Gateway`,
+                          which runs them on its own thread, so the methods below are coroutines.
         timeframe_mapping (dict): A mapping of timeframe strings to MetaTrader5 constants.
         order_type_mapping (dict): A mapping of order type strings to MetaTrader5 constants.
         reverse_order_type_mapping (dict): A reverse mapping of MetaTrader5 order type constants to strings.
@@ -137,9 +143,12 @@ class Metatrader_Module_Class:
         }
         self.reverse_order_type_mapping = {value: key for key, value in self.order_type_mapping.items()}
         
+
+    async def connect_Function(self):
+        """ Opens the terminal session (main() calls it once at startup; each fetch reconnects if needed). """
         try:
-            self.initialize_mt5_Function()
-            self.login_mt5_Function()
+            await self.initialize_mt5_Function()
+            await self.login_mt5_Function()
         except Exception as e:
             print_and_logging_Function("error",f"An error happened in Metatrader: {e} \n possible reasons: \n 1- Network connection \n 2- Account expiration or login")
 
@@ -147,19 +156,17 @@ class Metatrader_Module_Class:
     def comission_offset_calculator_Function(symbol_info: object, vol: float) -> float:
         tick_size = symbol_info.trade_tick_size # type: ignore
         tick_value = symbol_info.trade_tick_value   # type: ignore
-        commission_per_lot: float = config["account_info"]["commision"]
-        commission = vol * commission_per_lot
+        commission = vol * COMMISSION_PER_LOT
         return (commission / tick_value) * tick_size
     
     @staticmethod
     def max_vol_Calculator_Function(symbol_info: object, max_price_range: float) -> float:
         tick_size = symbol_info.trade_tick_size # type: ignore
         tick_value = symbol_info.trade_tick_value   # type: ignore
-        commission_per_lot:  float = config["account_info"]["commision"]
-        max_vol = (max_price_range / tick_size ) * tick_value / commission_per_lot
+        max_vol = (max_price_range / tick_size ) * tick_value / COMMISSION_PER_LOT
         return max_vol
     
-    def Open_position_Function(self, 
+    async def Open_position_Function(self, 
                             order_type: typing.Literal["Buy", "Sell", "Buy Limit", "Sell Limit"], 
                             vol: float, 
                             price: float, 
@@ -206,7 +213,7 @@ class Metatrader_Module_Class:
         try:        
             order_type_INT = self.order_type_mapping.get(order_type, None)
             # Get number of decimal places for the asset dynamically
-            symbol_info = self.mt.symbol_info(ticker)  # type: ignore
+            symbol_info = await CBroker_Metadata.symbol_info_Function(ticker)
             if symbol_info is None:
                 print_and_logging_Function("error",f"Error: Could not retrieve symbol info for {ticker}")
                 return None
@@ -257,11 +264,13 @@ class Metatrader_Module_Class:
                 "type_time": self.mt.ORDER_TIME_GTC,
                 "type_filling": self.mt.ORDER_FILLING_FOK
             }
-            return self.mt.order_send(request) # type: ignore
+            result = await CBroker_Gateway.call_Function("order_send", request)
+            CBroker_Metadata.invalidate_Function()  # the margin (and on a fill, the balance) moved
+            return result
         except Exception as e:
             raise Exception(f"an Error occured in Opening position with {comment}: {e}")
 
-    def partial_close(self, ticket: int, ratio: float  = 1):
+    async def partial_close(self, ticket: int, ratio: float  = 1):
         """
         Partially closes an open trading position based on the specified ticket and ratio.
         This method allows you to close a portion of an open position by specifying a ratio of the total volume to close. 
@@ -290,7 +299,7 @@ class Metatrader_Module_Class:
             return False
 
         # Get open positions
-        positions = self.mt.positions_get() # type: ignore
+        positions = await CBroker_Gateway.call_Function("positions_get")
 
         if positions is None:
             print("No open positions")
@@ -307,7 +316,7 @@ class Metatrader_Module_Class:
         volume_to_close = position.volume * ratio
 
         # Ensure the volume to close is valid (mt might have minimum volume limits)
-        if volume_to_close < self.mt.symbol_info(position.symbol).volume_min: # type: ignore
+        if volume_to_close < (await CBroker_Metadata.symbol_info_Function(position.symbol)).volume_min:
             print(f"Volume to close ({volume_to_close}) is less than the minimum allowed.")
             return False
 
@@ -324,7 +333,8 @@ class Metatrader_Module_Class:
         }
 
         # Send the close order
-        result = self.mt.order_send(close_request) # type: ignore
+        result = await CBroker_Gateway.call_Function("order_send", close_request)
+        CBroker_Metadata.invalidate_Function()
 
         if result and result.retcode == self.mt.TRADE_RETCODE_DONE:
             print(f"Successfully closed {ratio*100:.1f}% of position {ticket}. Remaining volume: {position.volume - volume_to_close:.2f}")
@@ -333,7 +343,7 @@ class Metatrader_Module_Class:
             print(f"Failed to partially close position {ticket}. Error code: {result.retcode}")
             return False
 
-    def cancel_order(self, order_number):
+    async def cancel_order(self, order_number):
         """
         Cancels an existing order in the MetaTrader platform.
         This function sends a request to the MetaTrader platform to remove an order
@@ -359,21 +369,25 @@ class Metatrader_Module_Class:
             "comment": "Order Removed"
         }
         # Send order to mt
-        order_result = self.mt.order_send(request) # type: ignore
+        order_result = await CBroker_Gateway.call_Function("order_send", request)
+        CBroker_Metadata.invalidate_Function()
         return order_result
     
-    def modify_pending_order_Function(self, order_id: int, new_tp: float = 0,ticker: str = config["trading_configs"]["asset"]):
+    async def modify_pending_order_Function(self, order_id: int, new_tp: float = 0,ticker: str = config["trading_configs"]["asset"], The_order: typing.Any = None):
+        """ Moves the TP of the pending order `order_id`; `The_order` is its record when the caller already has it (a broker snapshot). """
         try:
-            orders = self.mt.orders_get(ticket=order_id) # type: ignore
-            if orders is None or len(orders) == 0:
-                raise Exception(f"Order ID {order_id} not found or not a pending order")
+            if The_order is None:
+                orders = await CBroker_Gateway.call_Function("orders_get", ticket=order_id)
+                if orders is None or len(orders) == 0:
+                    raise Exception(f"Order ID {order_id} not found or not a pending order")
+                The_order = orders[0]
 
-            order = orders[0]  # Get the pending order
+            order = The_order  # The pending order
 
             if order.type not in [self.mt.ORDER_TYPE_BUY_LIMIT, self.mt.ORDER_TYPE_SELL_LIMIT]:
                 raise Exception(f"Order ID {order_id} is not a pending order")
             
-            symbol_info = self.mt.symbol_info(ticker)  # type: ignore
+            symbol_info = await CBroker_Metadata.symbol_info_Function(ticker)
             if symbol_info is None:
                 raise Exception(f"Could not retrieve symbol info for {ticker}")
             
@@ -400,7 +414,7 @@ class Metatrader_Module_Class:
                 "type_filling": order.type_filling,
             }
 
-            result = self.mt.order_send(request) # type: ignore
+            result = await CBroker_Gateway.call_Function("order_send", request)
 
             if result.retcode != self.mt.TRADE_RETCODE_DONE and result.retcode != self.mt.TRADE_RETCODE_NO_CHANGES:
                 raise Exception(f"Failed to modify order {order_id}: Retcode={result.retcode}")
@@ -411,13 +425,13 @@ class Metatrader_Module_Class:
         except Exception as e:
             raise Exception(f"Error in modify TP of {order_id}: {e}")
 
-    def profit_calculator_Function(self, vol_pip: float, ticker: str = config["trading_configs"]["asset"]) -> tuple[float, float]:
+    async def profit_calculator_Function(self, vol_pip: float, ticker: str = config["trading_configs"]["asset"]) -> tuple[float, float]:
         try:
-            account_info = self.mt.account_info()  # type: ignore
+            account_info = await CBroker_Metadata.account_info_Function()
             if account_info is None:
                 raise ValueError("Failed to fetch account info.")
 
-            symbol_info = self.mt.symbol_info(ticker)  # type: ignore
+            symbol_info = await CBroker_Metadata.symbol_info_Function(ticker)
             if symbol_info is None:
                 raise ValueError(f"Error: Could not retrieve symbol info for {ticker}")
 
@@ -437,7 +451,7 @@ class Metatrader_Module_Class:
         except Exception as e:
             raise Exception(f"Error calculating profit for {ticker}: {e}")
     
-    def initialize_mt5_Function(self):
+    async def initialize_mt5_Function(self):
         """
         Asynchronously initializes the MetaTrader5 trading platform.
         This function attempts to initialize the MetaTrader5 platform using the `initialize` method 
@@ -454,11 +468,11 @@ class Metatrader_Module_Class:
               or failure of the initialization.
             - The `print_and_logging_Function` is used to log an error message in case of failure.
         """
-        if not self.mt.initialize(): # type: ignore
+        if not await CBroker_Gateway.call_Function("initialize"):
             print_and_logging_Function("error", "MetaTrader5 initialization failed", "title")
             raise RuntimeError("MetaTrader5 initialization failed")
 
-    def login_mt5_Function(self):
+    async def login_mt5_Function(self):
         """
         Asynchronous function to log in to MetaTrader5 using account credentials.
         This function attempts to log in to the MetaTrader5 platform using the 
@@ -474,11 +488,11 @@ class Metatrader_Module_Class:
             - Calls `print_and_logging_Function` to log an error message if the login fails.
             - Raises an exception to indicate a critical failure in the login process.
         """
-        if not self.mt.login(config["account_info"]["login"], config["account_info"]["password"], config["account_info"]["server"]): # type: ignore
+        if not await CBroker_Gateway.call_Function("login", config["account_info"]["login"], config["account_info"]["password"], config["account_info"]["server"]):
             print_and_logging_Function("error", "MetaTrader5 login failed", "title")
             raise RuntimeError("MetaTrader5 login failed")
 
-    async def fetch_data_Function(self, The_timeframe = "M15", The_Dataset: pd.DataFrame = pd.DataFrame()):
+    async def fetch_data_Function(self, The_timeframe = "M15", The_Dataset: pd.DataFrame = pd.DataFrame(), ticker: str = config["trading_configs"]["asset"]):
         """
         Asynchronously fetches market data for a specified timeframe and returns it as a pandas DataFrame.
         This function interacts with a MetaTrader instance to retrieve historical market data for a given asset
@@ -488,6 +502,7 @@ class Metatrader_Module_Class:
             The_timeframe (str, optional): The timeframe for the market data to fetch. Defaults to "M15".
                                            The timeframe should match the keys in `self.timeframe_mapping`.
             The_Dataset (pd.DataFrame, optional): A pandas DataFrame containing previously fetched data. Defaults to an empty DataFrame.
+            ticker (str, optional): The symbol to fetch. Defaults to the asset specified in the configuration file.
         Returns:
             pd.DataFrame: A pandas DataFrame containing the fetched market data. If no new data is available or an error occurs,
                           an empty DataFrame is returned.
@@ -496,7 +511,8 @@ class Metatrader_Module_Class:
         Notes:
             - The function uses `self.timeframe_mapping` to map the provided timeframe to the appropriate MetaTrader timeframe.
             - It checks the validity of the trading symbol and ensures the market is open before fetching data.
-            - If `The_Dataset` is not empty, it waits for new candles to appear before returning the updated dataset.
+            - If `The_Dataset` is not empty, it polls the forming bar every `scheduler.retry_interval` seconds until a new candle
+              appears, and gives up with an empty DataFrame after `scheduler.retry_timeout` seconds.
             - The function respects an emergency flag (`parameters.The_emergency_flag`) to terminate its execution early.
             - Logs are generated for both successful and failed operations using `print_and_logging_Function`.
         Example:
@@ -507,32 +523,41 @@ class Metatrader_Module_Class:
         
         selected_timeframe = self.timeframe_mapping.get(The_timeframe, None)
         try:
-            symbol_info = self.mt.symbol_info(config["trading_configs"]["asset"]) # type: ignore
+            symbol_info = await CBroker_Metadata.symbol_info_Function(ticker)
             if symbol_info is None or not symbol_info.trade_mode:
                 print_and_logging_Function("error", "symbol is invalid or market is close now", "description")
 
             if len(The_Dataset) != 0:
-                    print_and_logging_Function("info", f"Waiting for new {The_timeframe} candles...", "description")
+                    print_and_logging_Function("info", f"Waiting for new {ticker} {The_timeframe} candles...", "description")
 
+            # Called by the scheduler right after a bar close: only the forming bar is polled, at short intervals,
+            # until the new bar appears (or RETRY_TIMEOUT passes); then the full window is fetched once
+            The_deadline = time.monotonic() + RETRY_TIMEOUT
             while is_trading_hours_now() and (not parameters.shutdown_flag):
-                DataSet = pd.DataFrame(self.mt.copy_rates_from_pos(config["trading_configs"]["asset"],  # type: ignore
+                if len(The_Dataset) != 0:
+                    The_last_bar = await CBroker_Gateway.call_Function("copy_rates_from_pos", ticker, selected_timeframe, 0, 1)
+                    if The_last_bar is None or len(The_last_bar) == 0 or pd.to_datetime(The_last_bar["time"][-1], unit='s') == The_Dataset['time'].iloc[-1]:
+                        if time.monotonic() >= The_deadline:
+                            print_and_logging_Function("warning", f"No new {The_timeframe} candle {RETRY_TIMEOUT}s after the bar close", "description")
+                            return pd.DataFrame()
+                        await asyncio.sleep(RETRY_INTERVAL)
+                        continue
+
+                DataSet = pd.DataFrame(await CBroker_Gateway.call_Function("copy_rates_from_pos",
+                                                            ticker,
                                                             selected_timeframe, 
                                                             0, 
                                                             10000))
                 DataSet['time'] = pd.to_datetime(DataSet["time"], unit='s')
-                
-                if len(The_Dataset) == 0 or The_Dataset['time'].iloc[-1] != DataSet['time'].iloc[-1]:
-                    print_and_logging_Function("info", f"Data {The_timeframe} successfully fetched", "title")
-                    return DataSet
-                
-                await asyncio.sleep(30)
+                print_and_logging_Function("info", f"Data {The_timeframe} successfully fetched", "title")
+                return DataSet
             return pd.DataFrame()
         
         except Exception as e:
             print_and_logging_Function("error", f"Failed to fetch data: {e}", "title")
             raise RuntimeError(f"Failed to fetch data: {e}")
 
-    async def main_fetching_data_Function(self, atimeframe = 'M15', aDataset: pd.DataFrame = pd.DataFrame()) -> pd.DataFrame:
+    async def main_fetching_data_Function(self, atimeframe = 'M15', aDataset: pd.DataFrame = pd.DataFrame(), ticker: str = config["trading_configs"]["asset"]) -> pd.DataFrame:
         """
         Asynchronous function to fetch trading data for a specified timeframe.
         This function initializes the MetaTrader 5 (MT5) connection, logs in, and fetches 
@@ -543,6 +568,7 @@ class Metatrader_Module_Class:
                 Defaults to 'M15' (15-minute candles).
             aDataset (pd.DataFrame, optional): A pandas DataFrame to be used as input 
                 for fetching data. Defaults to an empty DataFrame.
+            ticker (str, optional): The symbol to fetch. Defaults to the configured asset.
         Returns:
             pd.DataFrame: A pandas DataFrame containing the fetched trading data. 
             If an error occurs, an empty DataFrame is returned.
@@ -559,10 +585,10 @@ class Metatrader_Module_Class:
                in case of an error.
         """        
         try:
-            self.initialize_mt5_Function()
-            self.login_mt5_Function()
-            print_and_logging_Function("info",  f"Fetching {atimeframe} Data...", "description")
-            The_data = await self.fetch_data_Function(atimeframe, aDataset)
+            await self.initialize_mt5_Function()
+            await self.login_mt5_Function()
+            print_and_logging_Function("info",  f"Fetching {ticker} {atimeframe} Data...", "description")
+            The_data = await self.fetch_data_Function(atimeframe, aDataset, ticker)
             if len(The_data) > 0:
                 print_and_logging_Function("info", f"10000 candles in {atimeframe} fetched from {The_data['time'][0]} to {The_data['time'][len(The_data['time']) - 1]}", "description")
             return The_data
@@ -0,0 +1,241 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import datetime
+import collections
+import typing
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from classes.DP_Parameteres import DP_Parameteres_Class
+from classes.DP_Registry import TradeInfo
+from classes.Storage import Storage_Class
+from classes.Metatrader_Module import CMetatrader_Module
+from classes.Broker_Gateway import CBroker_Gateway, CBroker_Metadata
+from classes.Position_Manager import Position_Manager_Class
+from classes.Telegrambot import CTelegramBot
+from functions.utilities import stream_name_Function
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+MAX_CONCURRENCY: int = config.get("orders", {}).get("max_concurrency", 4)  # order actions in flight at once
+LATENCY_WINDOW = 200  # pass latencies kept for the percentiles
+
+class Desired_Order_Class:
+    """ The pending order one entry of the trade list (`ML_Main_Function`) should have at the broker. """
+
+    def __init__(self, The_DP: DP_Parameteres_Class, dp_key: int, risk: float, RR: float, probability: float):
+        self.dp_key = dp_key
+        self.risk = risk
+        self.probability = probability
+        if The_DP.trade_direction == "Bullish":
+            self.order_type = "Buy Limit"
+            self.price, self.sl = The_DP.High.price, The_DP.Low.price
+            self.tp = The_DP.High.price + RR * (The_DP.High.price - The_DP.Low.price)
+        else:
+            self.order_type = "Sell Limit"
+            self.price, self.sl = The_DP.Low.price, The_DP.High.price
+            self.tp = The_DP.Low.price - RR * (The_DP.High.price - The_DP.Low.price)
+
+def desired_orders_Function(The_Do_Trade_DpList: list[tuple[DP_Parameteres_Class, typing.Union[int, None], float, float, float]]) -> dict[int, Desired_Order_Class]:
+    """ The desired order set of a trade list, keyed by DP key (entries without a key are skipped). """
+    return {The_index: Desired_Order_Class(aDP, The_index, Estimated_Risk, Estimated_RR, probability)
+            for aDP, The_index, Estimated_Risk, Estimated_RR, probability in The_Do_Trade_DpList if The_index is not None}
+
+class Broker_Snapshot_Class:
+    """ The pending orders and open positions of one symbol at the broker, keyed by ticket: read once per pass. """
+
+    def __init__(self, The_orders: typing.Optional[typing.Iterable], The_positions: typing.Optional[typing.Iterable]):
+        self.orders: dict[int, typing.Any] = {order.ticket: order for order in The_orders or ()}
+        self.positions: dict[int, typing.Any] = {position.ticket: position for position in The_positions or ()}
+
+    @classmethod
+    async def take_Function(cls, The_symbol: str) -> "Broker_Snapshot_Class":
+        orders, positions = await asyncio.gather(CBroker_Gateway.call_Function("orders_get", symbol=The_symbol),
+                                                 CBroker_Gateway.call_Function("positions_get", symbol=The_symbol))
+        return cls(orders, positions)
+
+def plan_orders_Function(The_desired: dict[int, Desired_Order_Class], The_traded: dict[int, TradeInfo],
+                         The_snapshot: Broker_Snapshot_Class) -> tuple[list[Desired_Order_Class], list[tuple[Desired_Order_Class, typing.Any]], dict[int, int]]:
+    """
+    Diffs the desired orders against the placed ones (`The_traded`, the registry) and the broker snapshot.
+    Returns:
+        tuple: The minimal actions of the pass:
+            - opens: the desired orders of DPs without an order yet.
+            - modifies: (desired order, broker order) of pending orders whose desired TP moved below the placed one.
+            - cancels: DP key -> Order_ID of pending orders whose DP left the trade list.
+        Orders already filled (or gone) at the broker are neither modified nor cancelled. Unlike the former per-DP
+        loop, a TP is compared with the broker order's own TP rather than the registry's, and the cancels come from
+        the snapshot rather than the positions stored with Result 0 (`Read_Pending_Positions_Function`).
+    """
+    opens = [The_order for dp_key, The_order in The_desired.items() if dp_key not in The_traded]
+    modifies = [(The_order, The_snapshot.orders[The_traded[dp_key]["Order_ID"]]) for dp_key, The_order in The_desired.items()
+                if dp_key in The_traded and The_traded[dp_key]["Order_ID"] in The_snapshot.orders
+                and The_order.tp < The_snapshot.orders[The_traded[dp_key]["Order_ID"]].tp]
+    cancels = {dp_key: trade_info["Order_ID"] for dp_key, trade_info in The_traded.items()
+               if dp_key not in The_desired and trade_info["Order_ID"] in The_snapshot.orders}
+    return opens, modifies, cancels
+
+class Order_Manager_Class:
+    """
+    The order-management pass of one timeframe of one symbol: one `orders_get` / `positions_get` snapshot, diffed against the
+    desired order set of the trade list (`plan_orders_Function`), then the resulting open, modify and cancel
+    actions run through the broker gateway with at most `orders.max_concurrency` in flight. The DB writes are
+    batched per action kind, and the Telegram notifications are sent once the pass is over.
+    """
+
+    def __init__(self, The_timeframe: str, The_database: Storage_Class, notify: bool = True, max_concurrency: int = MAX_CONCURRENCY,
+                 The_symbol: str = config["trading_configs"]["asset"]):
+        self.timeframe = The_timeframe
+        self.database = The_database
+        self.symbol = The_symbol
+        self.name = stream_name_Function(The_symbol, The_timeframe)
+        self.notify = notify
+        self.max_concurrency = max_concurrency
+        self.clock: typing.Callable[[], datetime.datetime] = datetime.datetime.now  # stamps the positions (a backtest sets its simulated clock)
+        self.stats = {"passes": 0, "opened": 0, "modified": 0, "cancelled": 0, "failed": 0}
+        self.recent_ms: collections.deque = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def _open_Function(self, The_order: Desired_Order_Class, positions_rows: list, notifications: list):
+        try:
+            result = await CMetatrader_Module.Open_position_Function(
+                order_type=     The_order.order_type, # type: ignore
+                vol=            await Position_Manager_Class.Vol_Calculator_RiskBased_Function(The_order.price, The_order.sl, The_order.risk, self.symbol),
+                price=          The_order.price,
+                sl=             The_order.sl,
+                tp=             The_order.tp,
+                ticker=         self.symbol,
+                comment =       f"{int(The_order.probability * 100)}% chance, {self.timeframe}",
+            )
+            if result is None:
+                return
+            if result.retcode != CMetatrader_Module.mt.TRADE_RETCODE_DONE: # type: ignore
+                self.stats["failed"] += 1
+                print_and_logging_Function("error", f"{self.name} -> Error in opening position of DP No.{The_order.dp_key}. The message \n {result}", "title")
+                return
+            if not config["runtime"]["Able_to_Open_positions"]:
+                await CMetatrader_Module.cancel_order(result.order) # type: ignore
+            # Get the correct order type from the mapping
+            order_type = CMetatrader_Module.reverse_order_type_mapping.get(result.request.type) # type: ignore
+            positions_rows.append((
+                The_order.dp_key,                        # traded_dp_id
+                str(order_type),                         # order_type
+                result.request.price,                    # price # type: ignore
+                result.request.sl,                       # sl # type: ignore
+                result.request.tp,                       # tp # type: ignore
+                self.clock(),                            # Last_modified_time
+                result.request.volume,                   # vol # type: ignore
+                result.order,                            # order_id # type: ignore
+                int(The_order.probability * 100),        # Estimated win chance
+                0                                        # The result of trade
+            )) # type: ignore
+            self.database.Traded_DP_Dict[The_order.dp_key] = {"TP": result.request.tp, "Vol": result.request.volume, "Order_ID": result.order} # type: ignore
+            print_and_logging_Function("info", f"{self.name} -> New position opened: DP {The_order.dp_key}", "description")
+            notifications.append((CTelegramBot.notify_placed_position, (self.name, order_type, result.request.price, result.request.sl, result.request.tp, result.request.volume, int(The_order.probability * 100), result.order), {})) # type: ignore
+        except Exception as e:
+            self.stats["failed"] += 1
+            print_and_logging_Function("error", f"{self.name} -> Error in opening the position of DP No. {The_order.dp_key}: {e}")
+
+    async def _modify_Function(self, The_order: Desired_Order_Class, The_broker_order: typing.Any, modifying_TP_DB: list, notifications: list):
+        try:
+            result = await CMetatrader_Module.modify_pending_order_Function(The_broker_order.ticket, The_order.tp, ticker=self.symbol, The_order=The_broker_order)
+            if result is None or result.retcode != CMetatrader_Module.mt.TRADE_RETCODE_DONE:
+                return
+            modifying_TP_DB.append((The_broker_order.ticket, float(result.request.tp)))
+            notifications.append((CTelegramBot.send_message, (), {"text": f"✏️ Take-Profit Updated\n {self.name} \n\nOrder ID: {The_broker_order.ticket}\nPrevious TP: {The_broker_order.tp}\nNew TP: {result.request.tp}\n\nThis adjustment was made based on updated system logic."}))
+        except Exception as e:
+            self.stats["failed"] += 1
+            print_and_logging_Function("error", f"{self.name} -> Error in modifying positions: {e}", "title")
+
+    async def _cancel_Function(self, dp_key: int, order_ID: int, cancelled_positions_IDs: dict, notifications: list):
+        try:
+            result = await CMetatrader_Module.cancel_order(order_ID)
+            if result.retcode != CMetatrader_Module.mt.TRADE_RETCODE_DONE: # type: ignore
+                self.stats["failed"] += 1
+                print_and_logging_Function("error", f"{self.name} -> Error in canceling {order_ID} position: {result}", "title")
+                return
+            print_and_logging_Function("info", f"{self.name} -> Cancelled order {order_ID}. No more valid position", "description")
+            cancelled_positions_IDs[dp_key] = order_ID
+            notifications.append((CTelegramBot.send_message, (), {"text": f"🚫 Order Cancelled\n {self.name} \n\nOrder ID: {order_ID}\nReason: The setup is no longer valid based on current market conditions.\n\nTrade opportunity has been dismissed to ensure risk protection."}))
+        except Exception as e:
+            self.stats["failed"] += 1
+            print_and_logging_Function("error", f"{self.name} -> Error in canceling {order_ID} position: {e}", "title")
+
+    async def _write_Function(self, positions_rows: list, modifying_TP_DB: list, cancelled_positions_IDs: dict):
+        try:
+            await self.database._insert_positions_batch(positions_rows)
+            if positions_rows:
+                print_and_logging_Function("info", f"{self.name} -> {len(positions_rows)} New positions opened and inserted in DB", "title")
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.name} -> Error in inserting position in DB: {e}", "title")
+        try:
+            await self.database.update_position_TPs_batch_Function(modifying_TP_DB)
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.name} -> Error in Updating The modified positions in DB: {e}", "title")
+        try:
+            await self.database.remove_cancelled_positions_Function(cancelled_positions_IDs)
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.name} -> Error in canceling invalid positions: {e}", "title")
+
+    @staticmethod
+    def _send_notifications_Function(notifications: list[tuple[typing.Callable, tuple, dict]]):
+        for The_function, args, kwargs in notifications:
+            try:
+                The_function(*args, **kwargs)
+            except Exception as e:
+                print_and_logging_Function("error", f"Error in sending a notification: {e}", "title")
+
+    async def run_pass_Function(self, The_Do_Trade_DpList: list[tuple[DP_Parameteres_Class, typing.Union[int, None], float, float, float]]) -> dict[str, float]:
+        """
+        Brings the orders of the timeframe to the trade list `The_Do_Trade_DpList`.
+        Returns:
+            dict[str, float]: The actions of the pass (opens, modifies, cancels) and its latency in ms (`ms`, from the
+            snapshot to the DB writes; the notifications are sent afterwards).
+        """
+        start = time.perf_counter()
+        desired = desired_orders_Function(The_Do_Trade_DpList)
+        snapshot = await Broker_Snapshot_Class.take_Function(self.symbol)
+        opens, modifies, cancels = plan_orders_Function(desired, self.database.Traded_DP_Dict, snapshot)
+
+        # One batch of account / symbol lookups for the whole pass; sizing and placing read them from the cache
+        if opens or modifies:
+            try:
+                await CBroker_Metadata.prefetch_Function([self.symbol])
+            except Exception as e:
+                print_and_logging_Function("error", f"{self.name} -> Error in prefetching the broker metadata: {e}", "title")
+
+        positions_rows: list[tuple[int, str, float, float, float, datetime.datetime, int, int, int, float]] = []
+        modifying_TP_DB: list[tuple[int, float]] = []
+        cancelled_positions_IDs: dict[int, int] = {}
+        notifications: list[tuple[typing.Callable, tuple, dict]] = []
+        The_semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(The_action: typing.Awaitable):
+            async with The_semaphore:
+                await The_action
+
+        await asyncio.gather(*[bounded(self._open_Function(The_order, positions_rows, notifications)) for The_order in opens],
+                             *[bounded(self._modify_Function(The_order, The_broker_order, modifying_TP_DB, notifications)) for The_order, The_broker_order in modifies],
+                             *[bounded(self._cancel_Function(dp_key, order_ID, cancelled_positions_IDs, notifications)) for dp_key, order_ID in cancels.items()])
+        await self._write_Function(positions_rows, modifying_TP_DB, cancelled_positions_IDs)
+        ms = (time.perf_counter() - start) * 1000
+
+        self.stats["passes"] += 1
+        self.stats["opened"] += len(positions_rows)
+        self.stats["modified"] += len(modifying_TP_DB)
+        self.stats["cancelled"] += len(cancelled_positions_IDs)
+        self.recent_ms.append(ms)
+        if self.notify and notifications:
+            await asyncio.get_running_loop().run_in_executor(None, self._send_notifications_Function, notifications)
+        return {"opens": len(opens), "modifies": len(modifies), "cancels": len(cancels), "ms": ms}
+
+    def report_Function(self) -> dict[str, float]:
+        """ The action counters of the timeframe with the p50/p95/max latency of its passes (ms). """
+        p50, p95 = np.percentile(np.fromiter(self.recent_ms, dtype=float), [50, 95]) if self.recent_ms else (0.0, 0.0)
+        return {**self.stats, "p50": float(p50), "p95": float(p95), "max_ms": max(self.recent_ms, default=0.0)}
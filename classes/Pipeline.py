@@ -0,0 +1,253 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import collections
+import contextlib
+import functools
+import typing
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.run_with_retries import run_with_retries_Function
+from functions.utilities import is_trading_hours_now, is_valid_Dataset_Function, SYMBOLS
+from classes.Candle_Feed import CCandle_Feeds
+from classes.Scheduler import wait_for_bar_close_Function
+from classes.timeframe import Timeframe_Class
+import parameters
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+QUEUE_SIZE: int = config.get("scheduler", {}).get("queue_size", 1)
+STAGES = ("fetch", "detect", "ML", "positions")
+LATENCY_WINDOW = 200  # latencies kept per stage for the percentiles
+CPU_SLOTS: int = config.get("execution", {}).get("cpu_slots", 0) or os.cpu_count() or 1  # detect / ML stages running at once, over all streams
+SLOT_POLL = 0.5  # seconds per blocking attempt on the semaphore shared by the worker processes
+
+async def wait_for_window_Function(The_timeframe: str, The_last_DataSet: pd.DataFrame) -> bool:
+    """ The first window is fetched right away, the next ones right after their bar close; False on shutdown. """
+    return len(The_last_DataSet) == 0 or await wait_for_bar_close_Function(The_timeframe)
+
+async def fetch_window_Function(The_timeframe: str, The_last_DataSet: pd.DataFrame, The_symbol: str = SYMBOLS[0]) -> typing.Optional[pd.DataFrame]:
+    """ The window following `The_last_DataSet`, from the candle feed of `The_symbol`; None (and a shutdown) when the fetch keeps failing. """
+    try:
+        return await run_with_retries_Function(CCandle_Feeds[The_symbol].window_Function, The_timeframe, The_last_DataSet)
+    except RuntimeError as The_error:
+        print_and_logging_Function("critical", f"Critical failure in fetching {The_symbol} {The_timeframe} data: {The_error}", "title")
+        parameters.request_shutdown_Function()
+        return None
+
+class Stage_Stats_Class:
+    """ Runs, latency (rolling window) and the queue in front of one pipeline stage. """
+
+    def __init__(self):
+        self.runs = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.wait_ms = 0.0  # time the processed items spent in the queue
+        self.dropped = 0  # items replaced by a newer one before the stage got to them
+        self.max_depth = 0
+        self.recent_ms: collections.deque = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def add_Function(self, ms: float, wait_ms: float):
+        self.runs += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.wait_ms += wait_ms
+        self.recent_ms.append(ms)
+
+    def summary_Function(self) -> dict[str, float]:
+        p50, p95 = np.percentile(np.fromiter(self.recent_ms, dtype=float), [50, 95]) if self.recent_ms else (0.0, 0.0)
+        return {"runs": self.runs, "avg_ms": self.total_ms / self.runs if self.runs else 0.0, "p50": float(p50),
+                "p95": float(p95), "max_ms": self.max_ms, "avg_wait_ms": self.wait_ms / self.runs if self.runs else 0.0,
+                "dropped": self.dropped, "max_depth": self.max_depth}
+
+class CPU_Slots_Class:
+    """
+    The global cap on the CPU-heavy stages (detect, ML) running at once: a semaphore over the pipelines of the event
+    loop and, in the process mode, one shared by every worker process (`bind_Function`), so thirty symbols do not
+    run a hundred detections against a few cores. A stage holds its slot from the set_data to the trade list.
+    """
+
+    def __init__(self, The_slots: int = CPU_SLOTS):
+        self.slots = The_slots
+        self.shared: typing.Any = None  # a multiprocessing semaphore of the coordinator
+        self.local: typing.Optional[asyncio.Semaphore] = None
+        self.loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"acquired": 0, "waited": 0, "wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    def bind_Function(self, The_shared: typing.Any):
+        self.shared = The_shared
+
+    async def _acquire_shared_Function(self):
+        The_loop = asyncio.get_running_loop()
+        while True:
+            The_attempt = The_loop.run_in_executor(None, self.shared.acquire, True, SLOT_POLL)
+            try:
+                if await asyncio.shield(The_attempt):
+                    return
+            except asyncio.CancelledError:
+                The_attempt.add_done_callback(lambda attempt: attempt.result() and self.shared.release())  # a slot taken after the cancel goes back
+                raise
+
+    @contextlib.asynccontextmanager
+    async def slot_Function(self):
+        if self.local is None or self.loop is not asyncio.get_running_loop():
+            self.local, self.loop = asyncio.Semaphore(self.slots), asyncio.get_running_loop()  # one per event loop (each session runs its own)
+        start = time.perf_counter()
+        async with self.local:
+            if self.shared is not None and not self.shared.acquire(False):
+                await self._acquire_shared_Function()
+            wait_ms = (time.perf_counter() - start) * 1000
+            self.stats["acquired"] += 1
+            self.stats["waited"] += wait_ms > 1
+            self.stats["wait_ms"] += wait_ms
+            self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+            try:
+                yield
+            finally:
+                if self.shared is not None:
+                    self.shared.release()
+
+CCPU_Slots = CPU_Slots_Class()
+
+class Timeframe_Pipeline_Class:
+    """
+    The trading loop of one symbol × timeframe stream as four workers linked by bounded queues, so the stages of consecutive bars
+    overlap: the next bar is fetched and detected while the previous one is still being scored, and order
+    management acts on the newest decisions.
+        fetch      wakes on the bar close (`wait_for_window_Function`), fetches the window -> detect queue
+        detect     set_data, flag detection, DP validation -> ML queue (the tradeable DPs)
+        ML         `ML_Main_Function` -> positions queue (the trade list)
+        positions  `Update_Positions_Function`
+    Each item supersedes the one before it (every DataSet holds the whole window, every trade list the whole
+    desired set), so a full queue drops its oldest item instead of stalling the stage in front of it. The detect
+    and ML stages run under a slot of `CCPU_Slots`, the cap shared by all streams.
+    The wait and fetch of the fetch stage can be replaced (the workers of the process mode read the windows the
+    coordinator publishes, see classes/Process_Mode.py).
+    """
+
+    def __init__(self, The_timeframe_instance: Timeframe_Class, The_cycle_callback: typing.Optional[typing.Callable[[str, float], None]] = None,
+                 The_wait_Function: typing.Callable[[str, pd.DataFrame], typing.Awaitable[bool]] = wait_for_window_Function,
+                 The_fetch_Function: typing.Optional[typing.Callable[[str, pd.DataFrame], typing.Awaitable[typing.Optional[pd.DataFrame]]]] = None):
+        self.timeframe_instance = The_timeframe_instance
+        self.timeframe = The_timeframe_instance.timeframe
+        self.name = The_timeframe_instance.stream
+        self.cycle_callback = The_cycle_callback  # called after each positions pass with (stream, bar-close-to-orders seconds)
+        self.wait_Function = The_wait_Function
+        self.fetch_Function = The_fetch_Function or functools.partial(fetch_window_Function, The_symbol=The_timeframe_instance.symbol)
+        self.queues: dict[str, asyncio.Queue] = {stage: asyncio.Queue(maxsize=QUEUE_SIZE) for stage in STAGES[1:]}
+        self.stats: dict[str, Stage_Stats_Class] = {stage: Stage_Stats_Class() for stage in STAGES}
+        self.last_DataSet = The_timeframe_instance.DataSet  # the last fetched window, which the detect stage may not have taken yet
+
+    def _put_latest_Function(self, The_stage: str, The_item: typing.Optional[tuple]):
+        """ Queues `The_item` (None stops the stage) for `The_stage`, dropping the oldest queued item when the queue is full. """
+        The_queue = self.queues[The_stage]
+        if The_queue.full():
+            The_queue.get_nowait()
+            self.stats[The_stage].dropped += 1
+        The_queue.put_nowait(The_item)
+        self.stats[The_stage].max_depth = max(self.stats[The_stage].max_depth, The_queue.qsize())
+
+    async def _get_Function(self, The_stage: str) -> typing.Optional[tuple]:
+        """ The next item of `The_stage` as (payload, bar start, wait ms), or None once the pipeline is stopping. """
+        The_item = await self.queues[The_stage].get()
+        if The_item is None:
+            return None
+        payload, bar_start, queued_at = The_item
+        return payload, bar_start, (time.perf_counter() - queued_at) * 1000
+
+    async def _fetch_stage_Function(self):
+        try:
+            while is_trading_hours_now() and (not parameters.shutdown_flag):
+                if not await self.wait_Function(self.timeframe, self.last_DataSet):
+                    return
+                bar_start = time.perf_counter()
+                The_Collected_DataSet = await self.fetch_Function(self.timeframe, self.last_DataSet)
+                if The_Collected_DataSet is None:
+                    return
+                self.stats["fetch"].add_Function((time.perf_counter() - bar_start) * 1000, 0.0)
+
+                if not is_valid_Dataset_Function(The_Collected_DataSet):
+                    continue
+                self.last_DataSet = The_Collected_DataSet
+                self._put_latest_Function("detect", (The_Collected_DataSet, bar_start, time.perf_counter()))
+        finally:
+            self._put_latest_Function("detect", None)
+
+    async def _detect_stage_Function(self):
+        try:
+            while (The_item := await self._get_Function("detect")) is not None:
+                The_DataSet, bar_start, wait_ms = The_item
+                async with CCPU_Slots.slot_Function():
+                    stage_start = time.perf_counter()
+                    if not self.timeframe_instance.set_data_Function(The_DataSet):
+                        continue
+                    try:
+                        await run_with_retries_Function(self.timeframe_instance.detect_flags_Function)
+                    except RuntimeError as The_error:
+                        print_and_logging_Function("critical", f"Critical failure in flag detection {self.name}: {The_error}", "title")
+                    if parameters.shutdown_flag:
+                        return
+                    try:
+                        await run_with_retries_Function(self.timeframe_instance.validate_DPs_Function)
+                    except RuntimeError as The_error:
+                        print_and_logging_Function("critical", f"Critical failure in validating DPs {self.name}: {The_error}", "title")
+                self.stats["detect"].add_Function((time.perf_counter() - stage_start) * 1000, wait_ms)
+                self._put_latest_Function("ML", (list(self.timeframe_instance.Tradeable_DPs), bar_start, time.perf_counter()))
+        finally:
+            self._put_latest_Function("ML", None)
+
+    async def _ML_stage_Function(self):
+        try:
+            while (The_item := await self._get_Function("ML")) is not None:
+                The_Tradeable_DPs, bar_start, wait_ms = The_item
+                if parameters.shutdown_flag:
+                    return
+                async with CCPU_Slots.slot_Function():
+                    stage_start = time.perf_counter()
+                    try:
+                        The_Do_Trade_DpList = await run_with_retries_Function(self.timeframe_instance.ML_Main_Function, The_Tradeable_DPs)
+                    except RuntimeError as The_error:
+                        print_and_logging_Function("critical", f"Critical failure in ML {self.name}: {The_error}", "title")
+                        continue
+                self.stats["ML"].add_Function((time.perf_counter() - stage_start) * 1000, wait_ms)
+                self._put_latest_Function("positions", (The_Do_Trade_DpList, bar_start, time.perf_counter()))
+        finally:
+            self._put_latest_Function("positions", None)
+
+    async def _positions_stage_Function(self):
+        while (The_item := await self._get_Function("positions")) is not None:
+            The_Do_Trade_DpList, bar_start, wait_ms = The_item
+            if parameters.shutdown_flag:
+                return
+            stage_start = time.perf_counter()
+            try:
+                await run_with_retries_Function(self.timeframe_instance.Update_Positions_Function, The_Do_Trade_DpList)
+            except RuntimeError as The_error:
+                print_and_logging_Function("critical", f"Critical failure in updating Positions {self.name}: {The_error}", "title")
+            self.stats["positions"].add_Function((time.perf_counter() - stage_start) * 1000, wait_ms)
+            if self.cycle_callback is not None:
+                self.cycle_callback(self.name, time.perf_counter() - bar_start)
+
+    async def run_Function(self):
+        """ Runs the four stages until the session ends or a shutdown; a stopping stage drains the ones after it. """
+        results = await asyncio.gather(self._fetch_stage_Function(), self._detect_stage_Function(),
+                                       self._ML_stage_Function(), self._positions_stage_Function(), return_exceptions=True)
+        for The_stage, The_result in zip(STAGES, results):
+            if isinstance(The_result, BaseException):
+                print_and_logging_Function("error", f"{self.name} -> Pipeline stage {The_stage} failed: {The_result}", "title")
+
+    def report_Function(self) -> dict[str, dict[str, float]]:
+        """ The latency summary of every stage, with the current depth of the queue in front of it. """
+        report = {}
+        for The_stage in STAGES:
+            report[The_stage] = self.stats[The_stage].summary_Function()
+            report[The_stage]["depth"] = self.queues[The_stage].qsize() if The_stage in self.queues else 0
+        return report
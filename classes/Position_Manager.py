@@ -6,7 +6,7 @@ import json
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from classes.Metatrader_Module import CMetatrader_Module
+from classes.Broker_Gateway import CBroker_Metadata
 
 with open("./config.json", "r") as file:
     config = json.load(file)
@@ -18,15 +18,15 @@ Max_No_Trade_Daily: int = config["trading_configs"]["risk_management"]["Max_No_T
 class Position_Manager_Class:
     
     @staticmethod
-    def Vol_Calculator_RiskBased_Function(entry_price: float, stop_loss_price: float, risk_percent: float, symbol: str) -> float:
-        account_info = CMetatrader_Module.mt.account_info() # type: ignore
+    async def Vol_Calculator_RiskBased_Function(entry_price: float, stop_loss_price: float, risk_percent: float, symbol: str) -> float:
+        account_info = await CBroker_Metadata.account_info_Function()
         if account_info is None:
             raise Exception("Failed to fetch account info.")
 
         balance = account_info.balance
         risk_amount = (risk_percent / 100) * balance
 
-        symbol_info = CMetatrader_Module.mt.symbol_info(symbol) # type: ignore
+        symbol_info = await CBroker_Metadata.symbol_info_Function(symbol)
         if symbol_info is None:
             raise Exception(f"Symbol {symbol} not found.")
 
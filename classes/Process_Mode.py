@@ -0,0 +1,288 @@
+import sys
+import os
+import json
+import time
+import types
+import asyncio
+import glob
+import itertools
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import MetaTrader5
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.utilities import is_trading_hours_now, is_valid_Dataset_Function
+from classes.timeframe import CTimeFrames
+from classes.Broker_Gateway import CBroker_Gateway, BROKER_TIMEOUT
+from classes.Candle_Cache import CANDLE_WINDOW, RATES_DTYPE
+from classes.Pipeline import Timeframe_Pipeline_Class, CCPU_Slots, CPU_SLOTS, wait_for_window_Function, fetch_window_Function
+from classes.Write_Behind import CWrite_Behind, JOURNAL_PATH
+from classes.DB_Pool import CDB_Pool
+import parameters
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+EXECUTION_CONFIG: dict = config.get("execution", {})
+EXECUTION_MODE: str = EXECUTION_CONFIG.get("mode", "async")  # "async": all streams on one event loop; "process": the streams sharded over worker processes
+WORKERS: int = EXECUTION_CONFIG.get("workers", 0)  # worker processes of the process mode; 0: one per core, at most one per stream
+HEADER_BYTES = 16  # int64 sequence (odd while a window is being written) + int64 row count
+
+class Shared_Candles_Class:
+    """
+    The candle window of one stream in `multiprocessing.shared_memory`: the coordinator publishes each fetched
+    window, the worker running the stream reads it without any pickling. A sequence number guards the reads
+    (seqlock): it is odd while a window is being written, and a read is retried if it changed meanwhile.
+    """
+
+    def __init__(self, The_stream: str, create: bool = False):
+        self.name = f"TradingBot101_{The_stream}"
+        size = HEADER_BYTES + CANDLE_WINDOW * RATES_DTYPE.itemsize
+        if create:
+            try:
+                self.memory = shared_memory.SharedMemory(self.name, create=True, size=size)
+            except FileExistsError:
+                self.memory = shared_memory.SharedMemory(self.name)  # left by a crashed run: reused
+        else:
+            self.memory = shared_memory.SharedMemory(self.name)
+        self.header = np.ndarray((2,), dtype=np.int64, buffer=self.memory.buf)
+        self.rates = np.ndarray((CANDLE_WINDOW,), dtype=RATES_DTYPE, buffer=self.memory.buf, offset=HEADER_BYTES)
+        if create:
+            self.header[:] = 0
+
+    def publish_Function(self, The_DataSet: pd.DataFrame) -> int:
+        """ Writes the last `CANDLE_WINDOW` bars of `The_DataSet` (a fetched window); returns the new sequence number. """
+        rows = min(len(The_DataSet), CANDLE_WINDOW)
+        window = The_DataSet.iloc[-rows:]
+        self.header[0] += 1
+        for field in RATES_DTYPE.names:
+            if field == "time":
+                self.rates["time"][:rows] = window["time"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+            elif field in window.columns:
+                self.rates[field][:rows] = window[field].to_numpy()
+            else:
+                self.rates[field][:rows] = 0
+        self.header[1] = rows
+        self.header[0] += 1
+        return int(self.header[0])
+
+    def read_Function(self) -> pd.DataFrame:
+        """ A copy of the published window, in the layout of `fetch_data_Function` ('time' as datetime). """
+        while True:
+            sequence = int(self.header[0])
+            if sequence % 2 == 0:
+                rates = self.rates[:int(self.header[1])].copy()
+                if int(self.header[0]) == sequence:
+                    break
+            time.sleep(0.001)
+        DataSet = pd.DataFrame(rates)
+        DataSet["time"] = pd.to_datetime(DataSet["time"], unit="s")
+        return DataSet
+
+    def close_Function(self, unlink: bool = False):
+        del self.header, self.rates  # the views must go before the mapping is closed
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+def broker_record_Function(value):
+    """ MetaTrader5 results (named tuples, nested in the order results) as picklable namespaces. """
+    if hasattr(value, "_asdict"):
+        return types.SimpleNamespace(**{key: broker_record_Function(item) for key, item in value._asdict().items()})
+    if isinstance(value, (tuple, list)):
+        return type(value)(broker_record_Function(item) for item in value)
+    return value
+
+class Broker_Proxy_Class:
+    """
+    Stands in for the `MetaTrader5` module behind the broker gateway of a worker (`CBroker_Gateway.target`): calls
+    (`order_send`, `symbol_info`, `orders_get`, ...) become order intents sent to the coordinator, which runs them
+    through its own gateway on its broker session and sends the result back.
+    """
+
+    def __init__(self, The_worker: int, The_requests: multiprocessing.Queue, The_replies: multiprocessing.Queue):
+        self._module = MetaTrader5  # only its constants are read here
+        self._worker = The_worker
+        self._requests = The_requests
+        self._replies = The_replies
+        self._ids = itertools.count()
+
+    def _call_Function(self, The_name: str, *args, **kwargs):
+        call_id = next(self._ids)
+        self._requests.put((self._worker, call_id, The_name, args, kwargs))
+        deadline = time.monotonic() + BROKER_TIMEOUT
+        while True:
+            try:
+                reply_id, ok, value = self._replies.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                raise TimeoutError(f"No reply of the coordinator to {The_name} within {BROKER_TIMEOUT}s")
+            if reply_id == call_id:
+                break  # replies of calls that timed out earlier are skipped
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._module, name)
+        if not callable(attribute):
+            return attribute
+        return lambda *args, **kwargs: self._call_Function(name, *args, **kwargs)
+
+def stream_worker_Function(The_worker: int, The_streams: list[int], The_bars: multiprocessing.Queue,
+                           The_requests: multiprocessing.Queue, The_replies: multiprocessing.Queue, The_cpu_slots):
+    """
+    Entry point of a worker process: runs the pipelines of its shard of streams (`The_streams`, indexes into
+    `CTimeFrames`) on the windows published by the coordinator (a (stream, sequence number) on `The_bars` per
+    window, (stream, None) to stop the stream), with its own DB pool and write-behind journal; the detect and ML
+    stages take their slots from `The_cpu_slots`, shared by all workers. The broker calls of the positions stages
+    go to the coordinator. The worker never opens a terminal session itself.
+    """
+    CBroker_Gateway.target = Broker_Proxy_Class(The_worker, The_requests, The_replies)
+    CCPU_Slots.bind_Function(The_cpu_slots)
+    The_candles = {CTimeFrames[The_index].stream: Shared_Candles_Class(CTimeFrames[The_index].stream) for The_index in The_streams}
+
+    def log_cycle(The_stream: str, elapsed: float):
+        if config['runtime']['develop_mode']:
+            print_and_logging_Function("info", f"{The_stream} (worker {The_worker}) -> From the window to the orders: {elapsed:.2f} seconds", "title")
+
+    async def dispatch(The_windows: dict[str, asyncio.Queue]):
+        """ Hands the published windows to the pipelines of the streams, until every stream is stopped. """
+        The_running = set(The_windows)
+        while The_running:
+            The_stream, sequence = await asyncio.get_running_loop().run_in_executor(None, The_bars.get)
+            The_windows[The_stream].put_nowait(sequence)
+            if sequence is None:
+                The_running.discard(The_stream)
+
+    def pipeline(The_index: int, The_windows: dict[str, asyncio.Queue]) -> Timeframe_Pipeline_Class:
+        The_stream = CTimeFrames[The_index].stream
+
+        async def wait_for_window(The_timeframe: str, The_last_DataSet: pd.DataFrame) -> bool:
+            return await The_windows[The_stream].get() is not None
+
+        async def read_window(The_timeframe: str, The_last_DataSet: pd.DataFrame) -> pd.DataFrame:
+            return The_candles[The_stream].read_Function()
+
+        return Timeframe_Pipeline_Class(CTimeFrames[The_index], log_cycle, wait_for_window, read_window)
+
+    async def run():
+        await CDB_Pool.initialize_Function()
+        CWrite_Behind.use_journal_Function(f"{JOURNAL_PATH}.worker{The_worker}")
+        CWrite_Behind.recover_Function()
+        await CWrite_Behind.flush_Function()
+        The_flusher = asyncio.create_task(CWrite_Behind.run_Function())
+        The_windows = {The_stream: asyncio.Queue() for The_stream in The_candles}
+        try:
+            await asyncio.gather(dispatch(The_windows), *[pipeline(The_index, The_windows).run_Function() for The_index in The_streams])
+        finally:
+            The_flusher.cancel()
+            await CWrite_Behind.flush_Function()
+            await CDB_Pool.close_Function()
+
+    try:
+        asyncio.run(run())
+    finally:
+        for The_stream_candles in The_candles.values():
+            The_stream_candles.close_Function()
+
+class Process_Coordinator_Class:
+    """
+    The process execution mode (`execution.mode` = "process"): a fixed pool of `execution.workers` processes runs
+    the CPU-bound pipelines (flag detection, DP validation, CatBoost) of the symbol × timeframe streams, sharded
+    round-robin, while this process owns the broker session, the candle feeds and the only polling. For each
+    stream it fetches the window on the bar close, publishes it in shared memory (`Shared_Candles_Class`) and wakes
+    the worker of the stream; it runs the broker calls the workers send (the order intents of their positions
+    stages). The workers share one semaphore of `execution.cpu_slots` slots for their detect and ML stages.
+    """
+
+    def __init__(self, The_streams: list[int]):
+        self.streams = The_streams  # indexes into `CTimeFrames`
+        self.context = multiprocessing.get_context("spawn")  # the only start method of Windows, where MetaTrader5 runs
+        self.worker_count = max(1, min(len(The_streams), WORKERS or os.cpu_count() or 1))
+        self.shards: list[list[int]] = [The_streams[The_worker::self.worker_count] for The_worker in range(self.worker_count)]
+        self.candles: dict[str, Shared_Candles_Class] = {}
+        self.bars: list[multiprocessing.Queue] = []
+        self.replies: list[multiprocessing.Queue] = []
+        self.requests: multiprocessing.Queue = self.context.Queue()
+        self.cpu_slots = self.context.Semaphore(CPU_SLOTS)
+        self.workers: list = []
+        self.stats = {"published": 0, "broker_calls": 0, "broker_errors": 0}
+
+    async def _adopt_journals_Function(self):
+        """ Flushes what the workers of an earlier session journaled but did not write, before the shards are dealt again. """
+        The_paths = sorted(path for path in glob.glob(f"{JOURNAL_PATH}.*") if path != CWrite_Behind.flushing_path)
+        if The_paths:
+            await CWrite_Behind.adopt_journals_Function(The_paths)
+
+    def _start_workers_Function(self):
+        for The_index in self.streams:
+            self.candles[CTimeFrames[The_index].stream] = Shared_Candles_Class(CTimeFrames[The_index].stream, create=True)
+        for The_worker, The_shard in enumerate(self.shards):
+            self.bars.append(self.context.Queue())
+            self.replies.append(self.context.Queue())
+            The_process = self.context.Process(target=stream_worker_Function, name=f"TradingBot101-worker{The_worker}", daemon=True,
+                                               args=(The_worker, The_shard, self.bars[The_worker], self.requests, self.replies[The_worker], self.cpu_slots))
+            The_process.start()
+            self.workers.append(The_process)
+
+    async def _publish_Function(self, The_worker: int, The_index: int):
+        The_timeframe_instance = CTimeFrames[The_index]
+        The_stream = The_timeframe_instance.stream
+        The_last_DataSet = pd.DataFrame()
+        try:
+            while is_trading_hours_now() and (not parameters.shutdown_flag):
+                if not await wait_for_window_Function(The_timeframe_instance.timeframe, The_last_DataSet):
+                    return
+                The_DataSet = await fetch_window_Function(The_timeframe_instance.timeframe, The_last_DataSet, The_timeframe_instance.symbol)
+                if The_DataSet is None:
+                    return
+                if not is_valid_Dataset_Function(The_DataSet):
+                    continue
+                The_last_DataSet = The_DataSet
+                self.bars[The_worker].put((The_stream, self.candles[The_stream].publish_Function(The_DataSet)))
+                self.stats["published"] += 1
+        finally:
+            self.bars[The_worker].put((The_stream, None))
+
+    async def _serve_call_Function(self, The_worker: int, call_id: int, The_name: str, args: tuple, kwargs: dict):
+        try:
+            reply = (call_id, True, broker_record_Function(await CBroker_Gateway.call_Function(The_name, *args, **kwargs)))
+        except Exception as e:
+            self.stats["broker_errors"] += 1
+            reply = (call_id, False, f"{The_name} failed in the coordinator: {e}")
+        self.replies[The_worker].put(reply)
+
+    async def _serve_broker_Function(self):
+        """ Hands the broker calls of the workers to the gateway (which orders them by priority) until all workers have exited. """
+        The_loop = asyncio.get_running_loop()
+        The_calls: set[asyncio.Task] = set()
+        while any(The_process.is_alive() for The_process in self.workers):
+            try:
+                The_request = await The_loop.run_in_executor(None, self.requests.get, True, 1.0)
+            except queue.Empty:
+                continue
+            self.stats["broker_calls"] += 1
+            The_call = asyncio.create_task(self._serve_call_Function(*The_request))
+            The_calls.add(The_call)
+            The_call.add_done_callback(The_calls.discard)
+
+    async def run_Function(self):
+        """ Runs one trading session: starts the workers, feeds them until the session ends, then waits for them. """
+        await self._adopt_journals_Function()
+        self._start_workers_Function()
+        print_and_logging_Function("info", f"Process mode: {len(self.workers)} workers started for {len(self.streams)} streams, {CPU_SLOTS} CPU slots", "title")
+        try:
+            await asyncio.gather(self._serve_broker_Function(),
+                                 *[self._publish_Function(The_worker, The_index) for The_worker, The_shard in enumerate(self.shards) for The_index in The_shard])
+        finally:
+            for The_process in self.workers:
+                await asyncio.get_running_loop().run_in_executor(None, The_process.join)
+            for The_candles in self.candles.values():
+                The_candles.close_Function(unlink=True)
+            print_and_logging_Function("info", f"Process mode: session ended, {self.stats['published']} windows published, {self.stats['broker_calls']} broker calls ({self.stats['broker_errors']} failed)", "description")
@@ -0,0 +1,201 @@
+import sys
+import os
+import re
+import json
+import time
+import bisect
+import collections
+import typing
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+SLOW_QUERY_MS: float = config.get("database", {}).get("slow_query_ms", 200)
+ROLLING_WINDOW: int = config.get("database", {}).get("query_metrics_window", 500)  # latencies kept per statement for the percentiles
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]  # upper bounds; the last bucket is "slower"
+QUERY_SAMPLES = os.path.join("./logs", "query_samples.jsonl")  # one issued statement per fingerprint, for the EXPLAIN audit
+
+def fingerprint_Function(The_query: str) -> str:
+    """
+    Normalizes a statement so all its executions share one key: literals become `?`, IN-lists of any length become
+    `IN (...)`, whitespace is collapsed and the statement is cut to 200 characters.
+    """
+    fingerprint = re.sub(r"'(?:[^'\\]|\\.)*'", "?", The_query)
+    fingerprint = re.sub(r"\b\d+(?:\.\d+)?\b", "?", fingerprint)
+    fingerprint = re.sub(r"%s", "?", fingerprint)
+    fingerprint = re.sub(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", "IN (...)", fingerprint, flags=re.IGNORECASE)
+    fingerprint = re.sub(r"\s+", " ", fingerprint).strip()
+    return fingerprint[:200]
+
+class Statement_Stats_Class:
+    """ Counters, latency histogram and rolling latency window of one (user, fingerprint). """
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.recent_ms: collections.deque = collections.deque(maxlen=ROLLING_WINDOW)
+
+    def add_Function(self, rows: int, ms: float):
+        self.calls += 1
+        self.rows += rows
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.slow += ms >= SLOW_QUERY_MS
+        self.histogram[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, ms)] += 1
+        self.recent_ms.append(ms)
+
+    def percentiles_Function(self) -> dict[str, float]:
+        if not self.recent_ms:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        p50, p95, p99 = np.percentile(np.fromiter(self.recent_ms, dtype=float), [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+class Query_Metrics_Class:
+    """
+    Process-wide per-statement metrics of the async MySQL connections, fed by `Instrumented_Cursor_Class` (every
+    connection handed out by `CDB_Pool.acquire` is instrumented). Statements are keyed by the pool user (the
+    timeframe, "write_behind", "archive", ...) and their fingerprint; a statement slower than
+    `database.slow_query_ms` is logged. The first execution of each fingerprint (statement and parameters) is
+    appended to `QUERY_SAMPLES`, so the EXPLAIN audit (functions/diagnostics.py) covers what the bot actually ran.
+    """
+
+    def __init__(self):
+        self.statements: dict[tuple[str, str], Statement_Stats_Class] = {}
+        self.samples: typing.Optional[dict[str, dict]] = None  # fingerprint -> sample, loaded on first use
+
+    def record_Function(self, The_user: str, The_query: str, rows: int, ms: float, The_args=None):
+        fingerprint = fingerprint_Function(The_query)
+        stats = self.statements.get((The_user, fingerprint))
+        if stats is None:
+            stats = self.statements[(The_user, fingerprint)] = Statement_Stats_Class()
+            self._sample_Function(The_user, fingerprint, The_query, The_args)
+        rows = rows if 0 <= rows < 2**63 else 0  # -1 (or its unsigned form) when unknown, e.g. unbuffered cursors
+        stats.add_Function(rows, ms)
+        if ms >= SLOW_QUERY_MS:
+            print_and_logging_Function("warning", f"{The_user} -> Slow query ({ms:.0f} ms, {rows} rows): {fingerprint}", "description")
+
+    def report_Function(self, The_user: typing.Optional[str] = None, top: typing.Optional[int] = None) -> list[dict]:
+        """
+        Returns:
+            list[dict]: One entry per statement (of `The_user`, or all), slowest total first: user, fingerprint,
+            calls, rows, total/avg/max ms, slow count, rolling p50/p95/p99 and the histogram (bucket upper bound in
+            ms, or "inf" -> count).
+        """
+        report = []
+        for (user, fingerprint), stats in self.statements.items():
+            if The_user is not None and user != The_user:
+                continue
+            entry = {"user": user, "fingerprint": fingerprint, "calls": stats.calls, "rows": stats.rows,
+                     "total_ms": stats.total_ms, "avg_ms": stats.total_ms / stats.calls, "max_ms": stats.max_ms,
+                     "slow": stats.slow,
+                     "histogram": dict(zip([str(bound) for bound in HISTOGRAM_BUCKETS_MS] + ["inf"], stats.histogram))}
+            entry.update(stats.percentiles_Function())
+            report.append(entry)
+        report.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return report[:top] if top else report
+
+    def samples_Function(self) -> dict[str, dict]:
+        """
+        Returns:
+            dict[str, dict]: fingerprint -> one issued statement ({"user", "fingerprint", "query", "args"}), from
+            `QUERY_SAMPLES` (every run so far) and this process.
+        """
+        if self.samples is None:
+            self.samples = {}
+            if os.path.exists(QUERY_SAMPLES):
+                with open(QUERY_SAMPLES, "r") as file:
+                    for line in file:
+                        try:
+                            sample = json.loads(line)
+                        except ValueError:
+                            continue  # a line cut short by a crash
+                        self.samples[sample["fingerprint"]] = sample
+        return self.samples
+
+    def _sample_Function(self, The_user: str, fingerprint: str, The_query: str, The_args):
+        samples = self.samples_Function()
+        if fingerprint in samples:
+            return
+        if isinstance(The_args, dict):
+            The_args = {key: value.item() if isinstance(value, np.generic) else value for key, value in The_args.items()}
+        elif The_args is not None:
+            The_args = [value.item() if isinstance(value, np.generic) else value
+                        for value in (The_args if isinstance(The_args, (list, tuple)) else [The_args])]
+        samples[fingerprint] = {"user": The_user, "fingerprint": fingerprint, "query": The_query, "args": The_args}
+        try:
+            os.makedirs(os.path.dirname(QUERY_SAMPLES), exist_ok=True)
+            with open(QUERY_SAMPLES, "a") as file:
+                file.write(json.dumps(samples[fingerprint], default=str) + "\n")
+        except OSError as e:
+            print_and_logging_Function("warning", f"{The_user} -> Couldn't keep the query sample: {e}", "description")
+
+    def reset_Function(self):
+        self.statements.clear()
+
+class Instrumented_Cursor_Class:
+    """
+    Wraps an aiomysql cursor (or its `conn.cursor()` context manager): `execute` and `executemany` are timed and
+    recorded in `CQuery_Metrics`, everything else is passed through. For server-side cursors, the latency is the
+    time to the first row and the rows are not known at execute time.
+    """
+
+    def __init__(self, The_cursor, The_user: str):
+        self._cursor = The_cursor
+        self._user = The_user
+
+    async def __aenter__(self):
+        self._cursor = await self._cursor.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._cursor.__aexit__(*exc_info)
+
+    def __await__(self):
+        async def opened():
+            self._cursor = await self._cursor
+            return self
+        return opened().__await__()
+
+    async def execute(self, query: str, args=None):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.execute(query, args)
+        finally:
+            CQuery_Metrics.record_Function(self._user, query, self._cursor.rowcount or 0, (time.perf_counter() - start) * 1000, args)
+
+    async def executemany(self, query: str, args):
+        start = time.perf_counter()
+        try:
+            return await self._cursor.executemany(query, args)
+        finally:
+            # One row of the batch is the parameter set of the statement as executed alone
+            CQuery_Metrics.record_Function(self._user, query, self._cursor.rowcount or 0, (time.perf_counter() - start) * 1000,
+                                           args[0] if args else None)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+class Instrumented_Connection_Class:
+    """ An aiomysql connection whose cursors are `Instrumented_Cursor_Class`; everything else is passed through. """
+
+    def __init__(self, The_connection, The_user: str):
+        self._connection = The_connection
+        self._user = The_user
+
+    def cursor(self, *cursor_types):
+        return Instrumented_Cursor_Class(self._connection.cursor(*cursor_types), self._user)
+
+    def __getattr__(self, name: str):
+        return getattr(self._connection, name)
+
+CQuery_Metrics = Query_Metrics_Class()
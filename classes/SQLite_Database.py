@@ -0,0 +1,435 @@
+import sys
+import os
+import json
+import time
+import datetime
+import sqlite3
+import contextlib
+import typing
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.Flag import Flag_Class
+from classes.Storage import Storage_Class, POSITION_RESULT_SQL, ML_COLUMNS, ML_COLUMN_DTYPES
+from functions.utilities import stream_symbol_Function
+from classes.Metatrader_Module import CMetatrader_Module
+from functions.logger import print_and_logging_Function
+from functions.DB_migration import PERFORMANCE_SUMMARY_TABLE, STREAM_TABLES, legacy_scope_Function
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+SQLITE_PATH: str = config.get("storage", {}).get("sqlite_path", "./backtest.sqlite")  # ":memory:" for throwaway runs
+
+# Values as MySQL would store them: DATETIME as 'YYYY-MM-DD HH:MM:SS', and NumPy scalars as plain numbers
+sqlite3.register_adapter(datetime.datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(pd.Timestamp, lambda value: value.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(np.datetime64, lambda value: pd.Timestamp(value).strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+for numpy_type in (np.int64, np.int32, np.bool_):
+    sqlite3.register_adapter(numpy_type, int)
+sqlite3.register_adapter(np.float32, float)
+sqlite3.register_converter("DATETIME", lambda value: datetime.datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATE", lambda value: datetime.date.fromisoformat(value.decode()))
+
+# The one connection of the process: every timeframe shares the file (or the in-memory database)
+sqlite_connection: typing.Optional[sqlite3.Connection] = None
+
+def sqlite_connection_Function() -> sqlite3.Connection:
+    global sqlite_connection
+    if sqlite_connection is None:
+        if SQLITE_PATH != ":memory:":
+            os.makedirs(os.path.dirname(SQLITE_PATH) or ".", exist_ok=True)
+        # Transactions are explicit (BEGIN ... COMMIT in `_transaction_Function`)
+        sqlite_connection = sqlite3.connect(SQLITE_PATH, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None)
+        if SQLITE_PATH != ":memory:":
+            sqlite_connection.execute("PRAGMA journal_mode = WAL")
+            sqlite_connection.execute("PRAGMA synchronous = NORMAL")
+    return sqlite_connection
+
+def sqlite_tables_statements_Function(The_timeframe: str) -> list[str]:
+    """ The tables and indexes of `baseline_tables_statements_Function` and of the MySQL migrations, in SQLite types. """
+    flag_points = f"Flag_Points_{The_timeframe}"
+    important_dps = f"Important_DPs_{The_timeframe}"
+    flags = f"Flags_{The_timeframe}"
+    positions = f"Positions_{The_timeframe}"
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {flag_points} (
+            id INTEGER PRIMARY KEY,
+            readable_id TEXT NULL,
+            price REAL NULL,
+            time DATETIME NULL
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {important_dps} (
+            id INTEGER PRIMARY KEY,
+            readable_id TEXT NULL,
+            type TEXT NULL CHECK (type IN ('FTC', 'EL', 'MPL')),
+            High_Point INTEGER NULL,
+            Low_Point INTEGER NULL,
+            weight REAL NULL,
+            first_valid_trade_time DATETIME NOT NULL,
+            trade_direction TEXT NULL CHECK (trade_direction IN ('Bullish', 'Bearish', 'Undefined')),
+            length REAL NULL,
+            Flag_Ratio REAL NULL,
+            NO_Used_Candles INTEGER NULL,
+            Used_Ratio REAL NULL,
+            Related_DP_1 INTEGER NULL,
+            Related_DP_2 INTEGER NULL,
+            Is_related_DP_used INTEGER DEFAULT 0,
+            Is_golfed INTEGER DEFAULT 0,
+            Is_used_half INTEGER DEFAULT 0,
+            parent_length INTEGER NULL,
+            Result REAL NOT NULL DEFAULT 0
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {flags} (
+            Unique_Point DATETIME NOT NULL PRIMARY KEY,
+            type TEXT NOT NULL CHECK (type IN ('Bullish', 'Bearish', 'Undefined')),
+            High INTEGER NOT NULL,
+            Low INTEGER NOT NULL,
+            Starting_time DATETIME NOT NULL,
+            Ending_time DATETIME NOT NULL,
+            FTC INTEGER NULL,
+            EL INTEGER NULL,
+            MPL INTEGER NULL
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {positions} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Traded_DP INTEGER NULL,
+            Order_type TEXT NOT NULL CHECK (Order_type IN ('Buy', 'Sell', 'Buy Limit', 'Sell Limit')),
+            Price REAL NOT NULL,
+            SL REAL NOT NULL,
+            TP REAL NOT NULL,
+            Last_modified_time DATETIME NOT NULL,
+            Vol REAL NOT NULL,
+            Order_ID INTEGER NOT NULL UNIQUE,
+            Probability INTEGER NOT NULL,
+            Result REAL NOT NULL DEFAULT 0
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {PERFORMANCE_SUMMARY_TABLE} (
+            timeframe TEXT NOT NULL,
+            day DATE NOT NULL,
+            pnl_vol REAL NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            trades INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (timeframe, day)
+        )
+        """,
+        # Index names are global in SQLite, hence the timeframe suffix
+        f"CREATE INDEX IF NOT EXISTS idx_weight_{The_timeframe} ON {important_dps} (weight)",
+        f"CREATE INDEX IF NOT EXISTS idx_result_{The_timeframe} ON {important_dps} (Result)",
+        f"CREATE INDEX IF NOT EXISTS idx_traded_dp_{The_timeframe} ON {positions} (Traded_DP)",
+        f"CREATE INDEX IF NOT EXISTS idx_position_result_{The_timeframe} ON {positions} (Result)",
+        f"CREATE INDEX IF NOT EXISTS idx_last_modified_{The_timeframe} ON {positions} (Last_modified_time)",
+    ]
+
+class SQLite_Database_Class(Storage_Class):
+    """
+    Embedded `Storage_Class` backend: the same tables, Result propagation and batch APIs as `Database_Class`, in one
+    SQLite file (`storage.sqlite_path`, ":memory:" for an in-memory database) shared by every timeframe, with zero
+    network round trips. Meant for backtests, benchmarks and offline runs; the live bot keeps MySQL.
+    Differences with the MySQL backend:
+    - Writes are applied right away, one transaction per batch (no write-behind buffer: there is no round trip to save).
+    - The Flags table is not partitioned and nothing is archived.
+    - The set-based reconcile uses `UPDATE ... FROM`, which needs SQLite 3.33 or later.
+    """
+
+    def __init__(self, The_timeframe: str):
+        super().__init__(The_timeframe)
+        self.connection = sqlite_connection_Function()
+        try:
+            self._initialize_tables_Function()
+            print_and_logging_Function("info", f"{self.TimeFrame} -> SQLite storage ready ({SQLITE_PATH})", "title")
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Couldn't initialize SQLite storage: {e}", "title")
+
+    def _initialize_tables_Function(self):
+        cursor = self.connection.cursor()
+        The_legacy = legacy_scope_Function(self.TimeFrame)
+        if The_legacy is not None:
+            self._qualify_legacy_tables_Function(cursor, The_legacy)
+        for statement in sqlite_tables_statements_Function(self.TimeFrame):
+            cursor.execute(statement)
+
+    def _qualify_legacy_tables_Function(self, cursor: sqlite3.Cursor, The_legacy: str):
+        """ `qualify_legacy_scope_Function` for SQLite: the timeframe-only tables (and summary rows) of the stream are renamed. """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        existing = {row[0] for row in cursor.fetchall()}
+        if f"Important_DPs_{self.TimeFrame}" in existing:
+            return
+        for table in STREAM_TABLES:
+            if f"{table}_{The_legacy}" in existing:
+                cursor.execute(f"ALTER TABLE {table}_{The_legacy} RENAME TO {table}_{self.TimeFrame}")
+        for index in ("weight", "result", "traded_dp", "position_result", "last_modified"):
+            cursor.execute(f"DROP INDEX IF EXISTS idx_{index}_{The_legacy}")  # created again under the stream name
+        if PERFORMANCE_SUMMARY_TABLE in existing:
+            cursor.execute(f"UPDATE {PERFORMANCE_SUMMARY_TABLE} SET timeframe = ? WHERE timeframe = ?", (self.TimeFrame, The_legacy))
+
+    @contextlib.contextmanager
+    def _transaction_Function(self) -> typing.Iterator[sqlite3.Cursor]:
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN")
+        try:
+            yield cursor
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def reconcile_results_query_Function(positions_table: str, important_dps_table: str, where_clause: str = "TRUE") -> str:
+        """ `Database_Class.reconcile_results_query_Function` in SQLite syntax (aliases: p = positions, d = DPs). """
+        return f"""
+            UPDATE {positions_table} AS p
+            SET Result = {POSITION_RESULT_SQL}
+            FROM {important_dps_table} AS d
+            WHERE p.Traded_DP = d.id AND ({where_clause})
+        """
+
+    def performance_summary_SQL_Function(self, where_clause: str = "TRUE") -> str:
+        """ `functions.DB_migration.performance_summary_SQL_Function` in SQLite syntax. """
+        return f"""
+            INSERT INTO {PERFORMANCE_SUMMARY_TABLE} (timeframe, day, pnl_vol, wins, trades)
+            SELECT '{self.TimeFrame}', DATE(Last_modified_time), COALESCE(SUM(Result * Vol), 0),
+                SUM(CASE WHEN Result > 0 THEN 1 ELSE 0 END), SUM(CASE WHEN Result != 0 THEN 1 ELSE 0 END)
+            FROM {self.Positions_table_name}
+            WHERE {where_clause}
+            GROUP BY DATE(Last_modified_time)
+            ON CONFLICT (timeframe, day) DO UPDATE SET pnl_vol = excluded.pnl_vol, wins = excluded.wins, trades = excluded.trades
+        """
+
+    def _refresh_positions_Function(self, cursor: sqlite3.Cursor, dp_keys: list, order_ids: list, affected_days: typing.Optional[set] = None):
+        """
+        Reconciles the Results of the positions of `dp_keys` / `order_ids` and recomputes the `Performance_Summary`
+        rows of their days (plus `affected_days`), as `Database_Class._apply_writes_Function` does after a flush.
+        """
+        affected_days = set(affected_days or ())
+        conditions = []
+        if dp_keys:
+            conditions.append(f"p.Traded_DP IN ({','.join(['?'] * len(dp_keys))})")
+        if order_ids:
+            conditions.append(f"p.Order_ID IN ({','.join(['?'] * len(order_ids))})")
+        if conditions:
+            cursor.execute(self.reconcile_results_query_Function(self.Positions_table_name, self.important_dps_table_name, " OR ".join(conditions)),
+                           list(dp_keys) + list(order_ids))
+            cursor.execute(f"SELECT DISTINCT DATE(p.Last_modified_time) FROM {self.Positions_table_name} AS p WHERE {' OR '.join(conditions)}",
+                           list(dp_keys) + list(order_ids))
+            affected_days.update(row[0] for row in cursor.fetchall())
+
+        if affected_days:
+            days = sorted(affected_days)
+            cursor.execute(f"DELETE FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = ? AND day IN ({','.join(['?'] * len(days))})",
+                           [self.TimeFrame] + days)
+            day_ranges = " OR ".join(["(Last_modified_time >= ? AND Last_modified_time < DATE(?, '+1 day'))"] * len(days))
+            cursor.execute(self.performance_summary_SQL_Function(day_ranges), [d for day in days for d in (day, day)])
+
+    async def initialize_db_pool_Function(self):
+        """ Nothing to open: the connection is opened with the first instance and shared by every timeframe. """
+        return
+
+    async def save_flags_Function(self, flag_list: list[Flag_Class]):
+        flag_values, Important_DPs_values, flag_point_values, new_DPs = self._flag_rows_Function(flag_list)
+        try:
+            with self._transaction_Function() as cursor:
+                cursor.executemany(f"""
+                    INSERT OR IGNORE INTO {self.flags_table_name}
+                    (Unique_Point, type, High, Low, Starting_time, Ending_time, FTC, EL, MPL)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", flag_values)
+                self.detected_flags = max(cursor.rowcount, 0)
+                cursor.executemany(f"""
+                    INSERT OR IGNORE INTO {self.important_dps_table_name}
+                    (id, readable_id, type, High_Point, Low_Point, weight, first_valid_trade_time, trade_direction, length,
+                    Flag_Ratio, NO_Used_Candles, Used_Ratio, Related_DP_1, Related_DP_2, Is_related_DP_used,
+                    Is_golfed, Is_used_half, parent_length)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", Important_DPs_values)
+                cursor.executemany(f"""
+                    INSERT OR IGNORE INTO {self.flag_points_table_name}
+                    (id, readable_id, price, time)
+                    VALUES (?, ?, ?, ?)""", flag_point_values)
+            for aDP in new_DPs:
+                self.Registry.add_DP_Function(aDP)
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Error batch saving flags: {e}", "title")
+
+    async def _update_dp_weights_Function(self, dps_to_update: list):
+        try:
+            with self._transaction_Function() as cursor:
+                cursor.executemany(f"UPDATE {self.important_dps_table_name} SET weight = ? WHERE id = ?",
+                                   [(weight, dp_id) for dp_id, weight in dps_to_update])
+                self._refresh_positions_Function(cursor, [dp_id for dp_id, _ in dps_to_update], [])
+            self.Registry.update_weights_Function(dps_to_update)
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in batch updating DP weights: {e}", "title")
+
+    async def _update_dp_Results_Function(self, dps_to_update: list):
+        try:
+            with self._transaction_Function() as cursor:
+                cursor.executemany(f"UPDATE {self.important_dps_table_name} SET Result = ? WHERE id = ?",
+                                   [(Result, dp_id) for dp_id, Result in dps_to_update])
+                self._refresh_positions_Function(cursor, [dp_id for dp_id, _ in dps_to_update], [])
+            self.Registry.update_results_Function(dps_to_update)
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in batch updating DP Results: {e}", "title")
+
+    @staticmethod
+    def _columns_Function(cursor: sqlite3.Cursor, dtypes: typing.Optional[dict[str, typing.Any]] = None) -> dict[str, np.ndarray]:
+        """ The rows of the last SELECT of `cursor` as one array per column (`object` unless listed in `dtypes`). """
+        dtypes = dtypes or {}
+        names = [desc[0] for desc in cursor.description]
+        rows = cursor.fetchall()
+        if not rows:
+            return {name: np.empty(0, dtype=dtypes.get(name, object)) for name in names}
+        return {name: np.array(values, dtype=dtypes.get(name, object)) for name, values in zip(names, zip(*rows))}
+
+    async def sync_registry_Function(self):
+        start = time.perf_counter()
+        cursor = self.connection.cursor()
+        cursor.execute(self._hydration_query_Function("d.weight > 0"))
+        columns = self._columns_Function(cursor)
+        cursor.execute(f"SELECT id, Result FROM {self.important_dps_table_name}")
+        dp_results = cursor.fetchall()
+        cursor.execute(f"SELECT Traded_DP, Order_ID FROM {self.Positions_table_name} WHERE Result = 0")
+        pending_positions = {row[0]: row[1] for row in cursor.fetchall()}
+        self.DB_loop_stats["round_trips"] += 3
+        self.DB_loop_stats["ms"] += (time.perf_counter() - start) * 1000
+        self.DB_loop_stats["query_ms"] += (time.perf_counter() - start) * 1000
+
+        self._load_registry_Function(columns if len(columns["id"]) else {}, dp_results, pending_positions)
+
+    async def _insert_positions_batch(self, positions: list[tuple[int, str, float, float, float, datetime.datetime, int, int, int, float]]):
+        if not positions:
+            return
+
+        try:
+            with self._transaction_Function() as cursor:
+                traded_dps = [pos[0] for pos in positions]
+                cursor.execute(f"SELECT Traded_DP, Order_ID FROM {self.Positions_table_name} WHERE Traded_DP IN ({','.join(['?'] * len(traded_dps))})",
+                               traded_dps)
+                existing: dict[int, int] = {row[0]: row[1] for row in cursor.fetchall()}
+                new_positions = [pos for pos in positions if pos[0] not in existing]
+                if new_positions:
+                    cursor.executemany(f"""
+                        INSERT INTO {self.Positions_table_name}
+                        (Traded_DP, Order_type, Price, SL, TP, Last_modified_time, Vol, Order_ID, Probability, Result)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", new_positions)
+                    self._refresh_positions_Function(cursor, [pos[0] for pos in new_positions], [])
+            self.Registry.add_positions_Function(new_positions)
+
+            # Raise error if duplicates found and cancel duplicated positions !
+            if existing:
+                for anOrder_ID in existing.values():
+                    await CMetatrader_Module.cancel_order(anOrder_ID)
+                raise ValueError(f"Duplicate Traded_DP(s) already exist in DB: {', '.join(str(k) for k in existing)}")
+
+        except Exception as e:
+            raise Exception(f"Error inserting batch positions: {e}")
+
+    async def Read_ML_table_Function(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT {', '.join(ML_COLUMNS)} FROM {self.important_dps_table_name} WHERE Result != 0")
+            return self._ML_dataset_Function(pd.DataFrame(self._columns_Function(cursor, ML_COLUMN_DTYPES)))
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in fetching ML Dataset: {e}", "title")
+            return pd.DataFrame(), pd.DataFrame()
+
+    async def remove_cancelled_positions_Function(self, cancelled_list_dict: dict[int, int]):
+        try:
+            self.Registry.remove_positions_Function(cancelled_list_dict)  # Safe removal
+
+            if cancelled_list_dict:
+                order_ids = list(cancelled_list_dict.values())
+                in_list = ','.join(['?'] * len(order_ids))
+                with self._transaction_Function() as cursor:
+                    cursor.execute(f"SELECT DISTINCT DATE(Last_modified_time) FROM {self.Positions_table_name} WHERE Order_ID IN ({in_list})", order_ids)
+                    affected_days = {row[0] for row in cursor.fetchall()}
+                    cursor.execute(f"DELETE FROM {self.Positions_table_name} WHERE Order_ID IN ({in_list})", order_ids)
+                    self._refresh_positions_Function(cursor, [], [], affected_days)
+                print_and_logging_Function("info", f"{self.TimeFrame} -> Removed {order_ids} cancelled positions from DB and memory.", "description")
+        except Exception as e:
+            raise Exception(f"Error in removing the cancelled positions from DB: {e}")
+
+    async def correct_position_results_Function(self, full: bool = False):
+        """
+        Position Results are reconciled with every write, so there is nothing to do unless `full=True`, which
+        recomputes every position and the whole `Performance_Summary` of the timeframe.
+        """
+        if not full:
+            return
+        try:
+            with self._transaction_Function() as cursor:
+                cursor.execute(self.reconcile_results_query_Function(self.Positions_table_name, self.important_dps_table_name))
+                cursor.execute(f"DELETE FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = ?", (self.TimeFrame,))
+                cursor.execute(self.performance_summary_SQL_Function())
+        except Exception as e:
+            raise Exception(f"Error correcting Results in Positions table: {e}")
+
+    async def PNL_Calculator_Function(self, start_day: typing.Optional[datetime.date] = None, end_day: typing.Optional[datetime.date] = None) -> tuple[float, float]:
+        try:
+            day_range, params = self._day_range_SQL_Function(start_day, end_day)
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT SUM(pnl_vol) FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = ?{day_range.replace('%s', '?')}",
+                           [self.TimeFrame] + params)
+            result = cursor.fetchone()
+            total_vol_pip = result[0] if result and result[0] is not None else 0.0
+            return await CMetatrader_Module.profit_calculator_Function(total_vol_pip, stream_symbol_Function(self.TimeFrame))
+        except Exception as e:
+            raise Exception(f"Error calculating the PNL of {self.Positions_table_name}: {e}")
+
+    async def winrate_Calculator_Function(self, start_day: typing.Optional[datetime.date] = None, end_day: typing.Optional[datetime.date] = None) -> tuple[float, int]:
+        try:
+            day_range, params = self._day_range_SQL_Function(start_day, end_day)
+            cursor = self.connection.cursor()
+            cursor.execute(f"""
+                SELECT SUM(wins) * 1.0 / NULLIF(SUM(trades), 0) AS winrate, SUM(trades) AS trade_count
+                FROM {PERFORMANCE_SUMMARY_TABLE}
+                WHERE timeframe = ?{day_range.replace('%s', '?')}
+            """, [self.TimeFrame] + params)
+            result = cursor.fetchone()
+            winrate = float(result[0]) if result and result[0] is not None else 0.0
+            trade_count = int(result[1]) if result and result[1] is not None else 0
+            return winrate, trade_count
+        except Exception as e:
+            raise Exception(f"Error calculating the winrate of {self.Positions_table_name}: {e}")
+
+    @staticmethod
+    async def performance_report_Function(timeframes: typing.Optional[list[str]] = None,
+                                          start_day: typing.Optional[datetime.date] = None,
+                                          end_day: typing.Optional[datetime.date] = None) -> dict[str, dict]:
+        """ `Database_Class.performance_report_Function` on the SQLite file (SQLite has no `WITH ROLLUP`). """
+        day_range, params = Storage_Class._day_range_SQL_Function(start_day, end_day)
+        if timeframes:
+            day_range += f" AND timeframe IN ({','.join(['%s'] * len(timeframes))})"
+            params += timeframes
+        day_range = day_range.replace('%s', '?')
+        cursor = sqlite_connection_Function().cursor()
+        cursor.execute(f"""
+            SELECT timeframe, SUM(pnl_vol), SUM(wins), SUM(trades) FROM {PERFORMANCE_SUMMARY_TABLE} WHERE TRUE{day_range} GROUP BY timeframe
+            UNION ALL
+            SELECT NULL, SUM(pnl_vol), SUM(wins), SUM(trades) FROM {PERFORMANCE_SUMMARY_TABLE} WHERE TRUE{day_range}
+        """, params + params)
+        return await Storage_Class._report_from_rows_Function(cursor.fetchall())
+
+    async def update_position_TPs_batch_Function(self, modifying_TP_DB: list[tuple[int, float]]) -> None:
+        if not modifying_TP_DB:
+            return  # Nothing to update
+
+        try:
+            with self._transaction_Function() as cursor:
+                cursor.executemany(f"UPDATE {self.Positions_table_name} SET TP = ? WHERE Order_ID = ?",
+                                   [(tp, order_id) for order_id, tp in modifying_TP_DB])
+                self._refresh_positions_Function(cursor, [], [order_id for order_id, _ in modifying_TP_DB])
+            self.Registry.update_TPs_Function(modifying_TP_DB)
+        except Exception as e:
+            raise Exception(f"Error updating TP values in batch: {e}")
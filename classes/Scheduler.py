@@ -0,0 +1,73 @@
+import sys
+import os
+import json
+import asyncio
+import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.utilities import next_session_open_Function
+import parameters
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+SCHEDULER_CONFIG: dict = config.get("scheduler", {})
+GRACE_SECONDS: float = SCHEDULER_CONFIG.get("grace_seconds", 2)  # the terminal needs a moment to publish a closed bar
+RETRY_INTERVAL: float = SCHEDULER_CONFIG.get("retry_interval", 1)
+RETRY_TIMEOUT: float = SCHEDULER_CONFIG.get("retry_timeout", 30)
+SERVER_UTC_OFFSET = datetime.timedelta(hours=SCHEDULER_CONFIG.get("server_utc_offset_hours", 0))  # bars of H2 and above are aligned on the broker's clock
+
+BAR_SECONDS: dict[str, int] = {
+    "M1": 60, "M2": 120, "M3": 180, "M4": 240, "M5": 300, "M6": 360, "M10": 600, "M12": 720, "M15": 900,
+    "M20": 1200, "M30": 1800, "H1": 3600, "H2": 7200, "H3": 10800, "H4": 14400, "H6": 21600, "H8": 28800,
+    "H12": 43200, "D1": 86400, "W1": 604800,
+}
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+FIRST_MONDAY = datetime.datetime(1970, 1, 5, tzinfo=datetime.timezone.utc)  # W1 bars open on Monday
+
+def next_bar_close_Function(The_timeframe: str, now: datetime.datetime) -> datetime.datetime:
+    """
+    The close (UTC) of the bar of `The_timeframe` forming at `now`: bars are aligned on multiples of their duration
+    since the epoch (W1 on Mondays, MN1 on the first of the month) in the broker's time.
+    """
+    server_now = now.astimezone(datetime.timezone.utc) + SERVER_UTC_OFFSET
+    if The_timeframe == "MN1":
+        close = datetime.datetime(server_now.year + server_now.month // 12, server_now.month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+    else:
+        The_origin = FIRST_MONDAY if The_timeframe == "W1" else EPOCH
+        bar_seconds = BAR_SECONDS[The_timeframe]
+        elapsed = (server_now - The_origin).total_seconds()
+        close = The_origin + datetime.timedelta(seconds=(elapsed // bar_seconds + 1) * bar_seconds)
+    return close - SERVER_UTC_OFFSET
+
+async def sleep_until_Function(The_deadline: datetime.datetime) -> bool:
+    """
+    Sleeps until `The_deadline` (UTC) in one wait on the shutdown event of the loop, so it wakes at the deadline
+    or right away on `parameters.request_shutdown_Function`, and never in between.
+    Returns:
+        bool: False when the sleep was cut short by a shutdown.
+    """
+    if parameters.shutdown_flag:
+        return False
+    remaining = (The_deadline - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    if remaining <= 0:
+        return True
+    try:
+        await asyncio.wait_for(parameters.shutdown_event_Function().wait(), timeout=remaining)
+    except asyncio.TimeoutError:
+        return not parameters.shutdown_flag
+    return False
+
+async def wait_for_bar_close_Function(The_timeframe: str) -> bool:
+    """ Sleeps until `GRACE_SECONDS` after the close of the forming bar of `The_timeframe`; False on shutdown. """
+    return await sleep_until_Function(next_bar_close_Function(The_timeframe, datetime.datetime.now(datetime.timezone.utc))
+                                      + datetime.timedelta(seconds=GRACE_SECONDS))
+
+async def sleep_until_session_open_Function() -> bool:
+    """ Sleeps until the next trading-session open in one stretch instead of polling the trading hours; False on shutdown. """
+    The_open = next_session_open_Function(datetime.datetime.now(datetime.timezone.utc))
+    print_and_logging_Function("info", f"Next trading session opens at {The_open:%Y-%m-%d %H:%M} UTC", "description")
+    return await sleep_until_Function(The_open)
@@ -0,0 +1,176 @@
+import sys
+import os
+import json
+import time
+import types
+import itertools
+import typing
+import MetaTrader5
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+REQUEST_DEFAULTS = {"action": 0, "magic": 0, "order": 0, "symbol": "", "volume": 0.0, "price": 0.0, "stoplimit": 0.0,
+                    "sl": 0.0, "tp": 0.0, "deviation": 0, "type": 0, "type_filling": 0, "type_time": 0,
+                    "expiration": 0, "comment": "", "position": 0, "position_by": 0}
+
+class Simulated_Broker_Class:
+    """
+    An in-memory stand-in for the `MetaTrader5` module behind the broker gateway (`CBroker_Gateway.target`), for
+    benchmarks and backtests: pending orders and positions live in dicts, `order_send` places, modifies, removes
+    and closes them, and the records it hands out have the fields of the terminal's (as namespaces). Every call
+    sleeps `call_latency_ms` to stand for the terminal round trip. Constants are read from the real module.
+    A backtest moves it bar by bar with `advance_Function`: limit orders fill, positions hit their SL or TP, and the
+    balance follows. Every fill and close is kept in `deals`. `time` is the simulated clock (seconds, 0 = the wall clock).
+    """
+
+    def __init__(self, The_symbol: str = config["trading_configs"]["asset"], balance: float = 10_000.0, call_latency_ms: float = 0.0,
+                 commission_per_lot: float = 0.0):
+        self._module = MetaTrader5
+        self.symbol = The_symbol
+        self.balance = balance
+        self.call_latency_ms = call_latency_ms
+        self.commission_per_lot = commission_per_lot  # charged when a position closes
+        self.time = 0
+        self.last_price: typing.Optional[float] = None  # the close of the last bar of `advance_Function`
+        self.tickets = itertools.count(1)
+        self.orders: dict[int, types.SimpleNamespace] = {}
+        self.positions: dict[int, types.SimpleNamespace] = {}
+        self.deals: list[dict] = []
+        self.symbol_record = types.SimpleNamespace(name=The_symbol, digits=5, point=0.00001, trade_tick_size=0.00001,
+                                                   trade_tick_value=1.0, trade_contract_size=100_000.0,
+                                                   volume_min=0.01, volume_max=100.0, volume_step=0.01, spread=0)
+
+    def __getattr__(self, name: str):
+        return getattr(self._module, name)  # the ORDER_*, TRADE_* ... constants
+
+    def _profit_Function(self, position: types.SimpleNamespace, price: float) -> float:
+        """ Profit of `position` closed at `price`, in the account currency (commission not included). """
+        direction = 1.0 if position.type == self.ORDER_TYPE_BUY else -1.0
+        return direction * (price - position.price_open) / self.symbol_record.trade_tick_size * self.symbol_record.trade_tick_value * position.volume
+
+    def equity_Function(self) -> float:
+        """ Balance plus the floating profit of the open positions at `last_price`. """
+        if self.last_price is None:
+            return self.balance
+        return self.balance + sum(self._profit_Function(position, self.last_price) for position in self.positions.values())
+
+    def _deal_Function(self, The_time: int, position: types.SimpleNamespace, entry: str, price: float, volume: float, reason: str, profit: float = 0.0):
+        self.deals.append({"time": The_time, "ticket": position.ticket, "symbol": position.symbol,
+                           "type": "Buy" if position.type == self.ORDER_TYPE_BUY else "Sell", "entry": entry, "reason": reason,
+                           "price": price, "volume": volume, "sl": position.sl, "tp": position.tp, "profit": profit, "balance": self.balance})
+
+    def _close_Function(self, The_time: int, position: types.SimpleNamespace, price: float, volume: float, reason: str):
+        profit = self._profit_Function(position, price) * volume / position.volume - self.commission_per_lot * volume
+        self.balance += profit
+        position.volume = round(position.volume - volume, 8)
+        if position.volume <= 0:
+            self.positions.pop(position.ticket)
+        self._deal_Function(The_time, position, "out", price, volume, reason, profit)
+
+    def advance_Function(self, The_time: int, The_open: float, The_high: float, The_low: float, The_close: float) -> int:
+        """
+        Plays one bar (`The_time`, its start in seconds) on the pending orders and open positions. A Buy Limit fills
+        once the low reaches its price, a Sell Limit once the high does, at the open if the bar gaps through it.
+        A position closes at its SL or TP (at the open on a gap); the order of the prices inside a bar is unknown,
+        so the SL is assumed to come first when the bar reaches both. Returns the number of deals of the bar.
+        """
+        deals = len(self.deals)
+        for order in list(self.orders.values()):
+            if order.type == self.ORDER_TYPE_BUY_LIMIT and The_low <= order.price_open:
+                The_type, price = self.ORDER_TYPE_BUY, min(The_open, order.price_open)
+            elif order.type == self.ORDER_TYPE_SELL_LIMIT and The_high >= order.price_open:
+                The_type, price = self.ORDER_TYPE_SELL, max(The_open, order.price_open)
+            else:
+                continue
+            self.orders.pop(order.ticket)
+            position = types.SimpleNamespace(ticket=order.ticket, symbol=order.symbol, type=The_type, volume=order.volume_current,
+                                             price_open=price, sl=order.sl, tp=order.tp, magic=order.magic,
+                                             comment=order.comment, time=The_time)
+            self.positions[position.ticket] = position
+            self._deal_Function(The_time, position, "in", price, position.volume, "fill")
+
+        for position in list(self.positions.values()):
+            filled_now = position.time == The_time  # filled inside this bar: no gap through its levels
+            if position.type == self.ORDER_TYPE_BUY:
+                if position.sl and The_low <= position.sl:
+                    self._close_Function(The_time, position, position.sl if filled_now else min(The_open, position.sl), position.volume, "sl")
+                elif position.tp and The_high >= position.tp:
+                    self._close_Function(The_time, position, position.tp if filled_now else max(The_open, position.tp), position.volume, "tp")
+            else:
+                if position.sl and The_high >= position.sl:
+                    self._close_Function(The_time, position, position.sl if filled_now else max(The_open, position.sl), position.volume, "sl")
+                elif position.tp and The_low <= position.tp:
+                    self._close_Function(The_time, position, position.tp if filled_now else min(The_open, position.tp), position.volume, "tp")
+        self.last_price = The_close
+        return len(self.deals) - deals
+
+    def _round_trip_Function(self):
+        if self.call_latency_ms:
+            time.sleep(self.call_latency_ms / 1000)
+
+    def _result_Function(self, retcode: int, request: dict, order: int = 0, comment: str = "") -> types.SimpleNamespace:
+        return types.SimpleNamespace(retcode=retcode, deal=0, order=order, volume=request.get("volume", 0.0),
+                                     price=request.get("price", 0.0), comment=comment,
+                                     request=types.SimpleNamespace(**{**REQUEST_DEFAULTS, **request}))
+
+    def initialize(self, *args, **kwargs) -> bool:
+        return True
+
+    def login(self, *args, **kwargs) -> bool:
+        return True
+
+    def account_info(self) -> types.SimpleNamespace:
+        self._round_trip_Function()
+        equity = self.equity_Function()
+        return types.SimpleNamespace(balance=self.balance, equity=equity, margin_free=equity, currency="USD")
+
+    def symbol_info(self, The_symbol: str) -> typing.Optional[types.SimpleNamespace]:
+        self._round_trip_Function()
+        return self.symbol_record if The_symbol == self.symbol else None
+
+    def orders_get(self, symbol: typing.Optional[str] = None, ticket: typing.Optional[int] = None) -> tuple:
+        self._round_trip_Function()
+        return tuple(order for order in self.orders.values()
+                     if (symbol is None or order.symbol == symbol) and (ticket is None or order.ticket == ticket))
+
+    def positions_get(self, symbol: typing.Optional[str] = None, ticket: typing.Optional[int] = None) -> tuple:
+        self._round_trip_Function()
+        return tuple(position for position in self.positions.values()
+                     if (symbol is None or position.symbol == symbol) and (ticket is None or position.ticket == ticket))
+
+    def order_send(self, request: dict) -> types.SimpleNamespace:
+        self._round_trip_Function()
+        action = request.get("action")
+        if action == self.TRADE_ACTION_PENDING:
+            ticket = next(self.tickets)
+            self.orders[ticket] = types.SimpleNamespace(
+                ticket=ticket, symbol=request["symbol"], type=request["type"], price_open=request["price"],
+                sl=request.get("sl", 0.0), tp=request.get("tp", 0.0), volume_initial=request["volume"],
+                volume_current=request["volume"], type_time=request.get("type_time", 0),
+                type_filling=request.get("type_filling", 0), magic=request.get("magic", 0),
+                comment=request.get("comment", ""), time_setup=self.time or int(time.time()))
+            return self._result_Function(self.TRADE_RETCODE_DONE, request, ticket)
+        if action == self.TRADE_ACTION_MODIFY:
+            order = self.orders.get(request.get("order"))
+            if order is None:
+                return self._result_Function(self.TRADE_RETCODE_INVALID, request, comment="Unknown order")
+            if (order.price_open, order.sl, order.tp) == (request["price"], request["sl"], request["tp"]):
+                return self._result_Function(self.TRADE_RETCODE_NO_CHANGES, request, order.ticket)
+            order.price_open, order.sl, order.tp = request["price"], request["sl"], request["tp"]
+            return self._result_Function(self.TRADE_RETCODE_DONE, request, order.ticket)
+        if action == self.TRADE_ACTION_REMOVE:
+            if self.orders.pop(request.get("order"), None) is None:
+                return self._result_Function(self.TRADE_RETCODE_INVALID, request, comment="Unknown order")
+            return self._result_Function(self.TRADE_RETCODE_DONE, request, request["order"])
+        if action == self.TRADE_ACTION_DEAL and request.get("position"):
+            position = self.positions.get(request["position"])
+            if position is None:
+                return self._result_Function(self.TRADE_RETCODE_INVALID, request, comment="Unknown position")
+            price = request.get("price") or self.last_price or position.price_open
+            self._close_Function(self.time or int(time.time()), position, price, min(request["volume"], position.volume), "close")
+            return self._result_Function(self.TRADE_RETCODE_DONE, request, position.ticket)
+        return self._result_Function(self.TRADE_RETCODE_INVALID, request, comment="Unsupported request")
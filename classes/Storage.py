@@ -0,0 +1,419 @@
+import abc
+import sys
+import os
+import json
+import datetime
+import typing
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.Flag import Flag_Class
+from classes.FlagPoint import FlagPoint_Class, ID_to_key_Function
+from classes.DP_Parameteres import DP_Parameteres_Class
+from classes.DP_Registry import DP_Registry_Class, TradeInfo
+from classes.Metatrader_Module import CMetatrader_Module
+from functions.logger import print_and_logging_Function
+from functions.utilities import stream_symbol_Function
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+REGISTRY_RESYNC_EVERY: int = config.get("database", {}).get("registry_resync_every", 30)
+
+# Result of a position from the Result and weight of its DP (aliases: p = position, d = DP), shared by the
+# set-based reconcile statement of every backend (formerly the `trg_update_position_result_<tf>` trigger)
+POSITION_RESULT_SQL = """
+                CASE
+                    WHEN d.weight = 0 THEN
+                        CASE
+                            WHEN ROUND(d.Result * ABS(p.Price - p.SL), 5) <= ROUND(ABS(p.TP - p.Price), 5)
+                                THEN -ABS(p.Price - p.SL)
+                            ELSE ROUND(ABS(p.TP - p.Price), 5)
+                        END
+                    ELSE
+                        CASE
+                            WHEN ROUND(d.Result * ABS(p.Price - p.SL), 5) > ROUND(ABS(p.TP - p.Price), 5)
+                                THEN ROUND(ABS(p.TP - p.Price), 5)
+                            ELSE ROUND(d.Result * ABS(p.Price - p.SL), 5)
+                        END
+                END"""
+
+# Columns of the ML dataset, in the order of the model inputs (after `id`, `type` and `Result` are dropped)
+ML_COLUMNS = ["id", "type", "length", "Flag_Ratio", "NO_Used_Candles", "Used_Ratio", "Related_DP_1", "Related_DP_2",
+              "Is_related_DP_used", "Is_golfed", "Is_used_half", "parent_length", "Result"]
+# Their types; the 64-bit DP keys stay Python ints (object) so they keep every bit
+ML_COLUMN_DTYPES: dict[str, typing.Any] = {
+    "id": np.int64, "type": object, "length": np.float64, "Flag_Ratio": np.float64, "NO_Used_Candles": np.float64,
+    "Used_Ratio": np.float64, "Related_DP_1": object, "Related_DP_2": object, "Is_related_DP_used": np.int64,
+    "Is_golfed": np.int64, "Is_used_half": np.int64, "parent_length": np.float64, "Result": np.float64,
+}
+
+class Storage_Class(abc.ABC):
+    """
+    The storage interface of one timeframe of one symbol, as used by `Timeframe_Class` and `FlagDetector_Class`.
+    It is named by its stream (`stream_name_Function`, e.g. "EURUSD_M15"), which `TimeFrame` holds and `<tf>`
+    stands for below: the same four
+    tables (`Flag_Points_<tf>`, `Important_DPs_<tf>`, `Flags_<tf>`, `Positions_<tf>`) plus the shared
+    `Performance_Summary`, the set-based propagation of DP Results to the positions, and the batch APIs.
+    Backends: `Database_Class` (MySQL, the live bot) and `SQLite_Database_Class` (single file or in memory, for
+    backtests and benchmarks), selected by `storage.backend` in config.json (see functions/storage_backend.py).
+    The per-loop reads are served by the in-memory `DP_Registry_Class`, which is common to every backend and
+    implemented here, together with the backend-independent parts of the writes.
+    """
+
+    def __init__(self, The_timeframe: str):
+        self.flag_points_table_name = f"Flag_Points_{The_timeframe}"
+        self.important_dps_table_name = f"Important_DPs_{The_timeframe}"
+        self.flags_table_name = f"Flags_{The_timeframe}"
+        self.Positions_table_name = f"Positions_{The_timeframe}"
+        self.TimeFrame = The_timeframe
+        self.detected_flags = 0
+        self.Registry = DP_Registry_Class(The_timeframe)
+        # ms: wall-clock time spent loading DPs; query_ms: sum of the query latencies (what running them serially costs)
+        self.DB_loop_stats = {"round_trips": 0, "ms": 0.0, "query_ms": 0.0}
+
+    @property
+    def Traded_DP_Dict(self) -> dict[int, TradeInfo]:
+        """ Traded decision points keyed by their 64-bit DP key (owned by the registry). """
+        return self.Registry.Traded_DP_Dict
+
+    # ----- Backend specific -----
+
+    @abc.abstractmethod
+    async def initialize_db_pool_Function(self):
+        """ Opens the connection(s) of the backend, if not done yet. """
+
+    @abc.abstractmethod
+    async def save_flags_Function(self, flag_list: list[Flag_Class]):
+        """ Stores the flags with their flag points and DPs (existing rows are kept) and registers the new DPs. """
+
+    @abc.abstractmethod
+    async def _update_dp_weights_Function(self, dps_to_update: list):
+        """ (DP key, weight) pairs; errors are logged, not raised. """
+
+    @abc.abstractmethod
+    async def _update_dp_Results_Function(self, dps_to_update: list):
+        """ (DP key, Result) pairs; errors are logged, not raised. """
+
+    @abc.abstractmethod
+    async def sync_registry_Function(self):
+        """ Reloads `self.Registry` from the tables (see `_load_registry_Function`). """
+
+    @abc.abstractmethod
+    async def _insert_positions_batch(self, positions: list[tuple[int, str, float, float, float, datetime.datetime, int, int, int, float]]):
+        """ Stores placed positions; a DP that already has a position cancels the new order and raises. """
+
+    @abc.abstractmethod
+    async def Read_ML_table_Function(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """ The FTC inputs and Results of every DP with a Result (see `_ML_dataset_Function`). """
+
+    @abc.abstractmethod
+    async def remove_cancelled_positions_Function(self, cancelled_list_dict: dict[int, int]):
+        """ DP key -> Order_ID of the positions to delete. """
+
+    @abc.abstractmethod
+    async def correct_position_results_Function(self, full: bool = False):
+        """ Makes the stored position Results current; `full=True` recomputes every position. """
+
+    @abc.abstractmethod
+    async def PNL_Calculator_Function(self, start_day: typing.Optional[datetime.date] = None, end_day: typing.Optional[datetime.date] = None) -> tuple[float, float]:
+        """ PNL (percent of balance, money) between two days (inclusive, None = unbounded). """
+
+    @abc.abstractmethod
+    async def winrate_Calculator_Function(self, start_day: typing.Optional[datetime.date] = None, end_day: typing.Optional[datetime.date] = None) -> tuple[float, int]:
+        """ Winrate and number of closed trades between two days. """
+
+    @abc.abstractmethod
+    async def update_position_TPs_batch_Function(self, modifying_TP_DB: list[tuple[int, float]]) -> None:
+        """ (Order_ID, new TP) pairs. """
+
+    # ----- Common to every backend -----
+
+    @staticmethod
+    def _flag_rows_Function(flag_list: list[Flag_Class]) -> tuple[list[tuple], list[tuple], list[tuple], list[DP_Parameteres_Class]]:
+        """
+        Builds the rows stored by `save_flags_Function`.
+        Returns:
+            tuple: (Flags rows, Important_DPs rows, Flag_Points rows, DPs to register), in the column order of the
+            INSERT statements of the backends.
+        """
+        flag_values = []
+        Important_DPs_values = []
+        flag_point_values = []
+        new_DPs: list[DP_Parameteres_Class] = []
+        for flag in flag_list:
+            high_key = flag.high.key
+            low_key = flag.low.key
+            ftc_key = flag.FTC.key if flag.FTC else None
+            el_key = flag.EL.key if flag.EL else None
+            mpl_key = flag.MPL.key if flag.MPL else None
+
+            # Flag
+            flag_values.append((
+                flag.Unique_point, flag.flag_type, high_key, low_key,
+                flag.Start_time, flag.End_time, ftc_key, el_key, mpl_key
+            ))
+
+            # High Point
+            if flag.high.ID_generator_Function() is not None:
+                flag_point_values.append((
+                    flag.high.key, flag.high.id, flag.high.price, flag.high.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+
+            # Low Point
+            if flag.low.ID_generator_Function() is not None:
+                flag_point_values.append((
+                    flag.low.key, flag.low.id, flag.low.price, flag.low.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+
+            # FTC
+            if flag.FTC.ID_generator_Function() is not None:
+                if len(flag.FTC.related_DP_indexes)== 0:
+                    related_DP_1 = None
+                    related_DP_2 = None
+                else:
+                    related_DP_1 = ID_to_key_Function(flag.FTC.related_DP_indexes[0])
+                    related_DP_2 = ID_to_key_Function(flag.FTC.related_DP_indexes[1])
+
+                Important_DPs_values.append((
+                    flag.FTC.key, flag.FTC.id, flag.FTC.type, flag.FTC.High.key, flag.FTC.Low.key,
+                    flag.FTC.weight, flag.FTC.first_valid_trade_time, flag.FTC.trade_direction, flag.FTC.length,
+                    flag.FTC.ratio_to_flag, flag.FTC.number_used_candle, flag.FTC.used_ratio, related_DP_1, related_DP_2, int(flag.FTC.Is_related_DP_used),
+                    int(flag.FTC.Is_golfed), int(flag.FTC.Is_used_half), flag.FTC.parent_length
+                ))
+                new_DPs.append(flag.FTC)
+                flag_point_values.append((
+                    flag.FTC.High.key, flag.FTC.High.id, flag.FTC.High.price, flag.FTC.High.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+                flag_point_values.append((
+                    flag.FTC.Low.key, flag.FTC.Low.id, flag.FTC.Low.price, flag.FTC.Low.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+
+            # EL
+            if flag.EL.ID_generator_Function() is not None:
+                Important_DPs_values.append((
+                    flag.EL.key, flag.EL.id, flag.EL.type, flag.EL.High.key, flag.EL.Low.key,
+                    flag.EL.weight, flag.EL.first_valid_trade_time, flag.EL.trade_direction, flag.EL.length,
+                    flag.EL.ratio_to_flag, flag.EL.number_used_candle, flag.EL.used_ratio, ID_to_key_Function(flag.EL.related_DP_indexes[0]), None, int(flag.EL.Is_related_DP_used),
+                    int(flag.EL.Is_golfed), int(flag.EL.Is_used_half), flag.EL.parent_length
+                ))
+                new_DPs.append(flag.EL)
+                flag_point_values.append((
+                    flag.EL.High.key, flag.EL.High.id, flag.EL.High.price, flag.EL.High.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+                flag_point_values.append((
+                    flag.EL.Low.key, flag.EL.Low.id, flag.EL.Low.price, flag.EL.Low.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+
+            # MPL
+            if flag.MPL.ID_generator_Function() is not None:
+                Important_DPs_values.append((
+                    flag.MPL.key, flag.MPL.id, flag.MPL.type, flag.MPL.High.key, flag.MPL.Low.key,
+                    flag.MPL.weight, flag.MPL.first_valid_trade_time, flag.MPL.trade_direction, flag.MPL.length,
+                    flag.MPL.ratio_to_flag, flag.MPL.number_used_candle, flag.MPL.used_ratio, None, None, int(flag.MPL.Is_related_DP_used),
+                    int(flag.MPL.Is_golfed), int(flag.MPL.Is_used_half), flag.MPL.parent_length
+                ))
+                new_DPs.append(flag.MPL)
+                flag_point_values.append((
+                    flag.MPL.High.key, flag.MPL.High.id, flag.MPL.High.price, flag.MPL.High.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+                flag_point_values.append((
+                    flag.MPL.Low.key, flag.MPL.Low.id, flag.MPL.Low.price, flag.MPL.Low.time.strftime('%Y-%m-%d %H:%M:%S')
+                ))
+        return flag_values, Important_DPs_values, flag_point_values, new_DPs
+
+    def _hydration_query_Function(self, where_clause: str) -> str:
+        """
+        Builds the single hydration query: DPs joined to their High/Low flag points, self-joined to the
+        Results of their related DPs (only non-zero Results count, as before) and joined to their position.
+        """
+        return f"""
+            SELECT d.id, d.type, d.weight, d.first_valid_trade_time, d.trade_direction,
+                d.length, d.Flag_Ratio, d.NO_Used_Candles, d.Used_Ratio,
+                d.Is_related_DP_used, d.Is_golfed, d.Is_used_half, d.parent_length,
+                h.price AS High_price, h.time AS High_time,
+                l.price AS Low_price, l.time AS Low_time,
+                r1.Result AS Related_DP_1, r2.Result AS Related_DP_2,
+                d.Related_DP_1 AS Related_key_1, d.Related_DP_2 AS Related_key_2,
+                p.TP, p.Vol, p.Order_ID
+            FROM {self.important_dps_table_name} AS d
+            LEFT JOIN {self.flag_points_table_name} AS h ON h.id = d.High_Point
+            LEFT JOIN {self.flag_points_table_name} AS l ON l.id = d.Low_Point
+            LEFT JOIN {self.important_dps_table_name} AS r1 ON r1.id = d.Related_DP_1 AND r1.Result != 0
+            LEFT JOIN {self.important_dps_table_name} AS r2 ON r2.id = d.Related_DP_2 AND r2.Result != 0
+            LEFT JOIN {self.Positions_table_name} AS p ON p.Traded_DP = d.id
+            WHERE {where_clause}
+        """
+
+    @staticmethod
+    def _DPs_from_columns_Function(columns: dict[str, np.ndarray]) -> list[DP_Parameteres_Class]:
+        """
+        Rebuilds DP_Parameteres_Class objects from the columnar output of the hydration query.
+        Related_DP_1/2 hold the Results of the related DPs (or None), as expected by `to_model_input_Function`.
+        """
+        dps = []
+        for i in range(len(columns.get("id", []))):
+            high_point = FlagPoint_Class(price=columns["High_price"][i], time=columns["High_time"][i]) if columns["High_time"][i] is not None else None
+            low_point = FlagPoint_Class(price=columns["Low_price"][i], time=columns["Low_time"][i]) if columns["Low_time"][i] is not None else None
+            dp = DP_Parameteres_Class(
+                type=columns["type"][i],
+                High=high_point,  # type: ignore
+                Low=low_point,  # type: ignore
+                weight=columns["weight"][i],
+                first_valid_trade_time=columns["first_valid_trade_time"][i],
+                trade_direction=columns["trade_direction"][i]
+            )
+            dp.length              = columns["length"][i]
+            dp.ratio_to_flag       = columns["Flag_Ratio"][i]
+            dp.number_used_candle  = columns["NO_Used_Candles"][i]
+            dp.used_ratio          = columns["Used_Ratio"][i]
+            dp.Is_related_DP_used  = columns["Is_related_DP_used"][i]
+            dp.Is_golfed           = columns["Is_golfed"][i]
+            dp.Is_used_half        = columns["Is_used_half"][i]
+            dp.parent_length       = columns["parent_length"][i]
+            dp.related_DP_indexes.append(columns["Related_DP_1"][i])
+            dp.related_DP_indexes.append(columns["Related_DP_2"][i])
+            dp.key = int(columns["id"][i])
+            dps.append(dp)
+        return dps
+
+    def _load_registry_Function(self, columns: dict[str, np.ndarray], dp_results: list[tuple[int, float]], pending_positions: dict[int, int]):
+        """ Loads `self.Registry` from the columns of the hydration query of the active DPs and the two registry reads. """
+        active_DPs = self._DPs_from_columns_Function(columns)
+        related_keys = list(zip(columns["Related_key_1"], columns["Related_key_2"])) if columns else []
+        traded_DPs: dict[int, TradeInfo] = {
+            int(dp_key): {"TP": tp, "Vol": vol, "Order_ID": order_id}
+            for dp_key, tp, vol, order_id in zip(columns["id"], columns["TP"], columns["Vol"], columns["Order_ID"])
+            if order_id is not None
+        } if columns else {}
+
+        self.Registry.load_Function(active_DPs, related_keys, traded_DPs, dp_results, pending_positions)
+        print_and_logging_Function("info", f"{self.TimeFrame} -> DP registry synchronized: {len(active_DPs)} active DPs, {len(pending_positions)} pending positions", "description")
+
+    async def _get_update_DPlist_Function(self) -> list[tuple[DP_Parameteres_Class, int]]:
+        """
+        Returns the active Decision Points (DPs, weight > 0) from the in-memory registry.
+        The registry is (re)loaded from the database by `sync_registry_Function` on the first call and then every
+        `REGISTRY_RESYNC_EVERY` calls; in between, it is kept up to date by the write functions of the backend.
+        Traded DPs are still returned so that everything of a traded DP is updated; they are just not traded again.
+        Returns:
+            list[tuple[DP_Parameteres_Class, int]]: A list of tuples where each tuple contains a
+            DP_Parameteres_Class object and its 64-bit key.
+        """
+
+        try:
+            if self.Registry.needs_sync_Function(REGISTRY_RESYNC_EVERY):
+                await self.sync_registry_Function()
+            return self.Registry.get_active_DPs_Function()
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in fetching tradeable DPs: {e}", "title")
+            return []
+
+    async def _get_tradeable_DPs_Function(self, dp_ids: list[int]) -> list[DP_Parameteres_Class]:
+        """
+        Given a list of important-DP keys, return their DP_Parameteres_Class objects from the registry, with
+        Related_DP_1/2 substituted by the latest Results of the related DPs.
+        """
+        if not dp_ids:
+            return []
+
+        try:
+            return self.Registry.get_DPs_Function(dp_ids)
+        except Exception as e:
+            print_and_logging_Function(
+                "error",
+                f"{self.TimeFrame} -> Error in fetch_DPs_by_id for IDs {dp_ids}: {e}",
+                "title"
+            )
+            return []
+
+    async def Read_Pending_Positions_Function(self) -> dict[int, int]:
+        """ Returns DP key -> Order_ID of the positions whose Result is still 0, from the registry. """
+        try:
+            if not self.Registry.is_loaded:
+                await self.sync_registry_Function()
+            return dict(self.Registry.Pending_Positions)
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in fetching open positions: {e}", "title")
+            return {}
+
+    @staticmethod
+    def _ML_dataset_Function(full_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """ Turns the `ML_COLUMNS` rows of the DPs with a Result into the FTC model inputs and outputs. """
+        # Build a dictionary for fast lookup of id -> Result
+        id_to_result = dict(zip(full_df['id'], full_df['Result']))
+
+        # Now, prepare the Related DP results
+        full_df['Related_DP_1'] = full_df['Related_DP_1'].apply(
+            lambda x: id_to_result.get(x, 0) if pd.notnull(x) else None
+        )
+        full_df['Related_DP_2'] = full_df['Related_DP_2'].apply(
+            lambda x: id_to_result.get(x, 0) if pd.notnull(x) else None
+        )
+
+        # Prepare Input and Output
+        FTC_full_df = full_df[full_df['type'] == 'FTC'].reset_index(drop=True)
+        # EL_full_df = full_df[full_df['type'] == 'EL'].reset_index(drop=True)
+        # MPL_full_df = full_df[full_df['type'] == 'MPL'].reset_index(drop=True)
+
+        FTC_Input = FTC_full_df.drop(columns=['Result', 'id', 'type'])
+        FTC_Output = FTC_full_df['Result']
+
+        # EL_Input = EL_full_df.drop(columns=['Result', 'id', 'type'])
+        # EL_Output = EL_full_df['Result']
+
+        # MPL_Input = MPL_full_df.drop(columns=['Result', 'id', 'type'])
+        # MPL_Output = MPL_full_df['Result']
+
+        # return FTC_Input, FTC_Output, EL_Input, EL_Output, MPL_Input, MPL_Output
+        return FTC_Input, FTC_Output # type: ignore
+
+    @staticmethod
+    def _day_range_SQL_Function(start_day: typing.Optional[datetime.date], end_day: typing.Optional[datetime.date]) -> tuple[str, list]:
+        conditions, params = "", []
+        if start_day is not None:
+            conditions += " AND day >= %s"
+            params.append(start_day)
+        if end_day is not None:
+            conditions += " AND day <= %s"
+            params.append(end_day)
+        return conditions, params
+
+    @staticmethod
+    async def _report_from_rows_Function(rows: typing.Iterable[tuple]) -> dict[str, dict]:
+        """
+        (stream or None for the total, pnl_vol, wins, trades) rows -> the `performance_report_Function` dict. The
+        pnl of a stream is priced with its own symbol, so the "ALL" pnl is the sum of the streams' money, not of pips.
+        """
+        report: dict[str, dict] = {}
+        total = None
+        for timeframe, pnl_vol, wins, trades in rows:
+            if timeframe is None:
+                total = (wins, trades)
+                continue
+            pnl_percent, pnl = await CMetatrader_Module.profit_calculator_Function(float(pnl_vol or 0.0), stream_symbol_Function(timeframe))
+            report[timeframe] = {
+                "pnl_percent": pnl_percent,
+                "pnl": pnl,
+                "winrate": float(wins) / float(trades) if trades else 0.0,
+                "trades": int(trades or 0),
+            }
+        if total is not None:
+            wins, trades = total
+            report["ALL"] = {
+                "pnl_percent": sum(The_report["pnl_percent"] for The_report in report.values()),
+                "pnl": sum(The_report["pnl"] for The_report in report.values()),
+                "winrate": float(wins) / float(trades) if trades else 0.0,
+                "trades": int(trades or 0),
+            }
+        return report
+
+    async def _cancel_duplicate_order_Function(self, The_order_ID: int):
+        try:
+            await CMetatrader_Module.cancel_order(The_order_ID)
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Duplicate Traded_DP already exists in DB: order {The_order_ID} cancelled", "title")
+        except Exception as e:
+            print_and_logging_Function("error", f"{self.TimeFrame} -> Error in cancelling duplicated order {The_order_ID}: {e}", "title")
@@ -19,6 +19,7 @@ class Telegrambot_Class():
     PASSWORD = config["password"]
     authenticated_users = set()
     last_message_responded = None
+    muted = False  # nothing is sent (backtests)
     
     def __init__(self) -> None:        
         TELEGRAM_BOT_TOKEN = config['token']
@@ -42,6 +43,8 @@ class Telegrambot_Class():
             raise e
                 
     def send_message(self, chat_id: str = config['chat_id'], text: str= ''):
+        if self.muted:
+            return
         payload = {'chat_id': chat_id, 'text': text}
         try:
             response = requests.post(f'{self.API_URL}/sendMessage', json=payload)
@@ -96,6 +99,8 @@ class Telegrambot_Class():
             path.unlink()  # all sent successfully
         
     def notify_placed_position(self, timeframe: str, direction: typing.Literal["Buy Limit", "Sell Limit"], price: int, sl: int, tp: int, vol: int, chance: int, order_Id: int, chat_id: str = config['chat_id']):
+        if self.muted:
+            return
         text = (
             "*`{}` `{}` Position Placed*\n"
             " `{}` % chance \n\n"
@@ -185,7 +190,7 @@ class Telegrambot_Class():
 
         elif command in ['/shutdown']:
             self.send_message(chat_id, '⚠️ Emergency shutdown requested. Closing positions...')
-            parameters.shutdown_flag = True
+            parameters.request_shutdown_Function()
             # Insert emergency shutdown logic here
 
         elif command in ['/status']:
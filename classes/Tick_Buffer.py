@@ -0,0 +1,110 @@
+import sys
+import os
+import json
+import asyncio
+import datetime
+import typing
+import numpy as np
+import MetaTrader5
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.utilities import SYMBOLS
+from classes.Broker_Gateway import CBroker_Gateway
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+TICKS_CONFIG: dict = config.get("ticks", {})
+TICKS_ENABLED: bool = TICKS_CONFIG.get("enabled", False)  # resolve the entry and stop bars of the DP validation on ticks
+TICK_RETENTION_MS: int = int(TICKS_CONFIG.get("retention_minutes", 1440) * 60_000)  # ticks kept behind the newest one
+
+class Tick_Buffer_Class:
+    """
+    The ticks of one symbol loaded so far, as three sorted columns (time in ms, bid, ask) instead of the structured
+    records `copy_ticks_range` returns. Only the ranges asked for are fetched (the bars the DP validation cannot
+    resolve on their high and low), each once: `loaded` keeps the fetched ranges. Ticks older than
+    `ticks.retention_minutes` behind the newest one are dropped, so memory is bounded by the retention window.
+    """
+
+    def __init__(self, The_symbol: str):
+        self.symbol = The_symbol
+        self.time_msc = np.empty(0, dtype=np.int64)
+        self.bid = np.empty(0, dtype=np.float64)
+        self.ask = np.empty(0, dtype=np.float64)
+        self.loaded: list[tuple[int, int]] = []  # sorted, disjoint [start, end) ranges in ms
+        self.lock = asyncio.Lock()
+        self.stats = {"requests": 0, "fetches": 0, "fetched_ticks": 0, "errors": 0}
+
+    def _missing_Function(self, start: int, end: int) -> list[tuple[int, int]]:
+        missing = []
+        for loaded_start, loaded_end in self.loaded:
+            if loaded_end <= start or loaded_start >= end:
+                continue
+            if loaded_start > start:
+                missing.append((start, loaded_start))
+            start = max(start, loaded_end)
+        if start < end:
+            missing.append((start, end))
+        return missing
+
+    def _insert_Function(self, start: int, end: int, The_ticks: np.ndarray):
+        """ Inserts the ticks of the range [start, end), which holds none yet, and records the range as loaded. """
+        time_msc = The_ticks["time_msc"].astype(np.int64)
+        in_range = (time_msc >= start) & (time_msc < end)
+        position = int(np.searchsorted(self.time_msc, start))
+        self.time_msc = np.concatenate((self.time_msc[:position], time_msc[in_range], self.time_msc[position:]))
+        self.bid = np.concatenate((self.bid[:position], The_ticks["bid"][in_range].astype(np.float64), self.bid[position:]))
+        self.ask = np.concatenate((self.ask[:position], The_ticks["ask"][in_range].astype(np.float64), self.ask[position:]))
+        ranges = sorted(self.loaded + [(start, end)])
+        self.loaded = [ranges[0]]
+        for range_start, range_end in ranges[1:]:
+            if range_start <= self.loaded[-1][1]:
+                self.loaded[-1] = (self.loaded[-1][0], max(self.loaded[-1][1], range_end))
+            else:
+                self.loaded.append((range_start, range_end))
+
+    def trim_Function(self, The_horizon: int):
+        """ Drops the ticks (and loaded ranges) before `The_horizon` (ms). """
+        position = int(np.searchsorted(self.time_msc, The_horizon))
+        if position:
+            self.time_msc, self.bid, self.ask = self.time_msc[position:], self.bid[position:], self.ask[position:]
+        self.loaded = [(max(start, The_horizon), end) for start, end in self.loaded if end > The_horizon]
+
+    async def ticks_Function(self, start: int, end: int) -> typing.Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        The ticks of [start, end) (ms) as (time_msc, bid, ask) views, fetched through the broker gateway if not
+        loaded yet; None when the range is older than the retention window or could not be fetched.
+        """
+        self.stats["requests"] += 1
+        async with self.lock:
+            if len(self.time_msc) and end <= self.time_msc[-1] - TICK_RETENTION_MS:
+                return None
+            for missing_start, missing_end in self._missing_Function(start, end):
+                try:
+                    The_ticks = await CBroker_Gateway.call_Function("copy_ticks_range", self.symbol,
+                                                                    datetime.datetime.fromtimestamp(missing_start / 1000, datetime.timezone.utc),
+                                                                    datetime.datetime.fromtimestamp(missing_end / 1000, datetime.timezone.utc),
+                                                                    MetaTrader5.COPY_TICKS_ALL)
+                except Exception as e:
+                    The_ticks = None
+                    print_and_logging_Function("warning", f"Fetching the {self.symbol} ticks failed: {e}", "description")
+                if The_ticks is None:
+                    self.stats["errors"] += 1
+                    return None
+                self._insert_Function(missing_start, missing_end, The_ticks)
+                self.stats["fetches"] += 1
+                self.stats["fetched_ticks"] += len(The_ticks)
+            if len(self.time_msc):
+                self.trim_Function(int(self.time_msc[-1]) - TICK_RETENTION_MS)
+            first, last = np.searchsorted(self.time_msc, [start, end])
+            return self.time_msc[first:last], self.bid[first:last], self.ask[first:last]
+
+    def memory_Function(self) -> int:
+        """ Bytes held by the tick columns. """
+        return self.time_msc.nbytes + self.bid.nbytes + self.ask.nbytes
+
+CTick_Buffers: dict[str, Tick_Buffer_Class] = {The_symbol: Tick_Buffer_Class(The_symbol) for The_symbol in SYMBOLS}
+CTick_Buffer = CTick_Buffers[SYMBOLS[0]]
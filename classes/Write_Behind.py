@@ -0,0 +1,257 @@
+import sys
+import os
+import json
+import time
+import datetime
+import asyncio
+import typing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.utilities import SYMBOLS, stream_name_Function
+from classes.DB_Pool import CDB_Pool
+
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+WRITE_BEHIND_CONFIG: dict = config.get("write_behind", {})
+FLUSH_INTERVAL: float = WRITE_BEHIND_CONFIG.get("flush_interval", 5)
+JOURNAL_ENABLED: bool = WRITE_BEHIND_CONFIG.get("journal", True)
+JOURNAL_PATH: str = WRITE_BEHIND_CONFIG.get("journal_path", "./logs/write_behind.jsonl")
+
+class Pending_Writes_Class:
+    """
+    The coalesced, not yet flushed mutations of one timeframe. Repeated updates of the same DP or order keep
+    only the last value; a position cancelled (or re-priced) before its insert is flushed only changes the insert.
+    Attributes:
+        inserts (dict[int, tuple]): Traded_DP -> position row, as given to `Database_Class._insert_positions_batch`.
+        deletes (dict[int, int]): Order_ID -> Traded_DP of the positions to delete.
+        TPs (dict[int, float]): Order_ID -> new TP.
+        Results (dict[int, float]): DP key -> new Result.
+        weights (dict[int, float]): DP key -> new weight.
+    """
+
+    def __init__(self):
+        self.inserts: dict[int, tuple] = {}
+        self.deletes: dict[int, int] = {}
+        self.TPs: dict[int, float] = {}
+        self.Results: dict[int, float] = {}
+        self.weights: dict[int, float] = {}
+
+    def is_empty_Function(self) -> bool:
+        return not (self.inserts or self.deletes or self.TPs or self.Results or self.weights)
+
+    def size_Function(self) -> int:
+        return len(self.inserts) + len(self.deletes) + len(self.TPs) + len(self.Results) + len(self.weights)
+
+    def apply_Function(self, op: str, rows: list) -> int:
+        """
+        Applies one journaled mutation to the buffer.
+        Returns:
+            int: The number of rows that replaced (or cancelled) an already buffered mutation.
+        """
+        before = self.size_Function()
+        if op == "Results":
+            for dp_key, Result in rows:
+                self.Results[int(dp_key)] = Result
+        elif op == "weights":
+            for dp_key, weight in rows:
+                self.weights[int(dp_key)] = weight
+        elif op == "insert":
+            for row in rows:
+                self.inserts[int(row[0])] = tuple(row)
+        elif op == "delete":
+            for dp_key, order_id in rows:
+                self.TPs.pop(order_id, None)
+                buffered = self.inserts.get(int(dp_key))
+                if buffered is not None and buffered[7] == order_id:
+                    self.inserts.pop(int(dp_key))  # never reached the database
+                else:
+                    self.deletes[order_id] = int(dp_key)
+        elif op == "TPs":
+            for order_id, tp in rows:
+                for dp_key, buffered in self.inserts.items():
+                    if buffered[7] == order_id:
+                        self.inserts[dp_key] = buffered[:4] + (tp,) + buffered[5:]
+                        break
+                else:
+                    self.TPs[order_id] = tp
+        else:
+            raise ValueError(f"Unknown write-behind operation: {op}")
+        return len(rows) - (self.size_Function() - before)
+
+    def merge_newer_Function(self, newer: "Pending_Writes_Class"):
+        """ Puts back a snapshot whose flush failed (self) under the mutations queued meanwhile (newer). """
+        for name in ("inserts", "deletes", "TPs", "Results", "weights"):
+            merged = getattr(self, name)
+            merged.update(getattr(newer, name))
+            setattr(newer, name, merged)
+
+class Write_Behind_Class:
+    """
+    Write-behind layer of the DB writes issued in the hot path of every timeframe: DP Results and weights,
+    position inserts, TP updates and cancelled-position deletes. `Database_Class` queues them here (after updating
+    its registry), they are coalesced per DP / order, and `flush_Function` writes all timeframes in ONE transaction,
+    every `write_behind.flush_interval` seconds (0 flushes right away, as before).
+    Durability: with `write_behind.journal` enabled, every queued mutation is appended and fsync-ed to a local
+    journal before it is acknowledged. The journal of a flush in progress is moved aside (`.flushing`) and removed
+    only after the commit, and `recover_Function` replays both files on startup, so a crash loses nothing acknowledged.
+    All statements are idempotent on replay (updates, deletes, and inserts skipped when the position already exists).
+    """
+
+    def __init__(self):
+        self.Databases: dict[str, typing.Any] = {}
+        self.Pending: dict[str, Pending_Writes_Class] = {}
+        self.journal_path = JOURNAL_PATH
+        self.flushing_path = JOURNAL_PATH + ".flushing"
+        self.journal_file = None
+        self.flush_lock = asyncio.Lock()
+        self.stats = {"flushes": 0, "statements": 0, "coalesced": 0, "ms": 0.0}
+
+    def register_database_Function(self, The_database):
+        """ Registers the `Database_Class` of a timeframe; its `_apply_writes_Function` writes the timeframe's mutations. """
+        self.Databases[The_database.TimeFrame] = The_database
+        self.Pending.setdefault(The_database.TimeFrame, Pending_Writes_Class())
+
+    def use_journal_Function(self, The_path: str):
+        """ Journals to `The_path` instead (each worker process of the process mode keeps its own journal). Call before `recover_Function`. """
+        self.journal_path = The_path
+        self.flushing_path = The_path + ".flushing"
+
+    def buffered_inserts_Function(self, The_timeframe: str) -> dict[int, tuple]:
+        return self.Pending[The_timeframe].inserts
+
+    def _journal_Function(self, entry: dict):
+        if not JOURNAL_ENABLED:
+            return
+        if self.journal_file is None:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self.journal_file = open(self.journal_path, "a")
+        self.journal_file.write(json.dumps(entry) + "\n")
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def enqueue_Function(self, The_timeframe: str, op: str, rows: list):
+        """
+        Queues (and journals) one batch of mutations of a timeframe. Once this returns, the write is acknowledged.
+        Args:
+            op (str): "Results", "weights", "insert", "delete" or "TPs".
+            rows (list): The rows of the batch, in the layout of `Pending_Writes_Class.apply_Function`.
+        """
+        if not rows:
+            return
+        rows = [[value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime.datetime) else value for value in row] for row in rows]
+        self._journal_Function({"tf": The_timeframe, "op": op, "rows": rows})
+        self.stats["coalesced"] += self.Pending[The_timeframe].apply_Function(op, rows)
+
+    def _replay_Function(self, The_path: str) -> int:
+        """ Applies the batches of the journal `The_path` to the buffers; returns how many. """
+        replayed = 0
+        if not os.path.exists(The_path):
+            return 0
+        with open(The_path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a crash: it was never acknowledged
+                The_scope = entry["tf"]
+                if The_scope not in self.Pending:
+                    The_scope = stream_name_Function(SYMBOLS[0], entry["tf"])  # journaled before the symbol-qualified names
+                if The_scope not in self.Pending:
+                    print_and_logging_Function("warning", f"Write-behind journal entry of unknown stream {entry['tf']} ignored", "description")
+                    continue
+                self.Pending[The_scope].apply_Function(entry["op"], entry["rows"])
+                replayed += 1
+        return replayed
+
+    def recover_Function(self):
+        """ Replays the journals left by a previous run into the buffers. Call once, before the first flush. """
+        replayed = sum(self._replay_Function(path) for path in (self.flushing_path, self.journal_path))
+        if replayed:
+            print_and_logging_Function("info", f"Write-behind: replayed {replayed} journaled batches of the previous run", "title")
+
+    async def adopt_journals_Function(self, The_paths: list[str]):
+        """
+        Replays and flushes the journals of other processes (the worker journals of the process mode, whose streams a
+        new session may shard differently), then removes them; they are kept when the flush fails.
+        """
+        replayed = sum(self._replay_Function(path) for path in The_paths)
+        if not replayed:
+            return
+        await self.flush_Function()
+        if all(pending.is_empty_Function() for pending in self.Pending.values()):
+            for path in The_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+        print_and_logging_Function("info", f"Write-behind: replayed {replayed} journaled batches of {len(The_paths)} worker journals", "title")
+
+    def _rotate_journal_Function(self):
+        """ Moves the journal of the snapshot being flushed aside; queued mutations go to a fresh journal. """
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+        if not os.path.exists(self.journal_path):
+            return
+        if os.path.exists(self.flushing_path):
+            # A previous flush failed (or a recovery is pending): both files stay needed until this flush commits
+            with open(self.journal_path, "r") as source, open(self.flushing_path, "a") as target:
+                target.write(source.read())
+                target.flush()
+                os.fsync(target.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.flushing_path)
+
+    async def flush_Function(self):
+        """ Writes every buffered mutation of every timeframe in one transaction. """
+        async with self.flush_lock:
+            snapshot = {tf: pending for tf, pending in self.Pending.items() if not pending.is_empty_Function()}
+            if not snapshot:
+                return
+            for tf in snapshot:
+                self.Pending[tf] = Pending_Writes_Class()
+            self._rotate_journal_Function()
+
+            start = time.perf_counter()
+            orders_to_cancel: list[tuple[str, int]] = []
+            try:
+                async with CDB_Pool.acquire("write_behind") as conn:
+                    await conn.commit()  # Ensure previous state is clean (optional but safe)
+                    async with conn.cursor() as cursor:
+                        try:
+                            await conn.begin()
+                            for tf, pending in snapshot.items():
+                                cancelled = await self.Databases[tf]._apply_writes_Function(cursor, pending)
+                                orders_to_cancel.extend((tf, order_id) for order_id in cancelled)
+                            await conn.commit()
+                        except Exception:
+                            await conn.rollback()
+                            raise
+            except Exception as e:
+                for tf, pending in snapshot.items():
+                    pending.merge_newer_Function(self.Pending[tf])
+                print_and_logging_Function("error", f"Write-behind flush failed, {sum(p.size_Function() for p in snapshot.values())} mutations kept for the next flush: {e}", "title")
+                return
+
+            if os.path.exists(self.flushing_path):
+                os.remove(self.flushing_path)
+            self.stats["flushes"] += 1
+            self.stats["statements"] += sum(p.size_Function() for p in snapshot.values())
+            self.stats["ms"] += (time.perf_counter() - start) * 1000
+
+            for tf, order_id in orders_to_cancel:
+                await self.Databases[tf]._cancel_duplicate_order_Function(order_id)
+
+    async def run_Function(self):
+        """ Background flusher: flushes every `FLUSH_INTERVAL` seconds until cancelled, then flushes what is left. """
+        try:
+            while FLUSH_INTERVAL > 0:
+                await asyncio.sleep(FLUSH_INTERVAL)
+                await self.flush_Function()
+        finally:
+            await self.flush_Function()
+
+CWrite_Behind = Write_Behind_Class()
@@ -5,7 +5,6 @@ import json
 import asyncio
 import bisect
 import numpy as np
-import datetime
 import random
 import typing
 import pickle
@@ -23,9 +22,16 @@ from classes.Flag_Detector import FlagDetector_Class
 from classes.Metatrader_Module import CMetatrader_Module
 from functions.logger import print_and_logging_Function
 from functions.run_with_retries import run_with_retries_Function
-from classes.Database import Database_Class
+from functions.storage_backend import create_storage_Function
+from classes.Storage import Storage_Class
+from classes.DB_Pool import CDB_Pool
 from classes.Telegrambot import CTelegramBot
 from classes.Position_Manager import Position_Manager_Class
+from classes.Broker_Gateway import CBroker_Metadata
+from classes.Order_Manager import Order_Manager_Class
+from classes.Tick_Buffer import CTick_Buffers, TICKS_ENABLED, TICK_RETENTION_MS
+from classes.Scheduler import BAR_SECONDS
+from functions.utilities import SYMBOLS, stream_name_Function, streams_Function
 
 TARGET_PROB: float = config["trading_configs"]["risk_management"]["MIN_Prob"]
 Max_No_Trade_Daily: int = config["trading_configs"]["risk_management"]["Max_No_Trade_Daily"]
@@ -41,7 +47,7 @@ class Timeframe_Class:
     Attributes:
         timeframe (str): The timeframe associated with this instance.
         DataSet (pd.DataFrame): A DataFrame containing market data for the given timeframe.
-        CMySQL_DataBase (Database_Class): An instance of the database class for interacting with MySQL.
+        CMySQL_DataBase (Storage_Class): An instance of the storage class (MySQL for the live bot).
         detector (FlagDetector_Class): An instance of the flag detector class for detecting flags in the data.
         dps_to_update (list[tuple[int, int]]): A list of decision points (DPs) that need to be updated.
         Tradeable_DPs (list[tuple[DP_Parameteres_Class, int]]): A list of tradeable decision points.
@@ -83,11 +89,11 @@ class Timeframe_Class:
                 - None
             Exceptions:
                 - Exception: If any error occurs during validation or database operations.
-        async Each_DP_validation_Function(aDP: DP_Parameteres_Class, The_index_DP: str):
+        async Each_DP_validation_Function(aDP: DP_Parameteres_Class, The_index_DP: int):
             Validates a single decision point (DP) and determines its tradeability.
             Inputs:
                 - aDP (DP_Parameteres_Class): The decision point to validate.
-                - The_index_DP (str): The index of the decision point.
+                - The_index_DP (int): The index of the decision point.
             Outputs:
                 - None
             Exceptions:
@@ -102,27 +108,47 @@ class Timeframe_Class:
                 - Exception: If any error occurs during position opening or database insertion.
     """
     
-    def __init__(self, The_timeframe: str):
+    def __init__(self, The_timeframe: str, The_symbol: str = config["trading_configs"]["asset"], The_storage: typing.Optional[Storage_Class] = None):
         """
         Initializes an instance of the class with the specified timeframe.
         Args:
             The_timeframe (str): A string representing the timeframe for the instance.
+            The_symbol (str): The traded symbol (`trading_configs.asset` by default).
+            The_storage (Storage_Class): The storage to use instead of the one of `storage.backend` (the backtest
+                                         passes an in-memory SQLite storage).
         Attributes:
             timeframe (str): Stores the provided timeframe.
+            symbol (str): Stores the provided symbol.
+            stream (str): The name of the symbol × timeframe stream (`stream_name_Function`, e.g. "EURUSD_M15"):
+                          the scope of its storage and the prefix of its logs.
             DataSet (pd.DataFrame): An empty pandas DataFrame initialized for storing data.
-            CMySQL_DataBase (Database_Class): An instance of the `Database_Class` initialized with the given timeframe.
+            CMySQL_DataBase (Storage_Class): The storage of the timeframe: `Database_Class` (MySQL), or the backend
+                                             selected by `storage.backend` in config.json.
             detector (FlagDetector_Class): An instance of the `FlagDetector_Class` initialized with the given timeframe 
                                            and the `CMySQL_DataBase` instance.
+            Order_Manager (Order_Manager_Class): The order-management pass of the timeframe (`Update_Positions_Function`).
+            model_directory (str): Where the ML models are saved (the working directory; a backtest uses its own).
+            retrain_every (float): ML passes between two retrainings (`ML_Engine.Retrain_Every`).
         This constructor sets up the necessary attributes for the class, including initializing a database connection 
         and a flag detector specific to the provided timeframe.
         """
         
         self.timeframe = The_timeframe
+        self.symbol = The_symbol
+        self.stream = stream_name_Function(The_symbol, The_timeframe)
         self.DataSet = pd.DataFrame()
         global config
-        self.CMySQL_DataBase = Database_Class(The_timeframe)
-        self.detector = FlagDetector_Class(The_timeframe, self.CMySQL_DataBase)
+        self.CMySQL_DataBase = create_storage_Function(self.stream) if The_storage is None else The_storage
+        self.detector = FlagDetector_Class(self.stream, self.CMySQL_DataBase)
+        self.Order_Manager = Order_Manager_Class(The_timeframe, self.CMySQL_DataBase, The_symbol=The_symbol)
+        self.Tick_Buffer = CTick_Buffers[The_symbol]
         self.RANDOM_STATE = 42
+        self.model_directory = "."
+        self.retrain_every: float = RETRAIN_EVERY
+        self.retrain_counters: dict[str, int] = {}
+        self.loaded_models: dict[str, tuple[float, tuple]] = {}  # model file -> (mtime, its unpickled content)
+        self.predictions: dict[int, tuple[tuple, np.ndarray]] = {}  # DP key -> (model inputs, probability per RR level)
+        self.predicting_models: typing.Optional[dict] = None  # the models `predictions` were made with
     
     def set_data_Function(self, aDataSet: pd.DataFrame) -> bool:
         if self.DataSet.equals(aDataSet):
@@ -154,7 +180,7 @@ class Timeframe_Class:
         try:
             await run_with_retries_Function(self.detector.run_detection_Function,self.DataSet)
         except RuntimeError as The_error:
-            print_and_logging_Function("error", f"{self.timeframe} Flag detection failed: {The_error}", "title")
+            print_and_logging_Function("error", f"{self.stream} Flag detection failed: {The_error}", "title")
     
     async def validate_DPs_Function(self):
         """
@@ -169,7 +195,7 @@ class Timeframe_Class:
         Attributes:
             self.dps_to_update (list[tuple[int, int]]): A list of tuples containing DP IDs and their updated weights.
             self.Tradeable_DPs (list[tuple[DP_Parameteres_Class, int]]): A list of tradeable DP objects and their indices.
-            self.inserting_BackTest_DB (list[tuple[str, str, float, float, float, datetime.datetime, int, int, float]]): 
+            self.inserting_BackTest_DB (list[tuple[int, str, float, float, float, datetime.datetime, int, int, float]]): 
                 A list of tuples representing backtest positions to be inserted into the database.
         Steps:
             1. Retrieve tradeable DPs using `self.CMySQL_DataBase._get_tradeable_DPs_Function()`.
@@ -186,9 +212,9 @@ class Timeframe_Class:
         
         try:
             # Initialize list to store DPs that need to be updated
-            self.dps_to_update : list[tuple[str, float]] = []
-            self.Tradeable_DPs: list[str] = []
-            self.inserting_BackTest_DB: list[tuple[str, float]] = []
+            self.dps_to_update : list[tuple[int, float]] = []
+            self.Tradeable_DPs: list[int] = []
+            self.inserting_BackTest_DB: list[tuple[int, float]] = []
             
             valid_DPs = await self.CMySQL_DataBase._get_update_DPlist_Function()
             
@@ -205,9 +231,10 @@ class Timeframe_Class:
             try:
                 await self.CMySQL_DataBase._update_dp_Results_Function(self.inserting_BackTest_DB)
                 if len(self.inserting_BackTest_DB) > 0 :
-                    print_and_logging_Function("info", f"{self.timeframe} -> {len(self.inserting_BackTest_DB)} backtest positions inserted in DB", "description")
+                    CBroker_Metadata.invalidate_Function()  # the positions of these DPs may have closed: the balance moved
+                    print_and_logging_Function("info", f"{self.stream} -> {len(self.inserting_BackTest_DB)} backtest positions inserted in DB", "description")
             except Exception as e:
-                print_and_logging_Function("error", f"{self.timeframe} -> Error in inserting BackTest position in DB: {e}", "title")
+                print_and_logging_Function("error", f"{self.stream} -> Error in inserting BackTest position in DB: {e}", "title")
                 
             # Batch update the database
             if self.dps_to_update:
@@ -217,9 +244,9 @@ class Timeframe_Class:
                     raise e
                 
         except Exception as e:
-            print_and_logging_Function("error", f"{self.timeframe} -> Error in validating DPs: {e}", "title")
+            print_and_logging_Function("error", f"{self.stream} -> Error in validating DPs: {e}", "title")
             
-    async def Each_DP_validation_Function(self, aDP: DP_Parameteres_Class, The_index_DP: str):
+    async def Each_DP_validation_Function(self, aDP: DP_Parameteres_Class, The_index_DP: int):
         """
         Validates a Decision Point (DP) for trading based on the provided parameters and updates the relevant data structures.
         This function evaluates whether a given DP is valid for trading based on its trade direction (Bullish or Bearish),
@@ -234,8 +261,8 @@ class Timeframe_Class:
                     - `trade_direction`: The direction of the trade ("Bullish" or "Bearish").
                     - `Low.price`: The low price level of the DP.
                     - `High.price`: The high price level of the DP.
-            The_index_DP (str): 
-                A string identifier for the DP being validated.
+            The_index_DP (int): 
+                The 64-bit database key of the DP being validated.
         Returns:
             None: 
                 The function does not return a value. Instead, it updates the following internal attributes of the class:
@@ -256,6 +283,7 @@ class Timeframe_Class:
                 - Checks if any low price is less than or equal to the DP's high price.
                 - Calculates the maximum risk-reward ratio (RR) for the trade.
                 - Updates the backtesting database or marks the DP as tradeable.
+            - In tick mode, the entry and stop bars are resolved on their ticks (`_tick_extremes_Function`).
         """
         
         try:
@@ -287,6 +315,10 @@ class Timeframe_Class:
                     if sl_idx is not None:
                         lows = low_series[entry_idx + 1:sl_idx]
                         self.dps_to_update.append((The_index_DP, 0))
+
+                    tick_extremes = await self._tick_extremes_Function(aDP, time_series, entry_idx, sl_idx)
+                    if tick_extremes is not None:
+                        lows = np.concatenate((low_series[entry_idx + 1:sl_idx], tick_extremes))
                        
 
                     if lows.size == 0:
@@ -314,6 +346,10 @@ class Timeframe_Class:
                     if sl_idx is not None:
                         highs = high_series[entry_idx + 1:sl_idx]
                         self.dps_to_update.append((The_index_DP, 0))
+
+                    tick_extremes = await self._tick_extremes_Function(aDP, time_series, entry_idx, sl_idx)
+                    if tick_extremes is not None:
+                        highs = np.concatenate((high_series[entry_idx + 1:sl_idx], tick_extremes))
                     
                     if highs.size == 0:
                         max_rr = -1
@@ -329,26 +365,94 @@ class Timeframe_Class:
 
         except Exception as e:
             raise Exception(f"validating the {The_index_DP} DP: {e}")
+
+    async def _tick_extremes_Function(self, aDP: DP_Parameteres_Class, time_series: np.ndarray, entry_idx: int, sl_idx: typing.Optional[int]) -> typing.Optional[list[float]]:
+        """
+        Tick mode (`ticks.enabled`): on the bars alone, the price reached after the entry inside the entry bar, and
+        before the stop inside the stop bar, is unknown, so `Each_DP_validation_Function` leaves both bars out of
+        the max RR once the stop is hit. This resolves them on the ticks (bid, as the bars) of those two bars only:
+        the best price between the entry tick and the stop tick (or the bar end) of each.
+        Returns:
+            list[float]: The best price after the entry in the entry bar and before the stop in the stop bar (a bar
+            without such ticks adds none); None when tick mode is off, the bars are older than the retention window,
+            or their ticks are unavailable or disagree with the bars: the bar-based max RR is kept.
+        """
+        bar_ms = BAR_SECONDS.get(self.timeframe, 0) * 1000
+        if not TICKS_ENABLED or not bar_ms:
+            return None
+        bar_starts = time_series.astype("datetime64[ms]").astype(np.int64)
+        if bar_starts[entry_idx] < bar_starts[-1] + bar_ms - TICK_RETENTION_MS:
+            return None
+
+        # Bearish prices are negated, so both directions look for the first tick at or below the entry / stop and the highest price after it
+        sign = 1.0 if aDP.trade_direction == "Bullish" else -1.0
+        entry_price = sign * (aDP.High.price if sign > 0 else aDP.Low.price)
+        stop_price = sign * (aDP.Low.price if sign > 0 else aDP.High.price)
+        extremes = []
+        for The_bar in sorted({entry_idx, entry_idx if sl_idx is None else sl_idx}):
+            The_ticks = await self.Tick_Buffer.ticks_Function(int(bar_starts[The_bar]), int(bar_starts[The_bar]) + bar_ms)
+            if The_ticks is None or len(The_ticks[0]) == 0:
+                return None
+            prices = sign * The_ticks[1]
+            first = 0
+            if The_bar == entry_idx:
+                entry_hits = np.flatnonzero(prices <= entry_price)
+                if entry_hits.size == 0:
+                    return None
+                first = int(entry_hits[0])
+            last = len(prices)
+            if The_bar == sl_idx:
+                stop_hits = np.flatnonzero(prices[first:] <= stop_price)
+                if stop_hits.size == 0:
+                    return None
+                last = first + int(stop_hits[0])
+            if The_bar == entry_idx:
+                first += 1  # the entry tick itself is no move past the entry
+            if last > first:
+                extremes.append(sign * float(prices[first:last].max()))
+        return extremes
     
-    async def ML_Main_Function(self):
+    async def ML_Main_Function(self, The_Tradeable_DPs: typing.Optional[list[int]] = None) -> list[tuple[DP_Parameteres_Class, typing.Union[int, None], float, float, float]]:
+        """
+        Scores the tradeable DPs (`The_Tradeable_DPs`, by default those of the last validation) and returns the trade
+        list (also kept in `self.Do_Trade_DpList`). The pipeline passes its own snapshot, since the validation of the
+        next bar may already be refilling `self.Tradeable_DPs`.
+        The ML table is only read when the models are retrained. The DPs are scored in one batch per RR level, and
+        only those whose model inputs changed since the last pass with the same models (`self.predictions`).
+        """
         RR_levels = np.arange(1.25, 5.1, 0.25)  # Range of test RRs
         probs = []
-        self.Do_Trade_DpList : list[tuple[DP_Parameteres_Class, typing.Union[str, None], float, float, float]] = []
-        X_FTC, Y_FTC = await self.CMySQL_DataBase.Read_ML_table_Function()
-        FTC_models, model_weights = self.RR_ML_Training(RR_levels, X_FTC, Y_FTC, "FTC")
-        DP_TradeList = await self.CMySQL_DataBase._get_tradeable_DPs_Function(self.Tradeable_DPs)
+        Do_Trade_DpList : list[tuple[DP_Parameteres_Class, typing.Union[int, None], float, float, float]] = []
+        self.Do_Trade_DpList = Do_Trade_DpList
+        X_FTC, Y_FTC = await self.CMySQL_DataBase.Read_ML_table_Function() if self.retrain_due_Function("FTC") else (None, None)
+        FTC_models, model_weights = self.RR_ML_Training(RR_levels, X_FTC, Y_FTC, "FTC") # type: ignore
+        DP_TradeList = await self.CMySQL_DataBase._get_tradeable_DPs_Function(self.Tradeable_DPs if The_Tradeable_DPs is None else The_Tradeable_DPs)
         
         if any(np.isnan(k) for k in FTC_models.keys()):
-            return
+            return Do_Trade_DpList
         
-        for i in range(len(DP_TradeList)):
-            The_DP = DP_TradeList[i]
-            if(The_DP.type != "FTC"): 
-                continue
+        FTC_DPs = [The_DP for The_DP in DP_TradeList if The_DP.type == "FTC"]
+        if self.predicting_models is not FTC_models:
+            self.predictions = {}
+            self.predicting_models = FTC_models
+        predictions: dict[int, tuple[tuple, np.ndarray]] = {}
+        to_score: list[tuple[DP_Parameteres_Class, dict]] = []
+        for The_DP in FTC_DPs:
+            The_inputs = The_DP.model_input_row_Function()
+            known = self.predictions.get(The_DP.key)
+            if known is not None and known[0] == tuple(The_inputs.values()):
+                predictions[The_DP.key] = known
+            else:
+                to_score.append((The_DP, The_inputs))
+        if to_score:
+            model_input = pd.DataFrame([The_inputs for _, The_inputs in to_score])
+            scores = np.column_stack([FTC_models[rr].predict_proba(model_input)[:, 1] for rr in RR_levels])
+            for (The_DP, The_inputs), The_probs in zip(to_score, scores):
+                predictions[The_DP.key] = (tuple(The_inputs.values()), The_probs)
+        self.predictions = predictions
 
-            probs = np.array([
-                    FTC_models[rr].predict_proba(The_DP.to_model_input_Function())[0, 1] for rr in RR_levels
-                ])
+        for The_DP in FTC_DPs:
+            probs = predictions[The_DP.key][1]
 
             # Enforce monotonicity (with a threshold)
             if not np.all(probs[:-1] + 0.1 >= probs[1:]):
@@ -367,27 +471,51 @@ class Timeframe_Class:
                                                                                         Estimated_trade_nums_Daily= Max_No_Trade_Daily,
                                                                                         Trade_RR= best_rr)
                     if trade_risk_percent > 0 :
-                        self.Do_Trade_DpList.append((The_DP, The_DP.ID_generator_Function(), trade_risk_percent, best_rr, min(1,probs[best_rr_idx]*model_weights[RR_levels[best_rr_idx]])))
+                        Do_Trade_DpList.append((The_DP, The_DP.key, trade_risk_percent, best_rr, min(1,probs[best_rr_idx]*model_weights[RR_levels[best_rr_idx]])))
                     else:
                         raise Exception(f"Trade risk is calculated wrong: {trade_risk_percent}")
                 except Exception as e:
-                    print_and_logging_Function("error",f"{self.timeframe} -> Error in adding {The_DP.ID_generator_Function()} in Trade List: {e}")    
+                    print_and_logging_Function("error",f"{self.stream} -> Error in adding {The_DP.ID_generator_Function()} in Trade List: {e}")    
+        return Do_Trade_DpList
+
+    def model_path_Function(self, DP_type: str = "FTC") -> str:
+        """ The file the models of `DP_type` are saved to, in `self.model_directory`. """
+        return os.path.join(self.model_directory, f"{DP_type}_{self.stream}_models.pkl")
+
+    def retrain_due_Function(self, DP_type: str = "FTC") -> bool:
+        """ Whether the next `RR_ML_Training` call retrains (and so needs the ML table): no saved models yet, or `retrain_every` passes since the last retraining. """
+        return not os.path.exists(self.model_path_Function(DP_type)) or self.retrain_counters.get(DP_type, 0) + 1 >= self.retrain_every
+
+    def request_retrain_Function(self, DP_type: str = "FTC"):
+        """ Makes the next `RR_ML_Training` call retrain, whatever the number of passes since the last retraining. """
+        self.retrain_counters[DP_type] = self.retrain_every # type: ignore
+
+    def _load_models_Function(self, The_path: str) -> tuple:
+        """ The (models, weights, score) saved in `The_path`, unpickled once per version of the file (its mtime). """
+        mtime = os.path.getmtime(The_path)
+        loaded = self.loaded_models.get(The_path)
+        if loaded is None or loaded[0] != mtime:
+            with open(The_path, "rb") as f:
+                loaded = (mtime, pickle.load(f))
+            self.loaded_models[The_path] = loaded
+        return loaded[1]
 
     def RR_ML_Training(self, RR_values: np.ndarray, Input: pd.DataFrame, Output: pd.DataFrame, DP_type: str = "FTC") -> tuple[dict[float, CatBoostClassifier], dict[float, float]]:
         try:
             # --- Load Counter ---
-            self.retrain_counters = getattr(self, 'retrain_counters', {})
             self.retrain_counters[DP_type] = self.retrain_counters.get(DP_type, 0) + 1
 
-            model_cache_path = f"{DP_type}_{self.timeframe}_models.pkl"
+            model_cache_path = self.model_path_Function(DP_type)
+            legacy_cache_path = os.path.join(self.model_directory, f"{DP_type}_{self.timeframe}_models.pkl")  # saved before the symbol-qualified names
+            if self.symbol == SYMBOLS[0] and not os.path.exists(model_cache_path) and os.path.exists(legacy_cache_path):
+                os.replace(legacy_cache_path, model_cache_path)
 
             # --- Use Cached Models if Available and Not Due for Retrain ---
             if os.path.exists(model_cache_path):
-                with open(model_cache_path, "rb") as f:
-                    prev_models, prev_model_weights, prev_model_score = pickle.load(f)
+                prev_models, prev_model_weights, prev_model_score = self._load_models_Function(model_cache_path)
                     
-                if self.retrain_counters[DP_type] < RETRAIN_EVERY:
-                    print_and_logging_Function("info", f"{self.timeframe} -> ML Engine: Using cached model for DP type '{DP_type}'. Retraining in {RETRAIN_EVERY - self.retrain_counters[DP_type]} iterations.","title")
+                if self.retrain_counters[DP_type] < self.retrain_every:
+                    print_and_logging_Function("info", f"{self.stream} -> ML Engine: Using cached model for DP type '{DP_type}'. Retraining in {self.retrain_every - self.retrain_counters[DP_type]} iterations.","title")
                     return prev_models, prev_model_weights
             else:
                 prev_model_score = -1
@@ -411,7 +539,7 @@ class Timeframe_Class:
             model_weights : dict[float, float] = {}
 
             if y_test.shape[0] <= MIN_Test_Dataset_size:
-                print_and_logging_Function("warning",f"{self.timeframe} -> Testing Dataset is under valid size: {MIN_Test_Dataset_size}. No Valid model.", "title")
+                print_and_logging_Function("warning",f"{self.stream} -> Testing Dataset is under valid size: {MIN_Test_Dataset_size}. No Valid model.", "title")
                 return {float("nan"): CatBoostClassifier()} , {}
             
                 ##### Able to trade if dataset is close or not ?!
@@ -420,7 +548,7 @@ class Timeframe_Class:
             
             for rr in RR_values:
                 try:
-                    print_and_logging_Function("info", f"{self.timeframe} -> Training the {rr} model for {DP_type} {self.timeframe}", "title")
+                    print_and_logging_Function("info", f"{self.stream} -> Training the {rr} model for {DP_type} {self.stream}", "title")
                     # Binary label for this RR
                     y_train_bin : pd.DataFrame = (y_train >= rr).astype(int)
                     y_test_bin : pd.DataFrame = (y_test >= rr).astype(int)
@@ -459,7 +587,7 @@ class Timeframe_Class:
 
                     # Check if any high-probability samples exist
                     if (df["bucket"] == "high").sum() == 0:
-                        print_and_logging_Function("warning",f"{self.timeframe} -> RR {rr} -> \n No predictions with prob >= {TARGET_PROB}. \n Model is too conservative or threshold too high.Won't be considered as a valid model","title")
+                        print_and_logging_Function("warning",f"{self.stream} -> RR {rr} -> \n No predictions with prob >= {TARGET_PROB}. \n Model is too conservative or threshold too high.Won't be considered as a valid model","title")
                         model_weights[rr] = 0.0
                         continue
 
@@ -472,7 +600,7 @@ class Timeframe_Class:
                     # Check high-prob group
                     high = bucket_summary.loc["high"]
                     if high["empirical_winrate"].item() < high["predicted_prob"].item() - 0.2:
-                        print_and_logging_Function("warning",f"{self.timeframe} -> RR {rr} -> \n High-prob group underperforms: empirical winrate {high['empirical_winrate']:.2f} is more than 0.2 less than predicted {high['predicted_prob']:.2f}.\n Won't be considered as a valid model", "title")
+                        print_and_logging_Function("warning",f"{self.stream} -> RR {rr} -> \n High-prob group underperforms: empirical winrate {high['empirical_winrate']:.2f} is more than 0.2 less than predicted {high['predicted_prob']:.2f}.\n Won't be considered as a valid model", "title")
                         model_weights[rr] = 0.0
                         continue
 
@@ -480,7 +608,7 @@ class Timeframe_Class:
                     if "low" in bucket_summary.index:
                         low = bucket_summary.loc["low"]
                         if low["empirical_winrate"].item() > 0.5:
-                            print_and_logging_Function("warning",f"{self.timeframe} -> RR {rr} -> \n Low-prob group too strong: empirical winrate is {low['empirical_winrate']:.2f} (> 0.5), check model discrimination. \n Won't be considered as a valid model", "title")
+                            print_and_logging_Function("warning",f"{self.stream} -> RR {rr} -> \n Low-prob group too strong: empirical winrate is {low['empirical_winrate']:.2f} (> 0.5), check model discrimination. \n Won't be considered as a valid model", "title")
                             model_weights[rr] = 0.0
                             continue
                     model_weights[rr] = (high["empirical_winrate"].item() / high["predicted_prob"].item())
@@ -492,7 +620,7 @@ class Timeframe_Class:
                 
             if winrate <= (TARGET_PROB**2) and result_on_test <= 0 : 
                 self.RANDOM_STATE = random.randint(10, 50)
-                print_and_logging_Function("warning", f"{self.timeframe} -> Based on current data Bot is not profitable", "title")
+                print_and_logging_Function("warning", f"{self.stream} -> Based on current data Bot is not profitable", "title")
                 return {float("nan"): CatBoostClassifier()} , {}
                 
             # Save updated models and weights if needed
@@ -501,18 +629,19 @@ class Timeframe_Class:
             if model_score > prev_model_score:
                 with open(model_cache_path, "wb") as f:
                     pickle.dump((models, model_weights, model_score), f)
+                self.loaded_models[model_cache_path] = (os.path.getmtime(model_cache_path), (models, model_weights, model_score))
                 
-                print_and_logging_Function("info", f"{self.timeframe} -> ML model is updated. new score -> {model_score} prev score -> {prev_model_score}")
-                CTelegramBot.send_message(text=f"🧠 {self.timeframe} -> ML model is updated. new score -> {model_score} prev score -> {prev_model_score}"
+                print_and_logging_Function("info", f"{self.stream} -> ML model is updated. new score -> {model_score} prev score -> {prev_model_score}")
+                CTelegramBot.send_message(text=f"🧠 {self.stream} -> ML model is updated. new score -> {model_score} prev score -> {prev_model_score}"
                                           f"\n\n\n Based on the new Backtest Result: \n PNL : {result_on_test / TEST_TRAIN_SPLIT}"
                                           f"\n Winrate: {winrate} \n out of {total_trades} Trades")
                 return models, model_weights                
             else:
-                print_and_logging_Function("info", f"{self.timeframe} ->  model did not updated. new score -> {model_score} prev score -> {prev_model_score}. Previous model will be used!")
+                print_and_logging_Function("info", f"{self.stream} ->  model did not updated. new score -> {model_score} prev score -> {prev_model_score}. Previous model will be used!")
                 return prev_models, prev_model_weights
                     
         except Exception as e:
-            print_and_logging_Function("error", f"{self.timeframe} -> An error occured in Backtesting the ML on Test Dataset:{e}", "title")
+            print_and_logging_Function("error", f"{self.stream} -> An error occured in Backtesting the ML on Test Dataset:{e}", "title")
             return {float("nan"): CatBoostClassifier()} , {}
     
     def BackTest_ML_Model_on_TestDataset_Function(self, 
@@ -526,12 +655,10 @@ class Timeframe_Class:
             succeeded_trades = 0
             total_trades = 0
 
+            # One batch per RR level over the whole test dataset
+            probs_by_RR = np.column_stack([models[rr].predict_proba(X_test)[:, 1] for rr in RR_values]) if len(X_test) else np.empty((0, len(RR_values)))
             for i in range(len(X_test)):
-                probs = []
-                for rr in RR_values:
-                    probs.append(models[rr].predict_proba(X_test.iloc[[i]])[0, 1])
-
-                probs = np.array(probs)
+                probs = probs_by_RR[i]
 
                 # Enforce monotonicity (with a threshold)
                 if not np.all(probs[:-1] + 0.1 >= probs[1:]):
@@ -552,262 +679,98 @@ class Timeframe_Class:
                                                                                             Trade_RR= best_rr) * best_rr
                                 succeeded_trades += 1
                             except Exception as e:
-                                print_and_logging_Function("error",f"{self.timeframe} -> Error in Backtesting the ML model on Test Dataset: {e}")
+                                print_and_logging_Function("error",f"{self.stream} -> Error in Backtesting the ML model on Test Dataset: {e}")
                         else:
                             try:
                                 result_on_test -= Position_Manager_Class.Risk_Calculator_Function(Estimated_Trade_win_Prob= min(1,probs[best_rr_idx]*model_weights[RR_values[best_rr_idx]]),
                                                                                             Estimated_trade_nums_Daily= Max_No_Trade_Daily,
                                                                                             Trade_RR= best_rr)
                             except Exception as e:
-                                print_and_logging_Function("error",f"{self.timeframe} -> Error in Backtesting the ML model on Test Dataset: {e}")
+                                print_and_logging_Function("error",f"{self.stream} -> Error in Backtesting the ML model on Test Dataset: {e}")
                         total_trades += 1
             if total_trades > 0:
                 winrate = succeeded_trades / total_trades
-                print_and_logging_Function("info", f"{self.timeframe} -> The result of BackTest on test dataset: \n {result_on_test * 100} percent profit with the {winrate} winrate in {total_trades} trades", "title")
+                print_and_logging_Function("info", f"{self.stream} -> The result of BackTest on test dataset: \n {result_on_test * 100} percent profit with the {winrate} winrate in {total_trades} trades", "title")
             else:
                 winrate = 0
                 
             return winrate, result_on_test, total_trades
         
-    async def Update_Positions_Function(self):
+    async def Update_Positions_Function(self, The_Do_Trade_DpList: typing.Optional[list[tuple[DP_Parameteres_Class, typing.Union[int, None], float, float, float]]] = None):
         """
-        This asynchronous function is responsible for updating trading positions by opening new positions 
-        for tradeable decision points (DPs) that have not yet been traded. It interacts with a trading 
-        module to open positions and inserts the details of successfully opened positions into a database.
-        
+        This asynchronous function brings the orders of the timeframe to its trade list, as one pass of
+        `Order_Manager_Class`:
+        1. Takes one snapshot of the pending orders and open positions of the asset at the broker.
+        2. Diffs it against the desired orders of the trade list and the placed ones (`Traded_DP_Dict`):
+            - DPs without an order get a new pending order (Buy Limit / Sell Limit sized by their estimated risk).
+            - Pending orders whose desired TP moved below the placed one get their TP modified.
+            - Pending orders whose DP left the trade list are cancelled.
+        3. Runs these actions with bounded concurrency through the broker gateway, then writes the new, modified and
+           cancelled positions to the DB in one batch each.
+        4. Sends the Telegram notifications of the pass once it is over.
+
         Inputs:
-        - None (The function operates on the instance variables of the class it belongs to).
-        
-        Key Operations:
-        1. Iterates through `self.Tradeable_DPs`:
-            - For each tradeable decision point (DP) and its index, checks if the DP has already been traded 
-              by verifying its presence in `self.CMySQL_DataBase.Traded_DP_Set`.
-            - If the DP has not been traded:
-                - Calls `CMetatrader_Module.Open_position_Function` to open a new position with the following parameters:
-                    - `order_type`: Determines whether the order is "Buy Limit" or "Sell Limit" based on the trade direction.
-                    - `vol`: Sets the volume of the trade (fixed at 0.01 in this implementation).
-                    - `price`: Sets the entry price based on the trade direction.
-                    - `sl`: Sets the stop-loss price based on the trade direction.
-                    - `tp`: Sets the take-profit price based on the trade direction.
-                - If the position opening fails, logs an error message.
-                - If the position opening succeeds:
-                    - Retrieves the correct order type using `CMetatrader_Module.reverse_order_type_mapping`.
-                    - Appends the position details to the `inserting_positions_DB` list for later database insertion.
-                    - Increments the `new_opened_positions` counter.
-                    - Logs a success message for the newly opened position.
-        2. Inserts the new positions into the database:
-            - Calls `self.CMySQL_DataBase._insert_positions_batch` with the `inserting_positions_DB` list.
-            - Logs the number of successfully opened and inserted positions.
-            - Catches and logs any exceptions that occur during the database insertion process.
-            
+        - The_Do_Trade_DpList: The trade list of `ML_Main_Function` to act on (by default `self.Do_Trade_DpList`).
+
         Outputs:
         - None (The function performs operations and logs results but does not return any value).
-        
-        Notes:
-        - The function relies on external modules (`CMetatrader_Module` and `self.CMySQL_DataBase`) for trading 
-          and database operations, respectively.
-        - The function uses `print_and_logging_Function` for logging messages of different severity levels 
-          (e.g., "info", "error").
-        - The function assumes that `self.Tradeable_DPs` is a list of tuples containing tradeable decision points 
-          and their indices.
         """
-        new_opened_positions = 0
-        inserting_positions_DB: list[tuple[str, str, float, float, float, datetime.datetime, int, int, int, float]] = []
-        modifying_TP_DB: list[tuple[int, float]] = []
-
-        for aDP, The_index, Estimated_Risk, Estimated_RR, probability in self.Do_Trade_DpList:
-            if The_index is None:
-                continue
-            
-            # Trade new detected DPs            
-            if The_index not in self.CMySQL_DataBase.Traded_DP_Dict.keys():
-                try:
-                    if aDP.trade_direction == "Bullish":    
-                        result = CMetatrader_Module.Open_position_Function(
-                            order_type=     "Buy Limit",
-                            vol=            Position_Manager_Class.Vol_Calculator_RiskBased_Function(aDP.High.price, aDP.Low.price, Estimated_Risk, config["trading_configs"]["asset"]),
-                            price=          aDP.High.price,
-                            sl=             aDP.Low.price,
-                            tp=             aDP.High.price + Estimated_RR * (aDP.High.price - aDP.Low.price),
-                            comment =       f"{int(probability * 100)}% chance, {self.timeframe}",
-                            
-                        )
-                    else:
-                        result = CMetatrader_Module.Open_position_Function(
-                            order_type=     "Sell Limit",
-                            vol=            Position_Manager_Class.Vol_Calculator_RiskBased_Function(aDP.High.price, aDP.Low.price, Estimated_Risk, config["trading_configs"]["asset"]),
-                            price=          aDP.Low.price,
-                            sl=             aDP.High.price,
-                            tp=             aDP.Low.price - Estimated_RR * (aDP.High.price - aDP.Low.price),
-                            comment =       f"{int(probability * 100)}% chance, {self.timeframe}",
-                        )
-                    if result is None:
-                        continue
-                    # Not a valid trade (Not MT5 error!)
-                    # ========================================================
-                    # ========================================================
-                    # ========================================================
-                    
-                    elif result.retcode != CMetatrader_Module.mt.TRADE_RETCODE_DONE: # type: ignore
-                        print_and_logging_Function("error", f"{self.timeframe} -> Error in opening position of DP No.{The_index}. The message \n {result}", "title")
-                    else:
-                        if not config["runtime"]["Able_to_Open_positions"]:
-                            CMetatrader_Module.cancel_order(result.order) # type: ignore
-                        # Get the correct order type from the mapping
-                        order_type = CMetatrader_Module.reverse_order_type_mapping.get(result.request.type) # type: ignore
-
-                        inserting_positions_DB.append((
-                            The_index,                # traded_dp_id
-                            str(order_type),               # order_type
-                            result.request.price,     # price # type: ignore
-                            result.request.sl,        # sl # type: ignore
-                            result.request.tp,        # tp # type: ignore
-                            datetime.datetime.now(),  # Last_modified_time
-                            result.request.volume,    # vol # type: ignore
-                            result.order,             # order_id # type: ignore
-                            int(probability * 100),   # Estimated win chance
-                            0                         # The result of trade
-                        )) # type: ignore
-
-                        new_opened_positions += 1
-                        print_and_logging_Function("info", f"{self.timeframe} -> New position opened: DP {The_index}", "description")
-                        self.CMySQL_DataBase.Traded_DP_Dict[The_index] = {"TP": result.request.tp, "Vol": result.request.volume, "Order_ID": result.order} # type: ignore
-                        try:
-                            CTelegramBot.notify_placed_position(self.timeframe, order_type, result.request.price, result.request.sl, result.request.tp, result.request.volume, int(probability * 100), result.order) # type: ignore
-                        except Exception as e:
-                            print_and_logging_Function("error", f"{self.timeframe} -> {e}", "title")
-
-                except RuntimeError as e:
-                    print_and_logging_Function("error", f"{self.timeframe} -> Error in opening the position of DP No. {The_index}: {e}")
-            # Modify Trades which their info has been changed
-            else:
-                try:
-                    previous_info = self.CMySQL_DataBase.Traded_DP_Dict[The_index] # type: ignore
-                    if aDP.trade_direction == "Bullish":    
-                        new_TP = aDP.High.price + Estimated_RR * (aDP.High.price - aDP.Low.price)
-                    else:
-                        new_TP = aDP.Low.price - Estimated_RR * (aDP.High.price - aDP.Low.price)
-                        
-                    # Looking for TP changes
-                    if new_TP < previous_info["TP"]:
-                        result = CMetatrader_Module.modify_pending_order_Function(self.CMySQL_DataBase.Traded_DP_Dict[The_index]["Order_ID"], new_TP) # type: ignore
-                        if result is None:
-                            continue
-                            # An error happened (Not Mt5 error, should alert user later)
-                            # ========================================================
-                            # ========================================================
-                            # ========================================================
-                        elif result.retcode != CMetatrader_Module.mt.TRADE_RETCODE_DONE:
-                            continue
-                            # An error happened (Mt5 error, should alert user later)
-                            # ========================================================
-                            # ========================================================
-                            # ========================================================
-                        else:
-                            CTelegramBot.send_message(
-                                text=f"✏️ Take-Profit Updated\n {self.timeframe} \n\nOrder ID: {self.CMySQL_DataBase.Traded_DP_Dict[The_index]['Order_ID']}\nPrevious TP: {previous_info['TP']}\nNew TP: {result.request.tp}\n\nThis adjustment was made based on updated system logic."  # type: ignore
-                            )
-                            self.CMySQL_DataBase.Traded_DP_Dict[str(The_index)]["TP"] = float(result.request.tp)
-                            modifying_TP_DB.append((self.CMySQL_DataBase.Traded_DP_Dict[The_index]['Order_ID'], float(result.request.tp)))
-
-                    # Looking for vol changes 
-                    # ========================================================
-                    # ========================================================
-                    # ========================================================
-                    
-                except Exception as e:
-                    print_and_logging_Function("error", f"{self.timeframe} -> Error in modifying positions: {e}", "title") # type: ignore
-        
-        # insert The new positions in DB
-        try:
-            await self.CMySQL_DataBase._insert_positions_batch(inserting_positions_DB)
-            if new_opened_positions:
-                print_and_logging_Function("info", f"{self.timeframe} -> {new_opened_positions} New positions opened and inserted in DB", "title")
-        except Exception as e:
-            print_and_logging_Function("error", f"{self.timeframe} -> Error in inserting position in DB: {e}", "title")
-            
-            
-        # Update The modified positions in DB
-        try:
-            await self.CMySQL_DataBase.update_position_TPs_batch_Function(modifying_TP_DB)
-        except Exception as e:
-            print_and_logging_Function("error", f"{self.timeframe} -> Error in Updating The modified positions in DB: {e}", "title")
-        
-        # Cancel positions which are not valid anymore
-        try:
-            Pending_position_IDs = await self.CMySQL_DataBase.Read_Pending_Positions_Function()  # noqa: F841
-            valid_trade_indices = {The_index for _, The_index, _, _,_ in self.Do_Trade_DpList}  # noqa: F841
-            cancelled_positions_IDs : dict[str, int] = {}
-            
-            for The_index, order_ID in Pending_position_IDs.items():
-                if The_index not in valid_trade_indices:
-                    result = CMetatrader_Module.cancel_order(order_ID)
-                    if result.retcode != CMetatrader_Module.mt.TRADE_RETCODE_DONE: # type: ignore
-                        print_and_logging_Function("error", f"{self.timeframe} -> Error in canceling {order_ID} position: {result}", "title")
-                    else:
-                        print_and_logging_Function("info", f"{self.timeframe} -> Cancelled order {order_ID}. No more valid position", "description")
-                        cancelled_positions_IDs[The_index] = order_ID
-                        CTelegramBot.send_message(
-                            text=f"🚫 Order Cancelled\n {self.timeframe} \n\nOrder ID: {order_ID}\nReason: The setup is no longer valid based on current market conditions.\n\nTrade opportunity has been dismissed to ensure risk protection."
-                        )
-                 
-            
-            await self.CMySQL_DataBase.remove_cancelled_positions_Function(cancelled_positions_IDs)
-        except Exception as e:
-            print_and_logging_Function("error", f"{self.timeframe} -> Error in canceling invalid positions: {e}", "title")    
+        Do_Trade_DpList = self.Do_Trade_DpList if The_Do_Trade_DpList is None else The_Do_Trade_DpList
+        await self.Order_Manager.run_pass_Function(Do_Trade_DpList)
       
     async def Closing_positions_Function(self, is_forced: bool = False):
         # Alert users in Telegram
         try:
             if is_forced:
                 CTelegramBot.send_message(text=
-                                        f"⚠️Attention: Closing {self.timeframe} Positions⚠️\n\n"
+                                        f"⚠️Attention: Closing {self.stream} Positions⚠️\n\n"
                                         "Due to system conditions, please close all Pending positions immediately to avoid potential risk." 
                                         "Please wait for further notice.")
             else:
                 CTelegramBot.send_message(text=
-                                        f"🔒 {self.timeframe} Session Closure Notice\n\n"
+                                        f"🔒 {self.stream} Session Closure Notice\n\n"
                                         "All open positions are being closed as the trading session has ended. "
                                         "This action is taken as a precautionary risk management measure to prevent exposure during non-trading hours.\n\n"
                                         "📉 Please refrain from opening new positions until the next valid trading session begins. "
                                         "You will be notified when trading resumes.")
                 
         except Exception as e:
-            print_and_logging_Function("error", f"{self.timeframe} -> Error in sending message to Telegram for canceling positions...: {e}")
+            print_and_logging_Function("error", f"{self.stream} -> Error in sending message to Telegram for canceling positions...: {e}")
         
         # Cancel pending positions and remove from DB and memory
         try:
             Pending_position_IDs = await self.CMySQL_DataBase.Read_Pending_Positions_Function()
-            cancelled_positions_IDs : dict[str, int] = {}
+            cancelled_positions_IDs : dict[int, int] = {}
             for DP_Index, order_ID in Pending_position_IDs.items():
-                result = CMetatrader_Module.cancel_order(order_ID)
+                result = await CMetatrader_Module.cancel_order(order_ID)
                 if result.retcode != CMetatrader_Module.mt.TRADE_RETCODE_DONE: # type: ignore
-                    print_and_logging_Function("error", f"{self.timeframe} -> Error in canceling {order_ID} position: {result}", "title")
+                    print_and_logging_Function("error", f"{self.stream} -> Error in canceling {order_ID} position: {result}", "title")
                 else:
-                    print_and_logging_Function("info", f"{self.timeframe} -> Cancelled order {order_ID}", "description")
+                    print_and_logging_Function("info", f"{self.stream} -> Cancelled order {order_ID}", "description")
                     cancelled_positions_IDs[DP_Index] = order_ID
                     
             await self.CMySQL_DataBase.remove_cancelled_positions_Function(cancelled_positions_IDs)
         except Exception as e:
-            print_and_logging_Function("error", f"{self.timeframe} -> Error in canceling positions: {e}")
+            print_and_logging_Function("error", f"{self.stream} -> Error in canceling positions: {e}")
     
     async def Result_Reporter_Function(self):
         try:
             await self.CMySQL_DataBase.correct_position_results_Function()
-            Result_percent, Result = await self.CMySQL_DataBase.PNL_Calculator_Function()
-            winrate, trade_counts = await self.CMySQL_DataBase.winrate_Calculator_Function()
+            (Result_percent, Result), (winrate, trade_counts) = await CDB_Pool.gather_Function(
+                self.CMySQL_DataBase.PNL_Calculator_Function(),
+                self.CMySQL_DataBase.winrate_Calculator_Function())
             try:
                 CTelegramBot.send_message(
                     text=(
-                        f"📊 Performance Report - {self.timeframe} 📊\n\n"
+                        f"📊 Performance Report - {self.stream} 📊\n\n"
                         f"Result: {Result}$ ({Result_percent}%)\n"
                         f"Win Rate: {winrate:.2%}  out of {trade_counts} trades\n\n"
                         f"📈 Stay informed and manage risk accordingly."
                     )
                 )
             except Exception as e:
-                print_and_logging_Function("error", f"{self.timeframe} -> Error in sending message to Telegram for canceling positions...: {e}")
+                print_and_logging_Function("error", f"{self.stream} -> Error in sending message to Telegram for canceling positions...: {e}")
         except Exception as e:
-            raise Exception(f"{self.timeframe} -> Error in calculating / Notify user PNL: {e}")    
+            raise Exception(f"{self.stream} -> Error in calculating / Notify user PNL: {e}")    
          
-CTimeFrames = [Timeframe_Class(atimeframe) for atimeframe in config["trading_configs"]["timeframes"]]
\ No newline at end of file
+CTimeFrames = [Timeframe_Class(atimeframe, asymbol) for asymbol, atimeframe in streams_Function()]
\ No newline at end of file
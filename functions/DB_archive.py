@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import sys
+import typing
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.DB_migration import ensure_month_partitions_Function
+from functions.utilities import stream_name_Function, streams_Function
+from classes.DB_Pool import CDB_Pool
+from classes.Write_Behind import CWrite_Behind
+from classes.Scheduler import BAR_SECONDS
+from classes.Candle_Cache import CANDLE_WINDOW
+
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+ARCHIVE_CONFIG: dict = config.get("archive", {})
+RETENTION_DAYS: int = ARCHIVE_CONFIG.get("retention_days", 90)  # at least; streams whose detection window is longer keep that (`retention_cutoff_Function`)
+ARCHIVE_FORMAT: str = ARCHIVE_CONFIG.get("format", "table")  # "table" (cold MySQL tables) or "parquet"
+ARCHIVE_PATH: str = ARCHIVE_CONFIG.get("path", "./archive")
+BATCH_SIZE = 10_000
+CLOSED_WEEKDAYS: list[int] = config.get("candles", {}).get("closed_weekdays", [5, 6])
+WINDOW_MARGIN = 1.25  # holidays and missing bars stretch the calendar span of the detection window further
+
+def retention_cutoff_Function(The_timeframe: str, now: typing.Optional[datetime.datetime] = None) -> datetime.datetime:
+    """
+    The time before which the closed history of a stream (e.g. "EURUSD_M15") leaves the hot tables: the
+    retention of `archive.retention_days`, pushed back to the start of the detection window (`CANDLE_WINDOW` bars,
+    over the open weekdays only, with `WINDOW_MARGIN`) when that is older. A flag the detector still sees would be
+    found again after its archival, and `save_flags_Function` would insert it and re-activate its DPs.
+    """
+    bar_seconds = BAR_SECONDS[The_timeframe.rsplit("_", 1)[-1]]
+    open_days_share = (7 - len(set(CLOSED_WEEKDAYS))) / 7
+    window = datetime.timedelta(seconds=CANDLE_WINDOW * bar_seconds / open_days_share * WINDOW_MARGIN)
+    return (now or datetime.datetime.now()) - max(datetime.timedelta(days=RETENTION_DAYS), window)
+
+def archive_table_name_Function(The_table: str) -> str:
+    return f"Archive_{The_table}"
+
+def parquet_directory_Function(The_table: str) -> str:
+    return os.path.join(ARCHIVE_PATH, The_table)
+
+def closed_DPs_condition_Function(The_timeframe: str) -> str:
+    """
+    DPs that can leave the hot table: closed (weight 0 with a recorded Result), older than the retention cutoff, and not
+    related to a DP still active (whose Related_DP features read their Result).
+    """
+    important_dps = f"Important_DPs_{The_timeframe}"
+    return f"""
+        d.weight = 0 AND d.Result != 0 AND d.first_valid_trade_time < %s
+        AND NOT EXISTS (
+            SELECT 1 FROM {important_dps} AS a
+            WHERE a.weight > 0 AND (a.Related_DP_1 = d.id OR a.Related_DP_2 = d.id)
+        )
+    """
+
+async def _move_rows_Function(cursor, The_table: str, key_column: str, keys: list) -> int:
+    """ Copies the rows of `keys` to the cold storage of `The_table`, then deletes them from the hot table. """
+    if not keys:
+        return 0
+    in_list = ','.join(['%s'] * len(keys))
+    if ARCHIVE_FORMAT == "parquet":
+        await cursor.execute(f"SELECT * FROM {The_table} WHERE {key_column} IN ({in_list})", keys)
+        columns = [desc[0] for desc in cursor.description]
+        frame = pd.DataFrame(list(await cursor.fetchall()), columns=columns)
+        os.makedirs(parquet_directory_Function(The_table), exist_ok=True)
+        # Written before the delete: a crash in between leaves duplicates, which the readers drop
+        frame.to_parquet(os.path.join(parquet_directory_Function(The_table), f"{datetime.datetime.now():%Y%m%d_%H%M%S_%f}.parquet"),
+                         compression="zstd", index=False)
+    else:
+        archive_table = archive_table_name_Function(The_table)
+        await cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive_table} LIKE {The_table}")
+        await cursor.execute(f"INSERT IGNORE INTO {archive_table} SELECT * FROM {The_table} WHERE {key_column} IN ({in_list})", keys)
+    await cursor.execute(f"DELETE FROM {The_table} WHERE {key_column} IN ({in_list})", keys)
+    return len(keys)
+
+async def archive_timeframe_Function(The_timeframe: str) -> dict[str, int]:
+    """
+    Moves the closed history of a timeframe out of the hot tables, in batches of `BATCH_SIZE` rows:
+    closed DPs (see `closed_DPs_condition_Function`), then the Flags older than the retention cutoff
+    (`retention_cutoff_Function`) none of whose DPs is still hot, then the Flag_Points older than the cutoff no hot
+    DP or Flag points to.
+    Positions stay: they are small and the performance summary is built from them.
+    Also keeps the monthly partitions of the Flags table ahead of time.
+    Returns:
+        dict[str, int]: The number of archived rows per table.
+    """
+    important_dps = f"Important_DPs_{The_timeframe}"
+    flags = f"Flags_{The_timeframe}"
+    flag_points = f"Flag_Points_{The_timeframe}"
+    cutoff = retention_cutoff_Function(The_timeframe)
+    archived = {important_dps: 0, flags: 0, flag_points: 0}
+
+    await CWrite_Behind.flush_Function()  # the closed state of the DPs must be in the database
+    selections = [
+        (important_dps, "id", f"SELECT d.id FROM {important_dps} AS d WHERE {closed_DPs_condition_Function(The_timeframe)} LIMIT {BATCH_SIZE}"),
+        (flags, "Unique_Point", f"""
+            SELECT f.Unique_Point FROM {flags} AS f
+            WHERE f.Ending_time < %s
+            AND NOT EXISTS (SELECT 1 FROM {important_dps} AS d WHERE d.id IN (f.FTC, f.EL, f.MPL))
+            LIMIT {BATCH_SIZE}"""),
+        (flag_points, "id", f"""
+            SELECT fp.id FROM {flag_points} AS fp
+            WHERE fp.time < %s
+            AND NOT EXISTS (SELECT 1 FROM {important_dps} AS d WHERE fp.id IN (d.High_Point, d.Low_Point))
+            AND NOT EXISTS (SELECT 1 FROM {flags} AS f WHERE fp.id IN (f.High, f.Low))
+            LIMIT {BATCH_SIZE}"""),
+    ]
+    async with CDB_Pool.acquire("archive") as conn:
+        await conn.commit()
+        async with conn.cursor() as cursor:
+            for table, key_column, selection in selections:
+                while True:
+                    await cursor.execute(selection, (cutoff,))
+                    keys = [row[0] for row in await cursor.fetchall()]
+                    try:
+                        await conn.begin()
+                        moved = await _move_rows_Function(cursor, table, key_column, keys)
+                        await conn.commit()
+                    except Exception:
+                        await conn.rollback()
+                        raise
+                    archived[table] += moved
+                    if moved < BATCH_SIZE:
+                        break
+
+    with CDB_Pool.connect_sync_Function() as sync_conn:
+        added = ensure_month_partitions_Function(sync_conn.cursor(), The_timeframe)
+        sync_conn.commit()
+
+    print_and_logging_Function("info", f"{The_timeframe} -> Archived {archived[important_dps]} DPs, {archived[flags]} flags and {archived[flag_points]} flag points older than {cutoff:%Y-%m-%d %H:%M} ({ARCHIVE_FORMAT}); {added} Flags partitions added", "title")
+    return archived
+
+async def read_archived_DPs_Function(cursor, The_timeframe: str, columns: list[str]) -> pd.DataFrame:
+    """
+    The archived DPs of a timeframe (all closed, so all with a Result), restricted to `columns`, for the ML loader.
+    Parquet archives are read column-wise; cold tables are read with the caller's cursor.
+    """
+    important_dps = f"Important_DPs_{The_timeframe}"
+    parquet_files = sorted(glob.glob(os.path.join(parquet_directory_Function(important_dps), "*.parquet")))
+    frames = [pd.read_parquet(path, columns=columns) for path in parquet_files]
+
+    await cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (archive_table_name_Function(important_dps),))
+    if (await cursor.fetchone())[0]:
+        await cursor.execute(f"SELECT {', '.join(columns)} FROM {archive_table_name_Function(important_dps)}")
+        frames.append(pd.DataFrame(list(await cursor.fetchall()), columns=columns))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True).drop_duplicates(subset="id")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move the closed DP history of the hot tables to cold storage.")
+    parser.add_argument("timeframes", nargs="*", default=[stream_name_Function(asymbol, atimeframe) for asymbol, atimeframe in streams_Function()], help="stream names, e.g. EURUSD_M15")
+    args = parser.parse_args()
+
+    async def archive_all():
+        for atimeframe in args.timeframes:
+            try:
+                await archive_timeframe_Function(atimeframe)
+            except Exception as e:
+                print_and_logging_Function("error", f"{atimeframe} -> Archival failed: {e}", "title")
+        await CDB_Pool.close_Function()
+
+    asyncio.run(archive_all())
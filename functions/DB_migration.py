@@ -0,0 +1,507 @@
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+import typing
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from functions.utilities import SYMBOLS, stream_name_Function, streams_Function
+from classes.DB_Pool import CDB_Pool
+
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+SCHEMA_VERSION_TABLE = "Schema_Version"
+PERFORMANCE_SUMMARY_TABLE = "Performance_Summary"
+ER_DUP_FIELDNAME = 1060  # MySQL error raised when a column with the same name already exists
+ER_DUP_KEYNAME = 1061  # MySQL error raised when an index with the same name already exists
+ER_NO_SUCH_TABLE = 1146
+STREAM_TABLES = ("Flag_Points", "Important_DPs", "Flags", "Positions")
+
+# Schema version of every timeframe, read once per process by `ensure_schema_Function`
+schema_versions: typing.Optional[dict[str, int]] = None
+
+class String_Keys_Error(RuntimeError):
+    """ The DP tables of a timeframe still use the VARCHAR string IDs: the bot must not write integer keys into them. """
+
+def baseline_tables_statements_Function(The_timeframe: str) -> list[str]:
+    """
+    The tables of one timeframe (schema version 0). Run only when the timeframe has no recorded schema version.
+    No "FOREIGN KEY" is used, as the tables are inserted using batches, table by table.
+    All keys are 64-bit hashes of the readable IDs (see ID_to_key_Function); the readable ID is kept in `readable_id`.
+    """
+    flag_points = f"Flag_Points_{The_timeframe}"
+    important_dps = f"Important_DPs_{The_timeframe}"
+    flags = f"Flags_{The_timeframe}"
+    positions = f"Positions_{The_timeframe}"
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {flag_points} (
+            id BIGINT PRIMARY KEY,
+            readable_id VARCHAR(255) NULL,
+            price FLOAT NULL,
+            time DATETIME NULL
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {important_dps} (
+            id BIGINT PRIMARY KEY,
+            readable_id VARCHAR(255) NULL,
+            type ENUM('FTC', 'EL', 'MPL') NULL,
+            High_Point BIGINT NULL,
+            Low_Point BIGINT NULL,
+            weight FLOAT NULL,
+            first_valid_trade_time DATETIME NOT NULL,
+            trade_direction ENUM('Bullish', 'Bearish', 'Undefined') NULL,
+            length FLOAT NULL,
+            Flag_Ratio FLOAT NULL,
+            NO_Used_Candles INT NULL,
+            Used_Ratio FLOAT NULL,
+            Related_DP_1 BIGINT NULL,
+            Related_DP_2 BIGINT NULL,
+            Is_related_DP_used BOOL DEFAULT FALSE,
+            Is_golfed BOOL DEFAULT FALSE,
+            Is_used_half BOOL DEFAULT FALSE,
+            parent_length INT NULL,
+            Result FLOAT NOT NULL DEFAULT 0
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {flags} (
+            Unique_Point DATETIME NOT NULL PRIMARY KEY,
+            type ENUM('Bullish', 'Bearish', 'Undefined') NOT NULL,
+            High BIGINT NOT NULL,
+            Low BIGINT NOT NULL,
+            Starting_time DATETIME NOT NULL,
+            Ending_time DATETIME NOT NULL,
+            FTC BIGINT NULL,
+            EL BIGINT NULL,
+            MPL BIGINT NULL
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS {positions} (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            Traded_DP BIGINT NULL,
+            Order_type ENUM('Buy', 'Sell', 'Buy Limit', 'Sell Limit') NOT NULL,
+            Price FLOAT NOT NULL,
+            SL FLOAT NOT NULL,
+            TP FLOAT NOT NULL,
+            Last_modified_time DATETIME NOT NULL,
+            Vol FLOAT NOT NULL,
+            Order_ID INT NOT NULL UNIQUE,
+            Probability INT NOT NULL,
+            Result FLOAT NOT NULL DEFAULT 0
+        )
+        """
+    ]
+
+def index_statements_Function(The_timeframe: str) -> list[str]:
+    """
+    Secondary indexes for the predicates evaluated on every loop:
+    `weight > 0` and `Result != 0` on Important_DPs, `Result = 0` and `Traded_DP IN (...)` on Positions.
+    """
+    important_dps = f"Important_DPs_{The_timeframe}"
+    positions = f"Positions_{The_timeframe}"
+    return [
+        f"CREATE INDEX idx_weight ON {important_dps} (weight)",
+        f"CREATE INDEX idx_result ON {important_dps} (Result)",
+        f"CREATE INDEX idx_traded_dp ON {positions} (Traded_DP)",
+        f"CREATE INDEX idx_result ON {positions} (Result)",
+    ]
+
+def drop_result_trigger_statements_Function(The_timeframe: str) -> list[str]:
+    """
+    Position Results are reconciled set-based after every batch of DP updates (see
+    `Database_Class.reconcile_results_query_Function`), so the per-row trigger goes away.
+    """
+    return [f"DROP TRIGGER IF EXISTS trg_update_position_result_{The_timeframe}"]
+
+def performance_summary_SQL_Function(The_timeframe: str, where_clause: str = "TRUE") -> str:
+    """
+    (Re)computes the per-day rows of `Performance_Summary` of a timeframe from the positions matching
+    `where_clause`: PNL in vol*price units, winning and closed trades, grouped by the day of the position.
+    """
+    return f"""
+        INSERT INTO {PERFORMANCE_SUMMARY_TABLE} (timeframe, day, pnl_vol, wins, trades)
+        SELECT '{The_timeframe}', DATE(Last_modified_time), COALESCE(SUM(Result * Vol), 0),
+            SUM(CASE WHEN Result > 0 THEN 1 ELSE 0 END), SUM(CASE WHEN Result != 0 THEN 1 ELSE 0 END)
+        FROM Positions_{The_timeframe}
+        WHERE {where_clause}
+        GROUP BY DATE(Last_modified_time)
+        ON DUPLICATE KEY UPDATE pnl_vol = VALUES(pnl_vol), wins = VALUES(wins), trades = VALUES(trades)
+    """
+
+def performance_summary_statements_Function(The_timeframe: str) -> list[str]:
+    """ The shared per-timeframe, per-day summary table, the day index it is maintained with, and its backfill. """
+    return [
+        f"""
+        CREATE TABLE IF NOT EXISTS {PERFORMANCE_SUMMARY_TABLE} (
+            timeframe VARCHAR(16) NOT NULL,
+            day DATE NOT NULL,
+            pnl_vol DOUBLE NOT NULL DEFAULT 0,
+            wins INT NOT NULL DEFAULT 0,
+            trades INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (timeframe, day)
+        )
+        """,
+        f"CREATE INDEX idx_last_modified ON Positions_{The_timeframe} (Last_modified_time)",
+        performance_summary_SQL_Function(The_timeframe),
+    ]
+
+def month_start_Function(The_day: datetime.date, months_later: int = 0) -> datetime.date:
+    month_index = The_day.year * 12 + The_day.month - 1 + months_later
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+def month_partition_SQL_Function(The_month: datetime.date) -> str:
+    return f"PARTITION p{The_month:%Y%m} VALUES LESS THAN (TO_DAYS('{month_start_Function(The_month, 1)}'))"
+
+def flags_partitioning_statements_Function(The_timeframe: str, months_ahead: int = 2) -> list[str]:
+    """
+    Monthly RANGE partitioning of Flags_<tf> on its primary key `Unique_Point`: the history before this month in
+    one partition, one partition per month up to `months_ahead`, and a catch-all `pmax` that
+    `ensure_month_partitions_Function` splits as time goes by.
+    Important_DPs and Flag_Points are not partitioned: MySQL requires the partitioning column in every unique key,
+    which would give up the uniqueness of their `id`. They are kept small by the archival job (functions/DB_archive.py).
+    """
+    this_month = month_start_Function(datetime.date.today())
+    partitions = [f"PARTITION p_history VALUES LESS THAN (TO_DAYS('{this_month}'))"]
+    partitions += [month_partition_SQL_Function(month_start_Function(this_month, i)) for i in range(months_ahead + 1)]
+    partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return [f"ALTER TABLE Flags_{The_timeframe} PARTITION BY RANGE (TO_DAYS(Unique_Point)) ({', '.join(partitions)})"]
+
+def ensure_month_partitions_Function(cursor, The_timeframe: str, months_ahead: int = 2) -> int:
+    """
+    Splits `pmax` of Flags_<tf> so that partitions exist up to `months_ahead` months from now.
+    Returns:
+        int: The number of partitions added.
+    """
+    cursor.execute("""
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+    """, (f"Flags_{The_timeframe}",))
+    existing = {row[0] for row in cursor.fetchall()}
+    if "pmax" not in existing:
+        return 0
+
+    this_month = month_start_Function(datetime.date.today())
+    missing = [month_start_Function(this_month, i) for i in range(months_ahead + 1)]
+    missing = [month for month in missing if f"p{month:%Y%m}" not in existing]
+    latest = max((name for name in existing if name[1:].isdigit()), default=None)
+    missing = [month for month in missing if latest is None or f"p{month:%Y%m}" > latest]
+    if missing:
+        partitions = [month_partition_SQL_Function(month) for month in missing] + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+        cursor.execute(f"ALTER TABLE Flags_{The_timeframe} REORGANIZE PARTITION pmax INTO ({', '.join(partitions)})")
+    return len(missing)
+
+def widen_summary_scope_statements_Function(The_timeframe: str) -> list[str]:
+    """ Room for the symbol-qualified stream names (`stream_name_Function`) in the `timeframe` column of the shared summary. """
+    return [f"ALTER TABLE {PERFORMANCE_SUMMARY_TABLE} MODIFY timeframe VARCHAR(64) NOT NULL"]
+
+def key_SQL_Function(column: str) -> str:
+    """
+    SQL twin of `ID_to_key_Function` in classes/FlagPoint.py: the first 15 hex digits of SHA-256, as a number.
+    """
+    return f"CONV(LEFT(SHA2({column}, 256), 15), 16, 10)"
+
+def rekey_SQL_Function(column: str) -> str:
+    """
+    `key_SQL_Function` for the string IDs of `column` only: an ID that is already a number (a key the bot wrote
+    into a string-keyed table) is kept as is, and NULL stays NULL.
+    """
+    return f"CASE WHEN {column} REGEXP '^[0-9]+$' THEN {column} ELSE {key_SQL_Function(column)} END"
+
+def integer_keys_statements_Function(The_timeframe: str) -> list[str]:
+    """
+    Builds the statements converting the VARCHAR(255) string IDs of one timeframe into 64-bit integer keys.
+    The readable IDs of Flag_Points and Important_DPs are kept in a new `readable_id` column.
+    Only the string IDs are hashed (`rekey_SQL_Function`), so the statements can run again on tables the bot has
+    already written keys into, or on integer-keyed tables, without changing them.
+    Note: MySQL evaluates single-table UPDATE assignments from left to right, so `readable_id` is
+    assigned before `id` is overwritten with its key.
+    """
+    flag_points = f"Flag_Points_{The_timeframe}"
+    important_dps = f"Important_DPs_{The_timeframe}"
+    flags = f"Flags_{The_timeframe}"
+    positions = f"Positions_{The_timeframe}"
+    readable_id = "readable_id = CASE WHEN id REGEXP '^[0-9]+$' THEN readable_id ELSE id END"
+
+    return [
+        # The per-row trigger (schema version < 2) would fire for every converted DP
+        f"DROP TRIGGER IF EXISTS trg_update_position_result_{The_timeframe}",
+
+        f"ALTER TABLE {flag_points} ADD COLUMN readable_id VARCHAR(255) NULL AFTER id",
+        f"UPDATE {flag_points} SET {readable_id}, id = {rekey_SQL_Function('id')}",
+        f"ALTER TABLE {flag_points} MODIFY id BIGINT NOT NULL",
+
+        f"ALTER TABLE {important_dps} ADD COLUMN readable_id VARCHAR(255) NULL AFTER id",
+        f"""UPDATE {important_dps} SET
+                {readable_id},
+                id = {rekey_SQL_Function('id')},
+                High_Point = {rekey_SQL_Function('High_Point')},
+                Low_Point = {rekey_SQL_Function('Low_Point')},
+                Related_DP_1 = {rekey_SQL_Function('Related_DP_1')},
+                Related_DP_2 = {rekey_SQL_Function('Related_DP_2')}""",
+        f"""ALTER TABLE {important_dps}
+                MODIFY id BIGINT NOT NULL,
+                MODIFY High_Point BIGINT NULL,
+                MODIFY Low_Point BIGINT NULL,
+                MODIFY Related_DP_1 BIGINT NULL,
+                MODIFY Related_DP_2 BIGINT NULL""",
+
+        f"""UPDATE {flags} SET
+                High = {rekey_SQL_Function('High')},
+                Low = {rekey_SQL_Function('Low')},
+                FTC = {rekey_SQL_Function('FTC')},
+                EL = {rekey_SQL_Function('EL')},
+                MPL = {rekey_SQL_Function('MPL')}""",
+        f"""ALTER TABLE {flags}
+                MODIFY High BIGINT NOT NULL,
+                MODIFY Low BIGINT NOT NULL,
+                MODIFY FTC BIGINT NULL,
+                MODIFY EL BIGINT NULL,
+                MODIFY MPL BIGINT NULL""",
+
+        f"UPDATE {positions} SET Traded_DP = {rekey_SQL_Function('Traded_DP')}",
+        f"ALTER TABLE {positions} MODIFY Traded_DP BIGINT NULL",
+    ]
+
+def is_string_keyed_Function(cursor, The_timeframe: str) -> bool:
+    cursor.execute("""
+        SELECT DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'id'
+    """, (f"Important_DPs_{The_timeframe}",))
+    row = cursor.fetchone()
+    return row is not None and str(row[0]).lower() == "varchar"
+
+def run_statements_Function(cursor, statements: list[str]):
+    """ Runs the statements of a migration step; re-running a half applied step must not fail on the columns and indexes it already added. """
+    for statement in statements:
+        try:
+            cursor.execute(statement)
+        except Exception as e:
+            if getattr(e, "errno", None) not in (ER_DUP_FIELDNAME, ER_DUP_KEYNAME):
+                raise
+
+def tables_scope_Function(cursor, The_scope: str) -> str:
+    """
+    The scope the tables of the stream `The_scope` are stored under: its own, or the timeframe-only scope of
+    `legacy_scope_Function` when only the tables of that one exist (an install from before symbols were qualified).
+    """
+    The_legacy = legacy_scope_Function(The_scope)
+    if The_legacy is None:
+        return The_scope
+    cursor.execute("""
+        SELECT TABLE_NAME FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN (%s, %s)
+    """, (f"Important_DPs_{The_scope}", f"Important_DPs_{The_legacy}"))
+    existing = {row[0] for row in cursor.fetchall()}
+    return The_legacy if f"Important_DPs_{The_legacy}" in existing and f"Important_DPs_{The_scope}" not in existing else The_scope
+
+def convert_integer_keys_Function(cursor, The_tables_scope: str) -> bool:
+    """
+    The first step of every schema run (`ensure_schema_Function`), before the legacy tables are renamed and the
+    indexes of version 1 are built: converts the tables stored under `The_tables_scope` to integer keys if they
+    still use string IDs. Works on a synchronous cursor; the caller commits.
+    Returns:
+        bool: Whether the tables were converted.
+    """
+    if not is_string_keyed_Function(cursor, The_tables_scope):
+        return False
+    start = time.perf_counter()
+    run_statements_Function(cursor, integer_keys_statements_Function(The_tables_scope))
+    print_and_logging_Function("info", f"{The_tables_scope} -> Converted to integer keys in {time.perf_counter() - start:.1f} seconds", "title")
+    return True
+
+# (version, description, statements builder). Append new steps at the end, never edit an applied one.
+SCHEMA_MIGRATIONS: list[tuple[int, str, typing.Callable[[str], list[str]]]] = [
+    (1, "secondary indexes for the per-loop predicates", index_statements_Function),
+    (2, "drop the per-row position Result trigger", drop_result_trigger_statements_Function),
+    (3, "per-day performance summary", performance_summary_statements_Function),
+    (4, "monthly partitions of the Flags table", flags_partitioning_statements_Function),
+    (5, "symbol-qualified stream names in the performance summary", widen_summary_scope_statements_Function),
+    # Version bump only: the conversion itself runs first, on string-keyed tables only (`convert_integer_keys_Function`)
+    (6, "64-bit integer keys", lambda The_timeframe: []),
+]
+LATEST_SCHEMA_VERSION: int = SCHEMA_MIGRATIONS[-1][0]
+
+def read_schema_version_Function(cursor, The_timeframe: str) -> int:
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} (
+            scope VARCHAR(64) PRIMARY KEY,
+            version INT NOT NULL,
+            updated_at DATETIME NOT NULL
+        )
+    """)
+    cursor.execute(f"SELECT version FROM {SCHEMA_VERSION_TABLE} WHERE scope = %s", (The_timeframe,))
+    row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+def apply_schema_migrations_Function(cursor, The_timeframe: str) -> int:
+    """
+    Creates the tables of a timeframe without recorded version, then applies, in order, every migration step
+    newer than the recorded version and records the new version after each step.
+    Works on a synchronous (mysql.connector) cursor; the caller commits.
+    Returns:
+        int: The schema version of the timeframe after the run.
+    """
+    version = read_schema_version_Function(cursor, The_timeframe)
+    if version == 0:
+        for statement in baseline_tables_statements_Function(The_timeframe):
+            cursor.execute(statement)
+    for step_version, description, statements_builder in SCHEMA_MIGRATIONS:
+        if step_version <= version:
+            continue
+        run_statements_Function(cursor, statements_builder(The_timeframe))
+        cursor.execute(f"""
+            INSERT INTO {SCHEMA_VERSION_TABLE} (scope, version, updated_at) VALUES (%s, %s, NOW())
+            ON DUPLICATE KEY UPDATE version = VALUES(version), updated_at = VALUES(updated_at)
+        """, (The_timeframe, step_version))
+        version = step_version
+        print_and_logging_Function("info", f"{The_timeframe} -> Schema migrated to version {step_version}: {description}", "description")
+    return version
+
+def read_schema_versions_Function(cursor) -> dict[str, int]:
+    """ The recorded version of every timeframe, in one query (empty before the first migration ever). """
+    try:
+        cursor.execute(f"SELECT scope, version FROM {SCHEMA_VERSION_TABLE}")
+    except Exception as e:
+        if getattr(e, "errno", None) == ER_NO_SUCH_TABLE:
+            return {}
+        raise
+    return {scope: int(version) for scope, version in cursor.fetchall()}
+
+def legacy_scope_Function(The_scope: str) -> typing.Optional[str]:
+    """ The timeframe-only scope the stream `The_scope` had before symbols were qualified (streams of `trading_configs.asset` only). """
+    for The_timeframe in config["trading_configs"]["timeframes"]:
+        if The_scope == stream_name_Function(SYMBOLS[0], The_timeframe):
+            return The_timeframe
+    return None
+
+def qualify_legacy_scope_Function(cursor, The_legacy: str, The_scope: str):
+    """
+    Moves the tables, archive tables, summary rows and schema version of the timeframe-only scope `The_legacy`
+    (e.g. "M15") to the stream `The_scope` (e.g. "EURUSD_M15"), in one RENAME TABLE. The per-row trigger of
+    schema versions < 2 names the old tables, so it is dropped first. Works on a synchronous cursor; the caller commits.
+    """
+    cursor.execute("SHOW TABLES")
+    existing = {row[0] for row in cursor.fetchall()}
+    renames = [f"{prefix}{table}_{The_legacy} TO {prefix}{table}_{The_scope}"
+               for prefix in ("", "Archive_") for table in STREAM_TABLES if f"{prefix}{table}_{The_legacy}" in existing]
+    cursor.execute(f"DROP TRIGGER IF EXISTS trg_update_position_result_{The_legacy}")
+    if renames:
+        cursor.execute(f"RENAME TABLE {', '.join(renames)}")
+    if PERFORMANCE_SUMMARY_TABLE in existing:
+        cursor.execute(f"UPDATE {PERFORMANCE_SUMMARY_TABLE} SET timeframe = %s WHERE timeframe = %s", (The_scope, The_legacy))
+    cursor.execute(f"UPDATE {SCHEMA_VERSION_TABLE} SET scope = %s WHERE scope = %s", (The_scope, The_legacy))
+    print_and_logging_Function("info", f"{The_scope} -> {len(renames)} tables of {The_legacy} renamed to the symbol-qualified names", "title")
+
+def ensure_schema_Function(The_timeframe: str) -> int:
+    """
+    Startup path of `Database_Class`: the versions of all timeframes are read with one query (once per process);
+    a timeframe already at `LATEST_SCHEMA_VERSION` costs nothing more. Otherwise only its missing steps run.
+    The timeframes are symbol × timeframe streams (`stream_name_Function`); the tables of a stream of
+    `trading_configs.asset` still under their timeframe-only names are renamed first (`qualify_legacy_scope_Function`).
+    String-keyed tables are converted to integer keys before anything else, under whichever name they have.
+    Returns:
+        int: The schema version of the timeframe.
+    Raises:
+        String_Keys_Error: If the tables still use string IDs after the run.
+    """
+    global schema_versions
+    if schema_versions is None:
+        with CDB_Pool.connect_sync_Function() as conn:
+            schema_versions = read_schema_versions_Function(conn.cursor())
+
+    if schema_versions.get(The_timeframe, 0) >= LATEST_SCHEMA_VERSION:
+        return schema_versions[The_timeframe]
+
+    with CDB_Pool.connect_sync_Function() as conn:
+        cursor = conn.cursor()
+        The_tables_scope = tables_scope_Function(cursor, The_timeframe)
+        convert_integer_keys_Function(cursor, The_tables_scope)
+        if The_tables_scope != The_timeframe:
+            qualify_legacy_scope_Function(cursor, The_tables_scope, The_timeframe)
+            schema_versions[The_timeframe] = schema_versions.pop(The_tables_scope, 0)
+        version = apply_schema_migrations_Function(cursor, The_timeframe)
+        if is_string_keyed_Function(cursor, The_timeframe):
+            raise String_Keys_Error(f"{The_timeframe} -> The DP tables still use string IDs; run functions/DB_migration.py")
+        conn.commit()
+    schema_versions[The_timeframe] = version
+    return version
+
+def benchmark_hot_queries_Function(cursor, The_timeframe: str, repeats: int = 5) -> dict[str, float]:
+    """
+    Times (median, in ms) the read queries issued every loop by `_get_update_DPlist_Function` and
+    `_get_tradeable_DPs_Function`, so the effect of the key conversion can be compared before and after.
+    """
+    important_dps = f"Important_DPs_{The_timeframe}"
+    flag_points = f"Flag_Points_{The_timeframe}"
+    positions = f"Positions_{The_timeframe}"
+
+    cursor.execute(f"SELECT High_Point, Low_Point FROM {important_dps} WHERE weight > 0")
+    flag_ids = list({point for row in cursor.fetchall() for point in row if point is not None})
+
+    queries: dict[str, tuple[str, list]] = {
+        "active DPs": (f"SELECT * FROM {important_dps} WHERE weight > 0", []),
+        "flag points IN (...)": (
+            f"SELECT id, price, time FROM {flag_points} WHERE id IN ({','.join(['%s'] * len(flag_ids))})", flag_ids
+        ) if flag_ids else ("SELECT 1", []),
+        "positions": (f"SELECT Traded_DP, TP, Vol, Order_ID FROM {positions}", []),
+        "id -> Result map": (f"SELECT id, Result FROM {important_dps} WHERE Result != 0", []),
+        "positions JOIN DPs": (f"SELECT COUNT(*) FROM {positions} AS p JOIN {important_dps} AS d ON p.Traded_DP = d.id", []),
+    }
+
+    timings: dict[str, float] = {}
+    for name, (query, params) in queries.items():
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[name] = statistics.median(samples)
+    return timings
+
+def migrate_integer_keys_Function(The_timeframe: str, dry_run: bool = False):
+    """
+    The integer-key conversion `ensure_schema_Function` runs at startup, on its own: to print its statements
+    (`dry_run`) or to time the hot queries before and after it. `The_timeframe` is a stream name; the tables of
+    a legacy install are found under their timeframe-only names.
+    """
+    with CDB_Pool.connect_sync_Function() as conn:
+        cursor = conn.cursor()
+        The_tables_scope = tables_scope_Function(cursor, The_timeframe)
+        if not is_string_keyed_Function(cursor, The_tables_scope):
+            print_and_logging_Function("info", f"{The_timeframe} -> Tables already use integer keys. Nothing to migrate.", "title")
+            return
+
+        if dry_run:
+            for statement in integer_keys_statements_Function(The_tables_scope):
+                print(statement.strip() + ";")
+            return
+
+        before = benchmark_hot_queries_Function(cursor, The_tables_scope)
+        convert_integer_keys_Function(cursor, The_tables_scope)
+        conn.commit()
+
+        after = benchmark_hot_queries_Function(cursor, The_tables_scope)
+        for name in before:
+            print_and_logging_Function("info", f"{The_timeframe} -> {name}: {before[name]:.2f} ms -> {after[name]:.2f} ms", "description")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the string-keyed DP tables to 64-bit integer keys.")
+    parser.add_argument("timeframes", nargs="*", default=[stream_name_Function(The_symbol, The_timeframe) for The_symbol, The_timeframe in streams_Function()])
+    parser.add_argument("--dry-run", action="store_true", help="Only print the migration statements")
+    args = parser.parse_args()
+
+    for atimeframe in args.timeframes:
+        try:
+            migrate_integer_keys_Function(atimeframe, args.dry_run)
+        except Exception as e:
+            print_and_logging_Function("error", f"{atimeframe} -> Integer key migration failed: {e}", "title")
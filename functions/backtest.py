@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from classes.Backtest import Backtest_Class, run_backtest_Function, BACKTEST_BALANCE, RETRAIN_EVERY_DAYS
+
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the cached candles of one symbol and timeframe through the trading pipeline (see functions/candle_history.py to fill the cache).")
+    parser.add_argument("timeframe", nargs="?", default=config["trading_configs"]["timeframes"][0])
+    parser.add_argument("--symbol", default=config["trading_configs"]["asset"])
+    parser.add_argument("--start", default=None, help="first traded bar (YYYY-MM-DD); the bars before it are the starting history")
+    parser.add_argument("--end", default=None, help="end of the replay (YYYY-MM-DD, excluded)")
+    parser.add_argument("--balance", type=float, default=BACKTEST_BALANCE)
+    parser.add_argument("--retrain-every-days", type=float, default=RETRAIN_EVERY_DAYS)
+    parser.add_argument("--verbose", action="store_true", help="keep the info and warning logs of the pipeline")
+    args = parser.parse_args()
+
+    The_backtest = Backtest_Class(args.symbol, args.timeframe, start=args.start, end=args.end, balance=args.balance,
+                                  retrain_every_days=args.retrain_every_days)
+    try:
+        summary = asyncio.run(run_backtest_Function(The_backtest, verbose=args.verbose))
+        print_and_logging_Function("info", f"{The_backtest.stream} -> Backtest written to {The_backtest.directory}", "title")
+        print_and_logging_Function("info", json.dumps(summary, indent=4, default=str), "description")
+    except Exception as e:
+        print_and_logging_Function("error", f"{The_backtest.stream} -> Backtest failed: {e}", "title")
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.logger import print_and_logging_Function
+from classes.Metatrader_Module import CMetatrader_Module
+from classes.Broker_Gateway import CBroker_Gateway
+from classes.Scheduler import BAR_SECONDS
+from classes.Candle_Cache import Candle_Cache_Class, as_rates_Function
+
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+CHUNK_BARS = 50_000  # bars per copy_rates_range call
+
+async def download_history_Function(The_symbol: str, The_timeframe: str, The_start: datetime.datetime) -> int:
+    """
+    Fills the candle cache of `The_symbol` / `The_timeframe` back to `The_start`: the bars older than the cached
+    ones are fetched in chunks of `CHUNK_BARS` and merged in front of them, the newer ones appended. Returns the
+    number of bars added. The forming bar is left out, as in the live cache.
+    """
+    cache = Candle_Cache_Class(The_symbol, The_timeframe)
+    cached = cache.read_Function()
+    The_end = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=1)  # the broker clock may run ahead of UTC
+    chunk = datetime.timedelta(seconds=BAR_SECONDS[The_timeframe] * CHUNK_BARS)
+    chunks = []
+    chunk_start = The_start.replace(tzinfo=datetime.timezone.utc)
+    while chunk_start < The_end:
+        chunk_end = min(chunk_start + chunk, The_end)
+        if len(cached) == 0 or not cached["time"][0] <= chunk_start.timestamp() < chunk_end.timestamp() <= cached["time"][-1]:  # chunks held by the cache are not fetched again
+            The_rates = await CBroker_Gateway.call_Function("copy_rates_range", The_symbol, CMetatrader_Module.timeframe_mapping[The_timeframe], chunk_start, chunk_end)
+            if The_rates is None:
+                raise RuntimeError(f"No {The_timeframe} rates from the terminal for {chunk_start:%Y-%m-%d} .. {chunk_end:%Y-%m-%d}")
+            chunks.append(as_rates_Function(The_rates))
+        chunk_start = chunk_end
+    fetched = np.concatenate(chunks)[:-1] if chunks else cached[:0]
+    if len(cached) == 0:
+        merged = fetched
+    else:
+        merged = np.concatenate((fetched[fetched["time"] < cached["time"][0]], cached, fetched[fetched["time"] > cached["time"][-1]]))
+    merged = merged[np.concatenate(([True], np.diff(merged["time"]) > 0))] if len(merged) else merged  # chunk edges are fetched twice
+    if len(merged) > len(cached):
+        cache.rewrite_Function(merged)
+    print_and_logging_Function("info", f"{The_symbol} {The_timeframe}: {len(merged)} cached bars since {pd.to_datetime(merged['time'][0], unit='s') if len(merged) else '-'} ({len(merged) - len(cached)} added)", "title")
+    return len(merged) - len(cached)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the candle history of the traded symbol into the on-disk candle cache.")
+    parser.add_argument("timeframes", nargs="*", default=config["trading_configs"]["timeframes"])
+    parser.add_argument("--symbol", default=config["trading_configs"]["asset"])
+    parser.add_argument("--start", default=(datetime.date.today() - datetime.timedelta(days=3 * 365)).isoformat(), help="first day to download (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    async def download_all():
+        await CMetatrader_Module.connect_Function()
+        for atimeframe in args.timeframes:
+            try:
+                await download_history_Function(args.symbol, atimeframe, datetime.datetime.fromisoformat(args.start))
+            except Exception as e:
+                print_and_logging_Function("error", f"{atimeframe} -> History download failed: {e}", "title")
+
+    asyncio.run(download_all())
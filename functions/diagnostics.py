@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import types
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.Database import Database_Class
+from classes.DB_Pool import CDB_Pool
+from classes.SQLite_Database import SQLite_Database_Class
+from classes.Order_Manager import Order_Manager_Class
+from classes.Simulated_Broker import Simulated_Broker_Class
+from classes.Broker_Gateway import CBroker_Gateway, CBroker_Metadata
+from classes.Candle_Cache import Candle_Cache_Class, CANDLE_WINDOW, RATES_DTYPE
+from classes.Candle_Feed import CCandle_Feed, BASE_TIMEFRAME, resample_Function, bar_starts_Function, gap_spans_Function
+from classes.Scheduler import BAR_SECONDS
+from classes.Metatrader_Module import CMetatrader_Module
+from classes.Query_Metrics import QUERY_SAMPLES
+from functions.DB_migration import PERFORMANCE_SUMMARY_TABLE
+from functions.logger import print_and_logging_Function
+from functions.utilities import stream_name_Function, streams_Function
+
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+QUERY_AUDIT_HISTORY = os.path.join("./logs", "query_audit.jsonl")
+REGRESSION_FACTOR = 2.0  # a statement is flagged when rows or latency grow by this factor since the previous audit
+
+async def explain_queries_Function(The_database: Database_Class, repeats: int = 3) -> list[dict]:
+    """
+    Runs `EXPLAIN` on every statement of `Database_Class.audit_queries_Function` (the statements the bot issued, with
+    the parameters of one of their executions) and times the read-only ones. Write statements are only explained,
+    never executed.
+    Returns:
+        list[dict]: One entry per statement (named by its fingerprint) with the estimated scanned rows, full-scanned
+        tables, used keys and the median latency in milliseconds (None for writes).
+    """
+    catalog = The_database.audit_queries_Function()
+    if not catalog:
+        print_and_logging_Function("warning", f"{The_database.TimeFrame} -> No statements to audit: none recorded in {QUERY_SAMPLES} yet (run the bot first)", "description")
+    await The_database.initialize_db_pool_Function()
+    report = []
+    async with The_database.db_pool.acquire() as conn: # type: ignore
+        await conn.commit()
+        async with conn.cursor() as cursor:
+            for name, query, params in catalog:
+                await cursor.execute("EXPLAIN " + query, params or None)
+                columns = [desc[0] for desc in cursor.description]
+                plan = [dict(zip(columns, row)) for row in await cursor.fetchall()]
+
+                latency_ms = None
+                if query.lstrip().upper().startswith("SELECT"):
+                    samples = []
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        await cursor.execute(query, params or None)
+                        await cursor.fetchall()
+                        samples.append((time.perf_counter() - start) * 1000)
+                    latency_ms = statistics.median(samples)
+
+                report.append({
+                    "name": name,
+                    "rows": sum(int(step.get("rows") or 0) for step in plan),
+                    "full_scans": [step.get("table") for step in plan if step.get("type") == "ALL"],
+                    "keys": [step.get("key") for step in plan if step.get("key")],
+                    "latency_ms": latency_ms,
+                })
+    return report
+
+def report_query_audit_Function(The_timeframe: str, The_report: list[dict]):
+    """
+    Prints the audit, flags regressions against the previous audit of the same timeframe and appends this
+    audit to `logs/query_audit.jsonl`, so the growth of every statement can be followed as the tables grow.
+    """
+    previous: dict[str, dict] = {}
+    if os.path.exists(QUERY_AUDIT_HISTORY):
+        with open(QUERY_AUDIT_HISTORY, "r") as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry["timeframe"] == The_timeframe:
+                    previous = {item["name"]: item for item in entry["report"]}
+
+    print_and_logging_Function("info", f"{The_timeframe} -> Query plan audit of {len(The_report)} statements", "title")
+    for item in The_report:
+        latency = f"{item['latency_ms']:.2f} ms" if item["latency_ms"] is not None else "not executed"
+        scans = f", full scan of {', '.join(item['full_scans'])}" if item["full_scans"] else ""
+        print_and_logging_Function("info", f"{The_timeframe} -> {item['name']}: ~{item['rows']} rows, {latency}{scans}", "description")
+
+        old = previous.get(item["name"])
+        if old is None:
+            continue
+        grew_rows = old["rows"] > 0 and item["rows"] >= REGRESSION_FACTOR * old["rows"]
+        grew_latency = (old["latency_ms"] and item["latency_ms"] is not None
+                        and item["latency_ms"] >= REGRESSION_FACTOR * old["latency_ms"])
+        if grew_rows or grew_latency:
+            print_and_logging_Function("warning", f"{The_timeframe} -> Regression in '{item['name']}': rows {old['rows']} -> {item['rows']}, latency {old['latency_ms']} -> {item['latency_ms']}", "description")
+
+    os.makedirs(os.path.dirname(QUERY_AUDIT_HISTORY), exist_ok=True)
+    with open(QUERY_AUDIT_HISTORY, "a") as file:
+        file.write(json.dumps({"time": datetime.datetime.now().isoformat(), "timeframe": The_timeframe, "report": The_report}) + "\n")
+
+async def audit_timeframes_Function(The_databases: list[Database_Class]):
+    for The_database in The_databases:
+        try:
+            report_query_audit_Function(The_database.TimeFrame, await explain_queries_Function(The_database))
+        except Exception as e:
+            print_and_logging_Function("error", f"{The_database.TimeFrame} -> Query plan audit failed: {e}", "title")
+
+def trigger_benchmark_Function(n_dps: int = 100_000, batch_sizes: tuple = (100, 1_000, 10_000), repeats: int = 3) -> list[dict]:
+    """
+    Latency of one batch of DP Result updates on scratch tables of `n_dps` DPs (one position each), with the
+    former per-row AFTER UPDATE trigger and with the set-based reconciliation that replaced it.
+    The scratch tables (`Bench_*`) are dropped at the end.
+    Returns:
+        list[dict]: One entry per (mode, batch size) with the median latency in milliseconds.
+    """
+    important_dps, positions = "Bench_Important_DPs", "Bench_Positions"
+    trigger_query = f"""
+        CREATE TRIGGER trg_bench_position_result
+        AFTER UPDATE ON {important_dps}
+        FOR EACH ROW
+        BEGIN
+            IF NEW.Result <> OLD.Result OR NEW.weight <> OLD.weight THEN
+                UPDATE {positions}
+                SET Result = 
+                    CASE
+                        WHEN NEW.weight = 0 THEN
+                            CASE
+                                WHEN ROUND(NEW.Result * ABS(Price - SL), 5) <= ROUND(ABS(TP - Price), 5)
+                                    THEN -ABS(Price - SL)
+                                ELSE ROUND(ABS(TP - Price), 5)
+                            END
+                        ELSE
+                            CASE
+                                WHEN ROUND(NEW.Result * ABS(Price - SL), 5) > ROUND(ABS(TP - Price), 5)
+                                    THEN ROUND(ABS(TP - Price), 5)
+                                ELSE ROUND(NEW.Result * ABS(Price - SL), 5)
+                            END
+                    END
+                WHERE Traded_DP = NEW.id;
+            END IF;
+        END;
+    """
+    report = []
+    with CDB_Pool.connect_sync_Function() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {important_dps}, {positions}")
+            cursor.execute(f"CREATE TABLE {important_dps} (id BIGINT PRIMARY KEY, weight FLOAT NULL, Result FLOAT NOT NULL DEFAULT 0)")
+            cursor.execute(f"""
+                CREATE TABLE {positions} (
+                    id INT AUTO_INCREMENT PRIMARY KEY, Traded_DP BIGINT NULL, Price FLOAT NOT NULL, SL FLOAT NOT NULL,
+                    TP FLOAT NOT NULL, Order_ID INT NOT NULL UNIQUE, Result FLOAT NOT NULL DEFAULT 0,
+                    INDEX idx_traded_dp (Traded_DP)
+                )""")
+            for start in range(0, n_dps, 10_000):
+                keys = range(start, min(start + 10_000, n_dps))
+                cursor.executemany(f"INSERT INTO {important_dps} (id, weight, Result) VALUES (%s, 1, 0)", [(k,) for k in keys])
+                cursor.executemany(f"INSERT INTO {positions} (Traded_DP, Price, SL, TP, Order_ID) VALUES (%s, 1.1, 1.0, 1.3, %s)", [(k, k) for k in keys])
+            conn.commit()
+            print_and_logging_Function("info", f"Trigger benchmark: {n_dps} DPs and positions created", "title")
+
+            for mode in ("trigger", "reconcile"):
+                cursor.execute("DROP TRIGGER IF EXISTS trg_bench_position_result")
+                if mode == "trigger":
+                    cursor.execute(trigger_query)
+                for size in batch_sizes:
+                    samples = []
+                    for _ in range(repeats):
+                        keys = random.sample(range(n_dps), min(size, n_dps))
+                        start_time = time.perf_counter()
+                        cursor.executemany(f"UPDATE {important_dps} SET Result = %s WHERE id = %s", [(random.uniform(-1, 4), k) for k in keys])
+                        if mode == "reconcile":
+                            cursor.execute(Database_Class.reconcile_results_query_Function(
+                                positions, important_dps, f"p.Traded_DP IN ({','.join(['%s'] * len(keys))})"), keys)
+                        conn.commit()
+                        samples.append((time.perf_counter() - start_time) * 1000)
+                    report.append({"mode": mode, "batch": size, "latency_ms": statistics.median(samples)})
+                    print_and_logging_Function("info", f"Trigger benchmark: {mode}, batch of {size}: {report[-1]['latency_ms']:.1f} ms", "description")
+        finally:
+            cursor.execute("DROP TRIGGER IF EXISTS trg_bench_position_result")
+            cursor.execute(f"DROP TABLE IF EXISTS {important_dps}, {positions}")
+            conn.commit()
+    return report
+
+def order_pass_benchmark_Function(sizes: tuple = (1, 10, 100), repeats: int = 3, call_latency_ms: float = 1.0) -> list[dict]:
+    """
+    Latency of the order-management pass (`Order_Manager_Class.run_pass_Function`) with `sizes` desired orders,
+    against a simulated broker answering each call after `call_latency_ms`, on scratch SQLite tables (`*_BENCH`,
+    dropped at the end) and without notifications. Four passes per size: all orders new ("open"), nothing to
+    change ("steady"), every TP lowered ("modify") and an empty trade list ("cancel").
+    Returns:
+        list[dict]: One entry per (size, pass) with the actions of the pass and its median latency in milliseconds.
+    """
+    The_timeframe = "BENCH"
+    The_target = CBroker_Gateway.target
+    The_database = SQLite_Database_Class(The_timeframe)
+
+    def trade_list(size: int, RR: float) -> list[tuple]:
+        DPs = [types.SimpleNamespace(trade_direction="Bullish", High=types.SimpleNamespace(price=1.1 + k * 0.0001),
+                                     Low=types.SimpleNamespace(price=1.098 + k * 0.0001)) for k in range(size)]
+        return [(aDP, dp_key, 0.5, RR, 0.7) for dp_key, aDP in enumerate(DPs, start=1)]
+
+    async def run() -> list[dict]:
+        report = []
+        for size in sizes:
+            samples: dict[str, list[dict]] = {"open": [], "steady": [], "modify": [], "cancel": []}
+            for _ in range(repeats):
+                CBroker_Gateway.target = Simulated_Broker_Class(call_latency_ms=call_latency_ms)
+                CBroker_Metadata.invalidate_Function(config["trading_configs"]["asset"])
+                The_manager = Order_Manager_Class(The_timeframe, The_database, notify=False)
+                for The_pass, The_list in (("open", trade_list(size, 2.0)), ("steady", trade_list(size, 2.0)),
+                                           ("modify", trade_list(size, 1.5)), ("cancel", [])):
+                    samples[The_pass].append(await The_manager.run_pass_Function(The_list))
+            for The_pass, results in samples.items():
+                report.append({"size": size, "pass": The_pass, "opens": results[-1]["opens"], "modifies": results[-1]["modifies"],
+                               "cancels": results[-1]["cancels"], "latency_ms": statistics.median(result["ms"] for result in results)})
+                print_and_logging_Function("info", f"Order pass benchmark: {size} desired orders, {The_pass} pass ({report[-1]['opens']} opens, {report[-1]['modifies']} modifies, {report[-1]['cancels']} cancels): {report[-1]['latency_ms']:.1f} ms", "description")
+        return report
+
+    try:
+        return asyncio.run(run())
+    finally:
+        CBroker_Gateway.target = The_target
+        CBroker_Metadata.invalidate_Function(config["trading_configs"]["asset"])
+        cursor = The_database.connection.cursor()
+        for table in (The_database.Positions_table_name, The_database.flags_table_name, The_database.important_dps_table_name, The_database.flag_points_table_name):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"DELETE FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = ?", (The_timeframe,))
+
+def compare_resampled_Function(The_base: np.ndarray, The_broker: np.ndarray, The_timeframe: str) -> dict:
+    """
+    Compares the `The_timeframe` bars `resample_Function` builds from `The_base` with `The_broker`, over the span the
+    base bars fully cover: the first bar, partly before the base bars, and the last (forming) bar are left out.
+    Returns:
+        dict: Bars compared, bars only the broker / only the resampler has, and the mismatches per field.
+    """
+    resampled = resample_Function(The_base, The_timeframe)
+    first = bar_starts_Function(The_base["time"][:1], The_timeframe)[0]
+    span_start = first if first == The_base["time"][0] else first + 1
+    span_end = min(The_broker["time"][-1], resampled["time"][-1])
+    broker = The_broker[(The_broker["time"] >= span_start) & (The_broker["time"] < span_end)]
+    resampled = resampled[(resampled["time"] >= span_start) & (resampled["time"] < span_end)]
+    common, broker_index, resampled_index = np.intersect1d(broker["time"], resampled["time"], return_indices=True)
+    return {"timeframe": The_timeframe, "compared": len(common), "only_broker": len(broker) - len(common),
+            "only_resampled": len(resampled) - len(common),
+            "mismatches": {field: int(np.count_nonzero(broker[field][broker_index] != resampled[field][resampled_index]))
+                           for field in RATES_DTYPE.names if field != "time"}}
+
+async def resample_check_Function(The_timeframes: list[str], base_bars: int = CANDLE_WINDOW) -> list[dict]:
+    """
+    Compares the bars `Resampler_Class` builds from the last `base_bars` base bars (`candles.base_timeframe`) with
+    the bars the terminal serves for each of `The_timeframes` (`compare_resampled_Function`).
+    Returns:
+        list[dict]: One entry per timeframe: bars compared, bars only the broker / only the resampler has, and
+        the mismatches per field.
+    """
+    await CMetatrader_Module.connect_Function()
+    base = await CCandle_Feed._fetch_rates_Function(BASE_TIMEFRAME, base_bars)
+    report = []
+    for The_timeframe in The_timeframes:
+        broker = await CCandle_Feed._fetch_rates_Function(The_timeframe, CANDLE_WINDOW)
+        entry = compare_resampled_Function(base, broker, The_timeframe)
+        report.append(entry)
+        The_level = "info" if not (entry["only_broker"] or entry["only_resampled"] or any(entry["mismatches"].values())) else "warning"
+        print_and_logging_Function(The_level, f"Resample check {The_timeframe}: {entry['compared']} bars compared, {entry['only_broker']} only at the broker, {entry['only_resampled']} only resampled, mismatches {entry['mismatches']}", "description")
+    return report
+
+def gap_report_Function(The_timeframes: list[str], The_symbol: str = config["trading_configs"]["asset"]) -> list[dict]:
+    """
+    Lists the gaps of the on-disk candle cache of each of `The_timeframes` (the spans `gap_spans_Function` finds,
+    market closures left out), without a terminal.
+    Returns:
+        list[dict]: One entry per timeframe: cached bars, gaps, missing bars and the widest gaps.
+    """
+    report = []
+    for The_timeframe in The_timeframes:
+        The_times = Candle_Cache_Class(The_symbol, The_timeframe).read_Function()["time"]
+        spans = gap_spans_Function(The_times, The_timeframe)
+        widest = sorted(spans, key=lambda span: span[0] - span[1])[:5]
+        entry = {"timeframe": The_timeframe, "bars": len(The_times), "gaps": len(spans),
+                 "missing": sum((end - start) // BAR_SECONDS[The_timeframe] for start, end in spans),
+                 "widest": [(datetime.datetime.fromtimestamp(start, datetime.timezone.utc).replace(tzinfo=None),
+                             datetime.datetime.fromtimestamp(end, datetime.timezone.utc).replace(tzinfo=None)) for start, end in widest]}
+        report.append(entry)
+        print_and_logging_Function("info" if not spans else "warning", f"Gap check {The_timeframe}: {entry['bars']} cached bars, {entry['gaps']} gaps of {entry['missing']} bars, widest {entry['widest']}", "description")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diagnostics of the trading bot database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    explain_parser = subparsers.add_parser("explain", help="EXPLAIN and time every statement issued by Database_Class")
+    explain_parser.add_argument("timeframes", nargs="*", default=[stream_name_Function(asymbol, atimeframe) for asymbol, atimeframe in streams_Function()], help="stream names, e.g. EURUSD_M15")
+
+    trigger_parser = subparsers.add_parser("trigger-bench", help="Batch DP update latency with the per-row trigger vs. the set-based reconciliation")
+    trigger_parser.add_argument("--dps", type=int, default=100_000)
+    trigger_parser.add_argument("--batches", type=int, nargs="+", default=[100, 1_000, 10_000])
+
+    orders_parser = subparsers.add_parser("order-bench", help="Order-management pass latency with 1, 10 and 100 desired orders on a simulated broker")
+    orders_parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100])
+    orders_parser.add_argument("--call-latency-ms", type=float, default=1.0)
+
+    resample_parser = subparsers.add_parser("resample-check", help="Compare the bars resampled from the base timeframe with the broker's")
+    resample_parser.add_argument("timeframes", nargs="*", default=[atimeframe for atimeframe in config["trading_configs"]["timeframes"] if atimeframe != BASE_TIMEFRAME])
+
+    gap_parser = subparsers.add_parser("gap-check", help="List the gaps of the on-disk candle cache (market closures left out)")
+    gap_parser.add_argument("timeframes", nargs="*", default=config["trading_configs"]["timeframes"])
+    gap_parser.add_argument("--symbol", default=config["trading_configs"]["asset"])
+
+    args = parser.parse_args()
+    if args.command == "explain":
+        asyncio.run(audit_timeframes_Function([Database_Class(atimeframe) for atimeframe in args.timeframes]))
+    elif args.command == "trigger-bench":
+        trigger_benchmark_Function(args.dps, tuple(args.batches))
+    elif args.command == "order-bench":
+        order_pass_benchmark_Function(tuple(args.sizes), call_latency_ms=args.call_latency_ms)
+    elif args.command == "resample-check":
+        asyncio.run(resample_check_Function(args.timeframes))
+    elif args.command == "gap-check":
+        gap_report_Function(args.timeframes, args.symbol)
@@ -62,11 +62,17 @@ The_logger.addHandler(warning_handler)
 The_logger.addHandler(error_handler)
 The_logger.addHandler(critical_handler)
 
+# Log types dropped before anything is formatted (the backtest mutes "info" and "warning": one line per bar adds up)
+MUTED_TYPES: set[str] = set()
+
 # === Print & Log Function ===
 def print_and_logging_Function(The_type_of_log: typing.Literal["error", "warning", "info", "critical"] = "info", 
                                The_message: str = "", 
                                The_level: typing.Literal["title", "description"] = "title"):
 
+    if The_type_of_log in MUTED_TYPES:
+        return
+
     caller_frame = inspect.stack()[1]
     caller_filename = os.path.basename(caller_frame.filename)
     caller_name = os.path.splitext(caller_filename)[0].replace("_", " ")
@@ -0,0 +1,25 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.Storage import Storage_Class
+from classes.Database import Database_Class
+from classes.SQLite_Database import SQLite_Database_Class
+
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+STORAGE_BACKEND: str = config.get("storage", {}).get("backend", "mysql")  # "mysql" (live bot) or "sqlite" (backtests, benchmarks)
+
+def storage_class_Function() -> type[Storage_Class]:
+    """ The `Storage_Class` backend selected by `storage.backend` in config.json. """
+    if STORAGE_BACKEND == "mysql":
+        return Database_Class
+    if STORAGE_BACKEND == "sqlite":
+        return SQLite_Database_Class
+    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+
+def create_storage_Function(The_timeframe: str) -> Storage_Class:
+    return storage_class_Function()(The_timeframe)
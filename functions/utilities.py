@@ -1,6 +1,8 @@
-from datetime import datetime, time, timezone
+from datetime import datetime, time, timedelta, timezone
 import os
+import re
 import sys
+import json
 import time as Time_module
 import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -9,17 +11,46 @@ import parameters
 from classes.Telegrambot import CTelegramBot
 from functions.logger import print_and_logging_Function
 
+# Load JSON config file
+with open("./config.json", "r") as file:
+    config = json.load(file)
+
+# The traded symbols: `trading_configs.asset` first (its tables predate the symbol-qualified names), then `symbols`
+SYMBOLS: list[str] = list(dict.fromkeys([config["trading_configs"]["asset"]] + config["trading_configs"].get("symbols", [])))
+
+def stream_name_Function(The_symbol: str, The_timeframe: str) -> str:
+    """ The name of a symbol × timeframe stream, as used in table names, storage scopes and logs (e.g. "EURUSD_M15"). """
+    return f"{re.sub(r'[^0-9A-Za-z]', '_', The_symbol)}_{The_timeframe}"
+
+def streams_Function() -> list[tuple[str, str]]:
+    """ Every traded (symbol, timeframe) pair, symbol by symbol. """
+    return [(The_symbol, The_timeframe) for The_symbol in SYMBOLS for The_timeframe in config["trading_configs"]["timeframes"]]
+
+def stream_symbol_Function(The_stream: str) -> str:
+    """ The symbol of a stream name; the primary asset for a name it does not know (e.g. a bare timeframe). """
+    for The_symbol, The_timeframe in streams_Function():
+        if stream_name_Function(The_symbol, The_timeframe) == The_stream:
+            return The_symbol
+    return SYMBOLS[0]
+
+
+# Define trading window: Monday–Friday, 05:00–18:00 UTC
+TRADING_DAYS = range(0, 5)  # Monday = 0, Sunday = 6
+SESSION_START = time(5, 0)
+SESSION_END = time(18, 0)
 
 def is_trading_hours_now():
     now = datetime.now(timezone.utc)  # Timezone-aware UTC time
-    weekday = now.weekday()  # Monday = 0, Sunday = 6
-
-    # Define trading window: Monday–Friday, 08:00–21:00 UTC
-    allowed_days = range(0, 5)
-    start_time = time(5, 0)
-    end_time = time(18, 0)
-    
-    return weekday in allowed_days and start_time <= now.time() <= end_time
+    return now.weekday() in TRADING_DAYS and SESSION_START <= now.time() <= SESSION_END
+
+def next_session_open_Function(now: datetime) -> datetime:
+    """ The next session open (UTC) after `now`, or `now` itself when it is inside a session. """
+    if now.weekday() in TRADING_DAYS and SESSION_START <= now.time() <= SESSION_END:
+        return now
+    The_day = now.date() if now.time() < SESSION_START else now.date() + timedelta(days=1)
+    while The_day.weekday() not in TRADING_DAYS:
+        The_day += timedelta(days=1)
+    return datetime.combine(The_day, SESSION_START, tzinfo=timezone.utc)
 
 def TelegramBot_loop_Funciton():
     while not parameters.shutdown_flag:
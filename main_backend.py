@@ -2,24 +2,32 @@ from colorama import Fore,Style
 print(Fore.BLUE + Style.BRIGHT + "Welcome To Ashkan's EA..." + Style.RESET_ALL)
 import mysql.connector  # noqa: E402, F401
 import asyncio  # noqa: E402
-import pandas as pd  # noqa: E402
 import signal  # noqa: E402
 import sys  # noqa: E402
 import os  # noqa: E402
 import json  # noqa: E402
-import time  # noqa: E402
-import cProfile  # noqa: E402
 import threading  # noqa: E402
 # import subprocess  # noqa: E402
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from functions.logger import print_and_logging_Function  # noqa: E402
-from functions.run_with_retries import run_with_retries_Function  # noqa: E402
 from classes.timeframe import CTimeFrames  # noqa: E402
-from classes.Metatrader_Module import CMetatrader_Module  # noqa: E402
-from functions.utilities import is_trading_hours_now, TelegramBot_loop_Funciton, is_valid_Dataset_Function  # noqa: E402
+from functions.utilities import is_trading_hours_now, TelegramBot_loop_Funciton  # noqa: E402
 from classes.Telegrambot import CTelegramBot  # noqa: E402
+from classes.Write_Behind import CWrite_Behind  # noqa: E402
+from classes.DB_Pool import CDB_Pool  # noqa: E402
+from classes.Query_Metrics import CQuery_Metrics  # noqa: E402
+from classes.Broker_Gateway import CBroker_Gateway, CBroker_Metadata  # noqa: E402
+from classes.Tick_Buffer import CTick_Buffers  # noqa: E402
+from classes.Candle_Feed import CCandle_Feeds  # noqa: E402
+from classes.Metatrader_Module import CMetatrader_Module  # noqa: E402
+from classes.Pipeline import Timeframe_Pipeline_Class, CCPU_Slots  # noqa: E402
+from classes.Scheduler import sleep_until_session_open_Function  # noqa: E402
+from classes.Process_Mode import Process_Coordinator_Class, EXECUTION_MODE  # noqa: E402
+from functions.storage_backend import storage_class_Function  # noqa: E402
+from functions.DB_archive import archive_timeframe_Function  # noqa: E402
+from functions.diagnostics import audit_timeframes_Function  # noqa: E402
 import parameters  # noqa: E402
 
 # Load JSON config file
@@ -61,7 +69,7 @@ async def shutdown_Function():
     """
     def handle_shutdown():
         print_and_logging_Function("info", "Shutting down gracefully...")
-        parameters.shutdown_flag = True
+        parameters.request_shutdown_Function()
         
     def handle_restart():
         print_and_logging_Function("info", "Restarting bot gracefully...")
@@ -75,13 +83,54 @@ async def shutdown_Function():
     def handle_close_positions():
         print("Closing all positions...")
         # Call your broker API to close all open trades
+
+    def handle_explain_queries():
+        print_and_logging_Function("info", "Auditing the query plans of all timeframes...")
+        asyncio.get_event_loop().create_task(audit_timeframes_Function([aTimeframe.CMySQL_DataBase for aTimeframe in CTimeFrames]))
+
+    async def performance_report():
+        try:
+            for The_timeframe, The_report in (await storage_class_Function().performance_report_Function()).items():
+                print_and_logging_Function("info", f"{The_timeframe} -> Result: {The_report['pnl']:.2f}$ ({The_report['pnl_percent']:.2f}%), Win Rate: {The_report['winrate']:.2%} out of {The_report['trades']} trades", "description")
+        except Exception as e:
+            print_and_logging_Function("error", f"Error in the performance report: {e}", "title")
+
+    def handle_performance_report():
+        asyncio.get_event_loop().create_task(performance_report())
+
+    def handle_broker_stats():
+        for The_entry in CBroker_Gateway.report_Function():
+            print_and_logging_Function("info", f"Broker {The_entry['name']} -> {The_entry['calls']} calls, p50 {The_entry['p50']:.1f} / p95 {The_entry['p95']:.1f} / p99 {The_entry['p99']:.1f} ms, queue wait avg {The_entry['avg_wait_ms']:.1f} ms, {The_entry['errors']} errors, {The_entry['timeouts']} timeouts", "description")
+        The_cache = CBroker_Metadata.stats
+        print_and_logging_Function("info", f"Broker metadata cache -> {The_cache['hits']} hits, {The_cache['misses']} misses, {The_cache['invalidations']} invalidations", "description")
+        for The_symbol, The_buffer in CTick_Buffers.items():
+            The_ticks = The_buffer.stats
+            print_and_logging_Function("info", f"Tick buffer {The_symbol} -> {The_ticks['requests']} bar requests, {The_ticks['fetches']} fetches of {The_ticks['fetched_ticks']} ticks, {The_ticks['errors']} errors, {The_buffer.memory_Function() / 1024:.0f} KiB held", "description")
+        for The_symbol, The_candle_feed in CCandle_Feeds.items():
+            The_feed = The_candle_feed.stats
+            print_and_logging_Function("info", f"Candle feed {The_symbol} -> {The_feed['base_fetches']} base fetches ({The_feed['base_bars']} bars), {The_feed['window_fetches']} full window fetches, {The_feed['cached_bars_loaded']} bars loaded from the cache ({The_feed['topped_up_bars']} topped up)", "description")
+            print_and_logging_Function("info", f"Candle gaps {The_symbol} -> {The_feed['gaps']} gaps of {The_feed['gap_bars']} bars, {The_feed['backfilled_bars']} backfilled, {The_feed['unfilled_gaps']} unfilled, {The_feed['incomplete_windows']} incomplete windows skipped", "description")
+            for The_event in list(The_candle_feed.gap_events)[-5:]:
+                print_and_logging_Function("info", f"Gap {The_symbol} {The_event['timeframe']} {The_event['start']} -> {The_event['end']}: {The_event['missing']} bars missing, {The_event['backfilled']} backfilled", "description")
+        The_slots = CCPU_Slots.stats
+        print_and_logging_Function("info", f"CPU slots ({CCPU_Slots.slots}) -> {The_slots['acquired']} detect / ML runs, {The_slots['waited']} waited, wait avg {The_slots['wait_ms'] / max(1, The_slots['acquired']):.1f} ms / max {The_slots['max_wait_ms']:.1f} ms", "description")
+
+    def handle_query_stats():
+        for The_entry in CQuery_Metrics.report_Function(top=20):
+            print_and_logging_Function("info", f"{The_entry['user']} -> {The_entry['calls']} calls, {The_entry['total_ms']:.0f} ms total, p50 {The_entry['p50']:.1f} / p95 {The_entry['p95']:.1f} / p99 {The_entry['p99']:.1f} ms, {The_entry['slow']} slow: {The_entry['fingerprint']}", "description")
         
     COMMANDS = {
         "restart": handle_restart,
         "shutdown": handle_shutdown,
         "change the ML seed": handle_change_seed,
-        "close all positions": handle_close_positions
+        "close all positions": handle_close_positions,
+        "explain queries": handle_explain_queries,
+        "performance report": handle_performance_report,
+        "query stats": handle_query_stats,
+        "broker stats": handle_broker_stats
     }
+    # Diagnostic commands keep the listener alive
+    KEEP_LISTENING = {"explain queries", "performance report", "query stats", "broker stats"}
     
     while True:
         user_input = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
@@ -90,6 +139,8 @@ async def shutdown_Function():
         command_fn = COMMANDS.get(user_input)
         if command_fn:
             command_fn()
+            if user_input in KEEP_LISTENING:
+                continue
 
             # if parameters.restart_flag:
             #     print("Relaunching bot...")
@@ -115,118 +166,84 @@ def emergency_handler_Function(sig, frame):
     except Exception as e:
         print_and_logging_Function("error",f"Error in shutting down bot emergency: {e}", "title")
         
+def log_cycle_stats_Function(The_timeframe: str, elapsed: float):
+    """ Develop-mode statistics of a stream (`The_timeframe` is its name, e.g. "EURUSD_M15"), logged after each of its order-management passes. """
+    The_index = [The_timeframe_instance.stream for The_timeframe_instance in CTimeFrames].index(The_timeframe)
+    if config['runtime']['develop_mode'] :
+        print_and_logging_Function("info",f"{The_timeframe} -> From the bar close to the orders: {elapsed:.2f} seconds", "title")
+        for The_stage, The_stats in The_Pipelines[The_timeframe].report_Function().items():
+            print_and_logging_Function("info",f"{The_timeframe} -> Stage {The_stage}: {The_stats['runs']} runs, p50 {The_stats['p50']:.0f} / p95 {The_stats['p95']:.0f} / max {The_stats['max_ms']:.0f} ms, queue wait avg {The_stats['avg_wait_ms']:.0f} ms, depth {The_stats['depth']} (max {The_stats['max_depth']}), {The_stats['dropped']} dropped", "description")
+        Order_stats = CTimeFrames[The_index].Order_Manager.report_Function()
+        print_and_logging_Function("info",f"{The_timeframe} -> Order passes: {Order_stats['passes']} passes, p50 {Order_stats['p50']:.0f} / p95 {Order_stats['p95']:.0f} / max {Order_stats['max_ms']:.0f} ms, {Order_stats['opened']} opened, {Order_stats['modified']} modified, {Order_stats['cancelled']} cancelled, {Order_stats['failed']} failed", "description")
+        DB_stats = CTimeFrames[The_index].CMySQL_DataBase.DB_loop_stats
+        print_and_logging_Function("info",f"{The_timeframe} -> DP loading: {DB_stats['round_trips']} round trips, {DB_stats['ms']:.1f} ms ({DB_stats['query_ms']:.1f} ms if run serially)", "description")
+        WB_stats = CWrite_Behind.stats
+        print_and_logging_Function("info",f"Write-behind: {WB_stats['flushes']} flushes, {WB_stats['statements']} rows written, {WB_stats['coalesced']} coalesced, {WB_stats['ms']:.1f} ms", "description")
+        Pool_stats = CDB_Pool.metrics_Function()
+        for The_entry in CQuery_Metrics.report_Function(The_user=The_timeframe, top=3):
+            print_and_logging_Function("info",f"{The_timeframe} -> {The_entry['calls']} x {The_entry['fingerprint'][:80]}: p50 {The_entry['p50']:.1f} / p95 {The_entry['p95']:.1f} / p99 {The_entry['p99']:.1f} ms", "description")
+        print_and_logging_Function("info",f"DB pool: {Pool_stats['in_use']}/{Pool_stats['size']} in use (max {Pool_stats['max_in_use']}), wait avg {Pool_stats['avg_wait_ms']:.1f} ms / max {Pool_stats['max_wait_ms']:.1f} ms, {Pool_stats['timeouts']} timeouts", "description")
+    CTimeFrames[The_index].CMySQL_DataBase.DB_loop_stats = {"round_trips": 0, "ms": 0.0, "query_ms": 0.0}
+
+The_Pipelines: dict[str, Timeframe_Pipeline_Class] = {}
+
 async def Each_TimeFrame_Function(The_index: int, The_timeframe: str):
     """
-    Asynchronous function `Each_TimeFrame_Function` processes data for a specific timeframe in a trading bot system.
-    This function performs the following steps:
-    1. **Fetch Data**: Retrieves data for the specified timeframe using a retry mechanism. If an error occurs during data fetching, it logs the error, sets an emergency flag, and halts further processing.
-    2. **Set Data**: Updates the corresponding timeframe object with the fetched dataset.
-    3. **Detect Flags**: Identifies specific conditions or flags in the data for the given timeframe.
-    4. **Validate DPs and Flags**: Validates detected flags and decision points (DPs) to ensure they meet the required criteria.
-    5. **Update Positions**: Updates trading positions based on the processed data. If an error occurs during this step, it logs the error as critical.
+    Asynchronous function `Each_TimeFrame_Function` runs the trading loop of a symbol × timeframe stream until the trading
+    session ends or a shutdown, as the staged pipeline of `Timeframe_Pipeline_Class`:
+    1. **Fetch Data**: Right after each bar close (plus the scheduler grace delay), fetches the new window. A fetch that keeps failing sets the shutdown flag.
+    2. **Detect Flags** and **Validate DPs**: Updates the timeframe object with the window, detects flags and validates the decision points (DPs).
+    3. **Train ML**: Scores the tradeable DPs.
+    4. **Update Positions**: Opens, modifies and cancels the orders of the newest trade list.
+    The stages run as separate workers linked by bounded queues, so a slow ML step no longer holds back the fetch
+    and detection of the next bar.
     ### Parameters:
-    - `The_index` (int): The index of the timeframe being processed. This is used to access the corresponding timeframe object from a predefined list.
-    - `The_timeframe` (str): The string representation of the timeframe being processed (e.g., "1H", "4H", "1D").
+    - `The_index` (int): The index of the stream being processed. This is used to access the corresponding timeframe object from `CTimeFrames`.
+    - `The_timeframe` (str): The name of the stream being processed (e.g., "EURUSD_M15").
     ### Returns:
     - None: This function does not return any value. It performs operations on global or shared objects and logs the results.
     ### Additional Notes:
-    - The function uses a retry mechanism (`run_with_retries_Function`) to handle transient errors during asynchronous operations.
-    - If an emergency flag (`parameters.The_emergency_flag`) is set, the function halts further processing to prevent cascading failures.
-    - Execution time for each loop is logged for performance monitoring.
-    - The function is wrapped in a try-except block to handle unexpected errors gracefully and log them appropriately.
+    - Per-stage latency, queue depth and the time from the bar close to the orders are logged in develop mode.
     """
-    while is_trading_hours_now() and (not parameters.shutdown_flag):
-        try:
-            start_time = time.time()
-            profiler = cProfile.Profile()
-            profiler.enable()
-            
-            # Step 1: Fetch Data
-            if parameters.shutdown_flag:
-                return
-            
-            try:
-                The_Collected_DataSet : pd.DataFrame = await run_with_retries_Function(CMetatrader_Module.main_fetching_data_Function,The_timeframe, CTimeFrames[The_index].DataSet)
-            except RuntimeError as The_error:
-                print_and_logging_Function("critical", f"Critical failure in fetching {The_timeframe} data: {The_error}", "title")
-                parameters.shutdown_flag = True
-                The_Collected_DataSet = pd.DataFrame()
-            
-            if not is_valid_Dataset_Function(The_Collected_DataSet):
-                await asyncio.sleep(60)
-                continue
-            
-            if parameters.shutdown_flag:
-                return
-            
-            if not CTimeFrames[The_index].set_data_Function(The_Collected_DataSet):
-                await asyncio.sleep(60)
-                continue
+    try:
+        The_Pipelines[The_timeframe] = Timeframe_Pipeline_Class(CTimeFrames[The_index], log_cycle_stats_Function)
+        await The_Pipelines[The_timeframe].run_Function()
+    except Exception as e:
+        print_and_logging_Function("error", f"{The_timeframe} -> Error in the trading pipeline: {e}", "title")
 
-            # Step 2: Detect Flags
-            try:
-                await run_with_retries_Function(CTimeFrames[The_index].detect_flags_Function)
-            except RuntimeError as The_error:
-                print_and_logging_Function("critical", f"Critical failure in flag detection {The_timeframe}: {The_error}", "title")
-                
-            if parameters.shutdown_flag:
-                return
+async def main():   
+    await CDB_Pool.initialize_Function()  # open and warm up the shared DB pool before the first loop
+    await CMetatrader_Module.connect_Function()  # the terminal session lives on the broker gateway thread
 
-            # step 3: Validate DPs and Flags
-            try:
-                await run_with_retries_Function(CTimeFrames[The_index].validate_DPs_Function)
-            except RuntimeError as The_error:
-                print_and_logging_Function("critical", f"Critical failure in validating DPs {The_timeframe}: {The_error}", "title")
-            
-            if parameters.shutdown_flag:
-                return
-            # step 4: Train ML
-            try:
-                await run_with_retries_Function(CTimeFrames[The_index].ML_Main_Function)
-            except RuntimeError as The_error:
-                print_and_logging_Function("critical", f"Critical failure in ML {The_timeframe}: {The_error}", "title")
-            
-            if parameters.shutdown_flag:
-                return    
-            
-            # step 5: Update and open Positions
-            try:
-                await run_with_retries_Function(CTimeFrames[The_index].Update_Positions_Function)
-            except RuntimeError as The_error:
-                print_and_logging_Function("critical", f"Critical failure in updating Positions {The_timeframe}: {The_error}", "title")
-
-            profiler.disable()
-            elapsed = time.time() - start_time
-            if config['runtime']['develop_mode'] :
-                print_and_logging_Function("info",f"For Each loop of Each timeframe: {elapsed:.2f} seconds", "title")
-                # profiler.print_stats(sort='cumtime')
-            
-            # preventing spam requests
-            await asyncio.sleep(60)
-        except Exception as e:
-            print_and_logging_Function("error", f"Error in validating DPs: {e}", "title")
+    # Writes acknowledged by a previous run (journal) are flushed first, then every flush interval
+    CWrite_Behind.recover_Function()
+    await CWrite_Behind.flush_Function()
+    The_flusher = asyncio.create_task(CWrite_Behind.run_Function())
 
-async def main():   
     while not parameters.shutdown_flag:
         try:
             if not (is_trading_hours_now() or config['runtime']['develop_mode']):
                 print_and_logging_Function("info", "Outside trading hours. Closing positions and sleeping until next Valid Time...", "title")
                 
-                for The_index, The_timeframe in enumerate(config["trading_configs"]["timeframes"]):
-                    print_and_logging_Function("info", f"Closing Postions of {The_timeframe}", "description")
-                    await CTimeFrames[The_index].Closing_positions_Function()
+                for The_timeframe_instance in CTimeFrames:
+                    print_and_logging_Function("info", f"Closing Postions of {The_timeframe_instance.stream}", "description")
+                    await The_timeframe_instance.Closing_positions_Function()
 
                 try:
-                    for The_index, The_timeframe in enumerate(config["trading_configs"]["timeframes"]):
-                        print_and_logging_Function("info", f"Calculating the Result of {The_timeframe}", "description")
-                        await CTimeFrames[The_index].Result_Reporter_Function()
+                    print_and_logging_Function("info", f"Calculating the Result of {', '.join(The_timeframe_instance.stream for The_timeframe_instance in CTimeFrames)}", "description")
+                    await CDB_Pool.gather_Function(*[The_timeframe_instance.Result_Reporter_Function() for The_timeframe_instance in CTimeFrames])
                 except Exception as e:
                     print_and_logging_Function("error",f"Error in Reporting the Result of timeframes: {e}")
+
+                # Outside trading hours: move the closed history out of the hot tables
+                for The_timeframe_instance in CTimeFrames:
+                    try:
+                        await archive_timeframe_Function(The_timeframe_instance.stream)
+                    except Exception as e:
+                        print_and_logging_Function("error", f"{The_timeframe_instance.stream} -> Archival failed: {e}", "title")
                     
-                while not is_trading_hours_now():
-                    await asyncio.sleep(60)
-                    if parameters.shutdown_flag:
-                        break
+                # One precise sleep until the next session open (cut short only by a shutdown)
+                await sleep_until_session_open_Function()
                 
                 if not parameters.shutdown_flag:
                     print_and_logging_Function("info", "Inside trading hours. Starting Bot again...", "title")
@@ -244,10 +261,18 @@ async def main():
             if parameters.shutdown_flag:
                 break
             
+            if EXECUTION_MODE == "process":
+                # The streams sharded over a pool of worker processes; this process keeps the broker session
+                await Process_Coordinator_Class(list(range(len(CTimeFrames)))).run_Function()
+                # The workers placed and closed positions: reload what the session-end closing reads
+                for The_timeframe_instance in CTimeFrames:
+                    await The_timeframe_instance.CMySQL_DataBase.sync_registry_Function()
+                continue
+
             tasks = []
-            for The_index, The_timeframe in enumerate(config["trading_configs"]["timeframes"]):
-                print_and_logging_Function("info", f"TimeFrame {The_timeframe} :", "description")
-                task = asyncio.create_task(Each_TimeFrame_Function(The_index, The_timeframe))
+            for The_index, The_timeframe_instance in enumerate(CTimeFrames):
+                print_and_logging_Function("info", f"Stream {The_timeframe_instance.stream} :", "description")
+                task = asyncio.create_task(Each_TimeFrame_Function(The_index, The_timeframe_instance.stream))
                 tasks.append(task)
 
                 if parameters.shutdown_flag:
@@ -257,14 +282,17 @@ async def main():
 
         except Exception as The_error:
             print_and_logging_Function("critical", f"Unhandled error in main loop: {The_error}", "title")
-            parameters.shutdown_flag = True
+            parameters.request_shutdown_Function()
 
     if parameters.shutdown_flag:
         print_and_logging_Function("info", "Shutting down! Canceling all open positions and cleaning DB. Please wait...", "title")
 
-        for The_index, The_timeframe in enumerate(config["trading_configs"]["timeframes"]):
-            print_and_logging_Function("info", f"Closing Postions of {The_timeframe}", "description")
-            await CTimeFrames[The_index].Closing_positions_Function(is_forced=True)
+        for The_timeframe_instance in CTimeFrames:
+            print_and_logging_Function("info", f"Closing Postions of {The_timeframe_instance.stream}", "description")
+            await The_timeframe_instance.Closing_positions_Function(is_forced=True)
+        The_flusher.cancel()
+        await CWrite_Behind.flush_Function()
+        await CDB_Pool.close_Function()
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,3 +1,25 @@
+import asyncio
+
 shutdown_flag : bool = False
 restart_flag: bool = False
-bot_running : bool = False
\ No newline at end of file
+bot_running : bool = False
+
+# One shutdown event per event loop (the process mode runs a loop per worker), set by `request_shutdown_Function`
+shutdown_events: dict[asyncio.AbstractEventLoop, asyncio.Event] = {}
+
+def shutdown_event_Function() -> asyncio.Event:
+    """ The shutdown event of the running loop, already set if the shutdown was requested. """
+    loop = asyncio.get_running_loop()
+    if loop not in shutdown_events:
+        shutdown_events[loop] = asyncio.Event()
+        if shutdown_flag:
+            shutdown_events[loop].set()
+    return shutdown_events[loop]
+
+def request_shutdown_Function():
+    """ Sets `shutdown_flag` and wakes every sleep waiting on a shutdown event. Safe from any thread (the Telegram bot runs in its own). """
+    global shutdown_flag
+    shutdown_flag = True
+    for loop, event in list(shutdown_events.items()):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(event.set)
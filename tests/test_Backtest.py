@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from classes.Backtest import Backtest_Class, DP_Tracker_Class, release_bars_Function  # noqa: E402
+from classes.Flag_Detector import FlagDetector_Class  # noqa: E402
+from classes.timeframe import Timeframe_Class  # noqa: E402
+from classes import SQLite_Database  # noqa: E402
+from test_DB_archive import candles_Function  # noqa: E402
+
+STREAM = "TEST_M15"
+WINDOW = 120  # a short stand-in for CANDLE_WINDOW
+CANDLES = candles_Function(datetime.datetime(2025, 6, 2, 12), 960)
+FIRST_BAR = WINDOW - 1
+
+def flag_tuples_Function(The_flags, offset: int = 0) -> list[tuple]:
+    return [(aFlag.flag_type, aFlag.high.index + offset, aFlag.low.index + offset, aFlag.Start_index + offset, aFlag.End_index + offset)
+            for aFlag in The_flags]
+
+def find_flags_Function(The_candles):
+    return asyncio.run(FlagDetector_Class(STREAM, None).find_flags_Function(The_candles.reset_index(drop=True)))
+
+def window_detection_Function(The_candles, window: int) -> dict[int, list[tuple]]:
+    """ The flags the live bot finds first at each bar, detecting on the last `window` bars. """
+    detected: set[tuple] = set()
+    new_flags: dict[int, list[tuple]] = {}
+    for The_bar in range(window - 1, len(The_candles)):
+        The_window = flag_tuples_Function(find_flags_Function(The_candles.iloc[The_bar - window + 1:The_bar + 1]), The_bar - window + 1)
+        if any(aFlag not in detected for aFlag in The_window):
+            new_flags[The_bar] = [aFlag for aFlag in The_window if aFlag not in detected]
+        detected.update(The_window)
+    return new_flags
+
+def test_released_flags_match_the_window_detection():
+    flags = find_flags_Function(CANDLES)
+    releases = release_bars_Function(flags, FIRST_BAR, WINDOW)
+    assert 15 <= sum(len(released) for released in releases.values()) < len(flags)  # some start too far back to be seen
+    assert {The_bar: flag_tuples_Function(released) for The_bar, released in releases.items()} == window_detection_Function(CANDLES, WINDOW)
+
+@pytest.mark.parametrize("window, released", [(18, False), (19, True)])
+def test_flag_starting_on_the_first_window_bar_is_not_released(window, released):
+    # A flag from bar 3 to bar 19 whose start is bar 2: the first bar of an 18-bar window ending at bar 19
+    highs = [5, 5, 6, 9, 8] + [7] * 14 + [10]
+    lows = [3, 1, 1, 4, 3] + [2] * 14 + [6]
+    candles = pd.DataFrame({"time": pd.date_range("2025-01-06", periods=len(highs), freq="15min"), "high": np.array(highs, dtype=float),
+                            "low": np.array(lows, dtype=float)})
+    flags = find_flags_Function(candles)
+    assert flag_tuples_Function(flags) == [("Bullish", 3, 18, 2, 19)]
+    releases = release_bars_Function(flags, window - 1, window)
+    assert {The_bar: flag_tuples_Function(released) for The_bar, released in releases.items()} == window_detection_Function(candles, window)
+    assert bool(releases) == released
+
+def validation_Function(The_frame: Timeframe_Class, The_DPs: list, The_bar: int) -> dict[int, object]:
+    """ The outcome of `Each_DP_validation_Function` on the bars up to `The_bar`: "tradeable" or (Result, closed). """
+    The_frame.dps_to_update, The_frame.Tradeable_DPs, The_frame.inserting_BackTest_DB = [], [], []
+    The_frame.DataSet = CANDLES.iloc[:The_bar + 1]
+
+    async def validate():
+        for aDP in The_DPs:
+            await The_frame.Each_DP_validation_Function(aDP, aDP.key)
+    asyncio.run(validate())
+    closed = {dp_key for dp_key, weight in The_frame.dps_to_update if weight == 0}
+    return {**{dp_key: "tradeable" for dp_key in The_frame.Tradeable_DPs},
+            **{dp_key: (Result, dp_key in closed) for dp_key, Result in The_frame.inserting_BackTest_DB}}
+
+def test_tracker_matches_the_validation_of_every_bar(monkeypatch):
+    monkeypatch.setattr(SQLite_Database, "SQLITE_PATH", ":memory:")
+    monkeypatch.setattr(SQLite_Database, "sqlite_connection", None)
+    backtest = Backtest_Class.__new__(Backtest_Class)
+    backtest.stream = STREAM
+    backtest.stats = {"validations": 0}
+    backtest.candles = CANDLES
+    backtest.storage = SQLite_Database.SQLite_Database_Class(STREAM)
+    backtest.frame = Timeframe_Class.__new__(Timeframe_Class)
+    backtest.frame.timeframe = "M15"
+    backtest.tracker = DP_Tracker_Class()
+    reference = Timeframe_Class.__new__(Timeframe_Class)
+    reference.timeframe = "M15"
+
+    releases = release_bars_Function(find_flags_Function(CANDLES), FIRST_BAR, WINDOW)
+    times = CANDLES["time"].to_numpy(dtype="datetime64[ns]")
+    highs, lows = CANDLES["high"].to_numpy(dtype=float), CANDLES["low"].to_numpy(dtype=float)
+    registered: list = []
+    entered_DPs = closed_DPs = 0
+    for The_bar in range(FIRST_BAR, len(CANDLES)):
+        # The same steps as `Backtest_Class.run_Function`
+        new_positions = np.empty(0, dtype=np.int64)
+        if The_bar in releases:
+            known_DPs = len(backtest.storage.Registry.Active_DPs)
+            asyncio.run(backtest.storage.save_flags_Function(releases[The_bar]))
+            new_DPs = list(backtest.storage.Registry.Active_DPs.values())[known_DPs:]
+            if new_DPs:
+                first_bars = np.searchsorted(times, np.array([np.datetime64(aDP.first_valid_trade_time) for aDP in new_DPs], dtype="datetime64[ns]"), side="right")
+                backtest.tracker.add_Function(new_DPs, first_bars)
+                new_positions = np.arange(len(backtest.tracker.keys) - len(new_DPs), len(backtest.tracker.keys))
+                backtest.tracker.catch_up_Function(new_positions, The_bar, highs, lows)
+                registered.extend(new_DPs)
+        changed, entered = backtest.tracker.events_Function(The_bar, highs[The_bar], lows[The_bar])
+        changed = np.union1d(changed, new_positions[backtest.tracker.first[new_positions] < The_bar]) if len(new_positions) else changed
+        if len(changed):
+            asyncio.run(backtest._validate_Function(changed, The_bar))
+        entered_DPs += entered
+
+        # What the tracker kept matches validating every registered DP on the whole history up to this bar
+        expected = validation_Function(reference, registered, The_bar)
+        tradeable = set(backtest.tracker.tradeable_Function())
+        Results = backtest.storage.Registry.Results
+        active = backtest.storage.Registry.Active_DPs
+        kept = {aDP.key: "tradeable" if aDP.key in tradeable else (Results.get(aDP.key), aDP.key not in active) for aDP in registered}
+        assert kept == expected, The_bar
+        assert [dp_key for dp_key in expected if expected[dp_key] == "tradeable"] == backtest.tracker.tradeable_Function()
+        closed_DPs = sum(1 for outcome in expected.values() if outcome != "tradeable" and outcome[1])
+    assert len(registered) >= 20
+    assert entered_DPs and closed_DPs  # the series enters and stops out DPs
+    assert backtest.stats["validations"] < len(registered) * (len(CANDLES) - FIRST_BAR) // 10
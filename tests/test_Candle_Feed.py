@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from classes.Candle_Cache import RATES_DTYPE  # noqa: E402
+from classes.Candle_Feed import resample_Function  # noqa: E402
+from classes.Scheduler import BAR_SECONDS  # noqa: E402
+from functions.diagnostics import compare_resampled_Function  # noqa: E402
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# EURUSD bars from Thursday 2025-06-05 evening to Monday 2025-06-09 01:37 (broker clock): a rollover without quotes
+# (23:59-00:02), a quarter without ticks (Friday 03:15), the weekend (Friday 23:55 to Monday 00:05) and scattered
+# minutes without ticks. The M1 bars start at 22:07, the broker's M15/H1 bars at 21:00.
+def stored_rates_Function(The_timeframe: str) -> np.ndarray:
+    frame = pd.read_csv(os.path.join(DATA, f"EURUSD_{The_timeframe}.csv"))
+    rates = np.empty(len(frame), dtype=RATES_DTYPE)
+    rates["time"] = pd.to_datetime(frame["time"]).to_numpy(dtype="datetime64[s]").astype(np.int64)
+    for field in RATES_DTYPE.names[1:]:
+        rates[field] = frame[field].to_numpy()
+    return rates
+
+def seconds_Function(The_time: str) -> int:
+    return int(np.datetime64(The_time, "s").astype(np.int64))
+
+@pytest.mark.parametrize("timeframe, first_complete", [("M15", "2025-06-05 22:15"), ("H1", "2025-06-05 23:00")])
+def test_resampled_bars_match_the_broker(timeframe, first_complete):
+    base = stored_rates_Function("M1")
+    broker = stored_rates_Function(timeframe)
+    report = compare_resampled_Function(base, broker, timeframe)
+    assert report["compared"] == np.count_nonzero((broker["time"] >= seconds_Function(first_complete)) & (broker["time"] < broker["time"][-1]))
+    assert (report["only_broker"], report["only_resampled"]) == (0, 0)
+    assert not any(report["mismatches"].values())
+
+def test_partial_first_bar_is_left_out():
+    base = stored_rates_Function("M1")
+    broker = stored_rates_Function("H1")
+    resampled = resample_Function(base, "H1")
+    # The 22:00 bar is built from 22:07 on only: its open (and volume) differ from the broker's
+    first = broker[broker["time"] == resampled["time"][0]][0]
+    assert resampled["time"][0] == seconds_Function("2025-06-05 22:00")
+    assert (resampled["open"][0], resampled["tick_volume"][0]) != (first["open"], first["tick_volume"])
+    # Starting exactly on a bar open, that bar is complete and compared
+    aligned = base[base["time"] >= seconds_Function("2025-06-06 02:00")]
+    report = compare_resampled_Function(aligned, broker, "H1")
+    assert report["compared"] == np.count_nonzero((broker["time"] >= seconds_Function("2025-06-06 02:00")) & (broker["time"] < broker["time"][-1]))
+    assert not any(report["mismatches"].values())
+
+def test_forming_bar_matches_the_broker_so_far():
+    base = stored_rates_Function("M1")
+    for timeframe in ("M15", "H1"):
+        last = resample_Function(base, timeframe)[-1]
+        assert last.tolist() == stored_rates_Function(timeframe)[-1].tolist()
+
+@pytest.mark.parametrize("timeframe", ["M15", "H1"])
+def test_no_bars_over_session_gaps(timeframe):
+    base = stored_rates_Function("M1")
+    resampled = resample_Function(base, timeframe)
+    weekend = (resampled["time"] >= seconds_Function("2025-06-06 23:55")) & (resampled["time"] < seconds_Function("2025-06-09 00:00"))
+    assert not weekend.any()
+    monday = resampled[resampled["time"] == seconds_Function("2025-06-09 00:00")][0]
+    assert monday["open"] == base[base["time"] == seconds_Function("2025-06-09 00:05")][0]["open"]
+    # A bar opens at the first quote after the rollover, and a quarter without ticks has no M15 bar
+    midnight = resampled[resampled["time"] == seconds_Function("2025-06-06 00:00")][0]
+    assert midnight["open"] == base[base["time"] >= seconds_Function("2025-06-06 00:00")][0]["open"]
+    if timeframe == "M15":
+        assert seconds_Function("2025-06-06 03:15") not in resampled["time"]
+    assert np.all(np.diff(resampled["time"]) % BAR_SECONDS[timeframe] == 0)
@@ -0,0 +1,66 @@
+import asyncio
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from functions.DB_archive import retention_cutoff_Function, CLOSED_WEEKDAYS, RETENTION_DAYS  # noqa: E402
+from classes.Candle_Cache import CANDLE_WINDOW  # noqa: E402
+from classes.Flag_Detector import FlagDetector_Class  # noqa: E402
+from classes import SQLite_Database  # noqa: E402
+
+STREAM = "TEST_M15"
+
+def candles_Function(The_end: datetime.datetime, count: int) -> pd.DataFrame:
+    """ `count` M15 bars of a random walk on the open weekdays, the last one opening at `The_end`. """
+    times = pd.date_range(end=The_end, periods=count * 2, freq="15min")
+    times = times[~times.dayofweek.isin(CLOSED_WEEKDAYS)][-count:]
+    rng = np.random.default_rng(7)
+    closes = 1.1 + np.cumsum(rng.normal(0, 0.0005, count))
+    opens = np.r_[closes[0], closes[:-1]]
+    return pd.DataFrame({"time": times, "open": opens, "close": closes,
+                         "high": np.maximum(opens, closes) + np.abs(rng.normal(0, 0.0002, count)),
+                         "low": np.minimum(opens, closes) - np.abs(rng.normal(0, 0.0002, count))})
+
+def test_archived_history_is_not_detected_again(monkeypatch):
+    monkeypatch.setattr(SQLite_Database, "SQLITE_PATH", ":memory:")
+    monkeypatch.setattr(SQLite_Database, "sqlite_connection", None)
+    storage = SQLite_Database.SQLite_Database_Class(STREAM)
+    detector = FlagDetector_Class(STREAM, storage)
+    candles = candles_Function(datetime.datetime(2025, 6, 2, 12), 3 * CANDLE_WINDOW)
+    now = candles["time"].iloc[-1].to_pydatetime()
+    cutoff = retention_cutoff_Function(STREAM, now)
+    window = candles.iloc[-CANDLE_WINDOW:].reset_index(drop=True)
+
+    async def scenario():
+        # The bot has saved the flags of the whole history, then the archival job moves the closed part out
+        await detector.run_detection_Function(candles)
+        with storage._transaction_Function() as cursor:
+            cursor.execute(f"UPDATE {storage.important_dps_table_name} SET weight = 0, Result = 1")
+            cursor.execute(f"DELETE FROM {storage.important_dps_table_name} WHERE first_valid_trade_time < ?", (cutoff,))
+            archived_flags = cursor.execute(f"DELETE FROM {storage.flags_table_name} WHERE Ending_time < ?", (cutoff,)).rowcount
+            cursor.execute(f"DELETE FROM {storage.flag_points_table_name} WHERE time < ?", (cutoff,))
+        await storage.sync_registry_Function()
+
+        # The next pass sees the last window only
+        redetected = await detector.find_flags_Function(window.copy())
+        await storage.save_flags_Function(redetected)
+        return archived_flags, redetected
+
+    archived_flags, redetected = asyncio.run(scenario())
+    assert archived_flags > 0
+    # The fixed retention alone would archive flags the detector still sees
+    assert any(flag.End_time < now - datetime.timedelta(days=RETENTION_DAYS) for flag in redetected)
+    assert storage.detected_flags == 0
+    assert not storage.Registry.Active_DPs
+    with storage._transaction_Function() as cursor:
+        assert cursor.execute(f"SELECT COUNT(*) FROM {storage.flags_table_name} WHERE Ending_time < ?", (cutoff,)).fetchone()[0] == 0
+        assert cursor.execute(f"SELECT COUNT(*) FROM {storage.important_dps_table_name} WHERE first_valid_trade_time < ?", (cutoff,)).fetchone()[0] == 0
@@ -0,0 +1,74 @@
+import asyncio
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from classes.Flag_Detector import FlagDetector_Class  # noqa: E402
+from classes import SQLite_Database  # noqa: E402
+from test_DB_archive import candles_Function  # noqa: E402
+
+STREAM = "TEST_M15"
+
+def sql_reads_Function(The_storage) -> tuple[list[int], dict, dict]:
+    """
+    The reads the registry replaced: the active DP keys, Traded_DP_Dict (the registry only holds the positions of
+    the active DPs) and the pending positions of `Read_Pending_Positions_Function`.
+    """
+    cursor = The_storage.connection.cursor()
+    active = sorted(row[0] for row in cursor.execute(f"SELECT id FROM {The_storage.important_dps_table_name} WHERE weight > 0"))
+    traded = {row[0]: {"TP": row[1], "Vol": row[2], "Order_ID": row[3]}
+              for row in cursor.execute(f"SELECT Traded_DP, TP, Vol, Order_ID FROM {The_storage.Positions_table_name}")
+              if row[0] in set(active)}
+    pending = {row[0]: row[1] for row in cursor.execute(f"SELECT Traded_DP, Order_ID FROM {The_storage.Positions_table_name} WHERE Result = 0")}
+    return active, traded, pending
+
+async def registry_reads_Function(The_storage) -> tuple[list[int], dict, dict]:
+    traded = {dp_key: dict(trade_info) for dp_key, trade_info in The_storage.Traded_DP_Dict.items()}  # the later steps update them in place
+    return sorted(The_storage.Registry.Active_DPs), traded, await The_storage.Read_Pending_Positions_Function()
+
+def test_registry_reads_match_the_sql_reads(monkeypatch):
+    monkeypatch.setattr(SQLite_Database, "SQLITE_PATH", ":memory:")
+    monkeypatch.setattr(SQLite_Database, "sqlite_connection", None)
+    storage = SQLite_Database.SQLite_Database_Class(STREAM)
+
+    async def scenario() -> list[tuple]:
+        await FlagDetector_Class(STREAM, storage).run_detection_Function(candles_Function(datetime.datetime(2025, 6, 2, 12), 3000))
+        await storage.sync_registry_Function()
+        keys = sorted(storage.Registry.Active_DPs)
+        assert len(keys) >= 40
+        orders = {dp_key: 1000 + index for index, dp_key in enumerate(keys[:40])}
+        steps = []
+
+        # Positions on 40 DPs, then Results (winners and losers), closed DPs, cancelled orders and moved TPs
+        await storage._insert_positions_batch([(dp_key, "Buy Limit", 1.1, 1.09, 1.12, datetime.datetime(2025, 6, 2, 10), 0.1, order_id, 80, 0)
+                                               for dp_key, order_id in orders.items()])
+        steps.append(("positions", await registry_reads_Function(storage), sql_reads_Function(storage)))
+        await storage._update_dp_Results_Function([(dp_key, 1.5) for dp_key in keys[:10]] + [(dp_key, -1.0) for dp_key in keys[10:15]])
+        steps.append(("Results", await registry_reads_Function(storage), sql_reads_Function(storage)))
+        await storage._update_dp_weights_Function([(dp_key, 0) for dp_key in keys[5:10] + keys[15:20]] + [(dp_key, 2) for dp_key in keys[20:25]])
+        steps.append(("weights", await registry_reads_Function(storage), sql_reads_Function(storage)))
+        await storage.remove_cancelled_positions_Function({dp_key: orders[dp_key] for dp_key in keys[25:30]})
+        steps.append(("cancels", await registry_reads_Function(storage), sql_reads_Function(storage)))
+        await storage.update_position_TPs_batch_Function([(orders[dp_key], 1.13) for dp_key in keys[30:35]])
+        steps.append(("TPs", await registry_reads_Function(storage), sql_reads_Function(storage)))
+
+        # A full resync reads the same
+        before = await registry_reads_Function(storage)
+        await storage.sync_registry_Function()
+        steps.append(("sync", await registry_reads_Function(storage), before))
+        return steps
+
+    steps = asyncio.run(scenario())
+    for step, registry, sql in steps:
+        assert registry == sql, step
+    active, traded, pending = steps[-1][1]
+    # 40 positions: 10 on closed DPs and 5 cancelled leave 25, of which 10 have a Result (5 winners left, 5 losers)
+    assert (len(traded), len(pending)) == (25, 15)
+    assert {traded[dp_key]["TP"] for dp_key in traded} == {1.12, 1.13}
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from classes.Flag_Detector import FlagDetector_Class, next_exceeding_Function, previous_reaching_Function  # noqa: E402
+
+def scanned_flags_Function(The_dataset: pd.DataFrame) -> list[tuple]:
+    """ The per-extreme forward and backward scans the detector ran before the monotonic stacks, as flag tuples. """
+    highs = The_dataset["high"].to_numpy(dtype=float)
+    lows = The_dataset["low"].to_numpy(dtype=float)
+    is_local_max = (highs > np.roll(highs, 1)) & (highs > np.roll(highs, -1))
+    is_local_min = (lows < np.roll(lows, 1)) & (lows < np.roll(lows, -1))
+    The_flags = []
+    for anIndex in np.where(is_local_max)[0]:
+        high_of_flag = highs[anIndex]
+        end_of_flag_indices = np.where(highs[anIndex + 1:] > high_of_flag)[0]
+        if end_of_flag_indices.size == 0:
+            continue
+        end_of_flag_index = anIndex + 1 + end_of_flag_indices[0]
+        if end_of_flag_index - anIndex <= 15:
+            continue
+        low_of_flag = lows[anIndex:end_of_flag_index + 1].min()
+        low_of_flag_index = anIndex + np.where(lows[anIndex:end_of_flag_index + 1] == low_of_flag)[0][-1]
+        start_of_flag_index = None
+        for j in range(1, anIndex):
+            if highs[anIndex - j] >= high_of_flag:
+                break
+            elif lows[anIndex - j] < low_of_flag:
+                start_of_flag_index = anIndex - j
+                break
+        if start_of_flag_index is None:
+            continue
+        The_flags.append(("Bullish" if low_of_flag_index != anIndex else "Undefined",
+                          anIndex, low_of_flag_index, start_of_flag_index, end_of_flag_index))
+    for anIndex in np.where(is_local_min)[0]:
+        low_of_flag = lows[anIndex]
+        end_of_flag_indices = np.where(lows[anIndex + 1:] < low_of_flag)[0]
+        if end_of_flag_indices.size == 0:
+            continue
+        end_of_flag_index = anIndex + 1 + end_of_flag_indices[0]
+        if end_of_flag_index - anIndex <= 15:
+            continue
+        high_of_flag = highs[anIndex:end_of_flag_index + 1].max()
+        high_of_flag_index = anIndex + np.where(highs[anIndex:end_of_flag_index + 1] == high_of_flag)[0][-1]
+        start_of_flag_index = None
+        for j in range(1, anIndex):
+            if lows[anIndex - j] <= low_of_flag:
+                break
+            elif highs[anIndex - j] > high_of_flag:
+                start_of_flag_index = anIndex - j
+                break
+        if start_of_flag_index is None:
+            continue
+        The_flags.append(("Bearish" if high_of_flag_index != anIndex else "Undefined",
+                          high_of_flag_index, anIndex, start_of_flag_index, end_of_flag_index))
+    return The_flags
+
+def detected_flags_Function(The_dataset: pd.DataFrame) -> list[tuple]:
+    """ The flags of `find_flags_Function` as (type, high index, low index, start index, end index) tuples. """
+    detector = FlagDetector_Class("TEST_M15", None)
+    flags = asyncio.run(detector.find_flags_Function(The_dataset))
+    return [(aFlag.flag_type, aFlag.high.index, aFlag.low.index, aFlag.Start_index, aFlag.End_index) for aFlag in flags]
+
+def candles_Function(The_highs, The_lows) -> pd.DataFrame:
+    return pd.DataFrame({"time": pd.date_range("2025-01-06", periods=len(The_highs), freq="15min"),
+                         "high": np.asarray(The_highs, dtype=float), "low": np.asarray(The_lows, dtype=float)})
+
+def random_candles_Function(The_seed: int, count: int = 600, ticks: int = 3) -> pd.DataFrame:
+    """ A random walk on a coarse tick grid, so equal highs and equal lows are frequent. """
+    rng = np.random.default_rng(The_seed)
+    mids = np.cumsum(rng.integers(-ticks, ticks + 1, count))
+    highs = mids + rng.integers(0, ticks, count)
+    lows = mids - rng.integers(0, ticks, count)
+    return candles_Function(highs, lows)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_stacks_find_the_flags_of_the_scan(seed):
+    candles = random_candles_Function(seed)
+    expected = scanned_flags_Function(candles)
+    assert expected
+    assert detected_flags_Function(candles) == expected
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stack_indexes_match_brute_force(seed):
+    values = np.random.default_rng(seed).integers(0, 6, 300).astype(float)
+    next_exceeding = [next((j for j in range(i + 1, len(values)) if values[j] > values[i]), -1) for i in range(len(values))]
+    previous_reaching = [next((j for j in range(i - 1, -1, -1) if values[j] >= values[i]), -1) for i in range(len(values))]
+    assert next_exceeding_Function(values).tolist() == next_exceeding
+    assert previous_reaching_Function(values).tolist() == previous_reaching
+
+def test_bar_zero_is_never_a_flag_start():
+    # Only bar 0 has a low under the flag low before the local max at bar 2: the scan stops at bar 1, so no flag
+    highs = [5, 6, 9, 8] + [7] * 14 + [10]
+    lows = [1, 4, 4, 3] + [2] * 14 + [6]
+    candles = candles_Function(highs, lows)
+    assert scanned_flags_Function(candles) == []
+    assert detected_flags_Function(candles) == []
+    # The same low one bar later is a start
+    lows[1] = 1
+    candles = candles_Function(highs, lows)
+    assert detected_flags_Function(candles) == scanned_flags_Function(candles) == [("Bullish", 2, 17, 1, 18)]
+
+def test_equal_high_bounds_the_start_search():
+    # Bar 3 reaches the high of bar 5, so the lower low at bar 2 only starts the flag of bar 3
+    highs = [5, 4, 4, 9, 6, 9, 8] + [7] * 14 + [10]
+    lows = [3, 3, 1, 5, 5, 5, 4] + [3] * 14 + [6]
+    candles = candles_Function(highs, lows)
+    assert detected_flags_Function(candles) == scanned_flags_Function(candles) == [("Bullish", 3, 20, 2, 21)]
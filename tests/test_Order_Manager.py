@@ -0,0 +1,70 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from classes.Order_Manager import Broker_Snapshot_Class, desired_orders_Function, plan_orders_Function  # noqa: E402
+
+def DP_Function(high: float, low: float, direction: str = "Bullish") -> types.SimpleNamespace:
+    return types.SimpleNamespace(trade_direction=direction, High=types.SimpleNamespace(price=high), Low=types.SimpleNamespace(price=low))
+
+def broker_order_Function(ticket: int, tp: float) -> types.SimpleNamespace:
+    return types.SimpleNamespace(ticket=ticket, tp=tp)
+
+# A Bullish DP from 1.10 (entry) to 1.09 (SL): its TP is 1.10 + RR * 0.01
+CASES = [
+    # name, trade list [(DP, key, RR)], placed {key: (TP, Order_ID)}, broker orders {ticket: TP}, broker positions [ticket],
+    # expected (opens, modifies, cancels)
+    ("new DP is opened",
+     [(DP_Function(1.10, 1.09), 1, 2.0)], {}, {}, [],
+     ([1], [], {})),
+    ("entry without a key is skipped",
+     [(DP_Function(1.10, 1.09), None, 2.0), (DP_Function(1.20, 1.19), 2, 2.0)], {}, {}, [],
+     ([2], [], {})),
+    ("TP moved down is modified",
+     [(DP_Function(1.10, 1.09), 1, 1.5)], {1: (1.12, 100)}, {100: 1.12}, [],
+     ([], [(1, 100)], {})),
+    ("TP moved up is not modified",
+     [(DP_Function(1.10, 1.09), 1, 2.5)], {1: (1.12, 100)}, {100: 1.12}, [],
+     ([], [], {})),
+    ("broker TP decides over a stale registry TP",
+     [(DP_Function(1.10, 1.09), 1, 1.5)], {1: (1.13, 100)}, {100: 1.11}, [],
+     ([], [], {})),
+    ("filled order is not modified",
+     [(DP_Function(1.10, 1.09), 1, 1.5)], {1: (1.12, 100)}, {}, [100],
+     ([], [], {})),
+    ("pending order of a DP that left the list is cancelled",
+     [], {1: (1.12, 100)}, {100: 1.12}, [],
+     ([], [], {1: 100})),
+    ("filled order of a DP that left the list is not cancelled",
+     [], {1: (1.12, 100)}, {}, [100],
+     ([], [], {})),
+    ("order gone from the broker is not cancelled",
+     [], {1: (1.12, 100)}, {}, [],
+     ([], [], {})),
+    ("mixed pass",
+     [(DP_Function(1.10, 1.09), 1, 1.5), (DP_Function(1.31, 1.30, "Bearish"), 3, 1.0), (DP_Function(1.20, 1.19), None, 2.0)],
+     {1: (1.12, 100), 2: (1.22, 200), 4: (1.42, 400)}, {100: 1.12, 200: 1.22}, [400],
+     ([3], [(1, 100)], {2: 200})),
+]
+
+@pytest.mark.parametrize("trade_list, placed, orders, positions, expected", [case[1:] for case in CASES], ids=[case[0] for case in CASES])
+def test_plan_orders(trade_list, placed, orders, positions, expected):
+    desired = desired_orders_Function([(aDP, dp_key, 0.5, RR, 0.7) for aDP, dp_key, RR in trade_list])
+    traded = {dp_key: {"TP": tp, "Vol": 0.1, "Order_ID": order_id} for dp_key, (tp, order_id) in placed.items()}
+    snapshot = Broker_Snapshot_Class([broker_order_Function(ticket, tp) for ticket, tp in orders.items()],
+                                     [types.SimpleNamespace(ticket=ticket) for ticket in positions])
+    opens, modifies, cancels = plan_orders_Function(desired, traded, snapshot)
+    assert ([The_order.dp_key for The_order in opens], [(The_order.dp_key, broker_order.ticket) for The_order, broker_order in modifies], cancels) == expected
+
+def test_modify_takes_the_desired_TP():
+    desired = desired_orders_Function([(DP_Function(1.31, 1.30, "Bearish"), 1, 0.5, 1.5, 0.7)])
+    snapshot = Broker_Snapshot_Class([broker_order_Function(100, 1.29)], None)
+    _, modifies, _ = plan_orders_Function(desired, {1: {"TP": 1.29, "Vol": 0.1, "Order_ID": 100}}, snapshot)
+    assert [(The_order.order_type, round(The_order.tp, 5)) for The_order, _ in modifies] == [("Sell Limit", 1.285)]
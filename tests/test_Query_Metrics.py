@@ -0,0 +1,96 @@
+import asyncio
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from classes import Database, Query_Metrics  # noqa: E402
+from classes.Database import Database_Class  # noqa: E402
+from classes.Query_Metrics import Instrumented_Cursor_Class, Query_Metrics_Class  # noqa: E402
+from classes.Write_Behind import Pending_Writes_Class  # noqa: E402
+from functions.DB_migration import PERFORMANCE_SUMMARY_TABLE  # noqa: E402
+
+class Cursor_Class:
+    """ Takes any statement; the day queries return one day, everything else no rows. """
+
+    rowcount = 0
+
+    def __init__(self):
+        self.rows: list[tuple] = []
+
+    async def execute(self, query: str, params=None):
+        self.rows = [(datetime.date(2025, 6, 2),)] if "SELECT DISTINCT DATE" in query else []
+
+    async def executemany(self, query: str, rows):
+        self.rows = []
+
+    async def fetchall(self):
+        return self.rows
+
+def database_Function(The_stream: str) -> Database_Class:
+    database = Database_Class.__new__(Database_Class)
+    database.TimeFrame = The_stream
+    database.Positions_table_name = f"Positions_{The_stream}"
+    database.important_dps_table_name = f"Important_DPs_{The_stream}"
+    return database
+
+@pytest.fixture
+def metrics(monkeypatch, tmp_path):
+    metrics = Query_Metrics_Class()
+    monkeypatch.setattr(Query_Metrics, "QUERY_SAMPLES", str(tmp_path / "query_samples.jsonl"))
+    monkeypatch.setattr(Query_Metrics, "CQuery_Metrics", metrics)
+    monkeypatch.setattr(Database, "CQuery_Metrics", metrics)
+    return metrics
+
+def flush_Function(The_database: Database_Class, The_pending: Pending_Writes_Class):
+    asyncio.run(The_database._apply_writes_Function(Instrumented_Cursor_Class(Cursor_Class(), "write_behind"), The_pending))
+
+def test_audit_covers_the_issued_statements(metrics):
+    database = database_Function("TEST_M15")
+    pending = Pending_Writes_Class()
+    pending.apply_Function("delete", [(1, 100)])
+    pending.apply_Function("insert", [(2, "Buy Limit", 1.1, 1.09, 1.12, datetime.datetime(2025, 6, 2), 0.1, 200, 80, 0),
+                                      (3, "Sell Limit", 1.2, 1.21, 1.18, datetime.datetime(2025, 6, 2), 0.1, 300, 75, 0)])
+    flush_Function(database, pending)
+
+    catalog = database.audit_queries_Function()
+    queries = [query for _, query, _ in catalog]
+    assert [args for _, query, args in catalog if "INSERT INTO Positions_TEST_M15" in query] == [
+        [2, "Buy Limit", 1.1, 1.09, 1.12, datetime.datetime(2025, 6, 2), 0.1, 200, 80, 0]]  # one row of the batch
+    assert any(query.startswith("SELECT DISTINCT DATE(Last_modified_time) FROM Positions_TEST_M15") for query in queries)
+    assert any(query.startswith(f"DELETE FROM {PERFORMANCE_SUMMARY_TABLE}") for query in queries)
+    assert any(PERFORMANCE_SUMMARY_TABLE in query and query.lstrip().startswith("INSERT") for query in queries)
+
+def test_one_sample_per_fingerprint_kept_across_runs(metrics):
+    database = database_Function("TEST_M15")
+    for order_ids in ([100], [101, 102, 103]):
+        pending = Pending_Writes_Class()
+        pending.apply_Function("delete", [(order_id, order_id) for order_id in order_ids])
+        flush_Function(database, pending)
+    deletes = [args for _, query, args in database.audit_queries_Function() if query.startswith("DELETE FROM Positions_")]
+    assert deletes == [[100]]  # IN-lists of any length share one fingerprint
+
+    # A new process reads the samples the previous runs kept
+    Database.CQuery_Metrics = Query_Metrics.CQuery_Metrics = Query_Metrics_Class()
+    assert [args for _, query, args in database.audit_queries_Function() if query.startswith("DELETE FROM Positions_")] == [[100]]
+
+def test_audit_keeps_the_stream_and_shared_statements(metrics):
+    async def issue():
+        cursor = Instrumented_Cursor_Class(Cursor_Class(), "TEST_H1")
+        await cursor.execute("SELECT id, Result FROM Important_DPs_TEST_H1")
+        await cursor.execute(f"SELECT SUM(pnl_vol) FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = %s", ("TEST_H1",))
+        cursor = Instrumented_Cursor_Class(Cursor_Class(), "archive")
+        await cursor.execute("CREATE TABLE IF NOT EXISTS Archive_Flags_TEST_M15 LIKE Flags_TEST_M15")
+        await cursor.execute("SELECT id FROM Archive_Important_DPs_TEST_M15")
+        await cursor.execute("SELECT id FROM Archive_Important_DPs_TEST_M1")
+    asyncio.run(issue())
+
+    assert sorted((query, args) for _, query, args in database_Function("TEST_M15").audit_queries_Function()) == [
+        (f"SELECT SUM(pnl_vol) FROM {PERFORMANCE_SUMMARY_TABLE} WHERE timeframe = %s", ["TEST_H1"]),
+        ("SELECT id FROM Archive_Important_DPs_TEST_M15", [])]
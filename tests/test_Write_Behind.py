@@ -0,0 +1,196 @@
+import asyncio
+import contextlib
+import datetime
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("MetaTrader5")
+pytest.importorskip("aiomysql")
+
+from classes.Database import Database_Class  # noqa: E402
+from classes import Write_Behind  # noqa: E402
+from classes.Write_Behind import Pending_Writes_Class, Write_Behind_Class  # noqa: E402
+
+class Positions_Cursor_Class:
+    """ The statements `_apply_writes_Function` issues on the positions, played on a dict Order_ID -> Traded_DP; the others are ignored. """
+
+    def __init__(self, positions: dict[int, int]):
+        self.positions = positions
+        self.rows: list[tuple] = []
+
+    async def execute(self, query: str, params=None):
+        self.rows = []
+        query = " ".join(query.split())
+        if re.match(r"SELECT Traded_DP, Order_ID FROM Positions_", query):
+            self.rows = [(dp_key, order_id) for order_id, dp_key in self.positions.items() if dp_key in params]
+        elif re.match(r"DELETE FROM Positions_", query):
+            for order_id in params:
+                self.positions.pop(order_id, None)
+
+    async def executemany(self, query: str, rows):
+        if re.match(r"INSERT INTO Positions_", " ".join(query.split())):
+            for row in rows:
+                self.positions[row[7]] = row[0]
+
+    async def fetchall(self):
+        return self.rows
+
+def test_cancel_then_replace_in_one_flush():
+    database = Database_Class.__new__(Database_Class)
+    database.TimeFrame = "TEST_M15"
+    database.Positions_table_name = "Positions_TEST_M15"
+    database.important_dps_table_name = "Important_DPs_TEST_M15"
+    cursor = Positions_Cursor_Class({100: 1})  # the order 100 of DP 1 is stored
+
+    pending = Pending_Writes_Class()
+    pending.apply_Function("delete", [(1, 100)])  # cancelled ...
+    pending.apply_Function("insert", [(1, "Buy Limit", 1.1, 1.09, 1.12, datetime.datetime(2025, 6, 2), 0.1, 200, 80, 0)])  # ... and placed again
+
+    orders_to_cancel = asyncio.run(database._apply_writes_Function(cursor, pending))
+    assert orders_to_cancel == []
+    assert cursor.positions == {200: 1}
+
+class Crash(BaseException):
+    """ The process dying mid-flush: neither the rollback nor the flush error handling runs. """
+
+class Recording_Database_Class:
+    """ A registered timeframe whose flushes record the snapshots written; `during_flush` runs in the next flush, `fail` is raised by it. """
+
+    def __init__(self, The_timeframe: str):
+        self.TimeFrame = The_timeframe
+        self.flushed: list[Pending_Writes_Class] = []
+        self.during_flush = None
+        self.fail = None
+
+    async def _apply_writes_Function(self, cursor, pending):
+        if self.during_flush is not None:
+            self.during_flush, during_flush = None, self.during_flush
+            during_flush()
+        if self.fail is not None:
+            self.fail, fail = None, self.fail
+            raise fail
+        self.flushed.append(pending)
+        return []
+
+    async def _cancel_duplicate_order_Function(self, The_order_ID: int):
+        pass
+
+class Connection_Class:
+    async def commit(self):
+        pass
+
+    async def begin(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    @contextlib.asynccontextmanager
+    async def cursor(self):
+        yield None
+
+class Pool_Class:
+    @contextlib.asynccontextmanager
+    async def acquire(self, The_user: str):
+        yield Connection_Class()
+
+@pytest.fixture
+def journal(monkeypatch, tmp_path):
+    monkeypatch.setattr(Write_Behind, "CDB_Pool", Pool_Class())
+    monkeypatch.setattr(Write_Behind, "JOURNAL_ENABLED", True)
+    return str(tmp_path / "write_behind.jsonl")
+
+def write_behind_Function(The_journal: str) -> tuple[Write_Behind_Class, Recording_Database_Class]:
+    """ A fresh process: its write-behind on `The_journal`, with the TEST_M15 timeframe registered. """
+    write_behind = Write_Behind_Class()
+    write_behind.use_journal_Function(The_journal)
+    database = Recording_Database_Class("TEST_M15")
+    write_behind.register_database_Function(database)
+    return write_behind, database
+
+def position_Function(dp_key: int, order_id: int, tp: float = 1.12) -> list:
+    return [dp_key, "Buy Limit", 1.1, 1.09, tp, datetime.datetime(2025, 6, 2), 0.1, order_id, 80, 0]
+
+def test_crash_mid_flush_is_recovered(journal):
+    write_behind, database = write_behind_Function(journal)
+    write_behind.enqueue_Function("TEST_M15", "Results", [(1, 1.0), (2, -1.0)])
+    write_behind.enqueue_Function("TEST_M15", "insert", [position_Function(3, 300)])
+    # Queued while the snapshot is being written: journaled to the fresh journal, not the .flushing one
+    database.during_flush = lambda: write_behind.enqueue_Function("TEST_M15", "weights", [(4, 0.5)])
+    database.fail = Crash()
+    with pytest.raises(Crash):
+        asyncio.run(write_behind.flush_Function())
+    write_behind.journal_file.close()
+    assert os.path.exists(journal + ".flushing") and os.path.exists(journal)
+
+    write_behind, database = write_behind_Function(journal)
+    write_behind.recover_Function()
+    asyncio.run(write_behind.flush_Function())
+    assert len(database.flushed) == 1
+    assert database.flushed[0].Results == {1: 1.0, 2: -1.0}
+    assert database.flushed[0].weights == {4: 0.5}
+    assert list(database.flushed[0].inserts) == [3]
+    assert not os.path.exists(journal + ".flushing") and not os.path.exists(journal)
+
+def test_failed_flush_then_crash_keeps_both_journals(journal):
+    write_behind, database = write_behind_Function(journal)
+    write_behind.enqueue_Function("TEST_M15", "Results", [(1, 1.0)])
+    database.fail = ConnectionError("server gone")
+    asyncio.run(write_behind.flush_Function())  # kept for the next flush, the .flushing journal too
+    assert write_behind.Pending["TEST_M15"].Results == {1: 1.0}
+    write_behind.enqueue_Function("TEST_M15", "Results", [(1, -1.0), (2, 1.0)])
+    database.fail = Crash()
+    with pytest.raises(Crash):
+        asyncio.run(write_behind.flush_Function())  # the new journal is appended to the .flushing one
+    assert not os.path.exists(journal)
+
+    write_behind, database = write_behind_Function(journal)
+    write_behind.recover_Function()
+    assert write_behind.Pending["TEST_M15"].Results == {1: -1.0, 2: 1.0}  # replayed in order: the last Result wins
+
+def test_worker_journals_are_adopted(journal):
+    worker_journal = journal + ".worker0"
+    worker, worker_database = write_behind_Function(worker_journal)
+    worker.enqueue_Function("TEST_M15", "Results", [(1, 1.0)])
+    worker_database.fail = Crash()
+    with pytest.raises(Crash):
+        asyncio.run(worker.flush_Function())
+    worker.enqueue_Function("TEST_M15", "TPs", [(500, 1.2)])
+    worker.journal_file.close()
+    worker_journals = [worker_journal, worker_journal + ".flushing"]
+
+    write_behind, database = write_behind_Function(journal)
+    database.fail = ConnectionError("server gone")
+    asyncio.run(write_behind.adopt_journals_Function(worker_journals))
+    assert all(os.path.exists(path) for path in worker_journals)  # kept until they are written
+
+    write_behind, database = write_behind_Function(journal)
+    asyncio.run(write_behind.adopt_journals_Function(worker_journals))
+    assert (database.flushed[0].Results, database.flushed[0].TPs) == ({1: 1.0}, {500: 1.2})
+    assert not any(os.path.exists(path) for path in worker_journals)
+
+def test_insert_then_delete_of_the_same_order_coalesces_away(journal):
+    write_behind, database = write_behind_Function(journal)
+    write_behind.enqueue_Function("TEST_M15", "insert", [position_Function(1, 100)])
+    write_behind.enqueue_Function("TEST_M15", "TPs", [(100, 1.15)])
+    assert write_behind.Pending["TEST_M15"].inserts[1][4] == 1.15  # re-priced before its insert: only the insert changes
+    write_behind.enqueue_Function("TEST_M15", "delete", [(1, 100)])
+    assert write_behind.Pending["TEST_M15"].is_empty_Function()
+    assert write_behind.stats["coalesced"] == 3  # the TP, the delete and the insert it cancels
+
+    # A delete of another order of the same DP (the stored one) is kept, with the buffered insert
+    write_behind.enqueue_Function("TEST_M15", "insert", [position_Function(1, 200)])
+    write_behind.enqueue_Function("TEST_M15", "delete", [(1, 150)])
+    assert (list(write_behind.Pending["TEST_M15"].inserts), write_behind.Pending["TEST_M15"].deletes) == ([1], {150: 1})
+    write_behind.journal_file.close()
+
+    # Replaying the journal coalesces the same way
+    write_behind, database = write_behind_Function(journal)
+    write_behind.recover_Function()
+    assert (list(write_behind.Pending["TEST_M15"].inserts), write_behind.Pending["TEST_M15"].deletes) == ([1], {150: 1})
+    assert write_behind.Pending["TEST_M15"].inserts[1][7] == 200